@@ -15,6 +15,7 @@ interface ApiChatMessage {
 interface SendMessageRequest {
   messages: ApiChatMessage[];
   timestamp: string;
+  conversation_id?: string;
   aws_region: string;
   aws_bearer_token: string;
   bedrock_model_id: string;
@@ -25,11 +26,14 @@ interface SendMessageResponse {
   message: string;
   timestamp: string;
   success: boolean;
+  data_handle?: string | null;
+  conversation_id?: string | null;
 }
 
 interface CreateReportRequest {
   content: string;
   timestamp: string;
+  data_handle?: string;
   aws_region: string;
   aws_bearer_token: string;
   bedrock_model_id: string;
@@ -45,6 +49,7 @@ interface CreateReportResponse {
 interface CreateChartRequest {
   content: string;
   timestamp: string;
+  data_handle?: string;
   aws_region: string;
   aws_bearer_token: string;
   bedrock_model_id: string;
@@ -76,6 +81,8 @@ export const useChat = () => {
   const abortControllerRef = useRef<AbortController | null>(null);
   const previewCacheRef = useRef<Map<number, string>>(new Map());
   const chartCacheRef = useRef<Map<number, string>>(new Map());
+  // サーバーが発行した会話ID（会話内の取得済みデータを参照するため、以降のリクエストで送り返す）
+  const conversationIdRef = useRef<string | undefined>(undefined);
 
   const addMessage = useCallback((message: Omit<ChatMessage, 'id' | 'timestamp'>) => {
     setState((prev) => {
@@ -168,6 +175,7 @@ export const useChat = () => {
           body: {
             messages: allMessages,
             timestamp: generateTimestamp(),
+            conversation_id: conversationIdRef.current,
             aws_region: settings.awsRegion,
             aws_bearer_token: settings.awsBearerToken,
             bedrock_model_id: settings.bedrockModelId,
@@ -178,9 +186,13 @@ export const useChat = () => {
 
         // キャンセルされていない場合のみレスポンスを処理
         if (!abortControllerRef.current?.signal.aborted) {
+          if (response.conversation_id) {
+            conversationIdRef.current = response.conversation_id;
+          }
           addMessage({
             text: response.message,
             sender: 'bot',
+            dataHandle: response.data_handle ?? undefined,
           });
         }
       } catch (error) {
@@ -237,6 +249,7 @@ export const useChat = () => {
           body: {
             content: message.text,
             timestamp: generateTimestamp(),
+            data_handle: message.dataHandle,
             aws_region: settings.awsRegion,
             aws_bearer_token: settings.awsBearerToken,
             bedrock_model_id: settings.bedrockModelId,
@@ -284,6 +297,7 @@ export const useChat = () => {
           body: {
             content: message.text,
             timestamp: generateTimestamp(),
+            data_handle: message.dataHandle,
             aws_region: settings.awsRegion,
             aws_bearer_token: settings.awsBearerToken,
             bedrock_model_id: settings.bedrockModelId,
@@ -351,6 +365,7 @@ export const useChat = () => {
   const clearMessages = useCallback(() => {
     previewCacheRef.current.clear();
     chartCacheRef.current.clear();
+    conversationIdRef.current = undefined;
     setState((prev) => ({
       ...prev,
       messages: [],
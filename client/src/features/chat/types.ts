@@ -6,6 +6,7 @@ export interface ChatMessage {
   sender: ChatSender;
   timestamp: string;
   showChart?: boolean;
+  dataHandle?: string;
 }
 
 export interface ChatPreviewState {
@@ -1,4 +1,5 @@
 """システムプロンプト定義"""
+from ..core.dashboard_spec import dashboard_spec_json_schema
 
 # MCP用システムプロンプト
 MCP_SYSTEM_PROMPT = """
@@ -32,6 +33,37 @@ MCP_SYSTEM_PROMPT = """
 5. もしユーザーから'このビュー'や'このダッシュボード'と質問する際に、'get-view-data'を使い、view IDが'8073b84f-e050-4be1-9cb6-96fcffd53649'のデータを使って分析してください
 """
 
+# 会話内で取得済みのクエリ結果の案内（MCP_SYSTEM_PROMPTに追記）
+STORED_RESULTS_PROMPT_TEMPLATE = """
+このチャットで取得済みのクエリ結果（aggregate-cached-result ツールで再集計可能）:
+{results}
+フォローアップの質問（別の切り口での集計、絞り込み、並べ替えなど）がこれらの結果で回答できる場合は、
+query-datasource を再度呼び出さずに aggregate-cached-result を使用してください。
+"""
+
+# メタデータインデックスから抽出した関連フィールドの案内（MCP_SYSTEM_PROMPTに追記）
+METADATA_CONTEXT_PROMPT_TEMPLATE = """
+データソースのメタデータ索引から、質問に関連しそうなフィールドを抽出しました（フィールド名 [キャプション] (型)）:
+{fields}
+これで対象のデータソースとフィールドが特定できる場合は、list-datasources / get-datasource-metadata を呼び出さずに
+query-datasource を使用してください。他のフィールドは search-datasource-metadata で検索できます。
+"""
+
+# ツール選択で送信を省略したツールの案内（MCP_SYSTEM_PROMPTに追記）
+OMITTED_TOOLS_PROMPT_TEMPLATE = """
+以下のツールも利用できます（定義は省略しています）。必要な場合はツール名を挙げてください。次の応答から使用可能になります:
+{tools}
+"""
+
+# 要求されたツールを追加した際に会話へ追加するメッセージ
+TOOLS_ADDED_MESSAGE_TEMPLATE = "ツール {tools} を使用可能にしました。必要であれば使用して回答を続けてください。"
+
+# 同じツールを同じ引数で呼び直した場合に、前回の結果の前に付ける注記
+REPEATED_TOOL_CALL_NOTE = "（同じ引数での呼び出しが繰り返されたため、前回の結果を再掲します。再度呼び出す必要はありません）\n"
+
+# 循環または反復回数の上限を検出した際に、ツール結果と一緒に送る最終回答の指示
+FORCE_FINAL_ANSWER_MESSAGE = "これ以上ツールは呼び出さず、ここまでに得られた結果だけを使って質問への最終回答を作成してください。"
+
 # ダッシュボード生成用ベースプロンプト
 DASHBOARD_BASE_SYSTEM_PROMPT = """
 あなたはデータ分析結果をHTML+CSS+JavaScriptを使ってダッシュボード化する専門家です。Claudeのアーティファクトのような高品質なダッシュボードを作成してください。
@@ -126,6 +158,78 @@ CHART_SYSTEM_PROMPT = """
 - チャートコンテナのCSS高さは300px-400px範囲に設定
 """
 
+# ダッシュボード仕様（JSON）生成用プロンプト（HTMLはサーバー側テンプレートで描画）
+DASHBOARD_SPEC_SYSTEM_PROMPT = """
+あなたはデータ分析結果をダッシュボードとして構成する専門家です。
+HTMLやJavaScriptは書かず、ダッシュボードの内容を以下のJSON Schemaに従うJSONオブジェクト1つだけで出力してください。
+
+**絶対遵守：出力形式指示**
+- レスポンス全体が { で開始し } で終了する
+- コードブロック記法、説明文、前置き、後書きは一切書かない
+- 空白や改行を入れずにコンパクトに出力する
+- 数値データ（datasets[].data）は実際の値をそのまま数値で記載する
+- KPIのvalueは表示用に整形した文字列（適切な単位：千、万、億等）にする
+- chartsは分析内容に合った種類（bar, line, pie, doughnut, radar, polarArea）を選び、最大{max_charts}個まで
+- sectionsには洞察・分析結果を簡潔に記載する（マークダウン記法は使わない）
+
+JSON Schema:
+{schema}
+"""
+
+# チャート仕様（JSON）生成用プロンプト
+CHART_SPEC_SYSTEM_PROMPT_SUFFIX = """
+今回は単一のチャートを作成します。chartsには最も適切なチャートを必ず1つだけ含め、kpisとsectionsは空にしてください。
+"""
+
+# セクション並列生成：構成計画用プロンプト
+DASHBOARD_PLAN_SYSTEM_PROMPT = """
+あなたはデータ分析結果からダッシュボードの構成を設計する専門家です。
+ダッシュボードを構成するセクションの一覧を、以下の形式のJSONオブジェクト1つだけで出力してください。
+説明文やコードブロック記法は書かないでください。
+
+{"title":"ダッシュボードのタイトル","sections":[{"type":"kpi|chart|table|insight","title":"セクション見出し","brief":"表示する内容と使用する数値の指示"}]}
+
+- セクションは最大{max_sections}個。通常は kpi 1個、chart 2〜3個、insight 1個程度
+- 各セクションは別々の担当者が並行して作成するため、briefには必要な数値・項目名を具体的に書く
+- 同じ内容を複数のセクションで重複させない
+"""
+
+# セクション並列生成：個別セクション用プロンプト
+DASHBOARD_SECTION_SYSTEM_PROMPT = """
+あなたはダッシュボードの1セクションをHTML+CSS+Chart.jsで作成する専門家です。
+指定されたセクションのHTML断片だけを出力してください。
+
+**絶対遵守：出力形式指示**
+- <!DOCTYPE>、<html>、<head>、<body> は書かない（ページの外枠とChart.jsの読み込みは用意済み）
+- コードブロック記法、説明文、前置き、後書きは一切書かない
+- マークダウン記法は使わず、HTMLタグのみを使用する
+- 要素のidは必ず「{section_id}-」で始める（他のセクションと重複させない）
+- CSSはstyle属性で指定する（<style>タグは使わない）
+- チャートは <canvas id="{section_id}-chart" width="560" height="320"> を使い、Chart.js設定では responsive: false, maintainAspectRatio: false を指定する
+- <script>の中身は (function() { ... })(); で囲み、グローバル変数を作らない
+- 数値は提供されたデータの値をそのまま使用する
+"""
+
+# ダッシュボード差分編集用プロンプト
+DASHBOARD_EDIT_SYSTEM_PROMPT = """
+あなたは既存のHTMLダッシュボードを修正指示に従って部分的に修正する専門家です。
+HTML全体は出力せず、必要最小限の変更だけを以下の形式のJSONオブジェクト1つで出力してください。
+説明文やコードブロック記法は書かないでください。
+
+{"patches":[
+  {"op":"replace","find":"現在のHTML中に1回だけ現れる文字列（そのまま正確に）","replace":"置換後の文字列"},
+  {"op":"replace_section","section_id":"対象セクションID","html":"セクションの新しい中身"},
+  {"op":"insert_section","after":"直前のセクションID","section_id":"新しいID","html":"追加するセクションの中身"},
+  {"op":"remove_section","section_id":"削除するセクションID"}
+]}
+
+- 色・ラベル・数値・チャート種類など小さな変更は replace を使い、findは変更箇所を一意に特定できる最短の文字列にする
+- セクションの大部分を作り直す場合のみ replace_section を使う
+- セクションIDは data-section-id 属性の値（一覧を提供）。セクションのコンテナ要素自体は出力しない
+- 追加する要素のidは既存のidと重複させない
+- Chart.jsのチャートは responsive: false, maintainAspectRatio: false を維持し、canvasは width 600 / height 400 以下にする
+"""
+
 # フォールバック用プロンプト
 SIMPLE_CHAT_FALLBACK_PROMPT = "あなたは親切なAIアシスタントです。ユーザーの質問に日本語で答えてください。"
 TABLEAU_ANALYSIS_FALLBACK_PROMPT = "あなたはTableauデータ分析のアシスタントです。簡潔で実用的な回答を提供してください。"
@@ -136,6 +240,26 @@ def get_dashboard_system_prompt() -> str:
     return f"{DASHBOARD_BASE_SYSTEM_PROMPT}\n\n{DASHBOARD_SPECIFIC_INSTRUCTIONS}"
 
 
+def get_dashboard_spec_system_prompt() -> str:
+    """JSON仕様モードのダッシュボード用システムプロンプトを生成"""
+    return DASHBOARD_SPEC_SYSTEM_PROMPT.replace("{max_charts}", "4").replace("{schema}", dashboard_spec_json_schema())
+
+
+def get_chart_spec_system_prompt() -> str:
+    """JSON仕様モードのチャート用システムプロンプトを生成"""
+    return f"{get_dashboard_spec_system_prompt()}{CHART_SPEC_SYSTEM_PROMPT_SUFFIX}"
+
+
+def get_dashboard_plan_system_prompt(max_sections: int) -> str:
+    """セクション構成計画用システムプロンプトを生成"""
+    return DASHBOARD_PLAN_SYSTEM_PROMPT.replace("{max_sections}", str(max_sections))
+
+
+def get_dashboard_section_system_prompt(section_id: str) -> str:
+    """個別セクション生成用システムプロンプトを生成"""
+    return DASHBOARD_SECTION_SYSTEM_PROMPT.replace("{section_id}", section_id)
+
+
 def get_html_template_base() -> str:
     """HTMLテンプレートのベース部分"""
     return """<!DOCTYPE html>
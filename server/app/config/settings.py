@@ -1,7 +1,8 @@
 import os
 from functools import lru_cache
 from pathlib import Path
-from pydantic import BaseModel
+from typing import Literal, Optional
+from pydantic import BaseModel, model_validator
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -26,6 +27,20 @@ class TableauSettings(BaseModel):
     pat_value: str | None = None
 
 
+class JWTSettings(BaseModel):
+    token_expiry_minutes: int = 5
+    # 有効期限のこの秒数前を過ぎたトークンは再発行する
+    refresh_margin_seconds: int = 60
+    cache_max_entries: int = 1024
+
+    @model_validator(mode="after")
+    def validate_refresh_margin(self):
+        # マージンが有効期限以上だとキャッシュが常に期限切れ扱いになり、毎回再発行してしまう
+        if self.refresh_margin_seconds >= self.token_expiry_minutes * 60:
+            raise ValueError("JWT refresh margin must be shorter than the token lifetime")
+        return self
+
+
 class LoggingSettings(BaseModel):
     level: str = "INFO"
     use_structured: bool = False
@@ -33,9 +48,184 @@ class LoggingSettings(BaseModel):
 
 
 class MCPSettings(BaseModel):
+    # MCPサーバーへの接続方式。"stdio" は server_script_path をサブプロセスとして起動し、
+    # "streamable-http" / "sse" は server_url で常駐している共有サーバーに接続する
+    transport: str = "stdio"
     server_script_path: str | None = None
+    server_url: str | None = None
+    # 共有サーバーへのリクエストに付与する Authorization: Bearer トークン
+    server_auth_token: str | None = None
+    http_timeout_seconds: float = 30.0
+    sse_read_timeout_seconds: float = 300.0
     log_level: str = "debug"
     max_iterations: int = 20
+    # 同じツールを同じ引数で呼び直した場合は前回の結果を返し、新しい呼び出しのない反復が
+    # この回数続いたら循環とみなして最終回答を生成させる
+    tool_call_dedup_enabled: bool = True
+    max_unproductive_iterations: int = 2
+    # 接続失敗時のサーキットブレーカー
+    breaker_failure_threshold: int = 3
+    breaker_base_backoff_seconds: float = 5.0
+    breaker_max_backoff_seconds: float = 300.0
+    # half_open時のプローブ（接続試行）が結果を返さない場合に次のプローブを許可するまでの秒数
+    breaker_probe_timeout_seconds: float = 60.0
+    # ツール結果をプロンプトに含める際の上限
+    tool_result_max_rows: int = 500
+    tool_result_max_bytes: int = 50000
+    # 大規模な結果を統計ダイジェスト＋サンプル行に置き換えるモード
+    tool_result_digest_enabled: bool = False
+    tool_result_digest_min_rows: int = 1000
+    tool_result_digest_sample_rows: int = 20
+    # 会話内容に関連するツール（固定セット＋上位N件）のみをモデルに送る
+    tool_selection_enabled: bool = True
+    tool_selection_top_n: int = 4
+    tool_selection_pinned: list[str] = ["list-datasources", "get-datasource-metadata", "query-datasource"]
+    # 会話開始時、最初のモデル呼び出しと並行して実行するツール（明示的に設定したもの＋過去の会話で
+    # min_share以上の割合で最初に呼ばれたもの）。結果はttl秒以内の同一呼び出しに返す。
+    # 既定では固定のツールは設定せず、集計による予測が成立した場合のみ先行実行する
+    prefetch_enabled: bool = True
+    prefetch_tools: list[str] = []
+    prefetch_min_share: float = 0.6
+    prefetch_min_samples: int = 5
+    prefetch_max_tools: int = 2
+    prefetch_ttl_seconds: float = 30.0
+
+
+class MCPPoolSettings(BaseModel):
+    # 常駐させるMCPサーバープロセス数（既定の0ではプールを使わず、リクエストごとにプロセスを起動）
+    size: int = 0
+    health_check_interval_seconds: float = 15.0
+    ping_timeout_seconds: float = 5.0
+    # 呼び出し回数・起動時からのメモリ増加量が上限を超えたレプリカを入れ替える（0は無効）
+    max_calls_per_replica: int = 1000
+    max_memory_growth_mb: int = 512
+    # 全レプリカが再起動中の場合に空きを待つ時間
+    acquire_timeout_seconds: float = 10.0
+
+
+class BedrockSettings(BaseModel):
+    # 最初のツール選択ステップ用の高速モデル（未設定時はルーティング無効）。
+    # ツール結果を受け取った後の呼び出しはユーザー選択モデルで行う
+    fast_model_id: str | None = None
+    fast_max_tokens: int = 1024
+    # リージョン間ヘッジ（応答が遅い場合にフォールバックリージョンへ同一リクエストを送信）
+    hedge_enabled: bool = False
+    hedge_fallback_region: str | None = None
+    hedge_percentile: float = 95
+    hedge_min_delay_seconds: float = 1.0
+    hedge_max_delay_seconds: float = 30.0
+    # ヘッジによる追加トラフィックの上限比率（0.1 = 最大1.1倍）
+    hedge_max_ratio: float = 0.1
+    # 検証済みの認証情報（回答キャッシュの返却前に確認）を再検証せずに扱う秒数
+    credential_check_ttl_seconds: float = 300.0
+
+
+class ResultStoreSettings(BaseModel):
+    # 会話ごとのクエリ結果を保持し、ローカル再集計ツールを提供する
+    enabled: bool = True
+    max_bytes: int = 64 * 1024 * 1024
+    max_results_per_conversation: int = 20
+
+
+class DashboardSettings(BaseModel):
+    # data_handle経由で渡す構造化データの上限
+    data_max_rows: int = 200
+    data_max_bytes: int = 20000
+    # 構造化データがある場合に添える分析文の最大文字数
+    context_max_chars: int = 1500
+    # "html": LLMがHTML全体を出力 / "spec": LLMはJSON仕様のみ出力しサーバー側でテンプレート描画
+    # "sections": 構成を計画した後、セクションごとに並列生成して組み立て
+    render_mode: Literal["html", "spec", "sections"] = "html"
+    spec_max_tokens: int = 2048
+    plan_max_tokens: int = 1024
+    section_max_tokens: int = 2048
+    max_sections: int = 6
+    section_concurrency: int = 4
+    # 差分編集（パッチ）の出力トークン上限
+    edit_max_tokens: int = 2048
+    # 回答に表・数値リストが含まれる場合はLLMを使わずにチャートを描画
+    chart_fastpath_enabled: bool = True
+
+
+class ArtifactStoreSettings(BaseModel):
+    # 生成済みダッシュボード・チャートの保持上限（圧縮後のバイト数）
+    max_memory_bytes: int = 32 * 1024 * 1024
+    # 指定時はメモリから溢れた分をディスクに退避
+    disk_dir: Optional[str] = None
+    max_disk_bytes: int = 256 * 1024 * 1024
+    compression_level: int = 6
+
+
+class MetadataIndexSettings(BaseModel):
+    # データソース・フィールドのメタデータをバックグラウンドで取得してローカルに索引化する
+    enabled: bool = True
+    refresh_interval_seconds: float = 900
+    # 更新日時が取得できないデータソースを再取得する間隔
+    full_refresh_seconds: float = 86400
+    max_datasources: int = 500
+    concurrency: int = 4
+    # 質問に関連するフィールドをプロンプトに含める上限
+    prompt_max_fields: int = 15
+
+
+class AnswerCacheSettings(BaseModel):
+    # 単発の分析質問の最終回答をキャッシュする（使用データソースの更新で無効化）
+    enabled: bool = True
+    max_entries: int = 1000
+    ttl_seconds: float = 3600
+    # データソースの更新日時が取得できない回答のTTL
+    unversioned_ttl_seconds: float = 600
+    # 正規化した質問の文字bigram Jaccard類似度の閾値
+    similarity_threshold: float = 0.8
+    # 回答と一緒に保持する根拠データ（data_handle用）の上限。超える回答はキャッシュしない
+    max_result_bytes: int = 8 * 1024 * 1024
+
+
+class CacheWarmerSettings(BaseModel):
+    # 人気の質問をオフピーク時間帯・データソース更新後に再実行して回答キャッシュを温める
+    enabled: bool = False
+    # ウォーミング専用のBedrock設定（通常はリクエストごとに渡されるため別途必要）
+    aws_region: str | None = None
+    aws_bearer_token: str | None = None
+    bedrock_model_id: str | None = None
+    max_tokens: int = 4096
+    top_n: int = 20
+    question_window_days: float = 7
+    # サーバーのローカル時刻 "HH:MM-HH:MM"（日付をまたぐ指定も可）
+    offpeak_windows: list[str] = ["01:00-06:00"]
+    check_interval_seconds: float = 60
+    # ウォーミングでの質問実行の最小間隔と1サイクルの上限
+    min_interval_seconds: float = 10
+    max_per_cycle: int = 20
+    # 同じ質問を再実行するまでの間隔（キャッシュ対象にならなかった質問を含む）
+    retry_interval_seconds: float = 3600
+    # 処理中のライブリクエストがこの数を超える場合は実行しない
+    max_live_requests: int = 0
+
+
+class BatchSettings(BaseModel):
+    # /api/batch のワーカー数（ワーカーごとにMCPセッションを1つ使用）
+    concurrency: int = 4
+    max_concurrency: int = 8
+    # 結果を保持するバッチ数の上限
+    max_batches: int = 50
+
+
+class JobQueueSettings(BaseModel):
+    # /api/create_report・/api/create_chart の job=true で使う永続ジョブキュー
+    enabled: bool = True
+    db_path: str = "data/jobs.sqlite3"
+    # 同時に生成するジョブ数
+    concurrency: int = 2
+    # 新規ジョブ通知を取りこぼした場合の確認間隔
+    poll_interval_seconds: float = 1.0
+    # 再起動で中断されたジョブを再実行する回数の上限
+    max_attempts: int = 3
+    # ジョブに保存するBedrock認証情報の暗号鍵（Fernet鍵）。未指定時は db_path と同じ
+    # ディレクトリの鍵ファイルを使う（無ければ作成）
+    secret_key: str | None = None
+    # 完了・失敗したジョブの保持期間
+    retention_seconds: float = 86400.0
 
 
 class CORSSettings(BaseModel):
@@ -50,7 +240,18 @@ class Settings(BaseModel):
     app_version: str = "1.0.0"
 
     tableau: TableauSettings
+    jwt: JWTSettings
     mcp: MCPSettings
+    mcp_pool: MCPPoolSettings
+    bedrock: BedrockSettings
+    result_store: ResultStoreSettings
+    dashboard: DashboardSettings
+    artifacts: ArtifactStoreSettings
+    metadata_index: MetadataIndexSettings
+    answer_cache: AnswerCacheSettings
+    cache_warmer: CacheWarmerSettings
+    batch: BatchSettings
+    job_queue: JobQueueSettings
     logging: LoggingSettings
     cors: CORSSettings
 
@@ -67,9 +268,131 @@ class Settings(BaseModel):
                 pat_name=os.getenv("TABLEAU_PAT_NAME"),
                 pat_value=os.getenv("TABLEAU_PAT_VALUE")
             ),
+            jwt=JWTSettings(
+                token_expiry_minutes=int(os.getenv("JWT_TOKEN_EXPIRY_MINUTES", "5")),
+                refresh_margin_seconds=int(os.getenv("JWT_REFRESH_MARGIN_SECONDS", "60")),
+                cache_max_entries=int(os.getenv("JWT_CACHE_MAX_ENTRIES", "1024"))
+            ),
             mcp=MCPSettings(
+                transport=os.getenv("MCP_TRANSPORT", "stdio").lower(),
                 server_script_path=os.getenv("SERVER_SCRIPT_PATH"),
-                log_level=os.getenv("LOG_LEVEL", "debug")
+                server_url=os.getenv("MCP_SERVER_URL") or None,
+                server_auth_token=os.getenv("MCP_SERVER_AUTH_TOKEN") or None,
+                http_timeout_seconds=float(os.getenv("MCP_HTTP_TIMEOUT_SECONDS", "30")),
+                sse_read_timeout_seconds=float(os.getenv("MCP_SSE_READ_TIMEOUT_SECONDS", "300")),
+                log_level=os.getenv("LOG_LEVEL", "debug"),
+                max_iterations=int(os.getenv("MCP_MAX_ITERATIONS", "20")),
+                tool_call_dedup_enabled=os.getenv("MCP_TOOL_CALL_DEDUP_ENABLED", "true").lower() == "true",
+                max_unproductive_iterations=int(os.getenv("MCP_MAX_UNPRODUCTIVE_ITERATIONS", "2")),
+                breaker_failure_threshold=int(os.getenv("MCP_BREAKER_FAILURE_THRESHOLD", "3")),
+                breaker_base_backoff_seconds=float(os.getenv("MCP_BREAKER_BASE_BACKOFF_SECONDS", "5")),
+                breaker_max_backoff_seconds=float(os.getenv("MCP_BREAKER_MAX_BACKOFF_SECONDS", "300")),
+                breaker_probe_timeout_seconds=float(os.getenv("MCP_BREAKER_PROBE_TIMEOUT_SECONDS", "60")),
+                tool_result_max_rows=int(os.getenv("MCP_TOOL_RESULT_MAX_ROWS", "500")),
+                tool_result_max_bytes=int(os.getenv("MCP_TOOL_RESULT_MAX_BYTES", "50000")),
+                tool_result_digest_enabled=os.getenv("MCP_TOOL_RESULT_DIGEST", "false").lower() == "true",
+                tool_result_digest_min_rows=int(os.getenv("MCP_TOOL_RESULT_DIGEST_MIN_ROWS", "1000")),
+                tool_result_digest_sample_rows=int(os.getenv("MCP_TOOL_RESULT_DIGEST_SAMPLE_ROWS", "20")),
+                tool_selection_enabled=os.getenv("MCP_TOOL_SELECTION_ENABLED", "true").lower() == "true",
+                tool_selection_top_n=int(os.getenv("MCP_TOOL_SELECTION_TOP_N", "4")),
+                tool_selection_pinned=_parse_csv_env(
+                    os.getenv("MCP_TOOL_SELECTION_PINNED"),
+                    ["list-datasources", "get-datasource-metadata", "query-datasource"]
+                ),
+                prefetch_enabled=os.getenv("MCP_PREFETCH_ENABLED", "true").lower() == "true",
+                prefetch_tools=_parse_csv_env(os.getenv("MCP_PREFETCH_TOOLS"), []),
+                prefetch_min_share=float(os.getenv("MCP_PREFETCH_MIN_SHARE", "0.6")),
+                prefetch_min_samples=int(os.getenv("MCP_PREFETCH_MIN_SAMPLES", "5")),
+                prefetch_max_tools=int(os.getenv("MCP_PREFETCH_MAX_TOOLS", "2")),
+                prefetch_ttl_seconds=float(os.getenv("MCP_PREFETCH_TTL_SECONDS", "30"))
+            ),
+            mcp_pool=MCPPoolSettings(
+                size=int(os.getenv("MCP_POOL_SIZE", "0")),
+                health_check_interval_seconds=float(os.getenv("MCP_POOL_HEALTH_CHECK_INTERVAL_SECONDS", "15")),
+                ping_timeout_seconds=float(os.getenv("MCP_POOL_PING_TIMEOUT_SECONDS", "5")),
+                max_calls_per_replica=int(os.getenv("MCP_POOL_MAX_CALLS_PER_REPLICA", "1000")),
+                max_memory_growth_mb=int(os.getenv("MCP_POOL_MAX_MEMORY_GROWTH_MB", "512")),
+                acquire_timeout_seconds=float(os.getenv("MCP_POOL_ACQUIRE_TIMEOUT_SECONDS", "10"))
+            ),
+            bedrock=BedrockSettings(
+                fast_model_id=os.getenv("BEDROCK_FAST_MODEL_ID") or None,
+                fast_max_tokens=int(os.getenv("BEDROCK_FAST_MAX_TOKENS", "1024")),
+                hedge_enabled=os.getenv("BEDROCK_HEDGE_ENABLED", "false").lower() == "true",
+                hedge_fallback_region=os.getenv("BEDROCK_HEDGE_FALLBACK_REGION") or None,
+                hedge_percentile=float(os.getenv("BEDROCK_HEDGE_PERCENTILE", "95")),
+                hedge_min_delay_seconds=float(os.getenv("BEDROCK_HEDGE_MIN_DELAY_SECONDS", "1.0")),
+                hedge_max_delay_seconds=float(os.getenv("BEDROCK_HEDGE_MAX_DELAY_SECONDS", "30.0")),
+                hedge_max_ratio=float(os.getenv("BEDROCK_HEDGE_MAX_RATIO", "0.1")),
+                credential_check_ttl_seconds=float(os.getenv("BEDROCK_CREDENTIAL_CHECK_TTL_SECONDS", "300"))
+            ),
+            result_store=ResultStoreSettings(
+                enabled=os.getenv("RESULT_STORE_ENABLED", "true").lower() == "true",
+                max_bytes=int(os.getenv("RESULT_STORE_MAX_BYTES", str(64 * 1024 * 1024))),
+                max_results_per_conversation=int(os.getenv("RESULT_STORE_MAX_RESULTS_PER_CONVERSATION", "20"))
+            ),
+            dashboard=DashboardSettings(
+                data_max_rows=int(os.getenv("DASHBOARD_DATA_MAX_ROWS", "200")),
+                data_max_bytes=int(os.getenv("DASHBOARD_DATA_MAX_BYTES", "20000")),
+                context_max_chars=int(os.getenv("DASHBOARD_CONTEXT_MAX_CHARS", "1500")),
+                render_mode=os.getenv("DASHBOARD_RENDER_MODE", "html").lower(),
+                spec_max_tokens=int(os.getenv("DASHBOARD_SPEC_MAX_TOKENS", "2048")),
+                plan_max_tokens=int(os.getenv("DASHBOARD_PLAN_MAX_TOKENS", "1024")),
+                section_max_tokens=int(os.getenv("DASHBOARD_SECTION_MAX_TOKENS", "2048")),
+                max_sections=int(os.getenv("DASHBOARD_MAX_SECTIONS", "6")),
+                section_concurrency=int(os.getenv("DASHBOARD_SECTION_CONCURRENCY", "4")),
+                edit_max_tokens=int(os.getenv("DASHBOARD_EDIT_MAX_TOKENS", "2048")),
+                chart_fastpath_enabled=os.getenv("DASHBOARD_CHART_FASTPATH_ENABLED", "true").lower() == "true"
+            ),
+            artifacts=ArtifactStoreSettings(
+                max_memory_bytes=int(os.getenv("ARTIFACT_STORE_MAX_MEMORY_BYTES", str(32 * 1024 * 1024))),
+                disk_dir=os.getenv("ARTIFACT_STORE_DIR") or None,
+                max_disk_bytes=int(os.getenv("ARTIFACT_STORE_MAX_DISK_BYTES", str(256 * 1024 * 1024))),
+                compression_level=int(os.getenv("ARTIFACT_STORE_COMPRESSION_LEVEL", "6"))
+            ),
+            metadata_index=MetadataIndexSettings(
+                enabled=os.getenv("METADATA_INDEX_ENABLED", "true").lower() == "true",
+                refresh_interval_seconds=float(os.getenv("METADATA_INDEX_REFRESH_INTERVAL_SECONDS", "900")),
+                full_refresh_seconds=float(os.getenv("METADATA_INDEX_FULL_REFRESH_SECONDS", "86400")),
+                max_datasources=int(os.getenv("METADATA_INDEX_MAX_DATASOURCES", "500")),
+                concurrency=int(os.getenv("METADATA_INDEX_CONCURRENCY", "4")),
+                prompt_max_fields=int(os.getenv("METADATA_INDEX_PROMPT_MAX_FIELDS", "15"))
+            ),
+            answer_cache=AnswerCacheSettings(
+                enabled=os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true",
+                max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+                ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+                unversioned_ttl_seconds=float(os.getenv("ANSWER_CACHE_UNVERSIONED_TTL_SECONDS", "600")),
+                similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.8")),
+                max_result_bytes=int(os.getenv("ANSWER_CACHE_MAX_RESULT_BYTES", str(8 * 1024 * 1024)))
+            ),
+            cache_warmer=CacheWarmerSettings(
+                enabled=os.getenv("CACHE_WARMER_ENABLED", "false").lower() == "true",
+                aws_region=os.getenv("CACHE_WARMER_AWS_REGION") or None,
+                aws_bearer_token=os.getenv("CACHE_WARMER_AWS_BEARER_TOKEN") or None,
+                bedrock_model_id=os.getenv("CACHE_WARMER_BEDROCK_MODEL_ID") or None,
+                max_tokens=int(os.getenv("CACHE_WARMER_MAX_TOKENS", "4096")),
+                top_n=int(os.getenv("CACHE_WARMER_TOP_N", "20")),
+                question_window_days=float(os.getenv("CACHE_WARMER_QUESTION_WINDOW_DAYS", "7")),
+                offpeak_windows=_parse_csv_env(os.getenv("CACHE_WARMER_OFFPEAK_WINDOWS"), ["01:00-06:00"]),
+                check_interval_seconds=float(os.getenv("CACHE_WARMER_CHECK_INTERVAL_SECONDS", "60")),
+                min_interval_seconds=float(os.getenv("CACHE_WARMER_MIN_INTERVAL_SECONDS", "10")),
+                max_per_cycle=int(os.getenv("CACHE_WARMER_MAX_PER_CYCLE", "20")),
+                retry_interval_seconds=float(os.getenv("CACHE_WARMER_RETRY_INTERVAL_SECONDS", "3600")),
+                max_live_requests=int(os.getenv("CACHE_WARMER_MAX_LIVE_REQUESTS", "0"))
+            ),
+            batch=BatchSettings(
+                concurrency=int(os.getenv("BATCH_CONCURRENCY", "4")),
+                max_concurrency=int(os.getenv("BATCH_MAX_CONCURRENCY", "8")),
+                max_batches=int(os.getenv("BATCH_MAX_BATCHES", "50"))
+            ),
+            job_queue=JobQueueSettings(
+                enabled=os.getenv("JOB_QUEUE_ENABLED", "true").lower() == "true",
+                db_path=os.getenv("JOB_QUEUE_DB_PATH", "data/jobs.sqlite3"),
+                concurrency=int(os.getenv("JOB_QUEUE_CONCURRENCY", "2")),
+                poll_interval_seconds=float(os.getenv("JOB_QUEUE_POLL_INTERVAL_SECONDS", "1")),
+                max_attempts=int(os.getenv("JOB_QUEUE_MAX_ATTEMPTS", "3")),
+                secret_key=os.getenv("JOB_QUEUE_SECRET_KEY"),
+                retention_seconds=float(os.getenv("JOB_QUEUE_RETENTION_SECONDS", "86400"))
             ),
             logging=LoggingSettings(
                 level=os.getenv("LOG_LEVEL", "INFO").upper(),
@@ -0,0 +1,251 @@
+"""LLMを使わずにボット回答中の表・数値リストからチャートHTMLを生成する高速パス"""
+import html
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from ..config.prompts import get_chart_template_base
+from .dashboard_renderer import CHART_CANVAS_HEIGHT, CHART_CANVAS_WIDTH, render_chart_script
+from .dashboard_spec import ChartDatasetSpec, ChartSpec
+
+MIN_POINTS = 2
+MAX_POINTS = 200
+MAX_DATASETS = 4
+PIE_MAX_POINTS = 8
+
+_NUMBER_RE = re.compile(
+    r"^[\s¥$€£＄￥+]*(?P<number>[-−▲△]?\s*(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?)\s*"
+    r"(?P<unit>%|％|円|ドル|件|個|人|点|回|万円?|億円?|千円?|百万円?|[kKMB])?\s*$"
+)
+_SEPARATOR_CELL_RE = re.compile(r"^:?-{2,}:?$")
+_HEADING_RE = re.compile(r"^\s*(?:#{1,6}\s+|\*\*)(?P<title>.+?)(?:\*\*)?\s*$")
+# 値の中の桁区切りカンマ（直後が3桁）は区切りとみなさない
+_PAIR_RE = re.compile(r"(?P<label>[^:：,、|\n]{1,40}?)\s*[:：]\s*(?P<value>(?:[^,、|\n]|,(?=\d{3}(?!\d))){1,30})")
+_MARKDOWN_DECORATION_RE = re.compile(r"[*_`]+")
+_LIST_MARKER_RE = re.compile(r"^\s*(?:[-*・•]|\d+[.)])\s+")
+_TOTAL_LABEL_RE = re.compile(r"^(?:合計|総計|計|小計|total|grand total|sum)$", re.IGNORECASE)
+_TIME_LABEL_RE = re.compile(
+    r"^(?:\d{4}(?:[-/年.]\d{1,2}(?:[-/月.]\d{1,2}日?)?月?)?年?(?:度)?"
+    r"|\d{1,2}月|\d{1,2}日|FY\s?\d{2,4}|Q[1-4](?:\s?\d{2,4})?|\d{4}\s?Q[1-4]|第?[1-4一二三四]四半期"
+    r"|[月火水木金土日]曜日?"
+    r"|(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?(?:\s?\d{2,4})?"
+    r"|(?:mon|tue|wed|thu|fri|sat|sun)[a-z]*)$",
+    re.IGNORECASE
+)
+_SHARE_HEADER_RE = re.compile(r"構成比|割合|内訳|シェア|share|breakdown", re.IGNORECASE)
+
+
+@dataclass
+class ParsedTable:
+    headers: List[str]
+    rows: List[List[str]]
+    title: Optional[str] = None
+
+
+@dataclass
+class _NumericColumn:
+    header: str
+    values: List[Optional[float]] = field(default_factory=list)
+    percent: bool = False
+
+
+def _clean_text(text: str) -> str:
+    return _MARKDOWN_DECORATION_RE.sub("", _LIST_MARKER_RE.sub("", text)).strip()
+
+
+def parse_number(text: str) -> Optional[Tuple[float, Optional[str]]]:
+    """表示用の数値文字列（桁区切り・通貨記号・単位付き）を (値, 単位) に変換"""
+    match = _NUMBER_RE.match(_clean_text(text))
+    if not match:
+        return None
+    number = match.group("number").replace(",", "").replace(" ", "")
+    if number[0] in "−▲△":
+        number = "-" + number[1:]
+    unit = match.group("unit")
+    if unit == "％":
+        unit = "%"
+    return float(number), unit
+
+
+def _split_row(line: str) -> List[str]:
+    stripped = line.strip()
+    if stripped.startswith("|"):
+        stripped = stripped[1:]
+    if stripped.endswith("|"):
+        stripped = stripped[:-1]
+    return [_clean_text(cell) for cell in stripped.split("|")]
+
+
+def _preceding_title(lines: List[str], index: int) -> Optional[str]:
+    """表・リストの直前（空行を挟んでもよい）にある見出しをタイトルとして取得"""
+    for line in reversed(lines[max(0, index - 3):index]):
+        if not line.strip():
+            continue
+        match = _HEADING_RE.match(line)
+        return _clean_text(match.group("title")) if match else None
+    return None
+
+
+def parse_markdown_tables(text: str) -> List[ParsedTable]:
+    """テキスト中のマークダウン表（ヘッダー行＋区切り行＋データ行）をすべて抽出"""
+    lines = text.splitlines()
+    tables = []
+    i = 0
+    while i < len(lines) - 1:
+        if "|" not in lines[i]:
+            i += 1
+            continue
+        separator = _split_row(lines[i + 1])
+        if not separator or not all(_SEPARATOR_CELL_RE.match(cell.replace(" ", "")) for cell in separator):
+            i += 1
+            continue
+
+        headers = _split_row(lines[i])
+        rows = []
+        j = i + 2
+        while j < len(lines) and "|" in lines[j]:
+            cells = _split_row(lines[j])
+            rows.append((cells + [""] * len(headers))[:len(headers)])
+            j += 1
+        if rows:
+            tables.append(ParsedTable(headers, rows, _preceding_title(lines, i)))
+        i = j
+    return tables
+
+
+def parse_label_value_pairs(text: str) -> Optional[ParsedTable]:
+    """「ラベル: 値」が連続する最初のブロック（3組以上）を1列の表として抽出"""
+    lines = text.splitlines()
+    block: List[Tuple[str, str]] = []
+    block_start = 0
+    for index, line in enumerate(lines + [""]):
+        pairs = [
+            (_clean_text(m.group("label")), m.group("value"))
+            for m in _PAIR_RE.finditer(line)
+            if parse_number(m.group("value")) is not None
+        ]
+        if pairs:
+            if not block:
+                block_start = index
+            block.extend(pairs)
+            continue
+        if len(block) >= 3:
+            return ParsedTable(["", ""], [[label, value] for label, value in block], _preceding_title(lines, block_start))
+        block = []
+    return None
+
+
+def _numeric_columns(table: ParsedTable) -> Tuple[Optional[int], List[_NumericColumn]]:
+    """ラベル列のインデックスと数値列を判定"""
+    label_index = None
+    columns = []
+    for index, header in enumerate(table.headers):
+        cells = [row[index] for row in table.rows]
+        parsed = [parse_number(cell) if cell else None for cell in cells]
+        non_empty = [p for cell, p in zip(cells, parsed) if cell]
+        # 単位が混在する列（円と件など）は同じ軸に描けないため数値列とみなさない
+        if (
+            non_empty
+            and all(p is not None for p in non_empty)
+            and len({p[1] for p in non_empty} - {None}) <= 1
+        ):
+            columns.append(_NumericColumn(
+                header=header,
+                values=[p[0] if p else None for p in parsed],
+                percent={p[1] for p in non_empty} == {"%"}
+            ))
+        elif label_index is None:
+            label_index = index
+    return label_index, columns
+
+
+def _is_time_series(labels: List[str]) -> bool:
+    matched = sum(1 for label in labels if _TIME_LABEL_RE.match(label.replace(" ", "")))
+    return matched / len(labels) >= 0.8
+
+
+def table_to_chart(table: ParsedTable) -> Optional[ChartSpec]:
+    """解析済みの表からChartSpecを構築（チャート化に適さない場合はNone）"""
+    label_index, columns = _numeric_columns(table)
+    if not columns:
+        return None
+    if label_index is None:
+        if len(columns) < 2:
+            return None
+        # 全列が数値なら先頭列（年など）をラベルとして扱う
+        columns.pop(0)
+        labels = [row[0] for row in table.rows]
+    else:
+        labels = [row[label_index] for row in table.rows]
+
+    # 合計行はチャートを歪めるため除外
+    keep = [i for i, label in enumerate(labels) if label and not _TOTAL_LABEL_RE.match(label)]
+    labels = [labels[i] for i in keep]
+    if not MIN_POINTS <= len(labels) <= MAX_POINTS:
+        return None
+    for column in columns:
+        column.values = [column.values[i] for i in keep]
+
+    # スケールの異なる列（%と実数）を混在させない：先頭の数値列と同じ種類のみ採用
+    columns = [column for column in columns if column.percent == columns[0].percent][:MAX_DATASETS]
+    datasets = [
+        ChartDatasetSpec(label=column.header or "値", data=column.values)
+        for column in columns
+    ]
+
+    time_series = _is_time_series(labels)
+    values = [v for v in columns[0].values if v is not None]
+    # 構成比：見出しが割合を示すか、%値の合計がほぼ100
+    is_share = (
+        len(columns) == 1
+        and len(labels) <= PIE_MAX_POINTS
+        and all(v > 0 for v in values)
+        and (
+            bool(_SHARE_HEADER_RE.search(columns[0].header or table.title or ""))
+            or (columns[0].percent and 95 <= sum(values) <= 105)
+        )
+    )
+
+    if time_series:
+        chart_type, horizontal = "line", False
+    elif is_share:
+        chart_type, horizontal = "doughnut", False
+    else:
+        chart_type, horizontal = "bar", len(labels) > 12
+
+    title = table.title or (columns[0].header if len(columns) == 1 and columns[0].header else "チャート")
+    return ChartSpec(
+        title=title[:100],
+        type=chart_type,
+        labels=[label[:80] for label in labels],
+        datasets=datasets,
+        x_axis_label=(table.headers[label_index] or None) if label_index is not None else None,
+        y_axis_label=(columns[0].header or None) if len(columns) == 1 and chart_type != "doughnut" else None,
+        horizontal=horizontal
+    )
+
+
+def detect_chart(content: str) -> Optional[ChartSpec]:
+    """回答テキストから最初にチャート化できる表または数値リストを検出"""
+    for table in parse_markdown_tables(content):
+        chart = table_to_chart(table)
+        if chart is not None:
+            return chart
+    pairs = parse_label_value_pairs(content)
+    if pairs is not None:
+        return table_to_chart(pairs)
+    return None
+
+
+def render_chart_template(chart: ChartSpec) -> str:
+    """get_chart_template_base() のシェルにチャートを埋め込む"""
+    return (
+        get_chart_template_base()
+        .replace("<title>チャート</title>", f"<title>{html.escape(chart.title)}</title>", 1)
+        .replace(
+            '<canvas id="chart"></canvas>',
+            f'<canvas id="chart" width="{CHART_CANVAS_WIDTH}" height="{CHART_CANVAS_HEIGHT}"></canvas>',
+            1
+        )
+        .replace("// Chart.js初期化コード", render_chart_script(chart, "chart"), 1)
+    )
@@ -0,0 +1,123 @@
+"""サーキットブレーカー（closed / open / half_open）"""
+import threading
+import time
+from enum import Enum
+from typing import Callable
+
+from .logging import get_logger
+from .metrics import get_metrics
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+_STATE_GAUGE_VALUES = {
+    CircuitState.CLOSED: 0,
+    CircuitState.HALF_OPEN: 1,
+    CircuitState.OPEN: 2,
+}
+
+
+class CircuitBreaker:
+    """連続失敗で回路を開き、指数バックオフでプローブを許可するサーキットブレーカー
+
+    - closed: 通常どおり呼び出しを許可。連続失敗が failure_threshold に達するとopen
+    - open: 呼び出しを即座に拒否。バックオフ経過後にhalf_openへ
+    - half_open: プローブを1件だけ許可。成功でclosed、失敗でバックオフを倍にしてopen
+      （プローブが probe_timeout 秒以内に結果を記録しない場合は次のプローブを許可）
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        base_backoff: float = 5.0,
+        max_backoff: float = 300.0,
+        probe_timeout: float = 60.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.probe_timeout = probe_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._backoff = base_backoff
+        self._open_until = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self.logger = get_logger("circuit_breaker")
+        get_metrics().set_gauge("circuit_breaker.state", _STATE_GAUGE_VALUES[self._state], breaker=name)
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            if self._state == CircuitState.OPEN and self._clock() >= self._open_until:
+                self._transition(CircuitState.HALF_OPEN)
+            return self._state
+
+    def allow_request(self) -> bool:
+        """呼び出しを許可するかどうか（half_open時はプローブ1件のみ許可）"""
+        state = self.state
+        with self._lock:
+            if state == CircuitState.CLOSED:
+                return True
+            if state == CircuitState.HALF_OPEN and (
+                not self._probe_in_flight or self._clock() - self._probe_started >= self.probe_timeout
+            ):
+                self._probe_in_flight = True
+                self._probe_started = self._clock()
+                return True
+
+        get_metrics().increment("circuit_breaker.short_circuited", breaker=self.name)
+        return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._backoff = self.base_backoff
+            self._probe_in_flight = False
+            if self._state != CircuitState.CLOSED:
+                self._transition(CircuitState.CLOSED)
+
+    def release_probe(self) -> None:
+        """結果を記録せずに中断した呼び出しのプローブ枠を解放する"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == CircuitState.HALF_OPEN:
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+                self._open()
+            elif self._state == CircuitState.CLOSED and self._failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self) -> None:
+        self._probe_in_flight = False
+        self._open_until = self._clock() + self._backoff
+        self._transition(CircuitState.OPEN)
+
+    def _transition(self, new_state: CircuitState) -> None:
+        old_state = self._state
+        self._state = new_state
+        metrics = get_metrics()
+        metrics.set_gauge("circuit_breaker.state", _STATE_GAUGE_VALUES[new_state], breaker=self.name)
+        metrics.increment("circuit_breaker.transitions", breaker=self.name, to=new_state.value)
+        self.logger.warning(
+            f"Circuit breaker '{self.name}' {old_state.value} -> {new_state.value}",
+            extra={
+                "breaker": self.name,
+                "from_state": old_state.value,
+                "to_state": new_state.value,
+                "failures": self._failures,
+                "backoff": self._backoff
+            }
+        )
@@ -0,0 +1,257 @@
+"""DashboardSpecをテンプレートでHTMLに描画するレンダラー"""
+import html
+import json
+from string import Template
+from typing import Any, Dict, List, Tuple
+
+from ..config.prompts import get_html_template_base
+from .dashboard_spec import ChartSpec, DashboardSpec, KPISpec, TextSectionSpec
+
+CHART_CANVAS_WIDTH = 560
+CHART_CANVAS_HEIGHT = 320
+
+PALETTE = [
+    "#4e79a7", "#f28e2b", "#e15759", "#76b7b2", "#59a14f",
+    "#edc948", "#b07aa1", "#ff9da7", "#9c755f", "#bab0ac",
+]
+
+_TREND_SYMBOLS = {"up": "▲", "down": "▼", "flat": "▶"}
+
+_PAGE_TEMPLATE = Template("""<!DOCTYPE html>
+<html lang="ja">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>$title</title>
+    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+    <style>
+        * { box-sizing: border-box; }
+        body { font-family: 'Segoe UI', 'Hiragino Sans', sans-serif; margin: 0; background: #f5f6fa; color: #2d3436; }
+        .dashboard { padding: 24px; max-width: 1400px; margin: 0 auto; }
+        .header { background: linear-gradient(135deg, #4e79a7, #76b7b2); color: white; border-radius: 12px; padding: 24px 28px; margin-bottom: 24px; box-shadow: 0 4px 12px rgba(0,0,0,0.08); }
+        .header h1 { margin: 0 0 6px; font-size: 26px; }
+        .header p { margin: 0; opacity: 0.9; }
+        .kpi-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 16px; margin-bottom: 24px; }
+        .kpi-card { background: white; border-radius: 12px; padding: 18px 20px; box-shadow: 0 2px 8px rgba(0,0,0,0.06); }
+        .kpi-label { font-size: 13px; color: #636e72; margin-bottom: 8px; }
+        .kpi-value { font-size: 26px; font-weight: 700; }
+        .kpi-delta { font-size: 13px; margin-top: 6px; color: #636e72; }
+        .kpi-delta.up { color: #00b894; }
+        .kpi-delta.down { color: #d63031; }
+        .chart-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(600px, 1fr)); gap: 16px; margin-bottom: 24px; }
+        .chart-card { background: white; border-radius: 12px; padding: 18px 20px; box-shadow: 0 2px 8px rgba(0,0,0,0.06); overflow-x: auto; }
+        .chart-card h2 { font-size: 16px; margin: 0 0 12px; }
+        .section-card { background: white; border-radius: 12px; padding: 20px 24px; box-shadow: 0 2px 8px rgba(0,0,0,0.06); margin-bottom: 16px; }
+        .section-card h2 { font-size: 18px; margin: 0 0 10px; }
+        .section-card p { line-height: 1.7; margin: 0 0 8px; }
+        .section-card ul { margin: 0; padding-left: 20px; line-height: 1.7; }
+    </style>
+</head>
+<body>
+    <div class="dashboard">
+        <div class="header">
+            <h1>$title</h1>
+            $subtitle
+        </div>
+        $kpis
+        $charts
+        $sections
+    </div>
+    <script>
+        $chart_scripts
+    </script>
+</body>
+</html>""")
+
+_CHART_PAGE_TEMPLATE = Template("""<!DOCTYPE html>
+<html lang="ja">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>$title</title>
+    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+    <style>
+        body { font-family: 'Segoe UI', 'Hiragino Sans', sans-serif; margin: 0; padding: 20px; background: white; color: #2d3436; }
+        h1 { font-size: 18px; margin: 0 0 12px; }
+        .chart-container { height: 350px; }
+    </style>
+</head>
+<body>
+    <h1>$title</h1>
+    <div class="chart-container">
+        <canvas id="chart" width="$width" height="$height"></canvas>
+    </div>
+    <script>
+        $chart_script
+    </script>
+</body>
+</html>""")
+
+_SECTION_SHELL_STYLE = """        .dashboard-header { margin-bottom: 20px; }
+        .dashboard-header h1 { margin: 0; font-size: 26px; color: #2d3436; }
+        .dashboard-section { background: white; border-radius: 12px; padding: 18px 20px; margin-bottom: 16px; box-shadow: 0 2px 8px rgba(0,0,0,0.06); overflow-x: auto; }
+    </style>"""
+
+_KPI_TEMPLATE = Template("""<div class="kpi-card" data-section-id="$section_id">
+                <div class="kpi-label">$label</div>
+                <div class="kpi-value">$value</div>
+                $delta
+            </div>""")
+
+_CHART_TEMPLATE = Template("""<div class="chart-card" data-section-id="$section_id">
+                <h2>$title</h2>
+                <canvas id="$canvas_id" width="$width" height="$height"></canvas>
+            </div>""")
+
+# 差分編集でcanvasが削除されても他のチャートの初期化を止めないよう存在を確認する
+_CHART_SCRIPT_TEMPLATE = Template(
+    "document.getElementById('$canvas_id') && new Chart(document.getElementById('$canvas_id'), $config);"
+)
+
+_SECTION_TEMPLATE = Template("""<div class="section-card" data-section-id="$section_id">
+            <h2>$heading</h2>
+            $body
+        </div>""")
+
+
+def _escape(text: str) -> str:
+    return html.escape(text, quote=True)
+
+
+def _script_json(value: Any) -> str:
+    """<script>内に安全に埋め込めるJSON文字列"""
+    return json.dumps(value, ensure_ascii=False).replace("</", "<\\/")
+
+
+def build_chart_config(chart: ChartSpec) -> Dict[str, Any]:
+    """ChartSpecからChart.jsの設定オブジェクトを構築"""
+    is_circular = chart.type in ("pie", "doughnut", "polarArea")
+    datasets = []
+    for index, dataset in enumerate(chart.datasets):
+        color = PALETTE[index % len(PALETTE)]
+        entry: Dict[str, Any] = {"label": dataset.label, "data": dataset.data}
+        if is_circular:
+            entry["backgroundColor"] = [PALETTE[i % len(PALETTE)] for i in range(len(dataset.data))]
+        elif chart.type == "line":
+            entry.update({"borderColor": color, "backgroundColor": color + "33", "tension": 0.3, "fill": False})
+        else:
+            entry.update({"backgroundColor": color, "borderColor": color})
+        datasets.append(entry)
+
+    options: Dict[str, Any] = {
+        "responsive": False,
+        "maintainAspectRatio": False,
+        "plugins": {"legend": {"display": len(datasets) > 1 or is_circular}},
+    }
+    if not is_circular and chart.type != "radar":
+        x_axis: Dict[str, Any] = {"stacked": chart.stacked}
+        y_axis: Dict[str, Any] = {"stacked": chart.stacked, "beginAtZero": chart.type == "bar"}
+        if chart.x_axis_label:
+            x_axis["title"] = {"display": True, "text": chart.x_axis_label}
+        if chart.y_axis_label:
+            y_axis["title"] = {"display": True, "text": chart.y_axis_label}
+        options["scales"] = {"x": x_axis, "y": y_axis}
+        if chart.horizontal and chart.type == "bar":
+            options["indexAxis"] = "y"
+
+    return {"type": chart.type, "data": {"labels": chart.labels, "datasets": datasets}, "options": options}
+
+
+def render_chart_script(chart: ChartSpec, canvas_id: str) -> str:
+    return _CHART_SCRIPT_TEMPLATE.substitute(canvas_id=canvas_id, config=_script_json(build_chart_config(chart)))
+
+
+def render_kpi(kpi: KPISpec, section_id: str) -> str:
+    delta = ""
+    if kpi.delta:
+        trend = kpi.trend or ""
+        symbol = _TREND_SYMBOLS.get(trend, "")
+        delta = f'<div class="kpi-delta {trend}">{symbol} {_escape(kpi.delta)}</div>'
+    return _KPI_TEMPLATE.substitute(
+        section_id=section_id,
+        label=_escape(kpi.label),
+        value=_escape(kpi.value),
+        delta=delta
+    )
+
+
+def render_chart_card(chart: ChartSpec, section_id: str, canvas_id: str) -> str:
+    return _CHART_TEMPLATE.substitute(
+        section_id=section_id,
+        title=_escape(chart.title),
+        canvas_id=canvas_id,
+        width=CHART_CANVAS_WIDTH,
+        height=CHART_CANVAS_HEIGHT
+    )
+
+
+def render_text_section(section: TextSectionSpec, section_id: str) -> str:
+    body: List[str] = [f"<p>{_escape(paragraph)}</p>" for paragraph in section.paragraphs]
+    if section.bullets:
+        items = "".join(f"<li>{_escape(bullet)}</li>" for bullet in section.bullets)
+        body.append(f"<ul>{items}</ul>")
+    return _SECTION_TEMPLATE.substitute(
+        section_id=section_id,
+        heading=_escape(section.heading),
+        body="\n            ".join(body)
+    )
+
+
+def render_dashboard(spec: DashboardSpec) -> str:
+    """DashboardSpecを完全なHTMLドキュメントに描画"""
+    kpis = ""
+    if spec.kpis:
+        cards = "\n            ".join(render_kpi(kpi, f"kpi-{i}") for i, kpi in enumerate(spec.kpis))
+        kpis = f'<div class="kpi-grid">\n            {cards}\n        </div>'
+
+    charts = ""
+    chart_scripts = []
+    if spec.charts:
+        cards = []
+        for i, chart in enumerate(spec.charts):
+            canvas_id = f"chart-{i}"
+            cards.append(render_chart_card(chart, f"chart-{i}", canvas_id))
+            chart_scripts.append(render_chart_script(chart, canvas_id))
+        charts = '<div class="chart-grid">\n            ' + "\n            ".join(cards) + "\n        </div>"
+
+    sections = "\n        ".join(
+        render_text_section(section, f"section-{i}") for i, section in enumerate(spec.sections)
+    )
+
+    return _PAGE_TEMPLATE.substitute(
+        title=_escape(spec.title),
+        subtitle=f"<p>{_escape(spec.subtitle)}</p>" if spec.subtitle else "",
+        kpis=kpis,
+        charts=charts,
+        sections=sections,
+        chart_scripts="\n        ".join(chart_scripts)
+    )
+
+
+def render_chart_page(chart: ChartSpec) -> str:
+    """単一のChartSpecをチャート用HTMLドキュメントに描画"""
+    return _CHART_PAGE_TEMPLATE.substitute(
+        title=_escape(chart.title),
+        width=CHART_CANVAS_WIDTH,
+        height=CHART_CANVAS_HEIGHT,
+        chart_script=render_chart_script(chart, "chart")
+    )
+
+
+def assemble_sections(title: str, fragments: List[Tuple[str, str]]) -> str:
+    """個別に生成したセクション断片を get_html_template_base() のシェルに組み立てる
+
+    fragments は (section_id, html) のリストで、この順序で配置する。
+    """
+    body = [f'<div class="dashboard-header"><h1>{_escape(title)}</h1></div>']
+    for section_id, fragment in fragments:
+        body.append(
+            f'<div class="dashboard-section" data-section-id="{_escape(section_id)}">\n{fragment}\n        </div>'
+        )
+    return (
+        get_html_template_base()
+        .replace("<title>データ分析ダッシュボード</title>", f"<title>{_escape(title)}</title>", 1)
+        .replace("    </style>", _SECTION_SHELL_STYLE, 1)
+        .replace("<!-- ダッシュボードコンテンツ -->", "\n        ".join(body), 1)
+        .replace("// Chart.jsでのチャート初期化コード", "// チャートは各セクション内で初期化", 1)
+    )
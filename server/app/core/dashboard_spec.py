@@ -0,0 +1,83 @@
+"""ダッシュボード仕様（LLMが出力するコンパクトなJSON）のスキーマ定義とパース"""
+import json
+import re
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+ChartType = Literal["bar", "line", "pie", "doughnut", "radar", "polarArea"]
+
+_CODE_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.MULTILINE)
+
+
+class KPISpec(BaseModel):
+    label: str = Field(max_length=60)
+    value: str = Field(max_length=40, description="表示用に整形済みの値（例: '1.2億円', '23.4%'）")
+    delta: Optional[str] = Field(default=None, max_length=40, description="前期比などの補足（例: '+12.3%'）")
+    trend: Optional[Literal["up", "down", "flat"]] = None
+
+
+class ChartDatasetSpec(BaseModel):
+    label: str = Field(max_length=80)
+    data: List[Optional[float]] = Field(min_length=1, max_length=500)
+
+
+class ChartSpec(BaseModel):
+    title: str = Field(max_length=100)
+    type: ChartType
+    labels: List[str] = Field(min_length=1, max_length=500)
+    datasets: List[ChartDatasetSpec] = Field(min_length=1, max_length=8)
+    x_axis_label: Optional[str] = Field(default=None, max_length=60)
+    y_axis_label: Optional[str] = Field(default=None, max_length=60)
+    stacked: bool = False
+    horizontal: bool = False
+
+
+class TextSectionSpec(BaseModel):
+    heading: str = Field(max_length=100)
+    paragraphs: List[str] = Field(default_factory=list, max_length=10)
+    bullets: List[str] = Field(default_factory=list, max_length=20)
+
+
+class DashboardSpec(BaseModel):
+    title: str = Field(max_length=120)
+    subtitle: Optional[str] = Field(default=None, max_length=200)
+    kpis: List[KPISpec] = Field(default_factory=list, max_length=8)
+    charts: List[ChartSpec] = Field(default_factory=list, max_length=8)
+    sections: List[TextSectionSpec] = Field(default_factory=list, max_length=8)
+
+
+def dashboard_spec_json_schema() -> str:
+    """プロンプト埋め込み用のJSON Schema文字列"""
+    return json.dumps(DashboardSpec.model_json_schema(), ensure_ascii=False, separators=(",", ":"))
+
+
+def extract_json_object(text: str) -> str:
+    """LLM出力からJSONオブジェクト部分を取り出す（コードブロックや前置きを除去）"""
+    stripped = _CODE_FENCE_RE.sub("", text.strip())
+    start = stripped.find("{")
+    end = stripped.rfind("}")
+    if start == -1 or end <= start:
+        raise ValueError("No JSON object found in model output")
+    return stripped[start:end + 1]
+
+
+def parse_dashboard_spec(text: str) -> DashboardSpec:
+    """LLM出力をDashboardSpecとして検証（不正な場合は ValueError / ValidationError）"""
+    return DashboardSpec.model_validate_json(extract_json_object(text))
+
+
+class SectionPlan(BaseModel):
+    type: Literal["kpi", "chart", "table", "insight"]
+    title: str = Field(max_length=100)
+    brief: str = Field(max_length=400, description="このセクションで表示する内容と使用するデータの指示")
+
+
+class DashboardPlan(BaseModel):
+    title: str = Field(max_length=120)
+    sections: List[SectionPlan] = Field(min_length=1, max_length=12)
+
+
+def parse_dashboard_plan(text: str) -> DashboardPlan:
+    """LLM出力をDashboardPlanとして検証（不正な場合は ValueError / ValidationError）"""
+    return DashboardPlan.model_validate_json(extract_json_object(text))
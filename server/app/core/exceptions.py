@@ -28,6 +28,24 @@ class AuthenticationError(CustomException):
         super().__init__(message, 401)
 
 
+class ArtifactNotFoundError(CustomException):
+    """アーティファクトが存在しない（期限切れを含む）"""
+    def __init__(self, message: str = "Artifact not found"):
+        super().__init__(message, 404)
+
+
+class JobNotFoundError(CustomException):
+    """バッチ・ジョブが存在しない（保持期間切れを含む）"""
+    def __init__(self, message: str = "Job not found"):
+        super().__init__(message, 404)
+
+
+class JobNotReadyError(CustomException):
+    """ジョブがまだ完了していない"""
+    def __init__(self, message: str = "Job not finished"):
+        super().__init__(message, 409)
+
+
 async def custom_exception_handler(request: Request, exc: CustomException):
     """カスタム例外ハンドラー"""
     return JSONResponse(
@@ -0,0 +1,174 @@
+"""生成済みダッシュボードHTMLへの差分パッチ（セクション単位の置換・追加・削除、文字列置換）"""
+import html
+import re
+from dataclasses import dataclass, field
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from .dashboard_spec import extract_json_object
+from .html_sanitizer import sanitize_chart_html
+
+_SECTION_OPEN_RE = re.compile(r"<(?P<tag>[a-zA-Z][a-zA-Z0-9]*)\b[^>]*\bdata-section-id=\"(?P<id>[^\"]+)\"[^>]*>")
+_TAG_RE_TEMPLATE = r"<(/?){tag}\b[^>]*?(/?)>"
+
+
+class PatchError(ValueError):
+    """パッチを適用できない（対象が見つからない・一意でない等）"""
+
+
+class HTMLPatch(BaseModel):
+    op: Literal["replace", "replace_section", "insert_section", "remove_section"]
+    # replace: 文書中に1回だけ現れる文字列 find を replace に置換
+    find: Optional[str] = Field(default=None, max_length=4000)
+    replace: Optional[str] = Field(default=None, max_length=20000)
+    # replace_section / remove_section: 対象セクション、insert_section: 直前のセクション
+    section_id: Optional[str] = None
+    after: Optional[str] = None
+    # replace_section / insert_section: セクションの中身（コンテナ要素は含まない）
+    html: Optional[str] = Field(default=None, max_length=20000)
+
+
+class PatchSet(BaseModel):
+    patches: List[HTMLPatch] = Field(min_length=1, max_length=20)
+
+
+def parse_patch_set(text: str) -> PatchSet:
+    """LLM出力をPatchSetとして検証（不正な場合は ValueError / ValidationError）"""
+    return PatchSet.model_validate_json(extract_json_object(text))
+
+
+@dataclass
+class _Segment:
+    """文書の断片。セクションは開始タグ・中身・終了タグに分けて保持する"""
+    text: str
+    section_id: Optional[str] = None
+    open_tag: str = ""
+    close_tag: str = ""
+    changed: bool = False
+
+    def render(self) -> str:
+        return f"{self.open_tag}{self.text}{self.close_tag}"
+
+
+@dataclass
+class PatchResult:
+    html: str
+    applied: int = 0
+    failed: List[str] = field(default_factory=list)
+    changed_sections: List[str] = field(default_factory=list)
+    removed_sections: List[str] = field(default_factory=list)
+    changed_bytes: int = 0
+
+
+def _find_close(document: str, tag: str, start: int) -> int:
+    """start位置の開始タグに対応する終了タグの位置（見つからない場合は-1）"""
+    depth = 0
+    for match in re.finditer(_TAG_RE_TEMPLATE.format(tag=re.escape(tag)), document[start:], re.IGNORECASE):
+        closing, self_closing = match.group(1), match.group(2)
+        if self_closing:
+            continue
+        depth += -1 if closing else 1
+        if depth == 0:
+            return start + match.start()
+    return -1
+
+
+def split_sections(document: str) -> List[_Segment]:
+    """data-section-id を持つトップレベル要素ごとに文書を分割"""
+    segments: List[_Segment] = []
+    position = 0
+    for match in _SECTION_OPEN_RE.finditer(document):
+        if match.start() < position:
+            continue  # 既に取り込んだセクション内の入れ子
+        tag = match.group("tag")
+        close_start = _find_close(document, tag, match.start())
+        if close_start == -1:
+            continue
+        close_end = document.index(">", close_start) + 1
+        if match.start() > position:
+            segments.append(_Segment(document[position:match.start()]))
+        segments.append(_Segment(
+            text=document[match.end():close_start],
+            section_id=match.group("id"),
+            open_tag=match.group(0),
+            close_tag=document[close_start:close_end]
+        ))
+        position = close_end
+    if position < len(document):
+        segments.append(_Segment(document[position:]))
+    return segments
+
+
+def section_ids(document: str) -> List[str]:
+    return [segment.section_id for segment in split_sections(document) if segment.section_id]
+
+
+def _section_index(segments: List[_Segment], section_id: Optional[str]) -> int:
+    for index, segment in enumerate(segments):
+        if segment.section_id is not None and segment.section_id == section_id:
+            return index
+    raise PatchError(f"section not found: {section_id}")
+
+
+def _apply_one(segments: List[_Segment], patch: HTMLPatch, result: PatchResult) -> None:
+    if patch.op == "replace":
+        if not patch.find or patch.replace is None:
+            raise PatchError("replace requires find and replace")
+        hits = [(i, s.text.count(patch.find)) for i, s in enumerate(segments) if patch.find in s.text]
+        if sum(count for _, count in hits) != 1:
+            raise PatchError(f"find text must match exactly once (matched {sum(c for _, c in hits)})")
+        index = hits[0][0]
+        segments[index].text = segments[index].text.replace(patch.find, patch.replace, 1)
+        segments[index].changed = True
+
+    elif patch.op == "replace_section":
+        if patch.html is None:
+            raise PatchError("replace_section requires html")
+        segment = segments[_section_index(segments, patch.section_id)]
+        segment.text = f"\n{patch.html}\n"
+        segment.changed = True
+
+    elif patch.op == "remove_section":
+        del segments[_section_index(segments, patch.section_id)]
+        result.removed_sections.append(patch.section_id)
+
+    elif patch.op == "insert_section":
+        if patch.html is None:
+            raise PatchError("insert_section requires html")
+        index = _section_index(segments, patch.after)
+        new_id = patch.section_id or f"{patch.after}-added"
+        if any(segment.section_id == new_id for segment in segments):
+            raise PatchError(f"section already exists: {new_id}")
+        anchor = segments[index]
+        # 直前のセクションと同じ要素・クラスで追加する
+        open_tag = anchor.open_tag.replace(
+            f'data-section-id="{anchor.section_id}"', f'data-section-id="{html.escape(new_id, quote=True)}"', 1
+        )
+        segment = _Segment(f"\n{patch.html}\n", new_id, open_tag, anchor.close_tag, changed=True)
+        segments[index + 1:index + 1] = [_Segment("\n"), segment]
+
+
+def apply_patches(document: str, patch_set: PatchSet) -> PatchResult:
+    """パッチを順に適用し、変更された断片だけを再サニタイズして文書を再構成する
+
+    適用できないパッチは failed に理由を記録してスキップする。
+    """
+    segments = split_sections(document)
+    result = PatchResult(html=document)
+
+    for index, patch in enumerate(patch_set.patches):
+        try:
+            _apply_one(segments, patch, result)
+            result.applied += 1
+        except PatchError as e:
+            result.failed.append(f"#{index} {patch.op}: {e}")
+
+    for segment in segments:
+        if segment.changed:
+            segment.text = sanitize_chart_html(segment.text)
+            result.changed_bytes += len(segment.text.encode("utf-8"))
+            result.changed_sections.append(segment.section_id or "(document)")
+
+    result.html = "".join(segment.render() for segment in segments)
+    return result
@@ -0,0 +1,66 @@
+"""ストリーミング生成中のHTMLを、ブラウザに逐次渡せる安全な断片に分割するユーティリティ"""
+import re
+from typing import List
+
+from .html_sanitizer import sanitize_chart_html
+
+_LEADING_FENCE_RE = re.compile(r"^\s*```[a-zA-Z]*[^\n]*\n")
+_TRAILING_FENCE_RE = re.compile(r"\n?\s*```\s*$")
+_RAW_TEXT_TAG_RE = re.compile(r"<\s*(/?)\s*(script|style)\b[^>]*>", re.IGNORECASE)
+
+
+def _safe_cut(buffer: str) -> int:
+    """断片として切り出せる最長の位置
+
+    タグの途中では切らず、script/style要素は終了タグまで揃ってから切り出す。
+    """
+    last_close = buffer.rfind(">")
+    if last_close == -1:
+        return 0
+    cut = last_close + 1
+
+    open_start = None
+    for match in _RAW_TEXT_TAG_RE.finditer(buffer):
+        if match.group(1):
+            open_start = None
+        elif open_start is None:
+            open_start = match.start()
+    if open_start is not None:
+        cut = min(cut, open_start)
+    return cut
+
+
+class HTMLStreamFragmenter:
+    """モデルのテキストデルタを受け取り、タグ境界で区切ったサニタイズ済み断片を返す"""
+
+    def __init__(self, min_chars: int = 256):
+        self.min_chars = min_chars
+        self._buffer = ""
+        self._started = False
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        if not self._started:
+            # 先頭のコードブロック記法は1行揃うまで待って除去する
+            stripped = self._buffer.lstrip()
+            if stripped.startswith("`"):
+                if "\n" not in stripped:
+                    return []
+                self._buffer = _LEADING_FENCE_RE.sub("", self._buffer, count=1)
+            elif not stripped:
+                return []
+            self._started = True
+
+        cut = _safe_cut(self._buffer)
+        if cut < self.min_chars or not self._buffer[:cut].strip():
+            return []
+        fragment, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return [sanitize_chart_html(fragment)]
+
+    def flush(self) -> List[str]:
+        """残りのバッファを最後の断片として返す"""
+        remaining = _TRAILING_FENCE_RE.sub("", self._buffer)
+        self._buffer = ""
+        if not remaining.strip():
+            return []
+        return [sanitize_chart_html(remaining)]
@@ -1,5 +1,8 @@
+import re
 from typing import List, Any
 
+_CODE_FENCE_RE = re.compile(r"^\s*```[a-zA-Z]*\s*\n?|\n?\s*```\s*$")
+
 
 def extract_text_from_response(response_content: List[Any]) -> str:
     """Bedrockレスポンスからテキストを抽出する共通ユーティリティ"""
@@ -13,6 +16,11 @@ def extract_text_from_response(response_content: List[Any]) -> str:
     return "\n".join(final_text)
 
 
+def strip_code_fence(text: str) -> str:
+    """モデル出力を囲むコードブロック記法（```html 等）を除去"""
+    return _CODE_FENCE_RE.sub("", text).strip()
+
+
 def format_tool_execution_log(tool_name: str) -> str:
     """ツール実行ログの統一フォーマット"""
     return f"[ツール実行: {tool_name}]"
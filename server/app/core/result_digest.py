@@ -0,0 +1,167 @@
+"""大規模なクエリ結果をNumPyで列ごとの統計ダイジェストに要約するユーティリティ"""
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _format_number(value: float) -> str:
+    if not np.isfinite(value):
+        return str(value)
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return f"{value:.6g}"
+
+
+# ISO形式の日付（YYYY-MM または YYYY-MM-DD、時刻付きも可）。"10000" のような郵便番号・コード列を
+# numpyが年として解釈しないよう、この形式の列のみ日付として扱う
+_ISO_DATE_PATTERN = re.compile(r"^\d{4}-\d{2}(-\d{2})?([T ].*)?$")
+
+
+def _to_datetime(values: List[Any]) -> Optional[np.ndarray]:
+    """ISO形式の日付文字列をdatetime64[D]に変換（変換できない場合はNone）"""
+    if not values or not all(isinstance(v, str) and _ISO_DATE_PATTERN.match(v) for v in values):
+        return None
+    try:
+        # 末尾のタイムゾーン指定はnumpyが扱えないため除去
+        return np.array([v.rstrip("Z") for v in values], dtype="datetime64[s]").astype("datetime64[D]")
+    except ValueError:
+        return None
+
+
+class _Column:
+    def __init__(self, name: str, raw: List[Any]):
+        self.name = name
+        self.total = len(raw)
+        self.present_mask = np.fromiter((v is not None and v != "" for v in raw), dtype=bool, count=self.total)
+        present = [v for v in raw if v is not None and v != ""]
+        self.count = len(present)
+        self.null_rate = 1 - self.count / self.total if self.total else 0.0
+
+        self.numbers: Optional[np.ndarray] = None
+        self.dates: Optional[np.ndarray] = None
+        self.categories: Optional[np.ndarray] = None
+
+        if present and all(_is_number(v) for v in present):
+            self.kind = "number"
+            self.numbers = np.array(present, dtype=float)
+        elif (dates := _to_datetime(present)) is not None:
+            self.kind = "date"
+            self.dates = dates
+        else:
+            self.kind = "category"
+            self.categories = np.array([str(v) for v in present], dtype=object)
+
+
+def _numeric_line(column: _Column) -> str:
+    values = column.numbers
+    if values.size == 0:
+        return f"{column.name}\tnumber\tcount=0\tnull_rate={column.null_rate:.3f}"
+    p25, p50, p75 = np.percentile(values, [25, 50, 75])
+    parts = [
+        column.name,
+        "number",
+        f"count={column.count}",
+        f"null_rate={column.null_rate:.3f}",
+        f"sum={_format_number(values.sum())}",
+        f"min={_format_number(values.min())}",
+        f"max={_format_number(values.max())}",
+        f"mean={_format_number(values.mean())}",
+        f"p25={_format_number(p25)}",
+        f"p50={_format_number(p50)}",
+        f"p75={_format_number(p75)}",
+    ]
+    return "\t".join(parts)
+
+
+def _category_line(column: _Column, top_k: int) -> str:
+    parts = [column.name, "category", f"count={column.count}", f"null_rate={column.null_rate:.3f}"]
+    if column.categories.size:
+        labels, counts = np.unique(column.categories.astype(str), return_counts=True)
+        order = np.argsort(-counts, kind="stable")[:top_k]
+        parts.append(f"distinct={labels.size}")
+        parts.append("top=" + ", ".join(f"{labels[i]}:{counts[i]}" for i in order))
+    return "\t".join(parts)
+
+
+def _date_line(column: _Column) -> str:
+    parts = [column.name, "date", f"count={column.count}", f"null_rate={column.null_rate:.3f}"]
+    if column.dates.size:
+        parts.append(f"min={column.dates.min()}")
+        parts.append(f"max={column.dates.max()}")
+    return "\t".join(parts)
+
+
+def _trend_lines(date_column: _Column, numeric_columns: List[_Column]) -> List[str]:
+    """日付列ごとに集計した数値列の線形トレンド（日次合計の傾き）を算出"""
+    lines = []
+    for column in numeric_columns:
+        mask = date_column.present_mask & column.present_mask
+        if mask.sum() < 2:
+            continue
+
+        # 日付・数値の両方が存在する行だけを揃える
+        date_positions = np.cumsum(date_column.present_mask) - 1
+        number_positions = np.cumsum(column.present_mask) - 1
+        dates = date_column.dates[date_positions[mask]]
+        numbers = column.numbers[number_positions[mask]]
+
+        unique_dates, inverse = np.unique(dates, return_inverse=True)
+        if unique_dates.size < 2:
+            continue
+        daily_sums = np.bincount(inverse, weights=numbers)
+        days = (unique_dates - unique_dates[0]).astype(float)
+        slope, _ = np.polyfit(days, daily_sums, 1)
+        mean_daily = daily_sums.mean()
+        relative = f" ({slope / mean_daily * 100:+.2f}% of mean/day)" if mean_daily else ""
+        lines.append(
+            f"trend {column.name} by {date_column.name}: slope={_format_number(slope)}/day{relative} "
+            f"over {unique_dates.size} dates"
+        )
+    return lines
+
+
+def build_digest(rows: List[Dict[str, Any]], top_k: int = 5) -> str:
+    """行リストから列ごとの統計ダイジェストを生成する
+
+    数値列: 件数・欠損率・合計・最小/最大/平均・四分位
+    カテゴリ列: 上位top_k件の出現数
+    日付列: 範囲と、各数値列の日次合計に対する線形トレンド
+    """
+    column_names: List[str] = []
+    seen = set()
+    for row in rows:
+        for key in row:
+            if key not in seen:
+                seen.add(key)
+                column_names.append(key)
+
+    columns = [_Column(name, [row.get(name) for row in rows]) for name in column_names]
+    numeric_columns = [column for column in columns if column.kind == "number"]
+
+    lines = [f"[digest rows={len(rows)} columns={len(columns)}]"]
+    for column in columns:
+        if column.kind == "number":
+            lines.append(_numeric_line(column))
+        elif column.kind == "date":
+            lines.append(_date_line(column))
+        else:
+            lines.append(_category_line(column, top_k))
+
+    for column in columns:
+        if column.kind == "date":
+            lines.extend(_trend_lines(column, numeric_columns))
+
+    return "\n".join(lines)
+
+
+def sample_rows(rows: List[Dict[str, Any]], sample_size: int) -> List[Dict[str, Any]]:
+    """全体から等間隔にサンプル行を抽出"""
+    if len(rows) <= sample_size:
+        return rows
+    indices = np.linspace(0, len(rows) - 1, num=sample_size).astype(int)
+    return [rows[i] for i in indices]
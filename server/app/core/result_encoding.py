@@ -0,0 +1,202 @@
+"""MCPツール結果をプロンプト向けのコンパクトな表形式に変換するユーティリティ"""
+import json
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .result_digest import build_digest, sample_rows
+
+# 行データが格納されていることが多いキー（優先順）
+_ROW_CONTAINER_KEYS = ("data", "rows", "results", "records", "items")
+
+
+@dataclass
+class EncodedToolResult:
+    text: str
+    original_chars: int
+    encoded_chars: int
+    row_count: Optional[int] = None
+    truncated: bool = False
+    digested: bool = False
+    # 行指向JSONだった場合の元の行（ローカル再集計用）
+    rows: Optional[List[Dict[str, Any]]] = field(default=None, repr=False)
+
+    @property
+    def original_tokens(self) -> int:
+        return estimate_tokens_from_chars(self.original_chars)
+
+    @property
+    def encoded_tokens(self) -> int:
+        return estimate_tokens_from_chars(self.encoded_chars)
+
+    @property
+    def tokens_saved(self) -> int:
+        # メタ情報や切り詰めの注記で元より長くなった場合は0とする
+        return max(0, self.original_tokens - self.encoded_tokens)
+
+
+def estimate_tokens_from_chars(char_count: int) -> int:
+    """文字数からトークン数を概算（英数字中心のJSONで約4文字/トークン）"""
+    return math.ceil(char_count / 4)
+
+
+def extract_result_text(content: Any) -> str:
+    """MCPのcontent（TextContentのリスト等）からテキストを取り出す"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for item in content:
+            if hasattr(item, "text"):
+                parts.append(item.text)
+            elif isinstance(item, dict) and "text" in item:
+                parts.append(str(item["text"]))
+            else:
+                parts.append(str(item))
+        return "\n".join(parts)
+    return str(content)
+
+
+def find_rows(payload: Any) -> Tuple[Optional[List[Dict[str, Any]]], Dict[str, Any]]:
+    """行指向JSONから行リストを探す
+
+    Returns:
+        (rows, meta) のタプル。rowsが見つからない場合は (None, {})。
+        metaは行リスト以外のトップレベル項目。
+    """
+    if _is_row_list(payload):
+        return payload, {}
+
+    if isinstance(payload, dict):
+        for key in _ROW_CONTAINER_KEYS:
+            if _is_row_list(payload.get(key)):
+                meta = {k: v for k, v in payload.items() if k != key}
+                return payload[key], meta
+
+    return None, {}
+
+
+def _is_row_list(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(row, dict) for row in value)
+
+
+def _format_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        text = value
+    else:
+        text = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def encode_rows(
+    rows: List[Dict[str, Any]],
+    max_rows: int,
+    max_bytes: int,
+    meta: Optional[Dict[str, Any]] = None
+) -> Tuple[str, bool]:
+    """行リストをヘッダー＋TSV行の表に変換し、行数・バイト数の上限で切り詰める
+
+    Returns:
+        (text, truncated) のタプル
+    """
+    columns: List[str] = []
+    seen = set()
+    for row in rows:
+        for key in row:
+            if key not in seen:
+                seen.add(key)
+                columns.append(key)
+
+    lines = [f"[table rows={len(rows)} columns={len(columns)} format=tsv]"]
+    column_line = "\t".join(_format_cell(column) for column in columns)
+    if meta:
+        # メタ情報も上限に含め、収まらない場合は切り詰める
+        budget = max_bytes - sum(len(line.encode("utf-8")) + 1 for line in (lines[0], column_line)) - 1
+        meta_line = _cap_meta_line("meta: " + json.dumps(meta, ensure_ascii=False, separators=(",", ":")), budget)
+        if meta_line:
+            lines.append(meta_line)
+    lines.append(column_line)
+
+    used_bytes = sum(len(line.encode("utf-8")) + 1 for line in lines)
+    emitted = 0
+    for row in rows[:max_rows]:
+        line = "\t".join(_format_cell(row.get(column)) for column in columns)
+        line_bytes = len(line.encode("utf-8")) + 1
+        if used_bytes + line_bytes > max_bytes:
+            break
+        lines.append(line)
+        used_bytes += line_bytes
+        emitted += 1
+
+    truncated = emitted < len(rows)
+    if truncated:
+        lines.append(f"[truncated: showing {emitted} of {len(rows)} rows]")
+
+    return "\n".join(lines), truncated
+
+
+def _cap_meta_line(line: str, max_bytes: int) -> Optional[str]:
+    """meta行をmax_bytes以内に切り詰める（注記も収まらない場合はNone）"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return line
+    suffix = " [truncated]"
+    keep = max_bytes - len(suffix.encode("utf-8"))
+    if keep <= len("meta: "):
+        return None
+    return encoded[:keep].decode("utf-8", errors="ignore") + suffix
+
+
+def _cap_text(text: str, max_bytes: int) -> Tuple[str, bool]:
+    encoded = text.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return text, False
+    capped = encoded[:max_bytes].decode("utf-8", errors="ignore")
+    return f"{capped}\n[truncated: showing {max_bytes} of {len(encoded)} bytes]", True
+
+
+def encode_tool_result(
+    content: Any,
+    max_rows: int = 500,
+    max_bytes: int = 50000,
+    digest_min_rows: Optional[int] = None,
+    digest_sample_rows: int = 20
+) -> EncodedToolResult:
+    """ツール結果をプロンプト向けに変換する
+
+    行指向JSONはヘッダー＋行の表に、その他のJSONは空白を除いたJSONに、
+    JSONでないテキストはそのまま（バイト上限のみ適用）変換する。
+    digest_min_rows を指定した場合、その行数以上の結果は統計ダイジェストと
+    少数のサンプル行に置き換える。
+    """
+    text = extract_result_text(content)
+    original_chars = len(text)
+
+    try:
+        payload = json.loads(text)
+    except (TypeError, ValueError):
+        capped, truncated = _cap_text(text, max_bytes)
+        return EncodedToolResult(capped, original_chars, len(capped), truncated=truncated)
+
+    rows, meta = find_rows(payload)
+    if rows is None:
+        compact = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        capped, truncated = _cap_text(compact, max_bytes)
+        return EncodedToolResult(capped, original_chars, len(capped), truncated=truncated)
+
+    if digest_min_rows is not None and len(rows) >= digest_min_rows:
+        digest = build_digest(rows)
+        sample, _ = encode_rows(sample_rows(rows, digest_sample_rows), digest_sample_rows, max_bytes, meta)
+        text, _ = _cap_text(f"{digest}\n[sample]\n{sample}", max_bytes)
+        return EncodedToolResult(text, original_chars, len(text), row_count=len(rows), digested=True, rows=rows)
+
+    table, truncated = encode_rows(rows, max_rows, max_bytes, meta)
+    return EncodedToolResult(
+        table, original_chars, len(table), row_count=len(rows), truncated=truncated, rows=rows
+    )
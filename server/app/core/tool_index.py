@@ -0,0 +1,174 @@
+"""会話内容に関連するMCPツールだけを選ぶための語彙インデックス（BM25）"""
+import json
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from .result_encoding import estimate_tokens_from_chars
+
+_ASCII_WORD_RE = re.compile(r"[a-z0-9]+")
+_CJK_RUN_RE = re.compile(r"[぀-ヿ㐀-鿿ｦ-ﾟ]+")
+_CAMEL_RE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+# ツール説明は英語のため、日本語の質問によく出る語を英語の語彙に対応付ける
+_QUERY_ALIASES = {
+    "ビュー": "view",
+    "ダッシュボード": "dashboard view workbook",
+    "ワークブック": "workbook",
+    "データソース": "datasource",
+    "フィールド": "field metadata",
+    "項目": "field metadata",
+    "メタデータ": "metadata",
+    "列": "field column",
+    "集計": "query aggregate",
+    "売上": "query",
+    "件数": "query count",
+    "推移": "query",
+    "パルス": "pulse metric",
+    "メトリクス": "metric pulse",
+    "指標": "metric pulse",
+    "検索": "search",
+    "探": "search",
+    "画像": "image",
+    "一覧": "list",
+    "プロジェクト": "project",
+    "ユーザー": "user",
+    "取得済み": "cached result",
+    "再集計": "aggregate cached result",
+}
+
+
+def tokenize(text: str, expand_aliases: bool = True) -> List[str]:
+    """英数字は単語単位（camelCase・ケバブケースを分割）、日本語は文字bigramでトークン化"""
+    if not text:
+        return []
+    if expand_aliases:
+        for phrase, expansion in _QUERY_ALIASES.items():
+            if phrase in text:
+                text = f"{text} {expansion}"
+    tokens = _ASCII_WORD_RE.findall(_CAMEL_RE.sub(" ", text).lower())
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def _tool_document(tool: Dict[str, Any]) -> List[str]:
+    """ツール名（重み付け）・説明・引数名からトークン列を作る"""
+    name_tokens = tokenize(tool["name"])
+    properties = (tool.get("input_schema") or {}).get("properties") or {}
+    return name_tokens * 3 + tokenize(tool.get("description") or "") + tokenize(" ".join(properties))
+
+
+def estimate_tool_tokens(tools: Sequence[Dict[str, Any]]) -> int:
+    """ツール定義（名前・説明・JSONスキーマ）がプロンプトで消費するトークン数の概算"""
+    return estimate_tokens_from_chars(len(json.dumps(list(tools), ensure_ascii=False, separators=(",", ":"))))
+
+
+class ToolIndex:
+    """ツール名・説明に対するBM25インデックス"""
+
+    def __init__(self, tools: Sequence[Dict[str, Any]], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.names = [tool["name"] for tool in tools]
+        self._term_freqs = [Counter(_tool_document(tool)) for tool in tools]
+        self._lengths = [sum(freqs.values()) for freqs in self._term_freqs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        document_freqs: Counter = Counter()
+        for freqs in self._term_freqs:
+            document_freqs.update(freqs.keys())
+        count = len(tools)
+        self._idf = {
+            term: math.log(1 + (count - df + 0.5) / (df + 0.5))
+            for term, df in document_freqs.items()
+        }
+
+    def score(self, query: str) -> Dict[str, float]:
+        query_terms = Counter(tokenize(query))
+        scores = {}
+        for name, freqs, length in zip(self.names, self._term_freqs, self._lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self._avg_length) if self._avg_length else self.k1
+            for term, query_count in query_terms.items():
+                tf = freqs.get(term)
+                if tf:
+                    score += self._idf[term] * tf * (self.k1 + 1) / (tf + norm) * query_count
+            scores[name] = score
+        return scores
+
+    def top(self, query: str, n: int, exclude: Iterable[str] = ()) -> List[str]:
+        excluded = set(exclude)
+        ranked = sorted(
+            ((score, name) for name, score in self.score(query).items() if name not in excluded and score > 0),
+            key=lambda item: -item[0]
+        )
+        return [name for _, name in ranked[:n]]
+
+
+class ToolSelection:
+    """リクエスト内で送信するツールの部分集合（必要に応じて拡張し、縮小はしない）"""
+
+    def __init__(
+        self,
+        catalog: Sequence[Dict[str, Any]],
+        query: str,
+        pinned: Iterable[str] = (),
+        top_n: int = 4,
+        enabled: bool = True
+    ):
+        self.catalog = list(catalog)
+        self._by_name = {tool["name"]: tool for tool in self.catalog}
+        self.full_tokens = estimate_tool_tokens(self.catalog)
+        # 省略したツールの案内など、選択のために追加したプロンプトのトークン数
+        self.overhead_tokens = 0
+
+        if not enabled:
+            self._selected = set(self._by_name)
+            return
+
+        selected = [name for name in pinned if name in self._by_name]
+        selected.extend(ToolIndex(self.catalog).top(query, top_n, exclude=selected))
+        self._selected = set(selected)
+
+    @property
+    def tools(self) -> List[Dict[str, Any]]:
+        """選択中のツール（カタログ順）"""
+        return [tool for tool in self.catalog if tool["name"] in self._selected]
+
+    @property
+    def names(self) -> List[str]:
+        return [tool["name"] for tool in self.tools]
+
+    @property
+    def omitted_names(self) -> List[str]:
+        """送信対象外のツール名（カタログ順）"""
+        return [tool["name"] for tool in self.catalog if tool["name"] not in self._selected]
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tool_tokens(self.tools)
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.full_tokens - self.tokens - self.overhead_tokens
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._selected
+
+    def add(self, names: Iterable[str]) -> List[str]:
+        """カタログに存在する未選択のツールを追加し、追加した名前を返す"""
+        added = []
+        for name in names:
+            if name in self._by_name and name not in self._selected:
+                self._selected.add(name)
+                added.append(name)
+        return added
+
+    def mentioned_missing(self, text: Optional[str]) -> List[str]:
+        """テキスト中で名前が言及されている未選択のツール"""
+        if not text:
+            return []
+        return [name for name in self._by_name if name not in self._selected and name in text]
@@ -0,0 +1,64 @@
+"""エージェントループでの重複ツール呼び出し・循環の検出
+
+同じツールを同じ引数で呼び直す、2つのツールを交互に呼び続けるといった堂々巡りは、
+1回ごとにBedrockの往復が発生する。引数を正規化して過去の呼び出しと照合し、重複は
+前回の結果をそのまま返す。新しい呼び出しのない反復が続いた場合は循環と判定する。
+"""
+import json
+from typing import Any, Dict, Optional, Tuple
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(key): _normalize(item) for key, item in value.items() if item is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def canonicalize_tool_args(args: Optional[Dict[str, Any]]) -> str:
+    """キー順・前後の空白・None・整数値のfloat表記の違いを吸収した引数の文字列表現"""
+    return json.dumps(_normalize(args or {}), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+class ToolCallLedger:
+    """1回のクエリ処理内のツール呼び出し結果と、新しい呼び出しのない反復の連続回数を記録"""
+
+    def __init__(self, max_unproductive_iterations: int = 2):
+        self.max_unproductive_iterations = max_unproductive_iterations
+        self._results: Dict[Tuple[str, str], str] = {}
+        self.calls = 0
+        self.repeats = 0
+        self.unproductive_iterations = 0
+        self._new_calls_in_iteration = 0
+
+    @staticmethod
+    def _key(tool_name: str, tool_args: Optional[Dict[str, Any]]) -> Tuple[str, str]:
+        return tool_name, canonicalize_tool_args(tool_args)
+
+    def lookup(self, tool_name: str, tool_args: Optional[Dict[str, Any]]) -> Optional[str]:
+        """同じ引数での呼び出し済みの結果（未呼び出しの場合はNone）"""
+        self.calls += 1
+        result = self._results.get(self._key(tool_name, tool_args))
+        if result is None:
+            self._new_calls_in_iteration += 1
+        else:
+            self.repeats += 1
+        return result
+
+    def record(self, tool_name: str, tool_args: Optional[Dict[str, Any]], result: str) -> None:
+        # エラーは一時的な場合があるため記録しない（呼び出し側で成功時のみ呼ぶ）
+        self._results[self._key(tool_name, tool_args)] = result
+
+    def end_iteration(self) -> bool:
+        """反復を締めくくり、循環（新しい呼び出しのない反復が上限回数続いた）ならTrue"""
+        if self._new_calls_in_iteration:
+            self.unproductive_iterations = 0
+        else:
+            self.unproductive_iterations += 1
+        self._new_calls_in_iteration = 0
+        return self.unproductive_iterations >= self.max_unproductive_iterations
@@ -1,10 +1,95 @@
 from functools import lru_cache
 from .config.settings import get_settings
+from .services.answer_cache import AnswerCache
+from .services.artifact_store import ArtifactStore
 from .services.auth_service import AuthService
+from .services.batch_service import BatchStore
+from .services.cache_warmer import LiveTraffic, QuestionLog
+from .services.job_queue import JobQueue
+from .services.mcp_pool import MCPServerPool
+from .services.metadata_index import MetadataIndex
+from .services.result_store import ResultStore
 
 
 @lru_cache()
 def get_auth_service() -> AuthService:
     """AuthServicen"""
     settings = get_settings()
-    return AuthService(settings)
\ No newline at end of file
+    return AuthService(settings)
+
+
+@lru_cache()
+def get_result_store() -> ResultStore:
+    """会話ごとのクエリ結果ストア（プロセス共有）"""
+    settings = get_settings()
+    return ResultStore(
+        max_bytes=settings.result_store.max_bytes,
+        max_results_per_conversation=settings.result_store.max_results_per_conversation
+    )
+
+
+@lru_cache()
+def get_artifact_store() -> ArtifactStore:
+    """生成済みダッシュボード・チャートのストア（プロセス共有）"""
+    settings = get_settings()
+    return ArtifactStore(
+        max_memory_bytes=settings.artifacts.max_memory_bytes,
+        disk_dir=settings.artifacts.disk_dir,
+        max_disk_bytes=settings.artifacts.max_disk_bytes,
+        compression_level=settings.artifacts.compression_level
+    )
+
+
+@lru_cache()
+def get_metadata_index() -> MetadataIndex:
+    """データソース・フィールドのメタデータインデックス（プロセス共有、バックグラウンドで更新）"""
+    return MetadataIndex()
+
+
+@lru_cache()
+def get_answer_cache() -> AnswerCache:
+    """単発の分析質問に対する回答キャッシュ（プロセス共有）"""
+    settings = get_settings()
+    return AnswerCache(
+        max_entries=settings.answer_cache.max_entries,
+        ttl_seconds=settings.answer_cache.ttl_seconds,
+        unversioned_ttl_seconds=settings.answer_cache.unversioned_ttl_seconds,
+        similarity_threshold=settings.answer_cache.similarity_threshold,
+        max_result_bytes=settings.answer_cache.max_result_bytes
+    )
+
+
+@lru_cache()
+def get_question_log() -> QuestionLog:
+    """最近の単発質問の集計（キャッシュウォーマーが人気の質問を選ぶために使用）"""
+    return QuestionLog()
+
+
+@lru_cache()
+def get_live_traffic() -> LiveTraffic:
+    """処理中のAPIリクエスト数（キャッシュウォーマーがライブトラフィックを避けるために使用）"""
+    return LiveTraffic()
+
+
+@lru_cache()
+def get_batch_store() -> BatchStore:
+    """バッチの実行状態と結果（プロセス共有）"""
+    settings = get_settings()
+    return BatchStore(max_batches=settings.batch.max_batches)
+
+
+@lru_cache()
+def get_job_queue() -> JobQueue:
+    """ダッシュボード・チャート生成の永続ジョブキュー（プロセス共有）"""
+    settings = get_settings()
+    return JobQueue(
+        settings.job_queue.db_path,
+        max_attempts=settings.job_queue.max_attempts,
+        secret_key=settings.job_queue.secret_key
+    )
+
+
+@lru_cache()
+def get_mcp_pool() -> MCPServerPool:
+    """常駐MCPサーバープール（プロセス共有、lifespanで起動）"""
+    return MCPServerPool.from_settings(get_settings())
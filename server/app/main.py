@@ -1,16 +1,29 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import uvicorn
 
 from .config.settings import get_settings
+from .dependencies import (
+    get_answer_cache,
+    get_artifact_store,
+    get_job_queue,
+    get_live_traffic,
+    get_mcp_pool,
+    get_metadata_index,
+    get_question_log
+)
 from .core.exceptions import (
     CustomException,
     custom_exception_handler,
     general_exception_handler
 )
-from .routers import chat, dashboard, auth
+from .routers import chat, dashboard, auth, metrics, artifacts, batch, jobs
 from .routers import settings as settings_router
+from .services.cache_warmer import CacheWarmer, build_answer_function
+from .services.job_queue import ArtifactJobExecutor, JobWorkerPool
+from .services.mcp_service import MCPService, mcp_server_configured
+from .services.metadata_index import MetadataIndexer
 
 
 @asynccontextmanager
@@ -18,11 +31,64 @@ async def lifespan(app: FastAPI):
     # Startup
     print("Tableau AI Chat API starting up...")
     # MCP接続は各リクエストごとに行う（Bedrock設定が必要なため）
+    # メタデータインデックスはBedrock不要のため、専用のMCPセッションでバックグラウンド更新する
+    settings = get_settings()
+
+    # MCPサーバーを常駐させ、チャットの各リクエストで共有する（起動はバックグラウンド）
+    mcp_pool = None
+    if settings.mcp_pool.size > 0 and mcp_server_configured(settings):
+        mcp_pool = get_mcp_pool()
+        mcp_pool.start()
+
+    indexer = None
+    if settings.metadata_index.enabled and mcp_server_configured(settings):
+        indexer = MetadataIndexer(settings, get_metadata_index(), lambda: MCPService(settings))
+        indexer.start()
+
+    # 人気の質問をオフピーク時間帯に再実行して回答キャッシュを温める（専用のBedrock設定が必要）
+    warmer = None
+    warmer_settings = settings.cache_warmer
+    if (
+        warmer_settings.enabled and settings.answer_cache.enabled and mcp_server_configured(settings)
+        and warmer_settings.aws_region and warmer_settings.aws_bearer_token and warmer_settings.bedrock_model_id
+    ):
+        warmer = CacheWarmer(
+            settings,
+            get_answer_cache(),
+            get_question_log(),
+            get_metadata_index(),
+            get_live_traffic(),
+            build_answer_function(settings, get_metadata_index()),
+            indexer=indexer
+        )
+        warmer.start()
+    app.state.cache_warmer = warmer
+
+    # job=true で受け付けたダッシュボード・チャート生成を処理する（中断されたジョブはここで再投入）
+    job_pool = None
+    if settings.job_queue.enabled:
+        job_pool = JobWorkerPool(
+            get_job_queue(),
+            ArtifactJobExecutor(settings),
+            artifact_store=get_artifact_store(),
+            concurrency=settings.job_queue.concurrency,
+            poll_interval_seconds=settings.job_queue.poll_interval_seconds,
+            retention_seconds=settings.job_queue.retention_seconds
+        )
+        job_pool.start()
 
     yield
 
     # Shutdown
     print("Tableau AI Chat API shutting down...")
+    if job_pool:
+        await job_pool.stop()
+    if warmer:
+        await warmer.stop()
+    if indexer:
+        await indexer.stop()
+    if mcp_pool:
+        await mcp_pool.stop()
 
 
 def create_app() -> FastAPI:
@@ -43,6 +109,14 @@ def create_app() -> FastAPI:
         allow_headers=settings.cors.allow_headers,
     )
 
+    # キャッシュウォーマーがライブトラフィックと競合しないよう、処理中のAPIリクエストを数える
+    @app.middleware("http")
+    async def track_live_traffic(request: Request, call_next):
+        if request.method != "POST" or not request.url.path.startswith("/api/"):
+            return await call_next(request)
+        with get_live_traffic().track():
+            return await call_next(request)
+
     # 例外ハンドラー登録
     app.add_exception_handler(CustomException, custom_exception_handler)
     app.add_exception_handler(Exception, general_exception_handler)
@@ -52,6 +126,10 @@ def create_app() -> FastAPI:
     app.include_router(dashboard.router)
     app.include_router(auth.router)
     app.include_router(settings_router.router)
+    app.include_router(metrics.router)
+    app.include_router(artifacts.router)
+    app.include_router(batch.router)
+    app.include_router(jobs.router)
 
     @app.get("/")
     async def root():
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, field_validator
-from typing import List
+from typing import List, Literal, Optional
 
 
 class ChatMessage(BaseModel):
@@ -10,6 +10,8 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     messages: List[ChatMessage]
     timestamp: str
+    # 会話の識別子（未指定時はサーバーが発行し、ChatResponse.conversation_id で返す）
+    conversation_id: Optional[str] = None
     # Bedrock設定（必須フィールド）
     aws_region: str
     aws_bearer_token: str
@@ -27,6 +29,10 @@ class ChatRequest(BaseModel):
 class CreateReportRequest(BaseModel):
     content: str  # Bot message content to visualize
     timestamp: str
+    data_handle: Optional[str] = None  # ChatResponse.data_handle
+    render_mode: Optional[Literal["html", "spec", "sections"]] = None  # 未指定時はサーバー設定
+    # Trueの場合はジョブとして受け付けてjob_idを即座に返す（結果は GET /api/jobs/{job_id}/result）
+    job: bool = False
     # Bedrock設定（必須フィールド）
     aws_region: str
     aws_bearer_token: str
@@ -41,10 +47,78 @@ class CreateReportRequest(BaseModel):
         return v
 
 
+class EditReportRequest(BaseModel):
+    artifact_id: str  # CreateReportResponse.artifact_id
+    instruction: str  # 修正指示（例: 「売上チャートを折れ線に」）
+    timestamp: str
+    # Bedrock設定（必須フィールド）
+    aws_region: str
+    aws_bearer_token: str
+    bedrock_model_id: str
+    max_tokens: int
+
+    @field_validator('max_tokens')
+    @classmethod
+    def validate_max_tokens(cls, v):
+        if v < 100 or v > 200000:
+            raise ValueError('max_tokens must be between 100 and 200000')
+        return v
+
+
+class BatchItemRequest(BaseModel):
+    id: Optional[str] = None  # 未指定時は位置から採番
+    question: str
+    # "answer"（回答のみ）/ "report"（回答からダッシュボード）/ "chart"（回答からチャート）
+    kind: Literal["answer", "report", "chart"] = "answer"
+    render_mode: Optional[Literal["html", "spec", "sections"]] = None
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItemRequest]
+    timestamp: str
+    concurrency: Optional[int] = None  # 未指定時はサーバー設定
+    # Bedrock設定（必須フィールド）
+    aws_region: str
+    aws_bearer_token: str
+    bedrock_model_id: str
+    max_tokens: int
+
+    @field_validator('items')
+    @classmethod
+    def validate_items(cls, v):
+        if not v or len(v) > 100:
+            raise ValueError('items must contain between 1 and 100 entries')
+        return v
+
+    @field_validator('max_tokens')
+    @classmethod
+    def validate_max_tokens(cls, v):
+        if v < 100 or v > 200000:
+            raise ValueError('max_tokens must be between 100 and 200000')
+        return v
+
+
 class JWTRequest(BaseModel):
     username: str
 
 
+class JWTBatchItem(BaseModel):
+    id: str  # ビューやタイルの識別子
+    scopes: Optional[List[str]] = None  # 未指定時は既定のembedスコープ
+
+
+class JWTBatchRequest(BaseModel):
+    username: str
+    items: List[JWTBatchItem]
+
+    @field_validator('items')
+    @classmethod
+    def validate_items(cls, v):
+        if not v or len(v) > 100:
+            raise ValueError('items must contain between 1 and 100 entries')
+        return v
+
+
 class BedrockSettingsRequest(BaseModel):
     aws_region: str
     aws_bearer_token: str
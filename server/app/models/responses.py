@@ -1,21 +1,95 @@
 from pydantic import BaseModel
+from typing import List, Optional
 
 
 class CreateReportResponse(BaseModel):
     code: str
     timestamp: str
     success: bool
+    # 差分編集（/api/edit_report）で参照するID
+    artifact_id: Optional[str] = None
+    # job=true で受け付けた場合のジョブID（codeは空）
+    job_id: Optional[str] = None
+
+
+class EditReportResponse(BaseModel):
+    code: str
+    timestamp: str
+    success: bool
+    artifact_id: Optional[str] = None
+    mode: Optional[str] = None  # "patch"（差分適用）/ "full"（全体再生成）
+    changed_sections: List[str] = []
 
 
 class ChatResponse(BaseModel):
     message: str
     timestamp: str
     success: bool
+    # 応答の根拠となった構造化データへのハンドル（チャート・レポート生成で使用）
+    data_handle: Optional[str] = None
+    # 回答キャッシュから返した場合はTrue
+    cached: bool = False
+    # 会話の識別子（以降のリクエストで ChatRequest.conversation_id として送り返す）
+    conversation_id: Optional[str] = None
+
+
+class CacheInvalidationResponse(BaseModel):
+    removed: int
+    success: bool
+
+
+class BatchItemResult(BaseModel):
+    id: str
+    kind: str
+    status: str  # pending / running / succeeded / failed
+    message: Optional[str] = None
+    # レポート・チャートは /api/artifacts/{artifact_id} から取得
+    artifact_id: Optional[str] = None
+    cached: bool = False
+    error: Optional[str] = None
+    duration_seconds: Optional[float] = None
+
+
+class BatchStatusResponse(BaseModel):
+    batch_id: str
+    status: str  # queued / running / completed
+    total: int
+    succeeded: int
+    failed: int
+    items_per_minute: Optional[float] = None
+    items: List[BatchItemResult] = []
+    success: bool
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    kind: str  # dashboard / chart
+    status: str  # queued / running / succeeded / failed
+    attempts: int
+    # 完了後は /api/jobs/{job_id}/result または /api/artifacts/{artifact_id} から取得
+    artifact_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    success: bool
 
 
 class JWTResponse(BaseModel):
     token: str
     success: bool
+    expires_at: Optional[int] = None
+
+
+class JWTBatchItemResponse(BaseModel):
+    id: str
+    token: str
+    expires_at: int
+
+
+class JWTBatchResponse(BaseModel):
+    tokens: List[JWTBatchItemResponse]
+    success: bool
 
 
 class ValidationResponse(BaseModel):
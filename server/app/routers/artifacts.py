@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, Request, Response
+
+from ..core.exceptions import ArtifactNotFoundError
+from ..dependencies import get_artifact_store
+from ..services.artifact_store import ArtifactStore
+
+router = APIRouter(prefix="/api", tags=["artifacts"])
+
+# アーティファクトIDは内容のハッシュなので、同じURLの内容は変わらない。
+# ユーザーデータを含み得るため共有プロキシには保存させない
+_IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# モデルが生成したHTMLはAPIのオリジンで実行させない（スクリプトは一意のオリジンで実行）
+_ARTIFACT_CSP = "sandbox allow-scripts"
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return etag in candidates
+
+
+@router.get("/artifacts/{artifact_id}")
+async def get_artifact(
+    artifact_id: str,
+    request: Request,
+    artifact_store: ArtifactStore = Depends(get_artifact_store)
+) -> Response:
+    """生成済みダッシュボード・チャートのHTMLを返す（強いETag・イミュータブルキャッシュ）"""
+    etag = f'"{artifact_id}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": _IMMUTABLE_CACHE_CONTROL,
+        "Content-Security-Policy": _ARTIFACT_CSP,
+        "X-Content-Type-Options": "nosniff"
+    }
+
+    # 内容が同じであることはIDから保証されるため、存在確認のみで（展開せずに）304を返す
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag) and artifact_id in artifact_store:
+        return Response(status_code=304, headers=headers)
+
+    artifact = artifact_store.get(artifact_id)
+    if artifact is None:
+        raise ArtifactNotFoundError()
+
+    return Response(content=artifact.html, media_type="text/html; charset=utf-8", headers=headers)
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends
 
 from ..dependencies import get_auth_service
-from ..models.requests import JWTRequest
-from ..models.responses import JWTResponse
+from ..models.requests import JWTRequest, JWTBatchRequest
+from ..models.responses import JWTResponse, JWTBatchResponse, JWTBatchItemResponse
 from ..services.auth_service import AuthService
 
 router = APIRouter(prefix="/api", tags=["auth"])
@@ -13,18 +13,40 @@ async def generate_jwt(
     request: JWTRequest,
     auth_service: AuthService = Depends(get_auth_service)
 ) -> JWTResponse:
-    """JWT トークンを生成"""
+    """JWT トークンを生成（有効期限内はキャッシュを再利用）"""
     try:
         if not auth_service.validate_tableau_credentials():
             raise ValueError("Tableau Connected App credentials not configured")
 
-        token = auth_service.generate_jwt_token(
-            username=request.username,
-            token_expiry_minutes=5
-        )
+        token, expires_at = auth_service.get_jwt_token(username=request.username)
 
-        return JWTResponse(token=token, success=True)
+        return JWTResponse(token=token, success=True, expires_at=expires_at)
 
     except Exception as e:
         print(f"Error generating JWT: {e}")
         return JWTResponse(token="", success=False)
+
+
+@router.post("/jwt/batch", response_model=JWTBatchResponse)
+async def generate_jwt_batch(
+    request: JWTBatchRequest,
+    auth_service: AuthService = Depends(get_auth_service)
+) -> JWTBatchResponse:
+    """複数ビュー・スコープ分のJWTトークンを一括生成"""
+    try:
+        if not auth_service.validate_tableau_credentials():
+            raise ValueError("Tableau Connected App credentials not configured")
+
+        tokens = []
+        for item in request.items:
+            token, expires_at = auth_service.get_jwt_token(
+                username=request.username,
+                scopes=item.scopes
+            )
+            tokens.append(JWTBatchItemResponse(id=item.id, token=token, expires_at=expires_at))
+
+        return JWTBatchResponse(tokens=tokens, success=True)
+
+    except Exception as e:
+        print(f"Error generating JWT batch: {e}")
+        return JWTBatchResponse(tokens=[], success=False)
@@ -0,0 +1,127 @@
+import asyncio
+
+from fastapi import APIRouter, Depends
+from ..models.requests import BatchRequest
+from ..models.responses import BatchItemResult, BatchStatusResponse
+from ..services.answer_cache import AnswerCache
+from ..services.artifact_store import ArtifactStore
+from ..services.batch_service import BatchItem, BatchJob, BatchRunner, BatchStore
+from ..services.bedrock_service import BedrockService, verify_bedrock_credentials
+from ..services.mcp_pool import MCPServerPool
+from ..services.metadata_index import MetadataIndex
+from ..services.result_store import ResultStore
+from ..config.settings import get_settings
+from ..dependencies import (
+    get_answer_cache,
+    get_artifact_store,
+    get_batch_store,
+    get_mcp_pool,
+    get_metadata_index,
+    get_result_store
+)
+from ..core.exceptions import AuthenticationError, JobNotFoundError
+from ..core.logging import get_api_logger
+
+router = APIRouter(prefix="/api", tags=["batch"])
+logger = get_api_logger()
+
+
+def _to_response(job: BatchJob, include_items: bool = True) -> BatchStatusResponse:
+    items_per_minute = job.items_per_minute
+    return BatchStatusResponse(
+        batch_id=job.batch_id,
+        status=job.status,
+        total=len(job.items),
+        succeeded=job.count("succeeded"),
+        failed=job.count("failed"),
+        items_per_minute=round(items_per_minute, 2) if items_per_minute is not None else None,
+        items=[
+            BatchItemResult(
+                id=item.item_id,
+                kind=item.kind,
+                status=item.status,
+                message=item.message,
+                artifact_id=item.artifact_id,
+                cached=item.cached,
+                error=item.error,
+                duration_seconds=round(item.duration, 3) if item.duration is not None else None
+            )
+            for item in job.items
+        ] if include_items else [],
+        success=True
+    )
+
+
+@router.post("/batch", response_model=BatchStatusResponse)
+async def create_batch(
+    request: BatchRequest,
+    batch_store: BatchStore = Depends(get_batch_store),
+    result_store: ResultStore = Depends(get_result_store),
+    artifact_store: ArtifactStore = Depends(get_artifact_store),
+    answer_cache: AnswerCache = Depends(get_answer_cache),
+    metadata_index: MetadataIndex = Depends(get_metadata_index),
+    mcp_pool: MCPServerPool = Depends(get_mcp_pool)
+) -> BatchStatusResponse:
+    """質問・レポート生成のバッチを受け付け、バックグラウンドで実行する（結果は GET /api/batch/{batch_id}）"""
+    settings = get_settings()
+
+    # キャッシュ済みの回答は他の利用者の認証情報で生成したものなので、
+    # バッチを登録する前に呼び出し元の認証情報でモデルを呼び出せることを確認する
+    if not await asyncio.to_thread(
+        verify_bedrock_credentials, request.aws_region, request.aws_bearer_token, request.bedrock_model_id
+    ):
+        raise AuthenticationError("Bedrock credentials were rejected")
+
+    concurrency = min(request.concurrency or settings.batch.concurrency, settings.batch.max_concurrency)
+
+    items = [
+        BatchItem(
+            item_id=item.id or str(position),
+            kind=item.kind,
+            question=item.question,
+            render_mode=item.render_mode
+        )
+        for position, item in enumerate(request.items)
+    ]
+    job = batch_store.create(items, concurrency=concurrency)
+
+    # Bedrockクライアントはバッチ内の全アイテムで共有する
+    bedrock_service = BedrockService(
+        aws_region=request.aws_region,
+        aws_bearer_token=request.aws_bearer_token,
+        bedrock_model_id=request.bedrock_model_id,
+        max_tokens=request.max_tokens
+    )
+    runner = BatchRunner(
+        settings,
+        bedrock_service,
+        result_store=result_store if settings.result_store.enabled else None,
+        artifact_store=artifact_store,
+        answer_cache=answer_cache if settings.answer_cache.enabled else None,
+        metadata_index=metadata_index if settings.metadata_index.enabled else None,
+        mcp_pool=mcp_pool if mcp_pool.running else None
+    )
+    batch_store.start(job, runner)
+
+    logger.info(
+        "Batch accepted",
+        extra={
+            "batch_id": job.batch_id,
+            "items": len(items),
+            "concurrency": concurrency,
+            "timestamp": request.timestamp
+        }
+    )
+    return _to_response(job, include_items=False)
+
+
+@router.get("/batch/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch(
+    batch_id: str,
+    batch_store: BatchStore = Depends(get_batch_store)
+) -> BatchStatusResponse:
+    """バッチの進捗とアイテムごとの結果"""
+    job = batch_store.get(batch_id)
+    if job is None:
+        raise JobNotFoundError(f"Batch {batch_id} not found")
+    return _to_response(job)
@@ -1,10 +1,24 @@
+import asyncio
 import time
 import uuid
-from fastapi import APIRouter
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Request
 from ..models.requests import ChatRequest
-from ..models.responses import ChatResponse
-from ..services.bedrock_service import BedrockService
+from ..models.responses import CacheInvalidationResponse, ChatResponse
+from ..services.answer_cache import AnswerCache
+from ..services.cache_warmer import QuestionLog
+from ..services.bedrock_service import BedrockService, verify_bedrock_credentials
+from ..services.mcp_pool import MCPServerPool
 from ..services.mcp_service import MCPService
+from ..services.metadata_index import MetadataIndex
+from ..services.result_store import ResultStore, StoredResult
+from ..dependencies import (
+    get_answer_cache,
+    get_mcp_pool,
+    get_metadata_index,
+    get_question_log,
+    get_result_store
+)
 from ..config.settings import get_settings
 from ..core.response_utils import create_error_message
 from ..core.logging import get_api_logger
@@ -13,17 +27,54 @@ router = APIRouter(prefix="/api", tags=["chat"])
 logger = get_api_logger()
 
 
+def _resolve_conversation_id(request: ChatRequest) -> str:
+    """会話IDを取得（未指定時は推測できないIDを新規発行。同じ質問で始めた別ユーザーと
+    結果ストアの名前空間を共有しないよう、メッセージ内容からは導出しない）"""
+    if request.conversation_id:
+        return request.conversation_id
+    return uuid.uuid4().hex
+
+
+def _cacheable_question(request: ChatRequest) -> Optional[str]:
+    """会話の文脈に依存しない単発の質問のみキャッシュ対象とする"""
+    if len(request.messages) != 1 or request.messages[0].role != "user":
+        return None
+    return request.messages[0].content
+
+
+def _restore_cached_results(
+    result_store: ResultStore,
+    conversation_id: str,
+    results: List[StoredResult]
+) -> Optional[str]:
+    """キャッシュした回答の根拠データをこの会話の結果として登録し、data_handleを発行"""
+    restored = [result_store.restore(conversation_id, stored) for stored in results]
+    result_ids = [stored.result_id for stored in restored if stored is not None]
+    if not result_ids:
+        return None
+    return result_store.create_handle(conversation_id, result_ids)
+
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest) -> ChatResponse:
+async def chat(
+    request: ChatRequest,
+    result_store: ResultStore = Depends(get_result_store),
+    metadata_index: MetadataIndex = Depends(get_metadata_index),
+    answer_cache: AnswerCache = Depends(get_answer_cache),
+    question_log: QuestionLog = Depends(get_question_log),
+    mcp_pool: MCPServerPool = Depends(get_mcp_pool)
+) -> ChatResponse:
     """チャット処理"""
     start_time = time.time()
     request_id = str(uuid.uuid4())
     message_count = len(request.messages)
+    conversation_id = _resolve_conversation_id(request)
 
     logger.info(
         "Chat request received",
         extra={
             "request_id": request_id,
+            "conversation_id": conversation_id,
             "message_count": message_count,
             "timestamp": request.timestamp,
             "aws_region": request.aws_region,
@@ -32,9 +83,47 @@ async def chat(request: ChatRequest) -> ChatResponse:
         }
     )
 
-    # MCPServiceをインスタンス化
     settings = get_settings()
-    mcp_service = MCPService(settings)
+
+    # 同じ（言い換え程度の）質問の回答がキャッシュにあればエージェントループを省略。
+    # キャッシュの回答は他の利用者（またはウォーマー）の認証情報で生成したものなので、
+    # 呼び出し元の認証情報でモデルを呼び出せることを確認してから参照する
+    question = _cacheable_question(request) if settings.answer_cache.enabled else None
+    if question:
+        question_log.record(question)
+    if question and await asyncio.to_thread(
+        verify_bedrock_credentials, request.aws_region, request.aws_bearer_token, request.bedrock_model_id
+    ):
+        lookup = answer_cache.lookup(question, metadata_index.versions())
+        if lookup.entry:
+            data_handle = None
+            if settings.result_store.enabled:
+                data_handle = _restore_cached_results(result_store, conversation_id, lookup.entry.results)
+            logger.info(
+                "Chat answered from cache",
+                extra={
+                    "request_id": request_id,
+                    "similarity": round(lookup.similarity, 3),
+                    "datasources": list(lookup.entry.datasource_versions),
+                    "duration": time.time() - start_time
+                }
+            )
+            return ChatResponse(
+                message=lookup.entry.answer,
+                timestamp=request.timestamp,
+                success=True,
+                cached=True,
+                data_handle=data_handle,
+                conversation_id=conversation_id
+            )
+
+    # MCPServiceをインスタンス化
+    mcp_service = MCPService(
+        settings,
+        result_store=result_store if settings.result_store.enabled else None,
+        metadata_index=metadata_index if settings.metadata_index.enabled else None,
+        mcp_pool=mcp_pool if mcp_pool.running else None
+    )
 
     try:
         # リクエストからBedrock設定を取得してBedrockServiceをインスタンス化
@@ -48,8 +137,9 @@ async def chat(request: ChatRequest) -> ChatResponse:
         # BedrockServiceを設定
         mcp_service.set_bedrock_service(bedrock_service)
 
-        # MCPサーバーに接続を試行
-        await mcp_service.connect()
+        # MCPサーバーへの接続を開始（常駐プールが使えない場合は最初のモデル呼び出しと並行して
+        # プロセスを起動し、ツール実行時に完了を待つ）
+        mcp_service.start_connect()
 
         # messagesリストをBedrockのフォーマットに変換
         bedrock_messages = [
@@ -58,7 +148,21 @@ async def chat(request: ChatRequest) -> ChatResponse:
         ]
 
         # mcp_serviceで全ての処理を実行
-        response_text = await mcp_service.process_chat_with_history(bedrock_messages)
+        response_text = await mcp_service.process_chat_with_history(
+            bedrock_messages,
+            conversation_id=conversation_id
+        )
+        # データソースを参照して得た回答のみキャッシュ（使用データソースの更新日時をバージョンとして保持し、
+        # ヒット時にもdata_handleを返せるよう根拠の結果も保持する）
+        if question and mcp_service.turn_datasource_luids:
+            versions = metadata_index.versions()
+            answer_cache.put(
+                question,
+                response_text,
+                {luid: versions.get(luid) for luid in mcp_service.turn_datasource_luids},
+                results=mcp_service.turn_results()
+            )
+
         duration = time.time() - start_time
 
         logger.info(
@@ -73,7 +177,9 @@ async def chat(request: ChatRequest) -> ChatResponse:
         return ChatResponse(
             message=response_text,
             timestamp=request.timestamp,
-            success=True
+            success=True,
+            data_handle=mcp_service.create_data_handle(),
+            conversation_id=conversation_id
         )
 
     except Exception as e:
@@ -89,8 +195,31 @@ async def chat(request: ChatRequest) -> ChatResponse:
         return ChatResponse(
             message=create_error_message("チャット処理"),
             timestamp=request.timestamp,
-            success=False
+            success=False,
+            conversation_id=conversation_id
         )
     finally:
         # MCPセッションを必ずクリーンアップ
-        await mcp_service.cleanup()
\ No newline at end of file
+        await mcp_service.cleanup()
+
+@router.delete("/answer_cache", response_model=CacheInvalidationResponse)
+async def invalidate_answer_cache(
+    datasource_luid: Optional[str] = None,
+    answer_cache: AnswerCache = Depends(get_answer_cache)
+) -> CacheInvalidationResponse:
+    """回答キャッシュを無効化（データソース指定時はそのデータソースを使用した回答のみ）"""
+    removed = answer_cache.invalidate(datasource_luid)
+    logger.info("Answer cache invalidated", extra={"datasource_luid": datasource_luid, "removed": removed})
+    return CacheInvalidationResponse(removed=removed, success=True)
+
+
+@router.get("/answer_cache/stats")
+async def get_answer_cache_stats(
+    request: Request,
+    answer_cache: AnswerCache = Depends(get_answer_cache)
+) -> dict:
+    """回答キャッシュのヒット率と、キャッシュウォーマーのカバレッジ・直近の実行結果"""
+    warmer = getattr(request.app.state, "cache_warmer", None)
+    if warmer is None:
+        return {"answer_cache": answer_cache.stats(), "warmer": None}
+    return {"answer_cache": answer_cache.stats(), "warmer": warmer.status()}
@@ -1,19 +1,72 @@
+import json
 import time
 import uuid
-from fastapi import APIRouter
-from ..models.requests import CreateReportRequest
-from ..models.responses import CreateReportResponse
+from typing import Any, AsyncIterator, Dict, Optional
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from ..models.requests import CreateReportRequest, EditReportRequest
+from ..models.responses import CreateReportResponse, EditReportResponse
+from ..services.artifact_store import ArtifactStore
 from ..services.bedrock_service import BedrockService
 from ..services.dashboard_service import DashboardService
+from ..services.job_queue import JobQueue
+from ..services.result_store import ResultStore, resolve_handle_for_prompt
+from ..config.settings import get_settings
+from ..dependencies import get_artifact_store, get_job_queue, get_result_store
 from ..core.response_utils import create_error_message
 from ..core.logging import get_api_logger
 
 router = APIRouter(prefix="/api", tags=["dashboard"])
 logger = get_api_logger()
 
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _resolve_analysis_data(data_handle: Optional[str], result_store: ResultStore) -> Optional[str]:
+    """data_handleから構造化データをプロンプト用に整形（見つからない場合はNone）"""
+    if not data_handle:
+        return None
+
+    settings = get_settings()
+    data = resolve_handle_for_prompt(
+        result_store,
+        data_handle,
+        max_rows=settings.dashboard.data_max_rows,
+        max_bytes=settings.dashboard.data_max_bytes
+    )
+    if data is None:
+        logger.info("Data handle not found or expired, using content only", extra={"data_handle": data_handle})
+    return data
+
+
+def _enqueue_job(
+    kind: str,
+    request: CreateReportRequest,
+    result_store: ResultStore,
+    job_queue: JobQueue
+) -> CreateReportResponse:
+    """生成をジョブキューに投入してjob_idを返す（分析データは投入時に解決して保存）"""
+    job = job_queue.enqueue(kind, {
+        "content": request.content,
+        "data": _resolve_analysis_data(request.data_handle, result_store),
+        "render_mode": request.render_mode,
+        "timestamp": request.timestamp,
+        "aws_region": request.aws_region,
+        "aws_bearer_token": request.aws_bearer_token,
+        "bedrock_model_id": request.bedrock_model_id,
+        "max_tokens": request.max_tokens
+    })
+    logger.info("Generation job queued", extra={"job_id": job.job_id, "kind": kind})
+    return CreateReportResponse(code="", timestamp=request.timestamp, success=True, job_id=job.job_id)
+
 
 @router.post("/create_report", response_model=CreateReportResponse)
-async def create_report(request: CreateReportRequest) -> CreateReportResponse:
+async def create_report(
+    request: CreateReportRequest,
+    result_store: ResultStore = Depends(get_result_store),
+    artifact_store: ArtifactStore = Depends(get_artifact_store),
+    job_queue: JobQueue = Depends(get_job_queue)
+) -> CreateReportResponse:
     """レポート作成"""
     start_time = time.time()
     request_id = str(uuid.uuid4())
@@ -24,10 +77,14 @@ async def create_report(request: CreateReportRequest) -> CreateReportResponse:
         extra={
             "request_id": request_id,
             "content_length": content_length,
+            "has_data_handle": bool(request.data_handle),
             "timestamp": request.timestamp
         }
     )
 
+    if request.job and get_settings().job_queue.enabled:
+        return _enqueue_job("dashboard", request, result_store, job_queue)
+
     try:
         # BedrockServiceをインスタンス化
         bedrock_service = BedrockService(
@@ -40,7 +97,10 @@ async def create_report(request: CreateReportRequest) -> CreateReportResponse:
         # DashboardServiceをインスタンス化
         dashboard_service = DashboardService(bedrock_service)
 
-        response_text = await dashboard_service.generate_dashboard_code(request.content)
+        data = _resolve_analysis_data(request.data_handle, result_store)
+        response_text = await dashboard_service.generate_dashboard_code(
+            request.content, data=data, render_mode=request.render_mode
+        )
         duration = time.time() - start_time
 
         logger.info(
@@ -55,7 +115,8 @@ async def create_report(request: CreateReportRequest) -> CreateReportResponse:
         return CreateReportResponse(
             code=response_text,
             timestamp=request.timestamp,
-            success=True
+            success=True,
+            artifact_id=artifact_store.put(response_text, kind="dashboard").artifact_id
         )
 
     except Exception as e:
@@ -76,7 +137,12 @@ async def create_report(request: CreateReportRequest) -> CreateReportResponse:
 
 
 @router.post("/create_chart", response_model=CreateReportResponse)
-async def create_chart(request: CreateReportRequest) -> CreateReportResponse:
+async def create_chart(
+    request: CreateReportRequest,
+    result_store: ResultStore = Depends(get_result_store),
+    artifact_store: ArtifactStore = Depends(get_artifact_store),
+    job_queue: JobQueue = Depends(get_job_queue)
+) -> CreateReportResponse:
     """チャート作成"""
     start_time = time.time()
     request_id = str(uuid.uuid4())
@@ -87,10 +153,14 @@ async def create_chart(request: CreateReportRequest) -> CreateReportResponse:
         extra={
             "request_id": request_id,
             "content_length": content_length,
+            "has_data_handle": bool(request.data_handle),
             "timestamp": request.timestamp
         }
     )
 
+    if request.job and get_settings().job_queue.enabled:
+        return _enqueue_job("chart", request, result_store, job_queue)
+
     try:
         # BedrockServiceをインスタンス化
         bedrock_service = BedrockService(
@@ -103,7 +173,10 @@ async def create_chart(request: CreateReportRequest) -> CreateReportResponse:
         # DashboardServiceをインスタンス化
         dashboard_service = DashboardService(bedrock_service)
 
-        response_text = await dashboard_service.generate_chart_code(request.content)
+        data = _resolve_analysis_data(request.data_handle, result_store)
+        response_text = await dashboard_service.generate_chart_code(
+            request.content, data=data, render_mode=request.render_mode
+        )
         duration = time.time() - start_time
 
         logger.info(
@@ -118,7 +191,8 @@ async def create_chart(request: CreateReportRequest) -> CreateReportResponse:
         return CreateReportResponse(
             code=response_text,
             timestamp=request.timestamp,
-            success=True
+            success=True,
+            artifact_id=artifact_store.put(response_text, kind="chart").artifact_id
         )
 
     except Exception as e:
@@ -135,4 +209,178 @@ async def create_chart(request: CreateReportRequest) -> CreateReportResponse:
             code=f"// {create_error_message('チャート作成')}",
             timestamp=request.timestamp,
             success=False
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/edit_report", response_model=EditReportResponse)
+async def edit_report(
+    request: EditReportRequest,
+    artifact_store: ArtifactStore = Depends(get_artifact_store)
+) -> EditReportResponse:
+    """生成済みダッシュボード・チャートの差分編集"""
+    start_time = time.time()
+    request_id = str(uuid.uuid4())
+
+    logger.info(
+        "Report edit request received",
+        extra={
+            "request_id": request_id,
+            "artifact_id": request.artifact_id,
+            "instruction_length": len(request.instruction),
+            "timestamp": request.timestamp
+        }
+    )
+
+    artifact = artifact_store.get(request.artifact_id)
+    if artifact is None:
+        logger.info("Artifact not found or expired", extra={"request_id": request_id, "artifact_id": request.artifact_id})
+        return EditReportResponse(
+            code="// 編集対象のレポートが見つかりません。レポートを再作成してください。",
+            timestamp=request.timestamp,
+            success=False
+        )
+
+    try:
+        bedrock_service = BedrockService(
+            aws_region=request.aws_region,
+            aws_bearer_token=request.aws_bearer_token,
+            bedrock_model_id=request.bedrock_model_id,
+            max_tokens=request.max_tokens
+        )
+        dashboard_service = DashboardService(bedrock_service)
+
+        result = await dashboard_service.edit_code(artifact.html, request.instruction)
+        edited = artifact_store.put(result.html, kind=artifact.kind, parent_id=artifact.artifact_id)
+        duration = time.time() - start_time
+
+        logger.info(
+            "Report edit completed successfully",
+            extra={
+                "request_id": request_id,
+                "duration": duration,
+                "mode": result.mode,
+                "changed_sections": result.changed_sections,
+                "response_length": len(result.html)
+            }
+        )
+
+        return EditReportResponse(
+            code=result.html,
+            timestamp=request.timestamp,
+            success=True,
+            artifact_id=edited.artifact_id,
+            mode=result.mode,
+            changed_sections=result.changed_sections
+        )
+
+    except Exception as e:
+        duration = time.time() - start_time
+        logger.error(
+            "Report edit failed",
+            extra={
+                "request_id": request_id,
+                "error": str(e),
+                "duration": duration
+            }
+        )
+        return EditReportResponse(
+            code=f"// {create_error_message('レポート編集')}",
+            timestamp=request.timestamp,
+            success=False
+        )
+
+
+def _sse(event: str, payload: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+async def _stream_generation(
+    kind: str,
+    request: CreateReportRequest,
+    result_store: ResultStore,
+    artifact_store: ArtifactStore
+) -> AsyncIterator[str]:
+    """生成中のHTML断片をSSEイベントとして送信し、最後に完全なHTMLを送信する"""
+    start_time = time.time()
+    request_id = str(uuid.uuid4())
+    operation = "チャート作成" if kind == "chart" else "レポート作成"
+
+    logger.info(
+        "Streaming generation request received",
+        extra={
+            "request_id": request_id,
+            "kind": kind,
+            "content_length": len(request.content),
+            "has_data_handle": bool(request.data_handle),
+            "timestamp": request.timestamp
+        }
+    )
+
+    try:
+        bedrock_service = BedrockService(
+            aws_region=request.aws_region,
+            aws_bearer_token=request.aws_bearer_token,
+            bedrock_model_id=request.bedrock_model_id,
+            max_tokens=request.max_tokens
+        )
+        dashboard_service = DashboardService(bedrock_service)
+
+        data = _resolve_analysis_data(request.data_handle, result_store)
+        async for event in dashboard_service.stream_code(kind, request.content, data=data):
+            if event["event"] == "fragment":
+                yield _sse("fragment", {"html": event["html"]})
+                continue
+
+            artifact = artifact_store.put(event["code"], kind=kind)
+            duration = time.time() - start_time
+            logger.info(
+                "Streaming generation completed successfully",
+                extra={"request_id": request_id, "duration": duration, "response_length": len(event["code"])}
+            )
+            yield _sse("complete", {
+                "code": event["code"],
+                "usage": event["usage"],
+                "artifact_id": artifact.artifact_id,
+                "timestamp": request.timestamp,
+                "success": True
+            })
+
+    except Exception as e:
+        duration = time.time() - start_time
+        logger.error(
+            "Streaming generation failed",
+            extra={"request_id": request_id, "error": str(e), "duration": duration}
+        )
+        yield _sse("error", {
+            "code": f"// {create_error_message(operation)}",
+            "timestamp": request.timestamp,
+            "success": False
+        })
+
+
+@router.post("/create_report/stream")
+async def create_report_stream(
+    request: CreateReportRequest,
+    result_store: ResultStore = Depends(get_result_store),
+    artifact_store: ArtifactStore = Depends(get_artifact_store)
+) -> StreamingResponse:
+    """レポート作成（SSEで生成中のHTML断片を逐次送信）"""
+    return StreamingResponse(
+        _stream_generation("dashboard", request, result_store, artifact_store),
+        media_type="text/event-stream",
+        headers=_SSE_HEADERS
+    )
+
+
+@router.post("/create_chart/stream")
+async def create_chart_stream(
+    request: CreateReportRequest,
+    result_store: ResultStore = Depends(get_result_store),
+    artifact_store: ArtifactStore = Depends(get_artifact_store)
+) -> StreamingResponse:
+    """チャート作成（SSEで生成中のHTML断片を逐次送信）"""
+    return StreamingResponse(
+        _stream_generation("chart", request, result_store, artifact_store),
+        media_type="text/event-stream",
+        headers=_SSE_HEADERS
+    )
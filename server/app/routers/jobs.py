@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends
+from ..models.responses import CreateReportResponse, JobStatusResponse
+from ..services.job_queue import Job, JobQueue
+from ..dependencies import get_job_queue
+from ..core.exceptions import JobNotFoundError, JobNotReadyError
+from ..core.response_utils import create_error_message
+
+router = APIRouter(prefix="/api", tags=["jobs"])
+
+_JOB_LABELS = {"dashboard": "レポート作成", "chart": "チャート作成"}
+
+
+def _get_job(job_queue: JobQueue, job_id: str) -> Job:
+    job = job_queue.get(job_id)
+    if job is None:
+        raise JobNotFoundError(f"Job {job_id} not found")
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(
+    job_id: str,
+    job_queue: JobQueue = Depends(get_job_queue)
+) -> JobStatusResponse:
+    """ダッシュボード・チャート生成ジョブの状態"""
+    job = _get_job(job_queue, job_id)
+    return JobStatusResponse(
+        job_id=job.job_id,
+        kind=job.kind,
+        status=job.status,
+        attempts=job.attempts,
+        artifact_id=job.artifact_id,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        success=True
+    )
+
+
+@router.get("/jobs/{job_id}/result", response_model=CreateReportResponse)
+async def get_job_result(
+    job_id: str,
+    job_queue: JobQueue = Depends(get_job_queue)
+) -> CreateReportResponse:
+    """完了したジョブの生成結果（/api/create_report・/api/create_chart と同じ形式）"""
+    job = _get_job(job_queue, job_id)
+    if not job.finished:
+        raise JobNotReadyError(f"Job {job_id} is {job.status}")
+    timestamp = job.payload.get("timestamp", "")
+    if job.status == "failed":
+        return CreateReportResponse(
+            code=f"// {create_error_message(_JOB_LABELS.get(job.kind, 'レポート作成'))}",
+            timestamp=timestamp,
+            success=False,
+            job_id=job.job_id
+        )
+    return CreateReportResponse(
+        code=job.code or "",
+        timestamp=timestamp,
+        success=True,
+        artifact_id=job.artifact_id,
+        job_id=job.job_id
+    )
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends
+from ..core.metrics import get_metrics
+from ..dependencies import get_mcp_pool
+from ..services.mcp_pool import MCPServerPool
+
+router = APIRouter(prefix="/api", tags=["metrics"])
+
+
+@router.get("/metrics")
+async def get_metrics_snapshot() -> dict:
+    """アプリ内メトリクスのスナップショットを返す"""
+    return get_metrics().snapshot()
+
+
+@router.get("/metrics/mcp_pool")
+async def get_mcp_pool_stats(mcp_pool: MCPServerPool = Depends(get_mcp_pool)) -> dict:
+    """常駐MCPサーバーのレプリカごとの状態（処理中の呼び出し数＝キュー深さ、メモリ使用量など）"""
+    return mcp_pool.stats()
@@ -0,0 +1,238 @@
+"""繰り返される分析質問の最終回答キャッシュ
+
+質問を正規化し、文字bigramのJaccard類似度で言い換え程度の重複を同一視する
+（内容語が一致するものに限る）。
+回答に使用したデータソースの更新日時（メタデータインデックスの updatedAt）を
+バージョンとして保持し、データソースが更新されたエントリは無効とする。
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional
+
+from .result_store import StoredResult
+from ..core.metrics import get_metrics
+
+_SHINGLE_SIZE = 2
+_WHITESPACE_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_CONTENT_CHAR_RE = re.compile(r"[゠-ヿ㐀-鿿]")
+_STOPWORDS = frozenset({
+    "a", "an", "the", "of", "for", "in", "on", "by", "to", "and", "me", "please",
+    "show", "tell", "give", "what", "is", "are", "was", "were",
+})
+
+
+def normalize_question(text: str) -> str:
+    """全角・半角と大文字小文字を揃え、空白と句読点を除去"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = "".join(char for char in text if not unicodedata.category(char).startswith("P"))
+    return _WHITESPACE_RE.sub("", text)
+
+
+def content_terms(text: str) -> FrozenSet[str]:
+    """内容語（英数字の単語・漢字・カタカナ）の集合
+
+    助詞や句読点の違いは許容し、「東」と「西」、「2023」と「2024」のように
+    内容語が異なる質問は文字列が似ていても別の質問として扱うために使う。
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    words = {word for word in _WORD_RE.findall(text) if word not in _STOPWORDS}
+    return frozenset(words | set(_CONTENT_CHAR_RE.findall(text)))
+
+
+def shingles(normalized: str, size: int = _SHINGLE_SIZE) -> FrozenSet[str]:
+    if len(normalized) <= size:
+        return frozenset([normalized]) if normalized else frozenset()
+    return frozenset(normalized[i:i + size] for i in range(len(normalized) - size + 1))
+
+
+def jaccard(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    normalized: str
+    shingles: FrozenSet[str]
+    content_terms: FrozenSet[str]
+    answer: str
+    # 回答に使用したデータソースLUID -> キャッシュ時点の更新日時
+    datasource_versions: Dict[str, Optional[str]]
+    # 回答の根拠となった結果（ヒット時に会話の結果ストアへ戻し、data_handleを発行する）
+    results: List[StoredResult] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    expires_at: float = 0.0
+    hits: int = 0
+
+
+@dataclass
+class CacheLookup:
+    entry: Optional[CachedAnswer]
+    similarity: float = 0.0
+    # "hit" / "miss" / "stale"（一致したがデータソース更新・期限切れで無効）
+    result: str = "miss"
+
+
+class AnswerCache:
+    """正規化した質問と使用データソースのバージョンをキーとする回答キャッシュ"""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600,
+        unversioned_ttl_seconds: float = 600,
+        similarity_threshold: float = 0.8,
+        max_result_bytes: int = 8 * 1024 * 1024
+    ):
+        self.max_entries = max_entries
+        self.max_result_bytes = max_result_bytes
+        self.ttl_seconds = ttl_seconds
+        self.unversioned_ttl_seconds = unversioned_ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._lookups = {"hit": 0, "miss": 0, "stale": 0}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def entries(self) -> List[CachedAnswer]:
+        with self._lock:
+            return list(self._entries.values())
+
+    def lookup(self, question: str, current_versions: Optional[Dict[str, Optional[str]]] = None) -> CacheLookup:
+        """最も類似した有効なエントリを返す
+
+        current_versions はメタデータインデックスが把握している最新の更新日時。
+        エントリのデータソースのいずれかが更新されていれば無効とする。
+        """
+        normalized = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            best, similarity = self._best_match(normalized, content_terms(question))
+            if best is None:
+                lookup = CacheLookup(None, similarity, "miss")
+            elif now >= best.expires_at or self._is_outdated(best, current_versions or {}):
+                del self._entries[best.normalized]
+                lookup = CacheLookup(None, similarity, "stale")
+            else:
+                best.hits += 1
+                self._entries.move_to_end(best.normalized)
+                lookup = CacheLookup(best, similarity, "hit")
+            self._lookups[lookup.result] += 1
+        get_metrics().increment("answer_cache.lookups", result=lookup.result)
+        get_metrics().set_gauge("answer_cache.hit_rate", round(self.hit_rate(), 3))
+        return lookup
+
+    def peek(self, question: str, current_versions: Optional[Dict[str, Optional[str]]] = None) -> Optional[CachedAnswer]:
+        """有効なエントリがあれば返す（ヒット率の集計やLRU順序に影響しない）"""
+        normalized = normalize_question(question)
+        with self._lock:
+            best, _ = self._best_match(normalized, content_terms(question))
+            if best is None or time.time() >= best.expires_at or self._is_outdated(best, current_versions or {}):
+                return None
+            return best
+
+    def hit_rate(self) -> float:
+        total = sum(self._lookups.values())
+        return self._lookups["hit"] / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self._lookups["hit"],
+                "misses": self._lookups["miss"],
+                "stale": self._lookups["stale"],
+                "hit_rate": round(self.hit_rate(), 3),
+            }
+
+    def put(
+        self,
+        question: str,
+        answer: str,
+        datasource_versions: Dict[str, Optional[str]],
+        results: Optional[List[StoredResult]] = None
+    ) -> Optional[CachedAnswer]:
+        """回答を保存する（根拠の結果が大きすぎる場合は、ヒット時にデータを返せないため保存しない）"""
+        results = list(results or [])
+        if sum(stored.nbytes for stored in results) > self.max_result_bytes:
+            get_metrics().increment("answer_cache.skipped", reason="result_too_large")
+            return None
+        normalized = normalize_question(question)
+        versioned = any(version is not None for version in datasource_versions.values())
+        ttl = self.ttl_seconds if versioned else self.unversioned_ttl_seconds
+        entry = CachedAnswer(
+            question=question,
+            normalized=normalized,
+            shingles=shingles(normalized),
+            content_terms=content_terms(question),
+            answer=answer,
+            datasource_versions=dict(datasource_versions),
+            results=results
+        )
+        entry.expires_at = entry.created_at + ttl
+        with self._lock:
+            self._entries.pop(normalized, None)
+            self._entries[normalized] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            get_metrics().set_gauge("answer_cache.entries", len(self._entries))
+        return entry
+
+    def invalidate(self, datasource_luid: Optional[str] = None) -> int:
+        """指定データソースを使用したエントリ（未指定時はすべて）を削除し、削除件数を返す"""
+        with self._lock:
+            if datasource_luid is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                keys = [
+                    key for key, entry in self._entries.items()
+                    if datasource_luid in entry.datasource_versions
+                ]
+                for key in keys:
+                    del self._entries[key]
+                removed = len(keys)
+            get_metrics().set_gauge("answer_cache.entries", len(self._entries))
+        get_metrics().increment("answer_cache.invalidations", removed)
+        return removed
+
+    def _best_match(self, normalized: str, query_terms: FrozenSet[str]):
+        exact = self._entries.get(normalized)
+        if exact is not None:
+            return exact, 1.0
+
+        query_shingles = shingles(normalized)
+        best, best_similarity = None, 0.0
+        for entry in self._entries.values():
+            if entry.content_terms != query_terms:
+                continue
+            # 長さが大きく異なる質問はJaccard係数が閾値に届かないため計算を省く
+            sizes = sorted((len(entry.shingles), len(query_shingles)))
+            if sizes[0] < self.similarity_threshold * sizes[1]:
+                continue
+            similarity = jaccard(query_shingles, entry.shingles)
+            if similarity > best_similarity:
+                best, best_similarity = entry, similarity
+        if best_similarity < self.similarity_threshold:
+            return None, best_similarity
+        return best, best_similarity
+
+    @staticmethod
+    def _is_outdated(entry: CachedAnswer, current_versions: Dict[str, Optional[str]]) -> bool:
+        if not current_versions:
+            # メタデータインデックス未構築時はTTLのみで判定
+            return False
+        return any(
+            current_versions.get(luid, "<removed>") != version
+            for luid, version in entry.datasource_versions.items()
+        )
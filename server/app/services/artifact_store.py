@@ -0,0 +1,292 @@
+"""生成済みダッシュボード・チャートHTMLをコンテンツハッシュで保持するストア
+
+HTMLはテンプレート由来の定型部分が大半を占めるため、テンプレートから作成した
+共有辞書付きのzlibで圧縮して保持する。メモリ上限を超えた分はディスクに退避し
+（ディスク未設定時は破棄）、ディスクも上限を超えたら古いものから削除する。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..config.prompts import get_chart_template_base, get_html_template_base
+from ..core.dashboard_renderer import render_chart_page, render_dashboard
+from ..core.dashboard_spec import DashboardSpec
+from ..core.logging import get_logger
+from ..core.metrics import get_metrics
+
+_ZDICT_MAX_BYTES = 32 * 1024
+_DISK_SUFFIX = ".z"
+
+# LLMが生成するChart.jsダッシュボードに頻出する断片（辞書は末尾ほど短い距離で参照されるため、外枠テンプレートより前に置く）
+_COMMON_SNIPPETS = [
+    "grid-template-columns: repeat(auto-fit, minmax(",
+    "display: flex; justify-content: space-between; align-items: center;",
+    "border-radius: 12px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);",
+    "font-size: 14px; color: #666; margin-bottom: 8px;",
+    "background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);",
+    "const ctx = document.getElementById('",
+    "').getContext('2d');",
+    "new Chart(ctx, {",
+    "type: 'bar',",
+    "type: 'line',",
+    "type: 'doughnut',",
+    "data: { labels: [",
+    "datasets: [{ label: '",
+    "backgroundColor: [",
+    "borderColor: '",
+    "borderWidth: 2,",
+    "options: { responsive: false, maintainAspectRatio: false,",
+    "plugins: { legend: { position: 'bottom' }, title: { display: true, text: '",
+    "scales: { y: { beginAtZero: true, ticks: { callback: function(value) { return value.toLocaleString(); } } } }",
+    '<div class="chart-container">',
+    '<div class="kpi-card">',
+    '<div class="kpi-value">',
+    '<div class="kpi-label">',
+    '<div class="insights">',
+    "<canvas id=\"",
+    '" width="560" height="320"></canvas>',
+]
+
+
+@lru_cache()
+def get_template_dictionary() -> bytes:
+    """テンプレートとテンプレート描画例から圧縮用の共有辞書を作成"""
+    sample_spec = DashboardSpec.model_validate({
+        "title": "データ分析ダッシュボード",
+        "subtitle": "期間",
+        "kpis": [{"label": "売上", "value": "1,000", "delta": "+10%", "trend": "up"}],
+        "charts": [{
+            "title": "売上推移",
+            "type": "line",
+            "labels": ["1月", "2月"],
+            "datasets": [{"label": "売上", "data": [1, 2]}],
+            "y_axis_label": "売上"
+        }],
+        "sections": [{"heading": "洞察", "paragraphs": ["要約"], "bullets": ["要点"]}]
+    })
+    parts = [
+        "\n".join(_COMMON_SNIPPETS),
+        render_chart_page(sample_spec.charts[0]),
+        render_dashboard(sample_spec),
+        get_chart_template_base(),
+        get_html_template_base(),
+    ]
+    dictionary = "\n".join(parts).encode("utf-8")
+    # zlibは辞書の末尾32KBのみ使うため、末尾（最も頻出する外枠テンプレート）を残す
+    return dictionary[-_ZDICT_MAX_BYTES:]
+
+
+@dataclass
+class Artifact:
+    artifact_id: str
+    kind: str  # "dashboard" / "chart"
+    html: str
+    parent_id: Optional[str] = None  # 編集元のアーティファクト
+    created_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class _Entry:
+    kind: str
+    parent_id: Optional[str]
+    created_at: float
+    blob: bytes
+    original_bytes: int
+
+
+def content_hash(html: str) -> str:
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()[:32]
+
+
+class ArtifactStore:
+    """コンテンツハッシュをIDとする圧縮アーティファクトストア（メモリ・ディスクの2段LRU）"""
+
+    def __init__(
+        self,
+        max_memory_bytes: int = 32 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+        compression_level: int = 6
+    ):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.compression_level = compression_level
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.logger = get_logger("artifact_store")
+
+        self._zdict = get_template_dictionary()
+        self._dict_id = hashlib.sha256(self._zdict).hexdigest()[:12]
+        self._memory: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._original_bytes = 0
+        self._compressed_bytes = 0
+        self._lock = threading.Lock()
+
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+
+    # 圧縮
+
+    def _compress(self, html: str) -> bytes:
+        compressor = zlib.compressobj(self.compression_level, zdict=self._zdict)
+        return compressor.compress(html.encode("utf-8")) + compressor.flush()
+
+    def _decompress(self, blob: bytes) -> str:
+        decompressor = zlib.decompressobj(zdict=self._zdict)
+        return (decompressor.decompress(blob) + decompressor.flush()).decode("utf-8")
+
+    # 公開API
+
+    def put(self, html: str, kind: str, parent_id: Optional[str] = None) -> Artifact:
+        """HTMLを保存してアーティファクトを返す（同一内容は同じIDに重複排除）"""
+        artifact_id = content_hash(html)
+        with self._lock:
+            existing = self._memory.get(artifact_id)
+            if existing is not None:
+                self._memory.move_to_end(artifact_id)
+                get_metrics().increment("artifact_store.dedup_hits")
+                return Artifact(artifact_id, existing.kind, html, existing.parent_id, existing.created_at)
+
+            entry = _Entry(kind, parent_id, time.time(), self._compress(html), len(html.encode("utf-8")))
+            self._memory[artifact_id] = entry
+            self._memory_bytes += len(entry.blob)
+            self._original_bytes += entry.original_bytes
+            self._compressed_bytes += len(entry.blob)
+            self._enforce_memory_limit()
+            self._update_gauges()
+        return Artifact(artifact_id, kind, html, parent_id, entry.created_at)
+
+    def get(self, artifact_id: str) -> Optional[Artifact]:
+        entry = self._get_entry(artifact_id)
+        if entry is None:
+            return None
+        return Artifact(artifact_id, entry.kind, self._decompress(entry.blob), entry.parent_id, entry.created_at)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "original_bytes": self._original_bytes,
+                "compressed_bytes": self._compressed_bytes,
+                "compression_ratio": self._compression_ratio(),
+                "dictionary_bytes": len(self._zdict),
+            }
+
+    def __contains__(self, artifact_id: str) -> bool:
+        """アーティファクトが保存されているか（展開・ディスク読み込みを行わない）"""
+        with self._lock:
+            return artifact_id in self._memory or artifact_id in self._disk
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._memory.keys() | self._disk.keys())
+
+    # 内部処理
+
+    def _get_entry(self, artifact_id: str) -> Optional[_Entry]:
+        metrics = get_metrics()
+        with self._lock:
+            entry = self._memory.get(artifact_id)
+            if entry is not None:
+                self._memory.move_to_end(artifact_id)
+                metrics.increment("artifact_store.hits", tier="memory")
+                return entry
+
+            entry = self._read_disk(artifact_id) if artifact_id in self._disk else None
+            if entry is None:
+                metrics.increment("artifact_store.misses")
+                return None
+
+            # ディスクから読み込んだものはメモリに戻す
+            metrics.increment("artifact_store.hits", tier="disk")
+            self._disk.move_to_end(artifact_id)
+            self._memory[artifact_id] = entry
+            self._memory_bytes += len(entry.blob)
+            self._enforce_memory_limit()
+            self._update_gauges()
+            return entry
+
+    def _compression_ratio(self) -> float:
+        return self._original_bytes / self._compressed_bytes if self._compressed_bytes else 0.0
+
+    def _update_gauges(self) -> None:
+        metrics = get_metrics()
+        metrics.set_gauge("artifact_store.memory_bytes", self._memory_bytes)
+        metrics.set_gauge("artifact_store.disk_bytes", self._disk_bytes)
+        metrics.set_gauge("artifact_store.compression_ratio", round(self._compression_ratio(), 3))
+
+    def _enforce_memory_limit(self) -> None:
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            artifact_id, entry = self._memory.popitem(last=False)
+            self._memory_bytes -= len(entry.blob)
+            get_metrics().increment("artifact_store.evictions", tier="memory")
+            if self.disk_dir is not None and artifact_id not in self._disk:
+                self._write_disk(artifact_id, entry)
+
+    def _disk_path(self, artifact_id: str) -> Path:
+        return self.disk_dir / f"{artifact_id}{_DISK_SUFFIX}"
+
+    def _write_disk(self, artifact_id: str, entry: _Entry) -> None:
+        header = json.dumps({
+            "kind": entry.kind,
+            "parent_id": entry.parent_id,
+            "created_at": entry.created_at,
+            "original_bytes": entry.original_bytes,
+            "dict_id": self._dict_id,
+        }).encode("utf-8")
+        path = self._disk_path(artifact_id)
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            tmp_path.write_bytes(header + b"\n" + entry.blob)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.logger.warning("Failed to spill artifact to disk", extra={"artifact_id": artifact_id, "error": str(e)})
+            return
+
+        size = path.stat().st_size
+        self._disk[artifact_id] = size
+        self._disk_bytes += size
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            evicted_id, evicted_size = self._disk.popitem(last=False)
+            self._disk_bytes -= evicted_size
+            self._disk_path(evicted_id).unlink(missing_ok=True)
+            get_metrics().increment("artifact_store.evictions", tier="disk")
+
+    def _read_disk(self, artifact_id: str) -> Optional[_Entry]:
+        try:
+            header, blob = self._disk_path(artifact_id).read_bytes().split(b"\n", 1)
+            meta = json.loads(header)
+        except (OSError, ValueError):
+            self._forget_disk(artifact_id)
+            return None
+        if meta.get("dict_id") != self._dict_id:
+            # テンプレート変更で辞書が変わった古いファイルは復元できない
+            self._forget_disk(artifact_id)
+            return None
+        return _Entry(meta["kind"], meta.get("parent_id"), meta["created_at"], blob, meta["original_bytes"])
+
+    def _forget_disk(self, artifact_id: str) -> None:
+        self._disk_bytes -= self._disk.pop(artifact_id, 0)
+        self._disk_path(artifact_id).unlink(missing_ok=True)
+
+    def _load_disk_index(self) -> None:
+        """起動時に既存のディスクファイルを古い順にインデックス化"""
+        files = sorted(self.disk_dir.glob(f"*{_DISK_SUFFIX}"), key=lambda path: path.stat().st_mtime)
+        for path in files:
+            size = path.stat().st_size
+            self._disk[path.stem] = size
+            self._disk_bytes += size
@@ -1,32 +1,88 @@
 import datetime
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
 import jwt
 from ..config.settings import Settings
+from ..core.logging import get_auth_logger
+
+DEFAULT_SCOPES: Tuple[str, ...] = (
+    "tableau:views:embed",
+    "tableau:views:embed_authoring",
+    "tableau:insights:embed"
+)
 
 
 class AuthService:
     def __init__(self, settings: Settings):
         self.settings = settings
+        self.logger = get_auth_logger()
+        # (username, scopes) -> (token, exp[unix秒])
+        self._token_cache: "OrderedDict[Tuple[str, Tuple[str, ...]], Tuple[str, int]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
 
-    def generate_jwt_token(self, username: str, token_expiry_minutes: int = 1) -> str:
+    def generate_jwt_token(
+        self,
+        username: str,
+        token_expiry_minutes: int = 1,
+        scopes: Optional[Iterable[str]] = None
+    ) -> str:
         """Tableau用JWTトークンを生成"""
-        scopes = [
-            "tableau:views:embed",
-            "tableau:views:embed_authoring",
-            "tableau:insights:embed"
-        ]
+        token, _ = self._issue_token(username, token_expiry_minutes, self._normalize_scopes(scopes))
+        return token
+
+    def get_jwt_token(self, username: str, scopes: Optional[Iterable[str]] = None) -> Tuple[str, int]:
+        """キャッシュ済みのJWTトークンを取得（期限が近い場合は再発行）
+
+        Returns:
+            (token, exp) のタプル。exp はUNIX秒
+        """
+        normalized_scopes = self._normalize_scopes(scopes)
+        cache_key = (username, normalized_scopes)
+        margin = self.settings.jwt.refresh_margin_seconds
+
+        with self._cache_lock:
+            cached = self._token_cache.get(cache_key)
+            if cached and time.time() < cached[1] - margin:
+                self._token_cache.move_to_end(cache_key)
+                return cached
+
+        token, exp = self._issue_token(
+            username,
+            self.settings.jwt.token_expiry_minutes,
+            normalized_scopes
+        )
 
-        now = datetime.datetime.now(datetime.timezone.utc)
-        exp = now + datetime.timedelta(minutes=token_expiry_minutes)
+        with self._cache_lock:
+            self._token_cache[cache_key] = (token, exp)
+            self._token_cache.move_to_end(cache_key)
+            while len(self._token_cache) > self.settings.jwt.cache_max_entries:
+                self._token_cache.popitem(last=False)
+
+        self.logger.debug("Issued new JWT token", extra={"username": username, "scopes": list(normalized_scopes)})
+        return token, exp
+
+    def clear_token_cache(self) -> None:
+        """トークンキャッシュを破棄"""
+        with self._cache_lock:
+            self._token_cache.clear()
+
+    def _issue_token(self, username: str, token_expiry_minutes: int, scopes: Tuple[str, ...]) -> Tuple[str, int]:
+        """JWTに署名し、トークンとexpクレームを返す"""
+        now = int(time.time())
+        exp = now + token_expiry_minutes * 60
 
         payload = {
             "iss": self.settings.tableau.connected_app_client_id,
-            "exp": exp,
-            "nbf": now,
+            "exp": datetime.datetime.fromtimestamp(exp, datetime.timezone.utc),
+            "nbf": datetime.datetime.fromtimestamp(now, datetime.timezone.utc),
             "jti": str(uuid.uuid4()),
             "aud": "tableau",
             "sub": username,
-            "scp": scopes,
+            "scp": list(scopes),
         }
 
         token = jwt.encode(
@@ -39,7 +95,24 @@ class AuthService:
             },
         )
 
-        return token
+        return token, exp
+
+    @staticmethod
+    def _normalize_scopes(scopes: Optional[Iterable[str]]) -> Tuple[str, ...]:
+        """スコープを検証し、キャッシュキー用に正規化"""
+        if scopes is None:
+            # 明示的に既定スコープを指定した場合と同じキャッシュキーになるよう整列する
+            return tuple(sorted(DEFAULT_SCOPES))
+
+        normalized = tuple(sorted(set(scopes)))
+        if not normalized:
+            raise ValueError("At least one scope is required")
+
+        unsupported = [scope for scope in normalized if scope not in DEFAULT_SCOPES]
+        if unsupported:
+            raise ValueError(f"Unsupported scopes: {', '.join(unsupported)}")
+
+        return normalized
 
     def validate_tableau_credentials(self) -> bool:
         """Tableau Connected App認証情報の検証"""
@@ -47,4 +120,4 @@ class AuthService:
             self.settings.tableau.connected_app_client_id,
             self.settings.tableau.connected_app_client_secret,
             self.settings.tableau.connected_app_secret_value
-        ])
\ No newline at end of file
+        ])
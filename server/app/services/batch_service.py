@@ -0,0 +1,248 @@
+"""複数の質問・レポート生成をまとめて実行するバッチ処理
+
+各ワーカーは最初のキャッシュミスで専用のMCPセッションを1つ開いてバッチ終了まで使い回し、Bedrockクライアント・
+回答キャッシュ・結果ストア・アーティファクトストアはバッチ全体で共有する。MCPのstdio
+セッションは開始したタスク内で閉じる必要があるため、接続から切断までをワーカータスク内で行う。
+"""
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from .answer_cache import AnswerCache
+from .artifact_store import ArtifactStore
+from .dashboard_service import DashboardService
+from .mcp_service import MCPService
+from .metadata_index import MetadataIndex
+from .result_store import ResultStore, resolve_handle_for_prompt
+from ..config.settings import Settings
+from ..core.logging import get_logger
+from ..core.metrics import get_metrics
+
+ITEM_KINDS = ("answer", "report", "chart")
+
+
+@dataclass
+class BatchItem:
+    item_id: str
+    kind: str  # "answer"（回答のみ）/ "report"（回答からダッシュボード）/ "chart"（回答からチャート）
+    question: str
+    render_mode: Optional[str] = None
+    status: str = "pending"  # pending / running / succeeded / failed
+    message: Optional[str] = None
+    artifact_id: Optional[str] = None
+    cached: bool = False
+    error: Optional[str] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+@dataclass
+class BatchJob:
+    batch_id: str
+    items: List[BatchItem]
+    concurrency: int
+    status: str = "queued"  # queued / running / completed
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def count(self, status: str) -> int:
+        return sum(1 for item in self.items if item.status == status)
+
+    @property
+    def items_per_minute(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        done = self.count("succeeded") + self.count("failed")
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return done * 60 / elapsed if elapsed > 0 else None
+
+
+class BatchStore:
+    """実行中・完了済みのバッチを保持（上限を超えたら完了済みの古いものから削除）"""
+
+    def __init__(self, max_batches: int = 50):
+        self.max_batches = max_batches
+        self._jobs: "OrderedDict[str, BatchJob]" = OrderedDict()
+        # 実行タスクがGCされないよう参照を保持する
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+    def create(self, items: List[BatchItem], concurrency: int) -> BatchJob:
+        job = BatchJob(batch_id=uuid.uuid4().hex, items=items, concurrency=concurrency)
+        with self._lock:
+            self._jobs[job.batch_id] = job
+            finished = [batch_id for batch_id, stored in self._jobs.items() if stored.status == "completed"]
+            while len(self._jobs) > self.max_batches and finished:
+                self._jobs.pop(finished.pop(0), None)
+        return job
+
+    def get(self, batch_id: str) -> Optional[BatchJob]:
+        with self._lock:
+            return self._jobs.get(batch_id)
+
+    def start(self, job: BatchJob, runner: "BatchRunner") -> None:
+        task = asyncio.create_task(runner.run(job))
+        self._tasks[job.batch_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.batch_id, None))
+
+
+class _WorkerSession:
+    """ワーカー専用のMCPセッション（キャッシュヒットのみのワーカーは接続しないよう、初回利用時に接続する）"""
+
+    def __init__(self, factory: Callable[[], Any], bedrock_service: Any):
+        self._factory = factory
+        self._bedrock_service = bedrock_service
+        self._service: Optional[Any] = None
+
+    async def get(self) -> Any:
+        if self._service is None:
+            self._service = self._factory()
+            self._service.set_bedrock_service(self._bedrock_service)
+            await self._service.connect()
+        return self._service
+
+    async def cleanup(self) -> None:
+        if self._service is not None:
+            await self._service.cleanup()
+
+
+class BatchRunner:
+    """バッチの各アイテムを同時実行数を制限したワーカープールで処理する"""
+
+    def __init__(
+        self,
+        settings: Settings,
+        bedrock_service: Any,
+        result_store: Optional[ResultStore],
+        artifact_store: ArtifactStore,
+        answer_cache: Optional[AnswerCache] = None,
+        metadata_index: Optional[MetadataIndex] = None,
+        mcp_factory: Optional[Callable[[], Any]] = None,
+        mcp_pool: Optional[Any] = None
+    ):
+        self.settings = settings
+        self.bedrock_service = bedrock_service
+        self.result_store = result_store
+        self.artifact_store = artifact_store
+        self.answer_cache = answer_cache
+        self.metadata_index = metadata_index
+        self.mcp_factory = mcp_factory or (
+            lambda: MCPService(settings, result_store=result_store, metadata_index=metadata_index, mcp_pool=mcp_pool)
+        )
+        self.dashboard_service = DashboardService(bedrock_service, settings)
+        self.logger = get_logger("batch")
+
+    async def run(self, job: BatchJob) -> BatchJob:
+        job.status = "running"
+        job.started_at = time.time()
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in job.items:
+            queue.put_nowait(item)
+
+        workers = min(max(1, job.concurrency), len(job.items))
+        await asyncio.gather(*(self._worker(job, queue) for _ in range(workers)))
+
+        job.status = "completed"
+        job.finished_at = time.time()
+        metrics = get_metrics()
+        metrics.increment("batch.items", job.count("succeeded"), status="succeeded")
+        metrics.increment("batch.items", job.count("failed"), status="failed")
+        if job.items_per_minute is not None:
+            metrics.observe("batch.items_per_minute", job.items_per_minute)
+        self.logger.info(
+            "Batch completed",
+            extra={
+                "batch_id": job.batch_id,
+                "items": len(job.items),
+                "failed": job.count("failed"),
+                "concurrency": workers,
+                "duration": job.finished_at - job.started_at,
+                "items_per_minute": job.items_per_minute
+            }
+        )
+        return job
+
+    async def _worker(self, job: BatchJob, queue: asyncio.Queue) -> None:
+        session = _WorkerSession(self.mcp_factory, self.bedrock_service)
+        try:
+            while True:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await self._process(job, item, session)
+        finally:
+            await session.cleanup()
+
+    async def _process(self, job: BatchJob, item: BatchItem, session: _WorkerSession) -> None:
+        item.status = "running"
+        item.started_at = time.time()
+        try:
+            data_handle = await self._answer(job, item, session)
+            if item.kind in ("report", "chart"):
+                await self._generate_artifact(item, data_handle)
+            item.status = "succeeded"
+        except Exception as e:
+            item.status = "failed"
+            item.error = str(e)
+            self.logger.warning(
+                "Batch item failed",
+                extra={"batch_id": job.batch_id, "item_id": item.item_id, "error": str(e)}
+            )
+        finally:
+            item.finished_at = time.time()
+
+    async def _answer(self, job: BatchJob, item: BatchItem, session: _WorkerSession) -> Optional[str]:
+        """質問に回答し、レポート生成用のデータハンドルを返す（キャッシュヒット時はNone）"""
+        versions = self.metadata_index.versions() if self.metadata_index else {}
+        if self.answer_cache:
+            lookup = self.answer_cache.lookup(item.question, versions)
+            if lookup.entry:
+                item.message = lookup.entry.answer
+                item.cached = True
+                return None
+
+        mcp_service = await session.get()
+        item.message = await mcp_service.process_chat_with_history(
+            [{"role": "user", "content": item.question}],
+            conversation_id=f"batch-{job.batch_id}-{item.item_id}"
+        )
+        if self.answer_cache and mcp_service.turn_datasource_luids:
+            versions = self.metadata_index.versions() if self.metadata_index else {}
+            self.answer_cache.put(
+                item.question,
+                item.message,
+                {luid: versions.get(luid) for luid in mcp_service.turn_datasource_luids}
+            )
+        return mcp_service.create_data_handle()
+
+    async def _generate_artifact(self, item: BatchItem, data_handle: Optional[str]) -> None:
+        data = resolve_handle_for_prompt(
+            self.result_store,
+            data_handle,
+            max_rows=self.settings.dashboard.data_max_rows,
+            max_bytes=self.settings.dashboard.data_max_bytes
+        )
+
+        if item.kind == "chart":
+            code = await self.dashboard_service.generate_chart_code(
+                item.message, data=data, render_mode=item.render_mode
+            )
+            kind = "chart"
+        else:
+            code = await self.dashboard_service.generate_dashboard_code(
+                item.message, data=data, render_mode=item.render_mode
+            )
+            kind = "dashboard"
+        item.artifact_id = self.artifact_store.put(code, kind=kind).artifact_id
@@ -0,0 +1,129 @@
+"""Bedrock呼び出しのリージョン間ヘッジ（テールレイテンシ対策）"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Tuple
+
+from ..core.logging import get_bedrock_logger
+from ..core.metrics import Histogram, get_metrics
+
+# ヘッジ呼び出し用の共有スレッドプール（負けた呼び出しもここで完了まで走る）
+_EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix="bedrock-hedge")
+
+_policies: Dict[Tuple[str, str], "HedgePolicy"] = {}
+_policies_lock = threading.Lock()
+
+
+class HedgePolicy:
+    """ヘッジ送信の待ち時間と送信予算を管理する
+
+    待ち時間はプライマリ呼び出しの直近レイテンシのパーセンタイルから算出する。
+    予算はトークンバケット方式で、プライマリ1件ごとに max_ratio 分が貯まり、
+    ヘッジ1件で1消費する（上限 burst）。これにより総トラフィックは
+    最大でも (1 + max_ratio) 倍に抑えられる。
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95,
+        min_delay: float = 1.0,
+        max_delay: float = 30.0,
+        max_ratio: float = 0.1,
+        burst: float = 2.0,
+        min_samples: int = 20
+    ):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self.min_samples = min_samples
+        self._latencies = Histogram(window=512)
+        self._budget = 0.0
+        self._lock = threading.Lock()
+
+    def hedge_delay(self) -> float:
+        """ヘッジを送るまでの待ち時間（秒）"""
+        with self._lock:
+            if self._latencies.count < self.min_samples:
+                return self.max_delay
+            observed = self._latencies.percentile(self.percentile)
+        return min(max(observed, self.min_delay), self.max_delay)
+
+    def record_latency(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.observe(latency)
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._budget = min(self._budget + self.max_ratio, self.burst)
+
+    def try_acquire_hedge(self) -> bool:
+        with self._lock:
+            if self._budget < 1.0:
+                return False
+            self._budget -= 1.0
+            return True
+
+
+def get_hedge_policy(region: str, model_id: str, **options: Any) -> HedgePolicy:
+    """リージョン・モデル単位で共有されるHedgePolicyを取得"""
+    key = (region, model_id)
+    with _policies_lock:
+        policy = _policies.get(key)
+        if policy is None:
+            policy = _policies[key] = HedgePolicy(**options)
+        return policy
+
+
+def hedged_call(
+    primary: Callable[[], Any],
+    fallback: Callable[[], Any],
+    policy: HedgePolicy
+) -> Any:
+    """プライマリ呼び出しが遅延した場合にフォールバックへ同一リクエストを送り、先着を返す
+
+    実行中のboto3呼び出しは中断できないため、負けた側は未開始ならキャンセルし、
+    開始済みなら結果を破棄する。
+    """
+    logger = get_bedrock_logger()
+    metrics = get_metrics()
+    start_time = time.monotonic()
+    policy.record_request()
+
+    primary_future = _EXECUTOR.submit(primary)
+
+    def _record_primary(future: Future) -> None:
+        if not future.cancelled() and future.exception() is None:
+            policy.record_latency(time.monotonic() - start_time)
+
+    primary_future.add_done_callback(_record_primary)
+
+    delay = policy.hedge_delay()
+    done, _ = wait([primary_future], timeout=delay)
+    if done or not policy.try_acquire_hedge():
+        if not done:
+            metrics.increment("bedrock.hedge.budget_exhausted")
+        return primary_future.result()
+
+    logger.info("Primary Bedrock call exceeded hedge delay, sending hedge request", extra={"delay": delay})
+    metrics.increment("bedrock.hedge.sent")
+    fallback_future = _EXECUTOR.submit(fallback)
+    labels = {primary_future: "primary", fallback_future: "fallback"}
+
+    pending = set(labels)
+    last_error: BaseException | None = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            error = future.exception()
+            if error is not None:
+                last_error = error
+                continue
+
+            for loser in pending:
+                loser.cancel()
+            metrics.increment("bedrock.hedge.won", winner=labels[future])
+            return future.result()
+
+    raise last_error
@@ -1,9 +1,75 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
+from collections import OrderedDict
+import hashlib
+import threading
 import time
 import os
 import boto3
+from botocore.exceptions import ClientError
 
+from .bedrock_hedging import get_hedge_policy, hedged_call
+from ..config.settings import get_settings
 from ..core.logging import get_bedrock_logger
+from ..core.metrics import get_metrics
+
+
+# 認証情報・権限の不備を示すエラーコード（これ以外のCountTokensのエラーはConverseで再確認する）
+_AUTH_ERROR_CODES = {
+    "AccessDeniedException",
+    "UnrecognizedClientException",
+    "ExpiredTokenException",
+    "InvalidSignatureException",
+}
+_MAX_VERIFIED_CREDENTIALS = 1024
+
+# 検証済み認証情報のフィンガープリント -> 検証時刻
+_verified_credentials: "OrderedDict[str, float]" = OrderedDict()
+_verified_lock = threading.Lock()
+
+# boto3はクライアント生成時に環境変数のBearer Tokenを読み込むため、環境変数の設定から
+# クライアント生成までを直列化する（並行リクエストが他の呼び出し元のトークンで生成しないように）
+_client_lock = threading.Lock()
+
+
+def _credential_fingerprint(aws_region: str, aws_bearer_token: str, bedrock_model_id: str) -> str:
+    return hashlib.sha256(f"{aws_region}\0{bedrock_model_id}\0{aws_bearer_token}".encode("utf-8")).hexdigest()
+
+
+def remember_verified_credentials(aws_region: str, aws_bearer_token: str, bedrock_model_id: str) -> None:
+    """モデル呼び出しに成功した認証情報を検証済みとして記録"""
+    _remember_verified(_credential_fingerprint(aws_region, aws_bearer_token, bedrock_model_id))
+
+
+def _remember_verified(key: str) -> None:
+    with _verified_lock:
+        _verified_credentials[key] = time.time()
+        _verified_credentials.move_to_end(key)
+        while len(_verified_credentials) > _MAX_VERIFIED_CREDENTIALS:
+            _verified_credentials.popitem(last=False)
+
+
+def verify_bedrock_credentials(aws_region: str, aws_bearer_token: str, bedrock_model_id: str) -> bool:
+    """認証情報で指定モデルを呼び出せるか確認する（同期処理。成功結果はTTLの間再利用）"""
+    if not aws_bearer_token:
+        return False
+    key = _credential_fingerprint(aws_region, aws_bearer_token, bedrock_model_id)
+    ttl = get_settings().bedrock.credential_check_ttl_seconds
+    with _verified_lock:
+        verified_at = _verified_credentials.get(key)
+        if verified_at is not None and time.time() - verified_at < ttl:
+            return True
+
+    service = BedrockService(
+        aws_region=aws_region,
+        aws_bearer_token=aws_bearer_token,
+        bedrock_model_id=bedrock_model_id,
+        max_tokens=1
+    )
+    accepted = service.check_credentials()
+    get_metrics().increment("bedrock.credential_checks", result="accepted" if accepted else "rejected")
+    if accepted:
+        _remember_verified(key)
+    return accepted
 
 
 class BedrockService:
@@ -18,27 +84,74 @@ class BedrockService:
         self.bedrock_model_id = bedrock_model_id
         self.max_tokens = max_tokens
         self.logger = get_bedrock_logger()
+        self._credential_key = _credential_fingerprint(aws_region, aws_bearer_token, bedrock_model_id)
 
-        # Bearer Tokenを環境変数に設定（boto3が自動読み込み）
-        os.environ['AWS_BEARER_TOKEN_BEDROCK'] = aws_bearer_token
+        self.bedrock_settings = get_settings().bedrock
+        fallback_region = self.bedrock_settings.hedge_fallback_region
+        self.fallback_client = None
 
-        # boto3クライアント初期化
-        self.client = boto3.client(
-            service_name="bedrock-runtime",
-            region_name=aws_region
-        )
+        with _client_lock:
+            # Bearer Tokenを環境変数に設定（boto3がクライアント生成時に読み込む）
+            os.environ['AWS_BEARER_TOKEN_BEDROCK'] = aws_bearer_token
+
+            # boto3クライアント初期化
+            self.client = boto3.client(
+                service_name="bedrock-runtime",
+                region_name=aws_region
+            )
+
+            # ヘッジ有効時はフォールバックリージョンのクライアントも用意
+            if self.bedrock_settings.hedge_enabled and fallback_region and fallback_region != aws_region:
+                self.fallback_client = boto3.client(
+                    service_name="bedrock-runtime",
+                    region_name=fallback_region
+                )
+
+    def check_credentials(self) -> bool:
+        """課金の発生しないCountTokensでモデルへのアクセス権を確認する
+
+        CountTokens非対応のモデル・リージョンの場合は最大1トークンのConverseで確認する。
+        """
+        probe = [{"role": "user", "content": [{"text": "ping"}]}]
+        try:
+            self.client.count_tokens(modelId=self.bedrock_model_id, input={"converse": {"messages": probe}})
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in _AUTH_ERROR_CODES:
+                self.logger.info("Bedrock credentials rejected", extra={"error": str(e)})
+                return False
+        except Exception as e:
+            self.logger.info("Bedrock credential check failed", extra={"error": str(e)})
+            return False
+
+        try:
+            self.client.converse(modelId=self.bedrock_model_id, messages=probe, inferenceConfig={"maxTokens": 1})
+            return True
+        except Exception as e:
+            self.logger.info("Bedrock credentials rejected", extra={"error": str(e)})
+            return False
 
     def create_message(
         self,
         messages: List[Dict[str, Any]],
         tools: List[Dict[str, Any]] = None,
-        system: str = None
+        system: str = None,
+        model_id: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        tier: str = "default"
     ):
-        """Anthropic Bedrock API呼び出し（boto3 Converse API経由）"""
+        """Anthropic Bedrock API呼び出し（boto3 Converse API経由）
+
+        model_id / max_tokens を指定した場合はインスタンスの設定より優先する。
+        tier はテレメトリ用のラベル（例: planning / final）。
+        """
         start_time = time.time()
         message_count = len(messages)
         has_tools = bool(tools)
         has_system = bool(system)
+        model_id = model_id or self.bedrock_model_id
+        max_tokens = max_tokens or self.max_tokens
+        metrics = get_metrics()
 
         self.logger.info(
             "Creating Bedrock message",
@@ -46,33 +159,16 @@ class BedrockService:
                 "message_count": message_count,
                 "has_tools": has_tools,
                 "has_system": has_system,
-                "model": self.bedrock_model_id,
-                "max_tokens": self.max_tokens
+                "model": model_id,
+                "max_tokens": max_tokens,
+                "tier": tier
             }
         )
 
-        # メッセージフォーマット変換
-        bedrock_messages = self._convert_messages_to_bedrock_format(messages)
-
-        params = {
-            "modelId": self.bedrock_model_id,
-            "messages": bedrock_messages,
-            "inferenceConfig": {
-                "maxTokens": self.max_tokens
-            }
-        }
-
-        if system:
-            params["system"] = [{"text": system}]
-
-        if tools:
-            params["toolConfig"] = {
-                "tools": self._convert_tools_to_bedrock_format(tools)
-            }
-            self.logger.debug(f"Using {len(tools)} tools", extra={"tool_count": len(tools)})
+        params = self._build_params(messages, tools, system, model_id, max_tokens)
 
         try:
-            response = self.client.converse(**params)
+            response = self._converse(params)
             duration = time.time() - start_time
 
             # レスポンス情報をログ
@@ -81,10 +177,18 @@ class BedrockService:
                 "duration": duration,
                 "input_tokens": usage.get('inputTokens', 0),
                 "output_tokens": usage.get('outputTokens', 0),
-                "stop_reason": response.get('stopReason', 'unknown')
+                "stop_reason": response.get('stopReason', 'unknown'),
+                "tier": tier
             }
 
             self.logger.info("Bedrock API call completed", extra=response_info)
+            metrics.increment("bedrock.calls", tier=tier)
+            metrics.observe("bedrock.latency_seconds", duration, tier=tier)
+            metrics.observe("bedrock.input_tokens", response_info["input_tokens"], tier=tier)
+            metrics.observe("bedrock.output_tokens", response_info["output_tokens"], tier=tier)
+            if model_id == self.bedrock_model_id:
+                # 呼び出しに成功した認証情報は回答キャッシュの返却時に再検証しない
+                _remember_verified(self._credential_key)
 
             # Anthropic互換形式に変換して返却
             return self._convert_bedrock_response_to_anthropic_format(response)
@@ -93,10 +197,141 @@ class BedrockService:
             duration = time.time() - start_time
             self.logger.error(
                 "Bedrock API call failed",
-                extra={"error": str(e), "duration": duration}
+                extra={"error": str(e), "duration": duration, "tier": tier}
             )
+            metrics.increment("bedrock.errors", tier=tier)
             raise
 
+    def stream_message(
+        self,
+        messages: List[Dict[str, Any]],
+        system: str = None,
+        model_id: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        tier: str = "default"
+    ) -> Iterator[Dict[str, Any]]:
+        """ConverseStream APIでテキストを逐次取得する
+
+        {"type": "text", "text": ...} を生成順にyieldし、最後に
+        {"type": "usage", "input_tokens", "output_tokens", "stop_reason"} をyieldする。
+        """
+        start_time = time.time()
+        model_id = model_id or self.bedrock_model_id
+        max_tokens = max_tokens or self.max_tokens
+        metrics = get_metrics()
+
+        self.logger.info(
+            "Creating Bedrock message stream",
+            extra={"message_count": len(messages), "model": model_id, "max_tokens": max_tokens, "tier": tier}
+        )
+
+        params = self._build_params(messages, None, system, model_id, max_tokens)
+        usage: Dict[str, Any] = {}
+        stop_reason = "unknown"
+        first_token_at = None
+
+        try:
+            response = self.client.converse_stream(**params)
+            for event in response["stream"]:
+                if "contentBlockDelta" in event:
+                    text = event["contentBlockDelta"].get("delta", {}).get("text")
+                    if text:
+                        if first_token_at is None:
+                            first_token_at = time.time()
+                            metrics.observe("bedrock.time_to_first_token_seconds", first_token_at - start_time, tier=tier)
+                        yield {"type": "text", "text": text}
+                elif "messageStop" in event:
+                    stop_reason = event["messageStop"].get("stopReason", stop_reason)
+                elif "metadata" in event:
+                    usage = event["metadata"].get("usage", {})
+        except Exception as e:
+            duration = time.time() - start_time
+            self.logger.error(
+                "Bedrock stream failed",
+                extra={"error": str(e), "duration": duration, "tier": tier}
+            )
+            metrics.increment("bedrock.errors", tier=tier)
+            raise
+
+        duration = time.time() - start_time
+        response_info = {
+            "duration": duration,
+            "time_to_first_token": first_token_at - start_time if first_token_at else None,
+            "input_tokens": usage.get("inputTokens", 0),
+            "output_tokens": usage.get("outputTokens", 0),
+            "stop_reason": stop_reason,
+            "tier": tier
+        }
+        self.logger.info("Bedrock stream completed", extra=response_info)
+        metrics.increment("bedrock.calls", tier=tier)
+        metrics.observe("bedrock.latency_seconds", duration, tier=tier)
+        metrics.observe("bedrock.input_tokens", response_info["input_tokens"], tier=tier)
+        metrics.observe("bedrock.output_tokens", response_info["output_tokens"], tier=tier)
+
+        yield {
+            "type": "usage",
+            "input_tokens": response_info["input_tokens"],
+            "output_tokens": response_info["output_tokens"],
+            "stop_reason": stop_reason
+        }
+
+    def _build_params(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]],
+        system: Optional[str],
+        model_id: str,
+        max_tokens: int
+    ) -> Dict[str, Any]:
+        """Converse / ConverseStream 共通のリクエストパラメータを構築"""
+        # メッセージフォーマット変換
+        bedrock_messages = self._convert_messages_to_bedrock_format(messages)
+
+        params = {
+            "modelId": model_id,
+            "messages": bedrock_messages,
+            "inferenceConfig": {
+                "maxTokens": max_tokens
+            }
+        }
+
+        if system:
+            params["system"] = [{"text": system}]
+
+        if tools:
+            params["toolConfig"] = {
+                "tools": self._convert_tools_to_bedrock_format(tools)
+            }
+            self.logger.debug(f"Using {len(tools)} tools", extra={"tool_count": len(tools)})
+
+        return params
+
+    def _converse(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Converse API呼び出し（ヘッジ有効時はフォールバックリージョンと競争させる）"""
+        start_time = time.monotonic()
+        metrics = get_metrics()
+
+        if not self.fallback_client:
+            response = self.client.converse(**params)
+            metrics.observe("bedrock.converse_latency_seconds", time.monotonic() - start_time, hedging="off")
+            return response
+
+        policy = get_hedge_policy(
+            self.aws_region,
+            params["modelId"],
+            percentile=self.bedrock_settings.hedge_percentile,
+            min_delay=self.bedrock_settings.hedge_min_delay_seconds,
+            max_delay=self.bedrock_settings.hedge_max_delay_seconds,
+            max_ratio=self.bedrock_settings.hedge_max_ratio
+        )
+        response = hedged_call(
+            lambda: self.client.converse(**params),
+            lambda: self.fallback_client.converse(**params),
+            policy
+        )
+        metrics.observe("bedrock.converse_latency_seconds", time.monotonic() - start_time, hedging="on")
+        return response
+
     def _convert_messages_to_bedrock_format(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Anthropic形式のメッセージをBedrock Converse API形式に変換"""
         bedrock_messages = []
@@ -139,7 +374,10 @@ class BedrockService:
                             if isinstance(tool_result_content, str):
                                 result_content = [{"text": tool_result_content}]
                             elif isinstance(tool_result_content, list):
-                                result_content = [{"text": str(item)} for item in tool_result_content]
+                                result_content = [
+                                    {"text": item.text if hasattr(item, 'text') else str(item)}
+                                    for item in tool_result_content
+                                ]
                             else:
                                 result_content = [{"text": str(tool_result_content)}]
 
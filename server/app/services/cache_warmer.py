@@ -0,0 +1,295 @@
+"""人気の質問とメタデータをオフピーク時間帯に事前取得するキャッシュウォーマー
+
+最近の単発質問を頻度順に記録し、オフピーク時間帯またはデータソース更新の検知後に、
+回答キャッシュにない上位N件を再実行して回答キャッシュを温める。ライブのリクエストと
+競合しないよう、処理中のリクエストがある間は実行せず、実行間隔にも下限を設ける。
+"""
+import asyncio
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .answer_cache import AnswerCache, normalize_question
+from .bedrock_service import BedrockService
+from .mcp_service import MCPService
+from .metadata_index import MetadataIndex
+from .result_store import ResultStore, StoredResult
+from ..config.settings import Settings
+from ..core.logging import get_logger
+from ..core.metrics import get_metrics
+
+
+def parse_time_window(window: str) -> Tuple[int, int]:
+    """"HH:MM-HH:MM" を日付変更からの分に変換（終了が開始より前なら日付をまたぐ）"""
+    start, end = window.split("-")
+
+    def to_minutes(value: str) -> int:
+        hours, minutes = value.strip().split(":")
+        return int(hours) * 60 + int(minutes)
+
+    return to_minutes(start), to_minutes(end)
+
+
+def in_time_windows(now: datetime, windows: List[str]) -> bool:
+    minutes = now.hour * 60 + now.minute
+    for window in windows:
+        start, end = parse_time_window(window)
+        if start <= end:
+            if start <= minutes < end:
+                return True
+        elif minutes >= start or minutes < end:
+            return True
+    return False
+
+
+class LiveTraffic:
+    """処理中のライブリクエスト数（ウォーマーはこれが上限以下のときのみ実行する）"""
+
+    def __init__(self):
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @contextmanager
+    def track(self):
+        with self._lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+@dataclass
+class _QuestionStat:
+    question: str
+    count: int
+    last_seen: float
+
+
+class QuestionLog:
+    """最近の単発質問を正規化キーで集計する"""
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._stats: Dict[str, _QuestionStat] = {}
+        self._lock = threading.Lock()
+
+    def record(self, question: str) -> None:
+        key = normalize_question(question)
+        if not key:
+            return
+        now = time.time()
+        with self._lock:
+            stat = self._stats.get(key)
+            if stat is None:
+                self._stats[key] = _QuestionStat(question, 1, now)
+            else:
+                stat.count += 1
+                stat.last_seen = now
+            if len(self._stats) > self.max_entries:
+                oldest = min(self._stats, key=lambda item: self._stats[item].last_seen)
+                del self._stats[oldest]
+
+    def top(self, n: int, window_seconds: float) -> List[str]:
+        """指定期間内に記録された質問を頻度順に返す"""
+        cutoff = time.time() - window_seconds
+        with self._lock:
+            recent = [stat for stat in self._stats.values() if stat.last_seen >= cutoff]
+        recent.sort(key=lambda stat: (-stat.count, -stat.last_seen))
+        return [stat.question for stat in recent[:n]]
+
+
+# 質問を実行して (回答, 使用したデータソースLUID, 回答の根拠となった結果) を返す関数
+AnswerFunction = Callable[[str], Awaitable[Tuple[str, List[str], List[StoredResult]]]]
+
+
+class CacheWarmer:
+    """オフピーク時間帯・データソース更新後に人気の質問を再実行して回答キャッシュを温める"""
+
+    def __init__(
+        self,
+        settings: Settings,
+        answer_cache: AnswerCache,
+        question_log: QuestionLog,
+        metadata_index: MetadataIndex,
+        live_traffic: LiveTraffic,
+        answer_fn: AnswerFunction,
+        indexer: Optional[Any] = None,
+        clock: Callable[[], datetime] = datetime.now
+    ):
+        self.settings = settings
+        self.answer_cache = answer_cache
+        self.question_log = question_log
+        self.metadata_index = metadata_index
+        self.live_traffic = live_traffic
+        self.answer_fn = answer_fn
+        self.indexer = indexer
+        self.clock = clock
+        self.logger = get_logger("cache_warmer")
+        self._task: Optional[asyncio.Task] = None
+        self._last_versions: Dict[str, Optional[str]] = {}
+        self._last_metadata_window: Optional[str] = None
+        self._last_warmed_at = 0.0
+        # 正規化した質問 -> 最後に再実行した時刻（キャッシュ対象にならない質問の繰り返し実行を防ぐ）
+        self._attempted: Dict[str, float] = {}
+        self.last_run: Dict[str, Any] = {}
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                self.logger.warning("Cache warming failed", extra={"error": str(e)})
+                get_metrics().increment("cache_warmer.errors")
+            await asyncio.sleep(self.settings.cache_warmer.check_interval_seconds)
+
+    def _popular_questions(self) -> List[str]:
+        config = self.settings.cache_warmer
+        return self.question_log.top(config.top_n, config.question_window_days * 86400)
+
+    def coverage(self) -> float:
+        """人気上位の質問のうち、有効な回答がキャッシュされている割合"""
+        questions = self._popular_questions()
+        if not questions:
+            return 0.0
+        versions = self.metadata_index.versions()
+        cached = sum(1 for question in questions if self.answer_cache.peek(question, versions))
+        return cached / len(questions)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "coverage": round(self.coverage(), 3),
+            "answer_cache": self.answer_cache.stats(),
+            "last_run": self.last_run,
+        }
+
+    async def tick(self) -> Optional[Dict[str, Any]]:
+        """実行条件を満たしていれば1サイクル分のウォーミングを行う"""
+        config = self.settings.cache_warmer
+        now = self.clock()
+        off_peak = in_time_windows(now, config.offpeak_windows)
+
+        versions = self.metadata_index.versions()
+        refreshed = bool(self._last_versions) and versions != self._last_versions
+        self._last_versions = versions
+
+        if off_peak and self.indexer is not None and self._last_metadata_window != now.date().isoformat():
+            # メタデータはオフピーク時間帯ごとに1回、インデクサーに更新を依頼する
+            self._last_metadata_window = now.date().isoformat()
+            self.indexer.request_refresh()
+
+        if not (off_peak or refreshed):
+            return None
+        return await self.warm(trigger="datasource_refresh" if refreshed else "offpeak")
+
+    async def warm(self, trigger: str) -> Dict[str, Any]:
+        config = self.settings.cache_warmer
+        questions = self._popular_questions()
+        warmed, skipped_live, failed = 0, 0, 0
+        # 再試行間隔を過ぎた試行記録は判定に使わないため破棄する
+        cutoff = time.time() - config.retry_interval_seconds
+        self._attempted = {key: at for key, at in self._attempted.items() if at >= cutoff}
+
+        for question in questions:
+            if warmed + failed >= config.max_per_cycle:
+                break
+            if self.answer_cache.peek(question, self.metadata_index.versions()):
+                continue
+            key = normalize_question(question)
+            if time.time() - self._attempted.get(key, 0.0) < config.retry_interval_seconds:
+                continue
+            if self.live_traffic.in_flight > config.max_live_requests:
+                # ライブのリクエストを優先し、このサイクルは打ち切る
+                skipped_live += 1
+                get_metrics().increment("cache_warmer.deferred")
+                break
+
+            wait = config.min_interval_seconds - (time.time() - self._last_warmed_at)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_warmed_at = time.time()
+            self._attempted[key] = self._last_warmed_at
+
+            try:
+                answer, datasource_luids, results = await self.answer_fn(question)
+            except Exception as e:
+                failed += 1
+                self.logger.warning("Failed to warm question", extra={"error": str(e)})
+                continue
+            if datasource_luids:
+                versions = self.metadata_index.versions()
+                self.answer_cache.put(
+                    question,
+                    answer,
+                    {luid: versions.get(luid) for luid in datasource_luids},
+                    results=results
+                )
+            warmed += 1
+
+        coverage = self.coverage()
+        self.last_run = {
+            "trigger": trigger,
+            "at": time.time(),
+            "questions": len(questions),
+            "warmed": warmed,
+            "failed": failed,
+            "deferred": bool(skipped_live),
+            "coverage": round(coverage, 3),
+        }
+        metrics = get_metrics()
+        metrics.increment("cache_warmer.runs", trigger=trigger)
+        metrics.increment("cache_warmer.warmed", warmed)
+        metrics.set_gauge("cache_warmer.coverage", round(coverage, 3))
+        self.logger.info("Cache warming finished", extra=self.last_run)
+        return self.last_run
+
+
+def build_answer_function(settings: Settings, metadata_index: MetadataIndex) -> AnswerFunction:
+    """ウォーマー用の認証情報でMCPService・BedrockServiceを構築し、質問を1件処理する関数を返す"""
+    config = settings.cache_warmer
+
+    async def answer(question: str) -> Tuple[str, List[str], List[StoredResult]]:
+        # 根拠の結果を回答と一緒にキャッシュするため、質問ごとの一時的な結果ストアを使う
+        result_store = ResultStore(max_bytes=settings.result_store.max_bytes) if settings.result_store.enabled else None
+        mcp_service = MCPService(settings, result_store=result_store, metadata_index=metadata_index)
+        try:
+            mcp_service.set_bedrock_service(BedrockService(
+                aws_region=config.aws_region,
+                aws_bearer_token=config.aws_bearer_token,
+                bedrock_model_id=config.bedrock_model_id,
+                max_tokens=config.max_tokens
+            ))
+            if not await mcp_service.connect():
+                raise RuntimeError("MCP server is not available")
+            text = await mcp_service.process_chat_with_history(
+                [{"role": "user", "content": question}],
+                conversation_id=f"warmer-{uuid.uuid4().hex}"
+            )
+            return text, mcp_service.turn_datasource_luids, mcp_service.turn_results()
+        finally:
+            await mcp_service.cleanup()
+
+    return answer
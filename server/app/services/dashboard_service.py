@@ -1,39 +1,290 @@
+import asyncio
 import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from .bedrock_service import BedrockService
-from ..config.prompts import CHART_SYSTEM_PROMPT, get_dashboard_system_prompt
+from ..config.settings import Settings, get_settings
+from ..config.prompts import (
+    CHART_SYSTEM_PROMPT,
+    DASHBOARD_EDIT_SYSTEM_PROMPT,
+    get_chart_spec_system_prompt,
+    get_dashboard_plan_system_prompt,
+    get_dashboard_section_system_prompt,
+    get_dashboard_spec_system_prompt,
+    get_dashboard_system_prompt,
+)
+from ..core.chart_fastpath import detect_chart, render_chart_template
+from ..core.dashboard_renderer import assemble_sections, render_chart_page, render_dashboard
+from ..core.dashboard_spec import SectionPlan, parse_dashboard_plan, parse_dashboard_spec
+from ..core.html_patch import apply_patches, parse_patch_set, section_ids
 from ..core.html_sanitizer import sanitize_chart_html
+from ..core.html_stream import HTMLStreamFragmenter
 from ..core.logging import get_dashboard_logger
-from ..core.response_utils import extract_text_from_response
+from ..core.metrics import get_metrics
+from ..core.response_utils import extract_text_from_response, strip_code_fence
+
+DASHBOARD_INSTRUCTION = "をHTML+CSS+Chart.jsを使ってダッシュボードとして可視化してください"
+CHART_INSTRUCTION = "から最適なチャートを1つ作成してください"
+
+
+@dataclass
+class EditResult:
+    html: str
+    mode: str  # "patch" / "full"
+    changed_sections: List[str] = field(default_factory=list)
+    failed_patches: List[str] = field(default_factory=list)
 
 
 class DashboardService:
-    def __init__(self, bedrock_service: BedrockService):
+    def __init__(self, bedrock_service: BedrockService, settings: Optional[Settings] = None):
         self.bedrock_service = bedrock_service
+        self.settings = settings or get_settings()
         self.logger = get_dashboard_logger()
 
-    async def generate_dashboard_code(self, content: str) -> str:
+    def _build_user_content(self, instruction: str, content: str, data: Optional[str]) -> str:
+        """生成指示を組み立てる（構造化データがあれば分析文の代わりに主入力とする）"""
+        if not data:
+            return f"以下の分析結果{instruction}:\n\n{content}"
+
+        context = content[:self.settings.dashboard.context_max_chars]
+        return (
+            f"以下の分析データ{instruction}。数値は必ずこのデータの値をそのまま使用してください:\n\n"
+            f"{data}\n\n"
+            f"分析の要点（参考）:\n{context}"
+        )
+
+    def _output_tokens(self, response: Any) -> int:
+        return getattr(getattr(response, "usage", None), "output_tokens", 0) or 0
+
+    def _record_generation(self, kind: str, mode: str, response: Any, duration: float) -> int:
+        """生成モードごとの出力トークン数とレイテンシを記録"""
+        output_tokens = self._output_tokens(response)
+        metrics = get_metrics()
+        metrics.increment("dashboard.generations", kind=kind, mode=mode)
+        metrics.observe("dashboard.output_tokens", output_tokens, kind=kind, mode=mode)
+        metrics.observe("dashboard.latency_seconds", duration, kind=kind, mode=mode)
+        return output_tokens
+
+    def _render_chart_locally(self, content: str, data: Optional[str] = None) -> Optional[str]:
+        """表・数値リストを含む回答はLLMを使わずにチャートを描画（検出できない場合はNone）
+
+        分析データ（data_handleの結果行）がある場合は、丸め・省略された回答文の表ではなく
+        元の結果行から描画させるため使わない。
+        """
+        metrics = get_metrics()
+        if data:
+            metrics.increment("dashboard.chart_fastpath", result="skipped")
+            return None
+        start_time = time.time()
+        chart = detect_chart(content)
+        metrics.increment("dashboard.chart_fastpath", result="hit" if chart else "miss")
+        if chart is None:
+            return None
+
+        result = sanitize_chart_html(render_chart_template(chart))
+        duration = time.time() - start_time
+        metrics.observe("dashboard.latency_seconds", duration, kind="chart", mode="fastpath")
+        self.logger.info(
+            "Chart rendered locally",
+            extra={
+                "mode": "fastpath",
+                "duration": duration,
+                "chart_type": chart.type,
+                "points": len(chart.labels),
+                "datasets": len(chart.datasets),
+                "output_length": len(result)
+            }
+        )
+        return result
+
+    async def _generate_from_spec(self, kind: str, messages: list) -> Optional[str]:
+        """JSON仕様を生成してテンプレートで描画（仕様が不正な場合はNone）"""
+        start_time = time.time()
+        system = get_chart_spec_system_prompt() if kind == "chart" else get_dashboard_spec_system_prompt()
+        response = await asyncio.to_thread(
+            self.bedrock_service.create_message,
+            messages=messages,
+            system=system,
+            max_tokens=self.settings.dashboard.spec_max_tokens
+        )
+        raw_result = extract_text_from_response(response.content)
+        duration = time.time() - start_time
+        output_tokens = self._record_generation(kind, "spec", response, duration)
+
+        try:
+            spec = parse_dashboard_spec(raw_result)
+            if kind == "chart" and not spec.charts:
+                raise ValueError("Chart spec contains no charts")
+        except ValueError as e:
+            get_metrics().increment("dashboard.spec_fallbacks", kind=kind)
+            self.logger.warning(
+                "Invalid dashboard spec, falling back to HTML generation",
+                extra={"kind": kind, "error": str(e)[:500], "output_length": len(raw_result)}
+            )
+            return None
+
+        result = render_chart_page(spec.charts[0]) if kind == "chart" else render_dashboard(spec)
+        self.logger.info(
+            "Dashboard spec rendered",
+            extra={
+                "kind": kind,
+                "mode": "spec",
+                "duration": duration,
+                "output_tokens": output_tokens,
+                "spec_length": len(raw_result),
+                "output_length": len(result)
+            }
+        )
+        return sanitize_chart_html(result)
+
+    async def _generate_section(
+        self,
+        semaphore: asyncio.Semaphore,
+        dashboard_title: str,
+        section_id: str,
+        section: SectionPlan,
+        user_content: str
+    ) -> Tuple[str, int, float]:
+        """1セクション分のHTML断片を生成（同時実行数はsemaphoreで制限）"""
+        async with semaphore:
+            start_time = time.time()
+            response = await asyncio.to_thread(
+                self.bedrock_service.create_message,
+                messages=[{
+                    "role": "user",
+                    "content": (
+                        f"ダッシュボード「{dashboard_title}」の次のセクションを作成してください。\n"
+                        f"種類: {section.type}\n見出し: {section.title}\n内容: {section.brief}\n\n"
+                        f"{user_content}"
+                    )
+                }],
+                system=get_dashboard_section_system_prompt(section_id),
+                max_tokens=self.settings.dashboard.section_max_tokens,
+                tier="section"
+            )
+            fragment = sanitize_chart_html(strip_code_fence(extract_text_from_response(response.content)))
+            duration = time.time() - start_time
+            get_metrics().observe("dashboard.section_latency_seconds", duration, section_type=section.type)
+            return fragment, self._output_tokens(response), duration
+
+    async def _generate_in_sections(self, user_content: str) -> Optional[str]:
+        """構成計画→セクション並列生成→シェルへの組み立て（計画または全セクションが失敗した場合はNone）"""
+        start_time = time.time()
+        dashboard_settings = self.settings.dashboard
+
+        plan_response = await asyncio.to_thread(
+            self.bedrock_service.create_message,
+            messages=[{"role": "user", "content": user_content}],
+            system=get_dashboard_plan_system_prompt(dashboard_settings.max_sections),
+            model_id=self.settings.bedrock.fast_model_id,
+            max_tokens=dashboard_settings.plan_max_tokens,
+            tier="planning"
+        )
+        plan_duration = time.time() - start_time
+        try:
+            plan = parse_dashboard_plan(extract_text_from_response(plan_response.content))
+        except ValueError as e:
+            get_metrics().increment("dashboard.section_fallbacks", reason="plan")
+            self.logger.warning(
+                "Invalid dashboard plan, falling back to HTML generation",
+                extra={"error": str(e)[:500]}
+            )
+            return None
+
+        sections = plan.sections[:dashboard_settings.max_sections]
+        semaphore = asyncio.Semaphore(max(1, dashboard_settings.section_concurrency))
+        section_ids = [f"s{i + 1}" for i in range(len(sections))]
+        results = await asyncio.gather(
+            *(
+                self._generate_section(semaphore, plan.title, section_id, section, user_content)
+                for section_id, section in zip(section_ids, sections)
+            ),
+            return_exceptions=True
+        )
+
+        fragments = []
+        output_tokens = self._output_tokens(plan_response)
+        longest_section = 0.0
+        for section_id, section, result in zip(section_ids, sections, results):
+            if isinstance(result, BaseException):
+                self.logger.warning(
+                    "Dashboard section generation failed",
+                    extra={"section_id": section_id, "section_type": section.type, "error": str(result)}
+                )
+                continue
+            fragment, tokens, duration = result
+            fragments.append((section_id, fragment))
+            output_tokens += tokens
+            longest_section = max(longest_section, duration)
+
+        if not fragments:
+            get_metrics().increment("dashboard.section_fallbacks", reason="sections")
+            return None
+
+        result = assemble_sections(plan.title, fragments)
+        duration = time.time() - start_time
+        metrics = get_metrics()
+        metrics.increment("dashboard.generations", kind="dashboard", mode="sections")
+        metrics.observe("dashboard.output_tokens", output_tokens, kind="dashboard", mode="sections")
+        metrics.observe("dashboard.latency_seconds", duration, kind="dashboard", mode="sections")
+        self.logger.info(
+            "Dashboard sections generated",
+            extra={
+                "mode": "sections",
+                "duration": duration,
+                "plan_duration": plan_duration,
+                "longest_section_duration": longest_section,
+                "sections": len(sections),
+                "failed_sections": len(sections) - len(fragments),
+                "output_tokens": output_tokens,
+                "output_length": len(result)
+            }
+        )
+        return result
+
+    async def generate_dashboard_code(
+        self,
+        content: str,
+        data: Optional[str] = None,
+        render_mode: Optional[str] = None
+    ) -> str:
         """Generate dashboard HTML code using Chart.js"""
         start_time = time.time()
         content_length = len(content)
 
         self.logger.info(
             "Generating dashboard code",
-            extra={"content_length": content_length}
+            extra={"content_length": content_length, "data_length": len(data) if data else 0}
         )
 
         messages = [
             {
                 "role": "user",
-                "content": (
-                    "以下の分析結果をHTML+CSS+Chart.jsを使ってダッシュボードとして可視化してください:\n\n"
-                    f"{content}"
+                "content": self._build_user_content(
+                    DASHBOARD_INSTRUCTION,
+                    content,
+                    data
                 )
             }
         ]
 
+        mode = render_mode or self.settings.dashboard.render_mode
+
         try:
-            response = self.bedrock_service.create_message(
+            if mode == "spec":
+                result = await self._generate_from_spec("dashboard", messages)
+                if result is not None:
+                    return result
+                start_time = time.time()
+            elif mode == "sections":
+                result = await self._generate_in_sections(messages[0]["content"])
+                if result is not None:
+                    return result
+                start_time = time.time()
+
+            response = await asyncio.to_thread(
+                self.bedrock_service.create_message,
                 messages=messages,
                 system=get_dashboard_system_prompt()
             )
@@ -41,11 +292,14 @@ class DashboardService:
             raw_result = extract_text_from_response(response.content)
             result = sanitize_chart_html(raw_result)
             duration = time.time() - start_time
+            output_tokens = self._record_generation("dashboard", "html", response, duration)
 
             self.logger.info(
                 "Dashboard code generated successfully",
                 extra={
+                    "mode": "html",
                     "duration": duration,
+                    "output_tokens": output_tokens,
                     "output_length": len(result),
                     "is_html": result.strip().startswith("<!DOCTYPE html>")
                 }
@@ -60,28 +314,48 @@ class DashboardService:
             )
             raise
 
-    async def generate_chart_code(self, content: str) -> str:
+    async def generate_chart_code(
+        self,
+        content: str,
+        data: Optional[str] = None,
+        render_mode: Optional[str] = None
+    ) -> str:
         """Generate single chart HTML code using Chart.js"""
         start_time = time.time()
         content_length = len(content)
 
+        if self.settings.dashboard.chart_fastpath_enabled:
+            result = self._render_chart_locally(content, data)
+            if result is not None:
+                return result
+
         self.logger.info(
             "Generating chart code",
-            extra={"content_length": content_length}
+            extra={"content_length": content_length, "data_length": len(data) if data else 0}
         )
 
         messages = [
             {
                 "role": "user",
-                "content": (
-                    "以下の分析結果から最適なチャートを1つ作成してください:\n\n"
-                    f"{content}"
+                "content": self._build_user_content(
+                    CHART_INSTRUCTION,
+                    content,
+                    data
                 )
             }
         ]
 
+        mode = render_mode or self.settings.dashboard.render_mode
+
         try:
-            response = self.bedrock_service.create_message(
+            if mode == "spec":
+                result = await self._generate_from_spec("chart", messages)
+                if result is not None:
+                    return result
+                start_time = time.time()
+
+            response = await asyncio.to_thread(
+                self.bedrock_service.create_message,
                 messages=messages,
                 system=CHART_SYSTEM_PROMPT
             )
@@ -89,11 +363,14 @@ class DashboardService:
             raw_result = extract_text_from_response(response.content)
             result = sanitize_chart_html(raw_result)
             duration = time.time() - start_time
+            output_tokens = self._record_generation("chart", "html", response, duration)
 
             self.logger.info(
                 "Chart code generated successfully",
                 extra={
+                    "mode": "html",
                     "duration": duration,
+                    "output_tokens": output_tokens,
                     "output_length": len(result),
                     "is_html": result.strip().startswith("<!DOCTYPE html>")
                 }
@@ -107,3 +384,155 @@ class DashboardService:
                 extra={"error": str(e), "duration": duration}
             )
             raise
+
+    async def edit_code(self, html: str, instruction: str) -> EditResult:
+        """既存のHTMLに対する差分パッチを生成・適用（パッチが使えない場合は全体を再生成）"""
+        start_time = time.time()
+        sections = section_ids(html)
+
+        self.logger.info(
+            "Editing generated code",
+            extra={"html_length": len(html), "sections": len(sections), "instruction_length": len(instruction)}
+        )
+
+        section_list = ", ".join(sections) if sections else "（なし：replace のみ使用可能）"
+        response = await asyncio.to_thread(
+            self.bedrock_service.create_message,
+            messages=[{
+                "role": "user",
+                "content": f"修正指示: {instruction}\n\nセクションID: {section_list}\n\n現在のHTML:\n{html}"
+            }],
+            system=DASHBOARD_EDIT_SYSTEM_PROMPT,
+            max_tokens=self.settings.dashboard.edit_max_tokens
+        )
+        duration = time.time() - start_time
+        output_tokens = self._record_generation("edit", "patch", response, duration)
+        raw_result = extract_text_from_response(response.content)
+
+        try:
+            result = apply_patches(html, parse_patch_set(raw_result))
+        except ValueError as e:
+            result = None
+            self.logger.warning("Invalid edit patches", extra={"error": str(e)[:500]})
+
+        metrics = get_metrics()
+        if result is not None:
+            metrics.increment("dashboard.edit_patches", result.applied, result="applied")
+            metrics.increment("dashboard.edit_patches", len(result.failed), result="failed")
+
+        if result is not None and result.applied:
+            self.logger.info(
+                "Edit patches applied",
+                extra={
+                    "mode": "patch",
+                    "duration": duration,
+                    "output_tokens": output_tokens,
+                    "applied": result.applied,
+                    "failed": result.failed,
+                    "changed_sections": result.changed_sections,
+                    "changed_bytes": result.changed_bytes,
+                    "output_length": len(result.html)
+                }
+            )
+            return EditResult(
+                html=result.html,
+                mode="patch",
+                changed_sections=result.changed_sections + result.removed_sections,
+                failed_patches=result.failed
+            )
+
+        # パッチが1件も適用できない場合は修正後のHTML全体を生成する
+        metrics.increment("dashboard.edit_fallbacks")
+        start_time = time.time()
+        response = await asyncio.to_thread(
+            self.bedrock_service.create_message,
+            messages=[{
+                "role": "user",
+                "content": (
+                    f"以下のHTMLダッシュボードを修正指示に従って修正し、修正後のHTML全体を出力してください。\n"
+                    f"修正指示: {instruction}\n\n{html}"
+                )
+            }],
+            system=get_dashboard_system_prompt()
+        )
+        full_html = sanitize_chart_html(extract_text_from_response(response.content))
+        duration = time.time() - start_time
+        output_tokens = self._record_generation("edit", "full", response, duration)
+        self.logger.info(
+            "Edit fell back to full regeneration",
+            extra={"mode": "full", "duration": duration, "output_tokens": output_tokens, "output_length": len(full_html)}
+        )
+        return EditResult(html=full_html, mode="full", failed_patches=result.failed if result else [])
+
+    async def stream_code(self, kind: str, content: str, data: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """ダッシュボード/チャートHTMLを生成しながら安全な断片を逐次返す
+
+        {"event": "fragment", "html": ...} を生成順に返し、最後に
+        {"event": "complete", "code": サニタイズ済みの完全なHTML, "usage": {...}} を返す。
+        """
+        start_time = time.time()
+        metrics = get_metrics()
+
+        if kind == "chart" and self.settings.dashboard.chart_fastpath_enabled:
+            result = self._render_chart_locally(content, data)
+            if result is not None:
+                yield {"event": "complete", "code": result, "usage": {"input_tokens": 0, "output_tokens": 0}}
+                return
+
+        instruction = CHART_INSTRUCTION if kind == "chart" else DASHBOARD_INSTRUCTION
+        system = CHART_SYSTEM_PROMPT if kind == "chart" else get_dashboard_system_prompt()
+        messages = [{"role": "user", "content": self._build_user_content(instruction, content, data)}]
+
+        self.logger.info(
+            "Streaming code generation",
+            extra={"kind": kind, "content_length": len(content), "data_length": len(data) if data else 0}
+        )
+
+        fragmenter = HTMLStreamFragmenter()
+        stream = self.bedrock_service.stream_message(messages=messages, system=system, tier="stream")
+        parts: List[str] = []
+        usage: Dict[str, Any] = {}
+        fragment_count = 0
+        first_fragment_at = None
+
+        while True:
+            # boto3のイベントストリームは同期イテレータのため、1イベントずつスレッドで取得する
+            event = await asyncio.to_thread(next, stream, None)
+            if event is None:
+                break
+            if event["type"] == "usage":
+                usage = {key: value for key, value in event.items() if key != "type"}
+                continue
+
+            parts.append(event["text"])
+            for fragment in fragmenter.feed(event["text"]):
+                if first_fragment_at is None:
+                    first_fragment_at = time.time() - start_time
+                    metrics.observe("dashboard.first_fragment_seconds", first_fragment_at, kind=kind)
+                fragment_count += 1
+                yield {"event": "fragment", "html": fragment}
+
+        for fragment in fragmenter.flush():
+            fragment_count += 1
+            yield {"event": "fragment", "html": fragment}
+
+        result = sanitize_chart_html(strip_code_fence("".join(parts)))
+        duration = time.time() - start_time
+        output_tokens = usage.get("output_tokens", 0)
+        metrics.increment("dashboard.generations", kind=kind, mode="stream")
+        metrics.observe("dashboard.output_tokens", output_tokens, kind=kind, mode="stream")
+        metrics.observe("dashboard.latency_seconds", duration, kind=kind, mode="stream")
+
+        self.logger.info(
+            "Streaming code generation completed",
+            extra={
+                "kind": kind,
+                "mode": "stream",
+                "duration": duration,
+                "first_fragment_seconds": first_fragment_at,
+                "fragments": fragment_count,
+                "output_tokens": output_tokens,
+                "output_length": len(result)
+            }
+        )
+        yield {"event": "complete", "code": result, "usage": usage}
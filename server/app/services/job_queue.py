@@ -0,0 +1,390 @@
+"""ダッシュボード・チャート生成の非同期ジョブキュー（SQLiteで永続化）
+
+リクエストはジョブとしてSQLiteに保存して即座にジョブIDを返し、同時実行数を制限した
+ワーカーが順に処理する。処理中にプロセスが停止したジョブは次回起動時に再投入される。
+結果ストアはメモリ上にあるため、分析データは投入時にプロンプト用に整形してジョブに保存する。
+Bedrockの認証情報はサーバー鍵で暗号化して保存し、完了・失敗時に破棄する
+（鍵の変更などで復号できないジョブは "credentials expired" で失敗にする）。
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from .artifact_store import ArtifactStore
+from .bedrock_service import BedrockService
+from .dashboard_service import DashboardService
+from ..config.settings import Settings
+from ..core.logging import get_logger
+from ..core.metrics import get_metrics
+
+JOB_KINDS = ("dashboard", "chart")
+# 暗号化して保存するペイロードの項目
+_SECRET_FIELDS = ("aws_bearer_token",)
+CREDENTIALS_EXPIRED = "credentials expired"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    code TEXT,
+    artifact_id TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+@dataclass
+class Job:
+    job_id: str
+    kind: str  # "dashboard" / "chart"
+    status: str  # queued / running / succeeded / failed
+    payload: Dict[str, Any]
+    code: Optional[str]
+    artifact_id: Optional[str]
+    error: Optional[str]
+    attempts: int
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+
+def _scrub(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: (None if key in _SECRET_FIELDS else value) for key, value in payload.items()}
+
+
+def _load_key(path: str) -> bytes:
+    """DBと同じディレクトリの鍵ファイルを読み込む（無ければ所有者のみ読める権限で作成）"""
+    key_path = Path(path).with_suffix(".key")
+    try:
+        return key_path.read_bytes().strip()
+    except FileNotFoundError:
+        pass
+    key = Fernet.generate_key()
+    try:
+        fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        return key_path.read_bytes().strip()
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+
+class JobQueue:
+    """SQLiteに永続化するジョブキュー
+
+    secret_key（Fernet鍵）を指定しない場合は、DBと同じディレクトリの鍵ファイル（<db>.key）を使う。
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3, secret_key: Optional[str] = None):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.secret_key = secret_key
+        self._conn_obj: Optional[sqlite3.Connection] = None
+        self._fernet_obj: Optional[Fernet] = None
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[], None]] = []
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # ジョブを使わないリクエストでDBファイルを作らないよう、初回アクセス時に開く（ロック内で呼ぶ）
+        if self._conn_obj is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn_obj = conn
+        return self._conn_obj
+
+    @property
+    def _fernet(self) -> Fernet:
+        # DBと同様に鍵ファイルも初回アクセス時に用意する（ロック内で呼ぶ）
+        if self._fernet_obj is None:
+            if self.secret_key:
+                key = self.secret_key.encode("utf-8")
+            elif self.path == ":memory:":
+                key = Fernet.generate_key()
+            else:
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                key = _load_key(self.path)
+            self._fernet_obj = Fernet(key)
+        return self._fernet_obj
+
+    def _seal(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """認証情報の項目を暗号化したペイロード（ロック内で呼ぶ）"""
+        return {
+            key: (self._fernet.encrypt(str(value).encode("utf-8")).decode("ascii")
+                  if key in _SECRET_FIELDS and value else value)
+            for key, value in payload.items()
+        }
+
+    def _unseal(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """認証情報の項目を復号したペイロード（復号できない項目はNone、ロック内で呼ぶ）"""
+        opened = dict(payload)
+        for key in _SECRET_FIELDS:
+            if opened.get(key):
+                try:
+                    opened[key] = self._fernet.decrypt(opened[key].encode("ascii")).decode("utf-8")
+                except (InvalidToken, ValueError):
+                    opened[key] = None
+        return opened
+
+    def _credentials_lost(self, payload: Dict[str, Any]) -> bool:
+        opened = self._unseal(payload)
+        return any(key in payload and not opened[key] for key in _SECRET_FIELDS)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn_obj is not None:
+                self._conn_obj.close()
+                self._conn_obj = None
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        """ジョブ投入時に呼び出すコールバックを登録（ワーカーの起床用）"""
+        self._listeners.append(listener)
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> Job:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, kind, status, payload, created_at) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(self._seal(payload), ensure_ascii=False), now)
+            )
+        get_metrics().increment("job_queue.enqueued", kind=kind)
+        for listener in self._listeners:
+            listener()
+        return self.get(job_id)
+
+    def claim(self) -> Optional[Job]:
+        """最も古い待機中のジョブを実行中にして返す"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE job_id = ?",
+                    (time.time(), row["job_id"])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row["job_id"])
+
+    def complete(self, job: Job, code: str, artifact_id: Optional[str]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'succeeded', code = ?, artifact_id = ?, payload = ?, finished_at = ? "
+                "WHERE job_id = ?",
+                (code, artifact_id, json.dumps(_scrub(job.payload), ensure_ascii=False), time.time(), job.job_id)
+            )
+
+    def fail(self, job: Job, error: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, payload = ?, finished_at = ? WHERE job_id = ?",
+                (error, json.dumps(_scrub(job.payload), ensure_ascii=False), time.time(), job.job_id)
+            )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            payload = self._unseal(json.loads(row["payload"])) if row is not None else None
+        if row is None:
+            return None
+        return Job(
+            job_id=row["job_id"],
+            kind=row["kind"],
+            status=row["status"],
+            payload=payload,
+            code=row["code"],
+            artifact_id=row["artifact_id"],
+            error=row["error"],
+            attempts=row["attempts"],
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"]
+        )
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["count"] for row in rows}
+
+    def recover(self) -> List[str]:
+        """前回の停止時に実行中だったジョブを再投入する
+
+        認証情報を復号できないジョブ（鍵が変わった場合など）は実行できないため
+        "credentials expired" で失敗にし、試行回数の上限を超えたものも失敗にする。
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id, status, payload, attempts FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchall()
+            requeued = []
+            for row in rows:
+                payload = json.loads(row["payload"])
+                if self._credentials_lost(payload):
+                    error = CREDENTIALS_EXPIRED
+                elif row["status"] == "queued":
+                    continue
+                elif row["attempts"] >= self.max_attempts:
+                    error = "interrupted too many times"
+                else:
+                    self._conn.execute("UPDATE jobs SET status = 'queued' WHERE job_id = ?", (row["job_id"],))
+                    requeued.append(row["job_id"])
+                    continue
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, payload = ?, finished_at = ? WHERE job_id = ?",
+                    (error, json.dumps(_scrub(payload), ensure_ascii=False), now, row["job_id"])
+                )
+        return requeued
+
+    def prune(self, retention_seconds: float) -> int:
+        """保持期間を過ぎた完了・失敗ジョブを削除"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?",
+                (time.time() - retention_seconds,)
+            )
+        return cursor.rowcount
+
+
+class ArtifactJobExecutor:
+    """ジョブのペイロードからダッシュボード・チャートのコードを生成する"""
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+
+    async def __call__(self, job: Job) -> str:
+        payload = job.payload
+        if not payload.get("aws_bearer_token"):
+            raise ValueError(CREDENTIALS_EXPIRED)
+        dashboard_service = DashboardService(
+            BedrockService(
+                aws_region=payload["aws_region"],
+                aws_bearer_token=payload["aws_bearer_token"],
+                bedrock_model_id=payload["bedrock_model_id"],
+                max_tokens=payload["max_tokens"]
+            ),
+            self.settings
+        )
+        generate = (
+            dashboard_service.generate_chart_code if job.kind == "chart"
+            else dashboard_service.generate_dashboard_code
+        )
+        return await generate(payload["content"], data=payload.get("data"), render_mode=payload.get("render_mode"))
+
+
+class JobWorkerPool:
+    """ジョブキューを同時実行数を制限したワーカーで処理する"""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        executor: Callable[[Job], Awaitable[str]],
+        artifact_store: Optional[ArtifactStore] = None,
+        concurrency: int = 2,
+        poll_interval_seconds: float = 1.0,
+        retention_seconds: float = 86400.0
+    ):
+        self.queue = queue
+        self.executor = executor
+        self.artifact_store = artifact_store
+        self.concurrency = max(1, concurrency)
+        self.poll_interval_seconds = poll_interval_seconds
+        self.retention_seconds = retention_seconds
+        self._last_prune = 0.0
+        self.logger = get_logger("job_queue")
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self.queue.add_listener(self.notify)
+        requeued = self.queue.recover()
+        if requeued:
+            self.logger.info("Requeued interrupted jobs", extra={"jobs": requeued})
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        # 実行中のジョブは 'running' のまま残り、次回起動時に再投入される
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """新しいジョブの投入をワーカーに知らせる"""
+        self._wakeup.set()
+
+    async def _worker(self) -> None:
+        while True:
+            job = self.queue.claim()
+            if job is None:
+                self._prune()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run_job(job)
+
+    def _prune(self) -> None:
+        # 保持期間の1/10以上の間隔で削除する
+        now = time.time()
+        if now - self._last_prune < self.retention_seconds / 10:
+            return
+        self._last_prune = now
+        removed = self.queue.prune(self.retention_seconds)
+        if removed:
+            self.logger.info("Pruned finished jobs", extra={"removed": removed})
+
+    async def run_job(self, job: Job) -> None:
+        start_time = time.time()
+        metrics = get_metrics()
+        metrics.observe("job_queue.wait_seconds", start_time - job.created_at, kind=job.kind)
+        try:
+            code = await self.executor(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.queue.fail(job, str(e))
+            metrics.increment("job_queue.completed", kind=job.kind, status="failed")
+            self.logger.warning("Job failed", extra={"job_id": job.job_id, "kind": job.kind, "error": str(e)})
+            return
+
+        artifact_id = self.artifact_store.put(code, kind=job.kind).artifact_id if self.artifact_store is not None else None
+        self.queue.complete(job, code, artifact_id)
+        duration = time.time() - start_time
+        metrics.increment("job_queue.completed", kind=job.kind, status="succeeded")
+        metrics.observe("job_queue.run_seconds", duration, kind=job.kind)
+        self.logger.info("Job completed", extra={"job_id": job.job_id, "kind": job.kind, "duration": duration})
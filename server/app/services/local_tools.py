@@ -0,0 +1,140 @@
+"""MCPツールと並べてモデルに提供する、サーバー内で実行するローカルツール"""
+from abc import ABC, abstractmethod
+from typing import Any, Dict
+
+from .metadata_index import MetadataIndex, format_field_matches
+from .result_store import AGGREGATE_FUNCTIONS, FILTER_OPERATORS, ResultStore, run_local_query
+from ..core.result_encoding import encode_rows
+
+
+class LocalTool(ABC):
+    """ローカルツールの基底クラス"""
+    name: str = ""
+    description: str = ""
+    input_schema: Dict[str, Any] = {}
+
+    def definition(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "input_schema": self.input_schema,
+        }
+
+    @abstractmethod
+    async def run(self, args: Dict[str, Any]) -> str:
+        """ツールを実行し、モデルに返す結果テキストを返す"""
+
+
+class AggregateCachedResultTool(LocalTool):
+    """会話内で取得済みのクエリ結果をTableauに問い合わせずに再集計する"""
+    name = "aggregate-cached-result"
+    description = (
+        "Filter, group, aggregate and sort a query result that was already fetched in this conversation "
+        "(identified by resultId such as 'r1'), without calling Tableau again. Use this for follow-up "
+        "questions that can be answered from previously retrieved rows."
+    )
+    input_schema = {
+        "type": "object",
+        "properties": {
+            "resultId": {"type": "string", "description": "ID of a stored result, e.g. 'r1'"},
+            "filters": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "column": {"type": "string"},
+                        "op": {"type": "string", "enum": list(FILTER_OPERATORS)},
+                        "value": {},
+                    },
+                    "required": ["column", "op", "value"],
+                },
+            },
+            "groupBy": {"type": "array", "items": {"type": "string"}},
+            "aggregations": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "column": {"type": "string"},
+                        "function": {"type": "string", "enum": list(AGGREGATE_FUNCTIONS)},
+                        "alias": {"type": "string"},
+                    },
+                    "required": ["column", "function"],
+                },
+            },
+            "sortBy": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "column": {"type": "string"},
+                        "direction": {"type": "string", "enum": ["asc", "desc"]},
+                    },
+                    "required": ["column"],
+                },
+            },
+            "limit": {"type": "integer", "minimum": 1},
+        },
+        "required": ["resultId"],
+    }
+
+    def __init__(self, result_store: ResultStore, conversation_id: str, max_rows: int, max_bytes: int):
+        self.result_store = result_store
+        self.conversation_id = conversation_id
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+
+    async def run(self, args: Dict[str, Any]) -> str:
+        result_id = args.get("resultId", "")
+        stored = self.result_store.get(self.conversation_id, result_id)
+        if stored is None:
+            return f"結果ID {result_id} は見つかりません。query-datasource でデータを再取得してください。"
+
+        rows = run_local_query(
+            stored,
+            filters=args.get("filters"),
+            group_by=args.get("groupBy"),
+            aggregations=args.get("aggregations"),
+            sort_by=args.get("sortBy"),
+            limit=args.get("limit"),
+        )
+        if not rows:
+            return "条件に一致する行はありません。"
+
+        table, _ = encode_rows(rows, self.max_rows, self.max_bytes)
+
+        # 集計結果自体も保存し、チャート生成などから参照できるようにする
+        derived = self.result_store.put(self.conversation_id, self.name, args, rows)
+        if derived:
+            return f"[resultId: {derived.result_id}]\n{table}"
+        return table
+
+
+class SearchDatasourceMetadataTool(LocalTool):
+    """ローカルのメタデータインデックスからデータソース・フィールドを検索する"""
+    name = "search-datasource-metadata"
+    description = (
+        "Search the locally indexed metadata of all published data sources (data source names, field names, "
+        "captions and data types) by keywords, without calling Tableau. Returns matching fields grouped by "
+        "data source with their datasourceLuid. Prefer this over list-datasources and get-datasource-metadata "
+        "to find which data source and fields to query."
+    )
+    input_schema = {
+        "type": "object",
+        "properties": {
+            "query": {"type": "string", "description": "Keywords such as measure, dimension or data source names"},
+            "limit": {"type": "integer", "minimum": 1, "maximum": 50},
+        },
+        "required": ["query"],
+    }
+
+    def __init__(self, index: MetadataIndex, default_limit: int):
+        self.index = index
+        self.default_limit = default_limit
+
+    async def run(self, args: Dict[str, Any]) -> str:
+        limit = min(int(args.get("limit") or self.default_limit), 50)
+        matches = self.index.search(args.get("query", ""), limit=limit)
+        if not matches:
+            return "一致するフィールドはありません。list-datasources / get-datasource-metadata で確認してください。"
+        return format_field_matches(matches)
@@ -0,0 +1,370 @@
+"""複数のTableau MCPサーバープロセスを常駐させるプール
+
+stdioのMCPサーバーは1プロセスで要求を順に処理し、プロセスが落ちると処理中のチャットが
+すべて失敗する。N個のプロセス（レプリカ）を常駐させ、各呼び出しを処理中の呼び出しが
+最も少ないレプリカに振り分ける。定期的なpingで異常を検出したレプリカは再起動し、
+呼び出し回数やメモリ増加量が上限を超えたレプリカは処理中の呼び出しの完了後に入れ替える。
+streamable-http / sse のトランスポートでは、各レプリカは常駐している共有サーバーへの
+開いたままのセッションとなり、リクエスト間で接続を再利用する（メモリ監視は行わない）。
+
+プールは ClientSession と同じ list_tools / call_tool を持ち、MCPService のセッションとして使う。
+stdioセッションは開始したタスク内で閉じる必要があるため、各レプリカは接続から切断までを
+専用のタスクで行う。
+"""
+import asyncio
+import os
+import time
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from .mcp_service import open_session
+from ..config.settings import Settings
+from ..core.exceptions import MCPConnectionError
+from ..core.logging import get_mcp_logger
+from ..core.metrics import get_metrics
+
+# AsyncExitStackにトランスポートとセッションを登録し、初期化済みのセッションを返す
+SessionFactory = Callable[[AsyncExitStack], Awaitable[Any]]
+
+
+def _child_pids() -> Set[int]:
+    """このプロセスの直接の子プロセス（Linuxの/procから取得、取得できない場合は空）"""
+    parent = os.getpid()
+    pids = set()
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return pids
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # プロセス名（括弧内）に空白を含む場合があるため、最後の ')' 以降を分割する
+        fields = stat[stat.rfind(")") + 2:].split()
+        if len(fields) > 1 and fields[1] == str(parent):
+            pids.add(int(entry))
+    return pids
+
+
+def _rss_bytes(pid: Optional[int]) -> Optional[int]:
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        return None
+    return None
+
+
+def session_factory_from_settings(settings: Settings) -> SessionFactory:
+    """設定のトランスポートでMCPサーバーに接続するセッションファクトリ"""
+    async def factory(stack: AsyncExitStack) -> Any:
+        return await open_session(stack, settings)
+    return factory
+
+
+class MCPReplica:
+    """プール内の1つのMCPサーバープロセスとそのセッション"""
+
+    def __init__(self, index: int, session_factory: SessionFactory, track_process: bool = True):
+        self.index = index
+        self.session_factory = session_factory
+        # サーバープロセスを起動するトランスポート（stdio）の場合のみPIDとメモリを監視する
+        self.track_process = track_process
+        self.session: Optional[Any] = None
+        self.pid: Optional[int] = None
+        self.baseline_rss: Optional[int] = None
+        self.outstanding = 0
+        self.calls = 0
+        self.restarts = 0
+        self.started_at: Optional[float] = None
+        # 入れ替え待ち（新しい呼び出しを割り当てない）
+        self.draining = False
+        self.restarting = False
+        self._task: Optional[asyncio.Task] = None
+        self._close: Optional[asyncio.Event] = None
+
+    @property
+    def available(self) -> bool:
+        return self.session is not None and not self.draining and not self.restarting
+
+    async def start(self, spawn_lock: asyncio.Lock) -> None:
+        ready = asyncio.get_running_loop().create_future()
+        self._close = asyncio.Event()
+        if self.track_process:
+            # 起動前後の子プロセスの差分でPIDを特定するため、起動は1つずつ行う
+            async with spawn_lock:
+                before = _child_pids()
+                self._task = asyncio.create_task(self._own_session(ready))
+                await ready
+                spawned = _child_pids() - before
+            self.pid = spawned.pop() if len(spawned) == 1 else None
+        else:
+            self._task = asyncio.create_task(self._own_session(ready))
+            await ready
+            self.pid = None
+        self.baseline_rss = _rss_bytes(self.pid)
+        self.outstanding = 0
+        self.calls = 0
+        self.draining = False
+        self.started_at = time.time()
+
+    async def _own_session(self, ready: asyncio.Future) -> None:
+        try:
+            async with AsyncExitStack() as stack:
+                self.session = await self.session_factory(stack)
+                ready.set_result(None)
+                await self._close.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+        finally:
+            self.session = None
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        if self._task is None:
+            return
+        self._close.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except (asyncio.TimeoutError, Exception):
+            pass
+        self._task = None
+        self.session = None
+        self.pid = None
+
+    async def ping(self, timeout: float) -> bool:
+        if self.session is None:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=timeout)
+            return True
+        except Exception:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        rss = _rss_bytes(self.pid)
+        return {
+            "replica": self.index,
+            "pid": self.pid,
+            "healthy": self.session is not None,
+            "draining": self.draining or self.restarting,
+            "outstanding": self.outstanding,
+            "calls": self.calls,
+            "restarts": self.restarts,
+            "rss_bytes": rss,
+            "memory_growth_bytes": rss - self.baseline_rss if rss is not None and self.baseline_rss else None,
+            "uptime_seconds": round(time.time() - self.started_at, 1) if self.started_at else None
+        }
+
+
+class MCPServerPool:
+    """MCPサーバーのレプリカ群（処理中の呼び出しが最も少ないレプリカに振り分け）"""
+
+    def __init__(
+        self,
+        size: int,
+        session_factory: SessionFactory,
+        health_check_interval_seconds: float = 15.0,
+        ping_timeout_seconds: float = 5.0,
+        max_calls_per_replica: int = 0,
+        max_memory_growth_bytes: int = 0,
+        acquire_timeout_seconds: float = 10.0,
+        track_processes: bool = True
+    ):
+        self.size = size
+        self.health_check_interval_seconds = health_check_interval_seconds
+        self.ping_timeout_seconds = ping_timeout_seconds
+        self.max_calls_per_replica = max_calls_per_replica
+        self.max_memory_growth_bytes = max_memory_growth_bytes
+        self.acquire_timeout_seconds = acquire_timeout_seconds
+        self.replicas = [MCPReplica(index, session_factory, track_processes) for index in range(size)]
+        self.logger = get_mcp_logger()
+        self._spawn_lock = asyncio.Lock()
+        self._monitor_task: Optional[asyncio.Task] = None
+        self._background: Set[asyncio.Task] = set()
+        self._tools_result: Optional[Any] = None
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "MCPServerPool":
+        pool_settings = settings.mcp_pool
+        return cls(
+            size=pool_settings.size,
+            session_factory=session_factory_from_settings(settings),
+            health_check_interval_seconds=pool_settings.health_check_interval_seconds,
+            ping_timeout_seconds=pool_settings.ping_timeout_seconds,
+            max_calls_per_replica=pool_settings.max_calls_per_replica,
+            max_memory_growth_bytes=pool_settings.max_memory_growth_mb * 1024 * 1024,
+            acquire_timeout_seconds=pool_settings.acquire_timeout_seconds,
+            track_processes=settings.mcp.transport == "stdio"
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._monitor_task is not None
+
+    @property
+    def available(self) -> bool:
+        """呼び出しを割り当てられるレプリカがある"""
+        return any(replica.available for replica in self.replicas)
+
+    # ライフサイクル
+
+    def start(self) -> None:
+        """レプリカの起動とヘルスチェックをバックグラウンドで開始"""
+        self._monitor_task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        for task in [self._monitor_task, *self._background]:
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(task for task in [self._monitor_task, *self._background] if task), return_exceptions=True)
+        self._monitor_task = None
+        self._background.clear()
+        await asyncio.gather(*(replica.stop() for replica in self.replicas))
+
+    async def start_replicas(self) -> None:
+        for replica in self.replicas:
+            await self._start_replica(replica)
+
+    async def _run(self) -> None:
+        await self.start_replicas()
+        while True:
+            await asyncio.sleep(self.health_check_interval_seconds)
+            try:
+                await self.check_health()
+            except Exception as e:
+                self.logger.warning("MCP pool health check failed", extra={"error": str(e)})
+
+    async def _start_replica(self, replica: MCPReplica) -> bool:
+        try:
+            await replica.start(self._spawn_lock)
+        except Exception as e:
+            self.logger.warning("MCP replica failed to start", extra={"replica": replica.index, "error": str(e)})
+            get_metrics().increment("mcp_pool.start_failures")
+            return False
+        self._tools_result = None
+        self.logger.info("MCP replica started", extra={"replica": replica.index, "pid": replica.pid})
+        self._update_gauges(replica)
+        return True
+
+    async def restart(self, replica: MCPReplica, reason: str) -> None:
+        """レプリカを停止して起動し直す（処理中の呼び出しの完了を待ってから停止）"""
+        if replica.restarting:
+            return
+        replica.restarting = True
+        try:
+            deadline = time.monotonic() + self.acquire_timeout_seconds
+            while replica.outstanding and replica.session is not None and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            self.logger.info("Restarting MCP replica", extra={"replica": replica.index, "reason": reason})
+            get_metrics().increment("mcp_pool.restarts", reason=reason)
+            await replica.stop()
+            replica.restarts += 1
+            await self._start_replica(replica)
+        finally:
+            replica.restarting = False
+            self._update_gauges(replica)
+
+    def _restart_in_background(self, replica: MCPReplica, reason: str) -> None:
+        if replica.restarting:
+            return
+        task = asyncio.create_task(self.restart(replica, reason))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    # ヘルスチェック・入れ替え
+
+    async def check_health(self) -> None:
+        """停止・応答なしのレプリカを再起動し、メモリ増加量が上限を超えたものを入れ替える"""
+        async def check(replica: MCPReplica) -> None:
+            if replica.restarting:
+                return
+            if not await replica.ping(self.ping_timeout_seconds):
+                await self.restart(replica, "dead" if replica.session is None else "ping_failed")
+                return
+            if self._memory_exceeded(replica):
+                self._recycle(replica, "memory")
+
+        await asyncio.gather(*(check(replica) for replica in self.replicas))
+        get_metrics().set_gauge("mcp_pool.healthy_replicas", sum(1 for r in self.replicas if r.session is not None))
+
+    def _memory_exceeded(self, replica: MCPReplica) -> bool:
+        if not self.max_memory_growth_bytes or replica.baseline_rss is None:
+            return False
+        rss = _rss_bytes(replica.pid)
+        if rss is None:
+            return False
+        get_metrics().set_gauge("mcp_pool.rss_bytes", rss, replica=replica.index)
+        return rss - replica.baseline_rss > self.max_memory_growth_bytes
+
+    def _recycle(self, replica: MCPReplica, reason: str) -> None:
+        # 同時に入れ替えるのは1つまで（他のレプリカで処理を継続する）
+        if any(other.draining or other.restarting for other in self.replicas):
+            return
+        replica.draining = True
+        self._restart_in_background(replica, reason)
+
+    # ClientSession互換のAPI
+
+    async def list_tools(self) -> Any:
+        # ツール定義はレプリカ間で共通のため、再起動までキャッシュする
+        if self._tools_result is None:
+            self._tools_result = await self._dispatch(lambda session: session.list_tools())
+        return self._tools_result
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> Any:
+        return await self._dispatch(lambda session: session.call_tool(name, arguments))
+
+    async def _acquire(self) -> MCPReplica:
+        """処理中の呼び出しが最も少ないレプリカ（再起動中で空きがない場合は待つ）"""
+        deadline = time.monotonic() + self.acquire_timeout_seconds
+        while True:
+            candidates = [replica for replica in self.replicas if replica.available]
+            if candidates:
+                return min(candidates, key=lambda replica: (replica.outstanding, replica.calls))
+            if time.monotonic() >= deadline:
+                raise MCPConnectionError("No MCP replica available")
+            await asyncio.sleep(0.05)
+
+    async def _dispatch(self, request: Callable[[Any], Awaitable[Any]]) -> Any:
+        tried: Set[int] = set()
+        while True:
+            replica = await self._acquire()
+            session = replica.session
+            replica.outstanding += 1
+            self._update_gauges(replica)
+            try:
+                return await request(session)
+            except Exception:
+                # 呼び出しの失敗がプロセスの異常によるものなら、再起動して別のレプリカで1回だけ再試行
+                tried.add(replica.index)
+                if await replica.ping(self.ping_timeout_seconds):
+                    raise
+                self._restart_in_background(replica, "call_failed")
+                if len(tried) > 1 or not any(r.available and r.index not in tried for r in self.replicas):
+                    raise
+                get_metrics().increment("mcp_pool.retries")
+            finally:
+                replica.outstanding -= 1
+                replica.calls += 1
+                self._update_gauges(replica)
+                if self.max_calls_per_replica and replica.calls >= self.max_calls_per_replica:
+                    self._recycle(replica, "max_calls")
+
+    def _update_gauges(self, replica: MCPReplica) -> None:
+        get_metrics().set_gauge("mcp_pool.outstanding", replica.outstanding, replica=replica.index)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "size": self.size,
+            "replicas": [replica.stats() for replica in self.replicas]
+        }
@@ -1,24 +1,218 @@
 from typing import Optional, Dict, Any, List
+import asyncio
 from contextlib import AsyncExitStack
+from functools import lru_cache
 import time
 
 from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
 from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
 from .bedrock_service import BedrockService
-from ..config.settings import Settings
-from ..config.prompts import MCP_SYSTEM_PROMPT, SIMPLE_CHAT_FALLBACK_PROMPT, TABLEAU_ANALYSIS_FALLBACK_PROMPT
+from .local_tools import AggregateCachedResultTool, LocalTool, SearchDatasourceMetadataTool
+from .metadata_index import MetadataIndex, format_field_matches
+from .result_store import ResultStore, StoredResult
+from .tool_prefetch import FirstToolStats, ToolCall, ToolPrefetcher
+from ..config.settings import Settings, get_settings
+from ..config.prompts import (
+    FORCE_FINAL_ANSWER_MESSAGE,
+    MCP_SYSTEM_PROMPT,
+    METADATA_CONTEXT_PROMPT_TEMPLATE,
+    OMITTED_TOOLS_PROMPT_TEMPLATE,
+    REPEATED_TOOL_CALL_NOTE,
+    SIMPLE_CHAT_FALLBACK_PROMPT,
+    STORED_RESULTS_PROMPT_TEMPLATE,
+    TABLEAU_ANALYSIS_FALLBACK_PROMPT,
+    TOOLS_ADDED_MESSAGE_TEMPLATE
+)
 from ..core.exceptions import MCPConnectionError, BedrockError
 from ..core.response_utils import extract_text_from_response, format_tool_execution_log, create_error_message
 from ..core.logging import get_mcp_logger
+from ..core.circuit_breaker import CircuitBreaker
+from ..core.metrics import get_metrics
+from ..core.result_encoding import encode_tool_result, estimate_tokens_from_chars
+from ..core.tool_index import ToolSelection
+from ..core.tool_loop import ToolCallLedger
+
+
+def _build_server_env(settings: Settings) -> Dict[str, str]:
+    """Build environment variables for MCP server"""
+    return {
+        "SERVER": settings.tableau.server or "",
+        "SITE_NAME": settings.tableau.site_name or "",
+        "AUTH": settings.tableau.auth or "",
+        "JWT_SUB_CLAIM": settings.tableau.jwt_sub_claim or "",
+        "CONNECTED_APP_CLIENT_ID": settings.tableau.connected_app_client_id or "",
+        "CONNECTED_APP_SECRET_ID": settings.tableau.connected_app_client_secret or "",
+        "CONNECTED_APP_SECRET_VALUE": settings.tableau.connected_app_secret_value or "",
+        "PAT_NAME": settings.tableau.pat_name or "",
+        "PAT_VALUE": settings.tableau.pat_value or "",
+        "DEFAULT_LOG_LEVEL": settings.mcp.log_level,
+        "EXCLUDE_TOOLS": "",
+    }
+
+
+def build_server_parameters(settings: Settings) -> StdioServerParameters:
+    """Tableau MCPサーバー（stdio）の起動パラメータ"""
+    server_script_path = settings.mcp.server_script_path
+
+    if not server_script_path:
+        raise MCPConnectionError("SERVER_SCRIPT_PATH not configured")
+
+    is_python = server_script_path.endswith(".py")
+    is_js = server_script_path.endswith(".js")
+
+    if not (is_python or is_js):
+        raise MCPConnectionError("Server script must be a .py or .js file")
+
+    command = "python" if is_python else "node"
+    return StdioServerParameters(
+        command=command,
+        args=[server_script_path],
+        env=_build_server_env(settings),
+    )
+
+
+MCP_TRANSPORTS = ("stdio", "streamable-http", "sse")
+
+
+def mcp_server_configured(settings: Settings) -> bool:
+    """設定のトランスポートで接続先（起動スクリプトまたはURL）が指定されている"""
+    if settings.mcp.transport == "stdio":
+        return bool(settings.mcp.server_script_path)
+    return bool(settings.mcp.server_url)
+
+
+def open_transport(settings: Settings):
+    """設定のトランスポートのクライアント（(read, write, ...) を返す非同期コンテキストマネージャ）
+
+    stdioは接続ごとにサーバープロセスを起動する。streamable-http / sse は常駐している
+    1つのサーバーに接続するため、複数のワーカープロセスから同じサーバーを共有できる。
+    """
+    mcp_settings = settings.mcp
+    if mcp_settings.transport == "stdio":
+        return stdio_client(build_server_parameters(settings))
+    if mcp_settings.transport not in MCP_TRANSPORTS:
+        raise MCPConnectionError(f"Unsupported MCP transport: {mcp_settings.transport}")
+    if not mcp_settings.server_url:
+        raise MCPConnectionError("MCP_SERVER_URL not configured")
+
+    headers = None
+    if mcp_settings.server_auth_token:
+        headers = {"Authorization": f"Bearer {mcp_settings.server_auth_token}"}
+    if mcp_settings.transport == "sse":
+        return sse_client(
+            mcp_settings.server_url,
+            headers=headers,
+            timeout=mcp_settings.http_timeout_seconds,
+            sse_read_timeout=mcp_settings.sse_read_timeout_seconds
+        )
+    return streamablehttp_client(
+        mcp_settings.server_url,
+        headers=headers,
+        timeout=mcp_settings.http_timeout_seconds,
+        sse_read_timeout=mcp_settings.sse_read_timeout_seconds
+    )
+
+
+async def open_session(stack: AsyncExitStack, settings: Settings) -> ClientSession:
+    """設定のトランスポートでMCPサーバーに接続し、初期化済みのセッションを返す（切断はstackで行う）"""
+    # streamable-http は (read, write, get_session_id) を返す
+    streams = await stack.enter_async_context(open_transport(settings))
+    session = await stack.enter_async_context(ClientSession(streams[0], streams[1]))
+    await session.initialize()
+    return session
+
+
+@lru_cache()
+def get_mcp_circuit_breaker() -> CircuitBreaker:
+    """MCP接続用のプロセス共有サーキットブレーカー"""
+    settings = get_settings()
+    return CircuitBreaker(
+        "mcp",
+        failure_threshold=settings.mcp.breaker_failure_threshold,
+        base_backoff=settings.mcp.breaker_base_backoff_seconds,
+        max_backoff=settings.mcp.breaker_max_backoff_seconds,
+        probe_timeout=settings.mcp.breaker_probe_timeout_seconds
+    )
+
+
+class KnownToolCatalog:
+    """最後に取得したMCPツール定義（接続完了前の最初のモデル呼び出しで使用）"""
+
+    def __init__(self):
+        self.tools: List[Dict[str, Any]] = []
+        self.updated_at: Optional[float] = None
+
+    def update(self, tools: List[Dict[str, Any]]) -> None:
+        self.tools = list(tools)
+        self.updated_at = time.time()
+
+
+@lru_cache()
+def get_known_tool_catalog() -> KnownToolCatalog:
+    """プロセス共有のツール定義キャッシュ"""
+    return KnownToolCatalog()
+
+
+# 応答を返した後に切断処理を続けるセッション所有タスク（GCされないよう参照を保持）
+_closing_tasks: "set[asyncio.Task]" = set()
+
+
+def _tool_definitions(tools: List[Any]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "name": tool.name,
+            "description": tool.description,
+            "input_schema": tool.inputSchema,
+        }
+        for tool in tools
+    ]
+
+
+def _has_tool_results(messages: List[Dict[str, Any]]) -> bool:
+    """ツール結果をモデルに返した後の呼び出しか"""
+    return any(
+        isinstance(block, dict) and block.get("type") == "tool_result"
+        for message in messages
+        if isinstance(message.get("content"), list)
+        for block in message["content"]
+    )
+
+
+@lru_cache()
+def get_first_tool_stats() -> FirstToolStats:
+    """会話の最初に呼ばれたツールの集計（プロセス共有、先行実行の予測に使用）"""
+    return FirstToolStats()
 
 
 class MCPService:
-    def __init__(self, settings: Settings):
+    def __init__(
+        self,
+        settings: Settings,
+        result_store: Optional[ResultStore] = None,
+        metadata_index: Optional[MetadataIndex] = None,
+        mcp_pool: Optional[Any] = None
+    ):
         self.settings = settings
+        self.metadata_index = metadata_index
+        # 常駐MCPサーバープール（MCPServerPool）。利用可能な場合はプロセスを起動せずセッションとして使う
+        self.mcp_pool = mcp_pool
         self.bedrock_service: Optional[BedrockService] = None
         self.session: Optional[ClientSession] = None
         self.exit_stack = AsyncExitStack()
         self._is_connected = False
+        self.result_store = result_store
+        self.conversation_id: Optional[str] = None
+        self.local_tools: Dict[str, LocalTool] = {}
+        self.turn_result_ids: List[str] = []
+        # 直近の応答で参照したデータソース（回答キャッシュのバージョン管理に使用）
+        self.turn_datasource_luids: List[str] = []
+        self._prefetcher: Optional[ToolPrefetcher] = None
+        # start_connect() によるバックグラウンド接続（結果は接続できたかどうか）
+        self._connecting: Optional[asyncio.Future] = None
+        self._close_requested: Optional[asyncio.Event] = None
+        self._owner_task: Optional[asyncio.Task] = None
         self.logger = get_mcp_logger()
 
     def set_bedrock_service(self, bedrock_service: BedrockService):
@@ -27,56 +221,108 @@ class MCPService:
 
     async def connect(self) -> bool:
         """MCPサーバーに接続を試行"""
+        if self._use_pool():
+            return True
+        if not self._allow_connect():
+            return False
+        return await self._connect_with_breaker()
+
+    def start_connect(self) -> None:
+        """MCPサーバーへの接続をバックグラウンドで開始する
+
+        最初のモデル呼び出しを接続完了と並行して行うため、接続は専用のタスクで行い、
+        ツールの実行時に初めて完了を待つ。stdioセッションは開始したタスク内で閉じる
+        必要があるため、切断も同じタスクで cleanup() の要求を受けて行う。
+        """
+        if self._use_pool() or not self._allow_connect():
+            return
+        self._connecting = asyncio.get_running_loop().create_future()
+        self._close_requested = asyncio.Event()
+        self._owner_task = asyncio.create_task(self._own_session())
+        self._owner_task.add_done_callback(self._on_owner_done)
+
+    @property
+    def connection_pending(self) -> bool:
+        """バックグラウンド接続が完了していない"""
+        return self._connecting is not None and not self._connecting.done()
+
+    async def wait_for_session(self) -> bool:
+        """接続中の場合は完了を待ち、セッションが利用可能か返す"""
+        if self.connection_pending:
+            start_time = time.time()
+            await asyncio.shield(self._connecting)
+            get_metrics().observe("mcp.connect.wait_seconds", time.time() - start_time)
+        return self.session is not None
+
+    def _use_pool(self) -> bool:
+        """常駐プールに利用可能なレプリカがあればセッションとして使う（なければ個別に起動）"""
+        if self.mcp_pool is None or not self.mcp_pool.available:
+            return False
+        self.session = self.mcp_pool
+        self._is_connected = True
+        return True
+
+    def _allow_connect(self) -> bool:
+        breaker = get_mcp_circuit_breaker()
+        if breaker.allow_request():
+            return True
+        self.logger.info(
+            "MCP circuit breaker is open, using fallback mode without connecting",
+            extra={"breaker_state": breaker.state.value}
+        )
+        self._is_connected = False
+        return False
+
+    async def _connect_with_breaker(self) -> bool:
+        breaker = get_mcp_circuit_breaker()
         start_time = time.time()
         try:
             self.logger.info("MCP server connection attempt started")
             await self._connect_to_server()
             self._is_connected = True
+            breaker.record_success()
             duration = time.time() - start_time
             self.logger.info("MCP server connected successfully", extra={"duration": duration})
+            get_metrics().observe("mcp.connect_seconds", duration)
             return True
         except Exception as e:
+            breaker.record_failure()
             duration = time.time() - start_time
             self.logger.warning(
                 "Could not connect to MCP server, using fallback mode",
-                extra={"error": str(e), "duration": duration}
+                extra={"error": str(e), "duration": duration, "breaker_state": breaker.state.value}
             )
             self._is_connected = False
             return False
+        except BaseException:
+            # キャンセル等で結果を記録できない場合もプローブ枠を解放する（ブレーカーが開いたままにならないよう）
+            breaker.release_probe()
+            self._is_connected = False
+            raise
+
+    async def _own_session(self) -> None:
+        """接続から切断までを1つのタスクで行う"""
+        try:
+            connected = await self._connect_with_breaker()
+            self._connecting.set_result(connected)
+            if connected:
+                await self._close_requested.wait()
+        finally:
+            self._is_connected = False
+            self.session = None
+            try:
+                await self.exit_stack.aclose()
+            except Exception as e:
+                self.logger.debug("MCP session teardown failed", extra={"error": str(e)})
 
     async def _connect_to_server(self):
         """Connect to the MCP Tableau server"""
-        server_script_path = self.settings.mcp.server_script_path
-
-        if not server_script_path:
-            raise MCPConnectionError("SERVER_SCRIPT_PATH not configured")
-
-        is_python = server_script_path.endswith(".py")
-        is_js = server_script_path.endswith(".js")
-
-        if not (is_python or is_js):
-            raise MCPConnectionError("Server script must be a .py or .js file")
-
-        command = "python" if is_python else "node"
-        server_params = StdioServerParameters(
-            command=command,
-            args=[server_script_path],
-            env=self._build_server_env(),
-        )
-
         try:
-            stdio_transport = await self.exit_stack.enter_async_context(
-                stdio_client(server_params)
-            )
-            self.stdio, self.write = stdio_transport
-            self.session = await self.exit_stack.enter_async_context(
-                ClientSession(self.stdio, self.write)
-            )
-
-            await self.session.initialize()
+            self.session = await open_session(self.exit_stack, self.settings)
 
             response = await self.session.list_tools()
             tools = response.tools
+            get_known_tool_catalog().update(_tool_definitions(tools))
             tool_names = [tool.name for tool in tools]
             self.logger.info(
                 f"Connected to MCP server with {len(tools)} tools",
@@ -86,39 +332,21 @@ class MCPService:
         except Exception as e:
             raise MCPConnectionError(f"Failed to connect to MCP server: {str(e)}")
 
-    def _build_server_env(self) -> Dict[str, str]:
-        """Build environment variables for MCP server"""
-        return {
-            "SERVER": self.settings.tableau.server or "",
-            "SITE_NAME": self.settings.tableau.site_name or "",
-            "AUTH": self.settings.tableau.auth or "",
-            "JWT_SUB_CLAIM": self.settings.tableau.jwt_sub_claim or "",
-            "CONNECTED_APP_CLIENT_ID": self.settings.tableau.connected_app_client_id or "",
-            "CONNECTED_APP_SECRET_ID": self.settings.tableau.connected_app_client_secret or "",
-            "CONNECTED_APP_SECRET_VALUE": self.settings.tableau.connected_app_secret_value or "",
-            "PAT_NAME": self.settings.tableau.pat_name or "",
-            "PAT_VALUE": self.settings.tableau.pat_value or "",
-            "DEFAULT_LOG_LEVEL": self.settings.mcp.log_level,
-            "EXCLUDE_TOOLS": "",
-        }
-
     async def get_available_tools(self) -> List[Dict[str, Any]]:
         """Get list of available tools from MCP server"""
         if not self.session:
             await self._connect_to_server()
 
         response = await self.session.list_tools()
-        return [
-            {
-                "name": tool.name,
-                "description": tool.description,
-                "input_schema": tool.inputSchema,
-            }
-            for tool in response.tools
-        ]
+        tools = _tool_definitions(response.tools)
+        get_known_tool_catalog().update(tools)
+        tools.extend(tool.definition() for tool in self.local_tools.values())
+        return tools
 
     async def call_tool(self, tool_name: str, tool_args: Dict[str, Any]):
         """Execute a tool call via MCP"""
+        if not self.session and self.connection_pending:
+            await self.wait_for_session()
         if not self.session:
             raise MCPConnectionError("MCP session not initialized. Call connect_to_server() first.")
 
@@ -140,22 +368,34 @@ class MCPService:
             )
             raise MCPConnectionError(f"Tool execution failed for {tool_name}: {str(e)}")
 
-    async def process_chat_with_history(self, messages: List[Dict[str, Any]]) -> str:
+    async def process_chat_with_history(
+        self,
+        messages: List[Dict[str, Any]],
+        conversation_id: Optional[str] = None
+    ) -> str:
         """チャット履歴を含むクエリ処理"""
         start_time = time.time()
         message_count = len(messages)
+        self._set_conversation(conversation_id)
         self.logger.info(
             f"Processing chat with {message_count} messages",
             extra={"message_count": message_count, "has_mcp": self._is_connected}
         )
 
+        stored_before = self._stored_result_ids()
+        self.turn_datasource_luids = []
+
         try:
-            if self._is_connected:
+            if self._is_connected or self.connection_pending:
                 result = await self._process_query_with_tools(messages)
             else:
                 # MCP未接続時のフォールバック
                 result = await self._simple_chat_fallback(messages)
 
+            self.turn_result_ids = [
+                result_id for result_id in self._stored_result_ids() if result_id not in stored_before
+            ]
+
             duration = time.time() - start_time
             self.logger.info(
                 "Chat processing completed",
@@ -175,30 +415,45 @@ class MCPService:
         final_text = []
 
         try:
-            # MCPが接続されている場合のみツールを使用
-            if self.session:
-                available_tools = await self.get_available_tools()
-            else:
-                available_tools = []
+            # MCPが接続されている（または接続中）場合のみツールを使用
+            available_tools = await self._tools_for_first_call()
 
             self.logger.debug(f"Available tools: {[tool['name'] for tool in available_tools]}", extra={"tool_count": len(available_tools)})
 
             system_prompt = (
-                MCP_SYSTEM_PROMPT if available_tools
+                self._build_system_prompt() if available_tools
                 else TABLEAU_ANALYSIS_FALLBACK_PROMPT
             )
 
-            response = self.bedrock_service.create_message(
+            if available_tools:
+                system_prompt += self._build_metadata_context(messages)
+
+            selection = self._select_tools(available_tools, messages)
+            if selection.omitted_names:
+                omitted_prompt = OMITTED_TOOLS_PROMPT_TEMPLATE.format(tools=", ".join(selection.omitted_names))
+                selection.overhead_tokens = estimate_tokens_from_chars(len(omitted_prompt))
+                system_prompt += omitted_prompt
+
+            # 会話の開始時は、最初に要求されそうなツールをモデル呼び出しと並行して実行しておく
+            chat_start = self._is_chat_start(messages)
+            if chat_start:
+                self._prefetcher = self._start_prefetch(available_tools)
+
+            response = await asyncio.to_thread(
+                self._create_routed_message,
                 messages=messages,
-                tools=available_tools if available_tools else None,
+                tools=self._selected_tools(selection),
                 system=system_prompt
             )
+            if chat_start:
+                get_first_tool_stats().record([(c.name, c.input) for c in response.content if c.type == "tool_use"])
 
-            process_query = True
+            ledger = ToolCallLedger(self.settings.mcp.max_unproductive_iterations)
             max_iterations = self.settings.mcp.max_iterations
             iteration = 0
+            outcome = "answered"
 
-            while process_query and iteration < max_iterations:
+            while True:
                 iteration += 1
                 assistant_message_content = []
 
@@ -215,28 +470,28 @@ class MCPService:
                 # ツール使用ブロックを確認
                 tool_use_blocks = [c for c in response.content if c.type == "tool_use"]
 
-                if tool_use_blocks and self.session:
+                # 送信していないツールを要求された場合は次の呼び出しから追加する
+                added_tools = self._expand_tool_selection(selection, response.content)
+                answered = any(c.type == "text" and c.text.strip() for c in response.content)
+
+                # 接続中の場合はツールが要求された時点で初めて完了を待つ
+                if tool_use_blocks and await self.wait_for_session():
                     # アシスタントメッセージを追加
                     messages.append(
                         {"role": "assistant", "content": assistant_message_content}
                     )
 
-                    # ツールを実行して結果を追加
-                    tool_results = []
-                    for content in tool_use_blocks:
-                        try:
-                            result = await self.call_tool(content.name, content.input)
-                            tool_results.append({
-                                "type": "tool_result",
-                                "tool_use_id": content.id,
-                                "content": result.content if hasattr(result, 'content') else str(result),
-                            })
-                        except Exception as e:
-                            tool_results.append({
-                                "type": "tool_result",
-                                "tool_use_id": content.id,
-                                "content": f"ツールの実行でエラーが発生しました: {str(e)}",
-                            })
+                    # ツールを実行して結果を追加（同じ引数での再呼び出しは前回の結果を返す）
+                    tool_results = [await self._run_tool_call(content, ledger) for content in tool_use_blocks]
+
+                    cycling = self.settings.mcp.tool_call_dedup_enabled and ledger.end_iteration()
+                    if cycling or iteration >= max_iterations:
+                        # 堂々巡り・上限到達時はツール結果と一緒に最終回答を指示する
+                        outcome = "forced_cycle" if cycling else "forced_limit"
+                        tool_results.append({"type": "text", "text": FORCE_FINAL_ANSWER_MESSAGE})
+                        messages.append({"role": "user", "content": tool_results})
+                        response_text = await self._force_final_answer(messages, selection, system_prompt, final_text)
+                        break
 
                     messages.append({
                         "role": "user",
@@ -244,27 +499,397 @@ class MCPService:
                     })
 
                     # ツール結果を含む次のレスポンスを取得
-                    response = self.bedrock_service.create_message(
+                    response = await asyncio.to_thread(
+                        self._create_routed_message,
                         messages=messages,
-                        tools=available_tools,
+                        tools=self._selected_tools(selection),
+                        system=system_prompt
+                    )
+                elif tool_use_blocks and self._connecting is not None:
+                    # 既知のツール定義で呼び出されたが、MCPに接続できなかった
+                    outcome = "mcp_unavailable"
+                    messages.append({"role": "assistant", "content": assistant_message_content})
+                    tool_results = [
+                        {
+                            "type": "tool_result",
+                            "tool_use_id": content.id,
+                            "content": "ツールの実行でエラーが発生しました: MCPサーバーに接続できません",
+                        }
+                        for content in tool_use_blocks
+                    ]
+                    tool_results.append({"type": "text", "text": FORCE_FINAL_ANSWER_MESSAGE})
+                    messages.append({"role": "user", "content": tool_results})
+                    response_text = await self._force_final_answer(messages, selection, system_prompt, final_text)
+                    break
+                elif added_tools and not answered and iteration < max_iterations:
+                    # 回答を返さずに未送信のツールを要求された場合は、追加して応答を続けさせる
+                    messages.append({"role": "assistant", "content": assistant_message_content})
+                    messages.append({
+                        "role": "user",
+                        "content": TOOLS_ADDED_MESSAGE_TEMPLATE.format(tools=", ".join(added_tools))
+                    })
+                    response = await asyncio.to_thread(
+                        self._create_routed_message,
+                        messages=messages,
+                        tools=self._selected_tools(selection),
                         system=system_prompt
                     )
                 else:
                     # ツール使用なし、完了
-                    process_query = False
-                    response_text = final_text[-1]
+                    response_text = final_text[-1] if final_text else ""
+                    break
 
+            get_metrics().observe("mcp.agent_loop.iterations", iteration, outcome=outcome)
+            self.logger.info(
+                "Agent loop finished",
+                extra={
+                    "iterations": iteration,
+                    "outcome": outcome,
+                    "tool_calls": ledger.calls,
+                    "repeated_tool_calls": ledger.repeats
+                }
+            )
             self.logger.debug("Query processing result", extra={"response_length": len("\n".join(final_text))})
             # return "\n".join(final_text)
             return response_text
 
         except Exception as e:
             raise BedrockError(f"Query processing failed: {str(e)}")
+        finally:
+            self._finish_prefetch()
+
+    def _on_owner_done(self, task: asyncio.Task) -> None:
+        if self._connecting is not None and not self._connecting.done():
+            # ツールが不要なまま応答が完了し、接続中に破棄された
+            self._connecting.set_result(False)
+            get_mcp_circuit_breaker().release_probe()
+            get_metrics().increment("mcp.connect.abandoned")
+
+    async def _tools_for_first_call(self) -> List[Dict[str, Any]]:
+        """最初のモデル呼び出しに使うツール定義
+
+        接続中で既知のツール定義がある場合は接続を待たずにそれを使う（定義が古い場合は
+        ツール実行時のエラーとしてモデルに返る）。既知の定義がなければ接続完了を待つ。
+        """
+        catalog = get_known_tool_catalog()
+        if self.connection_pending and catalog.tools:
+            get_metrics().increment("mcp.connect.overlapped")
+            return catalog.tools + [tool.definition() for tool in self.local_tools.values()]
+        if await self.wait_for_session():
+            return await self.get_available_tools()
+        return []
+
+    @staticmethod
+    def _is_chat_start(messages: List[Dict[str, Any]]) -> bool:
+        return len(messages) == 1 and messages[0]["role"] == "user"
+
+    def _predict_first_tools(self, available_tools: List[Dict[str, Any]]) -> List[ToolCall]:
+        """設定したツールと、過去の会話で最初に呼ばれることが多かったツール呼び出し"""
+        mcp_settings = self.settings.mcp
+        mcp_tool_names = {tool["name"] for tool in available_tools} - set(self.local_tools)
+        predicted = [(name, {}) for name in mcp_settings.prefetch_tools]
+        predicted += get_first_tool_stats().predict(
+            mcp_settings.prefetch_min_share,
+            mcp_settings.prefetch_min_samples,
+            mcp_settings.prefetch_max_tools
+        )
+        return [(name, args) for name, args in predicted if name in mcp_tool_names]
+
+    def _start_prefetch(self, available_tools: List[Dict[str, Any]]) -> Optional[ToolPrefetcher]:
+        if not (self.settings.mcp.prefetch_enabled and (self.session or self.connection_pending)):
+            return None
+        calls = self._predict_first_tools(available_tools)
+        if not calls:
+            return None
+        prefetcher = ToolPrefetcher(self.call_tool, ttl_seconds=self.settings.mcp.prefetch_ttl_seconds)
+        prefetcher.start(calls)
+        return prefetcher
+
+    def _finish_prefetch(self) -> None:
+        if self._prefetcher is None:
+            return
+        issued, hits = self._prefetcher.finish()
+        self._prefetcher = None
+        get_first_tool_stats().record_outcome(issued, hits)
+        self.logger.info("Prefetch finished", extra={"prefetched": issued, "prefetch_hits": hits})
+
+    async def _run_tool_call(self, content: Any, ledger: ToolCallLedger) -> Dict[str, Any]:
+        """tool_useブロックを実行してtool_resultブロックを返す"""
+        previous = ledger.lookup(content.name, content.input) if self.settings.mcp.tool_call_dedup_enabled else None
+        if previous is not None:
+            self.logger.info(f"Repeated tool call served from earlier result: {content.name}", extra={"tool": content.name})
+            get_metrics().increment("mcp.tool_call.repeats", tool=content.name)
+            text = REPEATED_TOOL_CALL_NOTE + previous
+        else:
+            try:
+                text = await self._execute_tool(content.name, content.input)
+                ledger.record(content.name, content.input, text)
+            except Exception as e:
+                text = f"ツールの実行でエラーが発生しました: {str(e)}"
+        return {"type": "tool_result", "tool_use_id": content.id, "content": text}
+
+    async def _force_final_answer(
+        self,
+        messages: List[Dict[str, Any]],
+        selection: ToolSelection,
+        system_prompt: str,
+        final_text: List[str]
+    ) -> str:
+        """ツールを呼ばずに最終回答を生成させる
+
+        履歴にツール呼び出しを含むためツール定義は送る必要がある。それでもツールを
+        呼び出した場合は、応答中のテキストかそれまでのテキストを回答とする。
+        """
+        response = await asyncio.to_thread(
+            self.bedrock_service.create_message,
+            messages=messages,
+            tools=self._selected_tools(selection),
+            system=system_prompt,
+            tier="final"
+        )
+        text = "\n".join(c.text for c in response.content if c.type == "text" and c.text)
+        if text:
+            final_text.append(text)
+            return text
+        return final_text[-1] if final_text else create_error_message("チャット処理")
+
+    @staticmethod
+    def _recent_user_text(messages: List[Dict[str, Any]], turns: int = 3) -> str:
+        """直近のユーザー発言（ツール結果を除く）を連結"""
+        user_texts = [
+            message["content"] for message in messages
+            if message.get("role") == "user" and isinstance(message.get("content"), str)
+        ]
+        return "\n".join(user_texts[-turns:])
+
+    def _build_metadata_context(self, messages: List[Dict[str, Any]]) -> str:
+        """メタデータインデックスから質問に関連するフィールドをプロンプト用に抽出"""
+        if not (self.metadata_index and len(self.metadata_index)):
+            return ""
+        matches = self.metadata_index.search(
+            self._recent_user_text(messages, turns=1),
+            limit=self.settings.metadata_index.prompt_max_fields
+        )
+        get_metrics().increment("metadata_index.lookups", result="hit" if matches else "miss")
+        if not matches:
+            return ""
+        return METADATA_CONTEXT_PROMPT_TEMPLATE.format(fields=format_field_matches(matches))
+
+    def _select_tools(self, available_tools: List[Dict[str, Any]], messages: List[Dict[str, Any]]) -> ToolSelection:
+        """直近のユーザー発言に関連するツール（固定セット＋BM25上位N件）を選ぶ"""
+        mcp_settings = self.settings.mcp
+        selection = ToolSelection(
+            available_tools,
+            query=self._recent_user_text(messages),
+            pinned=[*mcp_settings.tool_selection_pinned, *self.local_tools],
+            top_n=mcp_settings.tool_selection_top_n,
+            enabled=mcp_settings.tool_selection_enabled
+        )
+        self.logger.info(
+            "Tools selected",
+            extra={
+                "selected": selection.names,
+                "tool_count": len(available_tools),
+                "full_tokens": selection.full_tokens,
+                "selected_tokens": selection.tokens
+            }
+        )
+        return selection
+
+    def _selected_tools(self, selection: ToolSelection) -> Optional[List[Dict[str, Any]]]:
+        """モデル呼び出しごとに送るツールを返し、削減した入力トークン数を記録"""
+        tools = selection.tools
+        if not tools:
+            return None
+        tokens_saved = selection.tokens_saved
+        self.logger.debug(
+            "Tool definitions sent",
+            extra={"tool_count": len(tools), "tokens_saved": tokens_saved}
+        )
+        get_metrics().increment("mcp.tool_selection.input_tokens_saved", tokens_saved)
+        get_metrics().observe("mcp.tool_selection.tools_sent", len(tools))
+        return tools
+
+    def _expand_tool_selection(self, selection: ToolSelection, content_blocks: List[Any]) -> List[str]:
+        """未送信ツールの呼び出し・言及があれば選択に追加し、追加したツール名を返す
+
+        テキスト中の言及は、ツール呼び出しで応答が続く場合のみ追加する（ツール名に触れただけの
+        最終回答を捨てて呼び直さないため）。
+        """
+        continues = any(content.type == "tool_use" for content in content_blocks)
+        requested = []
+        for content in content_blocks:
+            if content.type == "tool_use" and content.name not in selection:
+                requested.append(content.name)
+            elif content.type == "text" and continues:
+                requested.extend(selection.mentioned_missing(content.text))
+
+        added = selection.add(requested)
+        if added:
+            self.logger.info("Tool selection expanded", extra={"added": added})
+            get_metrics().increment("mcp.tool_selection.expansions", len(added))
+        return added
+
+    def _set_conversation(self, conversation_id: Optional[str]) -> None:
+        """会話IDを設定し、会話単位のローカルツールを登録"""
+        self.conversation_id = conversation_id
+        self.local_tools = {}
+        if self.result_store and conversation_id:
+            tool = AggregateCachedResultTool(
+                self.result_store,
+                conversation_id,
+                max_rows=self.settings.mcp.tool_result_max_rows,
+                max_bytes=self.settings.mcp.tool_result_max_bytes
+            )
+            self.local_tools[tool.name] = tool
+        if self.metadata_index and len(self.metadata_index):
+            tool = SearchDatasourceMetadataTool(
+                self.metadata_index,
+                default_limit=self.settings.metadata_index.prompt_max_fields
+            )
+            self.local_tools[tool.name] = tool
+
+    def _stored_result_ids(self) -> List[str]:
+        if not (self.result_store and self.conversation_id):
+            return []
+        return [stored.result_id for stored in self.result_store.list(self.conversation_id)]
+
+    def turn_results(self) -> List[StoredResult]:
+        """直近の応答で保存した結果（回答キャッシュにハンドルの内容として保持する）"""
+        if not (self.result_store and self.conversation_id):
+            return []
+        results = [self.result_store.get(self.conversation_id, result_id) for result_id in self.turn_result_ids]
+        return [stored for stored in results if stored is not None]
+
+    def create_data_handle(self) -> Optional[str]:
+        """直近の応答の根拠となったツールデータへのハンドルを発行"""
+        if not (self.result_store and self.conversation_id and self.turn_result_ids):
+            return None
+        return self.result_store.create_handle(self.conversation_id, self.turn_result_ids)
+
+    def _build_system_prompt(self) -> str:
+        """MCP用システムプロンプトに会話内の取得済み結果の案内を追加"""
+        if not (self.result_store and self.conversation_id):
+            return MCP_SYSTEM_PROMPT
+
+        stored_results = self.result_store.list(self.conversation_id)
+        if not stored_results:
+            return MCP_SYSTEM_PROMPT
+
+        results = "\n".join(f"- {stored.describe()}" for stored in stored_results)
+        return MCP_SYSTEM_PROMPT + STORED_RESULTS_PROMPT_TEMPLATE.format(results=results)
+
+    async def _execute_tool(self, tool_name: str, tool_args: Dict[str, Any]) -> str:
+        """ローカルツールまたはMCPツールを実行し、プロンプト用テキストを返す"""
+        local_tool = self.local_tools.get(tool_name)
+        if local_tool:
+            start_time = time.time()
+            text = await local_tool.run(tool_args)
+            self.logger.info(
+                f"Local tool executed: {tool_name}",
+                extra={"tool": tool_name, "duration": time.time() - start_time}
+            )
+            get_metrics().increment("mcp.local_tool.calls", tool=tool_name)
+            return text
+
+        datasource_luid = tool_args.get("datasourceLuid")
+        if datasource_luid and datasource_luid not in self.turn_datasource_luids:
+            self.turn_datasource_luids.append(datasource_luid)
+
+        result = await self._prefetcher.take(tool_name, tool_args) if self._prefetcher else None
+        if result is None:
+            result = await self.call_tool(tool_name, tool_args)
+        return self._encode_tool_result(tool_name, result, tool_args)
+
+    def _encode_tool_result(self, tool_name: str, result: Any, tool_args: Optional[Dict[str, Any]] = None) -> str:
+        """ツール結果をコンパクトな表形式に変換し、削減トークン数を記録"""
+        content = result.content if hasattr(result, 'content') else str(result)
+        encoded = encode_tool_result(
+            content,
+            max_rows=self.settings.mcp.tool_result_max_rows,
+            max_bytes=self.settings.mcp.tool_result_max_bytes,
+            digest_min_rows=(
+                self.settings.mcp.tool_result_digest_min_rows
+                if self.settings.mcp.tool_result_digest_enabled else None
+            ),
+            digest_sample_rows=self.settings.mcp.tool_result_digest_sample_rows
+        )
+
+        self.logger.info(
+            f"Tool result encoded: {tool_name}",
+            extra={
+                "tool": tool_name,
+                "row_count": encoded.row_count,
+                "truncated": encoded.truncated,
+                "digested": encoded.digested,
+                "original_tokens": encoded.original_tokens,
+                "encoded_tokens": encoded.encoded_tokens,
+                "tokens_saved": encoded.tokens_saved
+            }
+        )
+        get_metrics().increment("mcp.tool_result.tokens_saved", encoded.tokens_saved, tool=tool_name)
+
+        if encoded.rows and self.result_store and self.conversation_id:
+            stored = self.result_store.put(self.conversation_id, tool_name, tool_args or {}, encoded.rows)
+            if stored:
+                return f"[resultId: {stored.result_id}]\n{encoded.text}"
+
+        return encoded.text
+
+    def _create_routed_message(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]],
+        system: str
+    ):
+        """最初のツール選択ステップは高速モデル、ツール結果を受け取った後はユーザー選択モデルで生成する
+
+        ツール結果を踏まえた応答は最終回答になることが多いため、同じ呼び出しを両方のモデルで
+        行わないよう最初からユーザー選択モデルを使う。高速モデルがツールを使わずに回答した場合は
+        その回答を返し、出力上限で打ち切られた場合のみユーザー選択モデルで生成し直す。
+        """
+        fast_model_id = self.settings.bedrock.fast_model_id
+        if (
+            not tools
+            or not fast_model_id
+            or fast_model_id == self.bedrock_service.bedrock_model_id
+            or _has_tool_results(messages)
+        ):
+            return self.bedrock_service.create_message(
+                messages=messages,
+                tools=tools,
+                system=system,
+                tier="final"
+            )
+
+        response = self.bedrock_service.create_message(
+            messages=messages,
+            tools=tools,
+            system=system,
+            model_id=fast_model_id,
+            max_tokens=min(self.settings.bedrock.fast_max_tokens, self.bedrock_service.max_tokens),
+            tier="planning"
+        )
+
+        if response.stop_reason != "max_tokens":
+            return response
+
+        self.logger.debug(
+            "Planning tier answer was truncated, escalating to final tier",
+            extra={"stop_reason": response.stop_reason}
+        )
+        return self.bedrock_service.create_message(
+            messages=messages,
+            tools=tools,
+            system=system,
+            tier="final"
+        )
 
     async def _simple_chat_fallback(self, messages: List[Dict[str, Any]]) -> str:
         """MCP未接続時のシンプルな対話処理"""
         try:
-            response = self.bedrock_service.create_message(
+            response = await asyncio.to_thread(
+                self.bedrock_service.create_message,
                 messages=messages,
                 system=SIMPLE_CHAT_FALLBACK_PROMPT
             )
@@ -275,7 +900,25 @@ class MCPService:
             return create_error_message("チャット処理")
 
     async def cleanup(self):
-        """リソースクリーンアップ"""
+        """リソースクリーンアップ
+
+        start_connect() で接続した場合は所有タスクに切断を要求し、完了を待たずに戻る
+        （接続中であれば接続ごと破棄する）。
+        """
+        if self.mcp_pool is not None and self.session is self.mcp_pool:
+            # プールのレプリカは共有のため閉じない
+            self.session = None
+            self._is_connected = False
+            return
+        if self._owner_task is not None:
+            self._close_requested.set()
+            if self.connection_pending:
+                self._owner_task.cancel()
+            if not self._owner_task.done():
+                _closing_tasks.add(self._owner_task)
+                self._owner_task.add_done_callback(_closing_tasks.discard)
+            self._owner_task = None
+            return
         if self._is_connected:
             await self.exit_stack.aclose()
 
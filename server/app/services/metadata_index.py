@@ -0,0 +1,363 @@
+"""Tableauデータソース・フィールドのメタデータをローカルに保持する転置インデックス
+
+バックグラウンドのインデクサーが専用のMCPセッションで list-datasources /
+get-datasource-metadata を定期実行し、更新されたデータソースのみ再取得する。
+チャット処理では質問に関連するフィールドをプロンプトに含めたり、ローカルツールで
+検索したりすることで、Tableauへのメタデータ取得の往復を省く。
+"""
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..config.settings import Settings
+from ..core.logging import get_logger
+from ..core.metrics import get_metrics
+from ..core.result_encoding import extract_result_text
+from ..core.tool_index import tokenize
+
+LIST_DATASOURCES_TOOL = "list-datasources"
+DATASOURCE_METADATA_TOOL = "get-datasource-metadata"
+
+# データソース名に一致した場合のフィールドへの加点比率
+_DATASOURCE_NAME_WEIGHT = 0.5
+
+
+@dataclass
+class FieldInfo:
+    name: str
+    caption: Optional[str] = None
+    data_type: Optional[str] = None
+    role: Optional[str] = None
+    description: Optional[str] = None
+
+    def describe(self) -> str:
+        label = self.name
+        if self.caption and self.caption != self.name:
+            label += f" [{self.caption}]"
+        details = ", ".join(value for value in (self.data_type, self.role) if value)
+        return f"{label} ({details})" if details else label
+
+
+@dataclass
+class DatasourceInfo:
+    luid: str
+    name: str
+    project: Optional[str] = None
+    updated_at: Optional[str] = None
+    fields: List[FieldInfo] = field(default_factory=list)
+    indexed_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class FieldMatch:
+    datasource: DatasourceInfo
+    field_info: FieldInfo
+    score: float
+
+
+def _load_json(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_datasource_list(text: str) -> List[DatasourceInfo]:
+    """list-datasources の結果からデータソース一覧を取り出す"""
+    payload = _load_json(text)
+    if isinstance(payload, dict):
+        payload = payload.get("datasources") or payload.get("data") or []
+    if not isinstance(payload, list):
+        return []
+
+    datasources = []
+    for item in payload:
+        if not isinstance(item, dict):
+            continue
+        luid = item.get("id") or item.get("luid")
+        if not luid or not item.get("name"):
+            continue
+        project = item.get("project")
+        datasources.append(DatasourceInfo(
+            luid=str(luid),
+            name=str(item["name"]),
+            project=project.get("name") if isinstance(project, dict) else project,
+            updated_at=item.get("updatedAt") or item.get("updated_at")
+        ))
+    return datasources
+
+
+def parse_datasource_metadata(text: str) -> List[FieldInfo]:
+    """get-datasource-metadata の結果からフィールド一覧を取り出す（新旧の出力形式に対応）"""
+    payload = _load_json(text)
+    if isinstance(payload, dict):
+        payload = payload.get("fields") or payload.get("data") or []
+    if not isinstance(payload, list):
+        return []
+
+    fields = []
+    for item in payload:
+        if not isinstance(item, dict):
+            continue
+        name = item.get("name") or item.get("fieldName")
+        if not name:
+            continue
+        fields.append(FieldInfo(
+            name=str(name),
+            caption=item.get("fieldCaption") or item.get("caption"),
+            data_type=item.get("dataType"),
+            role=item.get("role") or item.get("columnClass"),
+            description=item.get("description")
+        ))
+    return fields
+
+
+def _field_text(info: FieldInfo) -> str:
+    return " ".join(value for value in (info.name, info.caption, info.data_type, info.role) if value)
+
+
+class MetadataIndex:
+    """データソース名・フィールド名・キャプション・型に対する転置インデックス"""
+
+    def __init__(self):
+        self._datasources: Dict[str, DatasourceInfo] = {}
+        # 語 -> {(データソースLUID, フィールド位置): 出現数}
+        self._field_postings: Dict[str, Dict[Tuple[str, int], int]] = defaultdict(dict)
+        # 語 -> データソース名にその語を含むデータソースLUID
+        self._datasource_postings: Dict[str, set] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._datasources)
+
+    @property
+    def field_count(self) -> int:
+        with self._lock:
+            return sum(len(datasource.fields) for datasource in self._datasources.values())
+
+    def get(self, luid: str) -> Optional[DatasourceInfo]:
+        return self._datasources.get(luid)
+
+    def datasources(self) -> List[DatasourceInfo]:
+        with self._lock:
+            return list(self._datasources.values())
+
+    def versions(self) -> Dict[str, Optional[str]]:
+        """データソースLUIDごとの更新日時（データ鮮度のバージョンとして使用）"""
+        with self._lock:
+            return {luid: datasource.updated_at for luid, datasource in self._datasources.items()}
+
+    def upsert(self, datasource: DatasourceInfo) -> None:
+        with self._lock:
+            self._remove_postings(datasource.luid)
+            self._datasources[datasource.luid] = datasource
+            for term in set(tokenize(datasource.name, expand_aliases=False)):
+                self._datasource_postings[term].add(datasource.luid)
+            for position, info in enumerate(datasource.fields):
+                for term in tokenize(_field_text(info), expand_aliases=False):
+                    postings = self._field_postings[term]
+                    postings[(datasource.luid, position)] = postings.get((datasource.luid, position), 0) + 1
+
+    def remove(self, luid: str) -> None:
+        with self._lock:
+            self._remove_postings(luid)
+            self._datasources.pop(luid, None)
+
+    def _remove_postings(self, luid: str) -> None:
+        previous = self._datasources.get(luid)
+        if previous is None:
+            return
+        for term in set(tokenize(previous.name, expand_aliases=False)):
+            self._datasource_postings[term].discard(luid)
+            if not self._datasource_postings[term]:
+                del self._datasource_postings[term]
+        for position, info in enumerate(previous.fields):
+            for term in set(tokenize(_field_text(info), expand_aliases=False)):
+                postings = self._field_postings.get(term)
+                if postings is None:
+                    continue
+                postings.pop((luid, position), None)
+                if not postings:
+                    del self._field_postings[term]
+
+    def search(self, query: str, limit: int = 15) -> List[FieldMatch]:
+        """質問文に関連するフィールドをスコア順に返す"""
+        terms = set(tokenize(query, expand_aliases=False))
+        with self._lock:
+            total_fields = sum(len(datasource.fields) for datasource in self._datasources.values()) or 1
+            scores: Dict[Tuple[str, int], float] = defaultdict(float)
+            datasource_scores: Dict[str, float] = defaultdict(float)
+            for term in terms:
+                postings = self._field_postings.get(term)
+                if postings:
+                    idf = math.log(1 + total_fields / len(postings))
+                    for key, count in postings.items():
+                        scores[key] += idf * (1 + math.log(count))
+                for luid in self._datasource_postings.get(term, ()):
+                    datasource_scores[luid] += math.log(1 + len(self._datasources) / len(self._datasource_postings[term]))
+
+            # データソース名が質問に一致する場合は、そのデータソースのフィールドを底上げする
+            for luid, boost in datasource_scores.items():
+                for position in range(len(self._datasources[luid].fields)):
+                    scores[(luid, position)] += boost * _DATASOURCE_NAME_WEIGHT
+
+            ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+            return [
+                FieldMatch(self._datasources[luid], self._datasources[luid].fields[position], score)
+                for (luid, position), score in ranked
+            ]
+
+
+def format_field_matches(matches: List[FieldMatch]) -> str:
+    """検索結果をデータソースごとにまとめたプロンプト用テキスト"""
+    grouped: Dict[str, List[FieldMatch]] = {}
+    for match in matches:
+        grouped.setdefault(match.datasource.luid, []).append(match)
+
+    lines = []
+    for luid, datasource_matches in grouped.items():
+        datasource = datasource_matches[0].datasource
+        project = f", project: {datasource.project}" if datasource.project else ""
+        lines.append(f"- {datasource.name} (datasourceLuid: {luid}{project})")
+        lines.extend(f"    - {match.field_info.describe()}" for match in datasource_matches)
+    return "\n".join(lines)
+
+
+class MetadataIndexer:
+    """専用のMCPセッションでメタデータを定期取得し、インデックスを差分更新する
+
+    MCPのstdioセッションは開始したタスク内で閉じる必要があるため、接続から切断までを
+    run() のタスク内で完結させる。
+    """
+
+    def __init__(self, settings: Settings, index: MetadataIndex, service_factory: Callable[[], Any]):
+        self.settings = settings
+        self.index = index
+        self.service_factory = service_factory
+        self.logger = get_logger("metadata_index")
+        self._service = None
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_requested = asyncio.Event()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def request_refresh(self) -> None:
+        """次の定期実行を待たずに更新する（MCPセッションを持つ run() のタスク内で実行される）"""
+        self._refresh_requested.set()
+
+    async def run(self) -> None:
+        try:
+            while True:
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    self.logger.warning("Metadata index refresh failed", extra={"error": str(e)})
+                    get_metrics().increment("metadata_index.refresh_errors")
+                    await self._disconnect()
+                try:
+                    await asyncio.wait_for(
+                        self._refresh_requested.wait(),
+                        timeout=self.settings.metadata_index.refresh_interval_seconds
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                self._refresh_requested.clear()
+        finally:
+            await self._disconnect()
+
+    async def _ensure_connected(self):
+        if self._service is None:
+            service = self.service_factory()
+            if not await service.connect():
+                raise RuntimeError("MCP server is not available")
+            self._service = service
+        return self._service
+
+    async def _disconnect(self) -> None:
+        if self._service is not None:
+            service, self._service = self._service, None
+            try:
+                await service.cleanup()
+            except Exception as e:
+                self.logger.debug("Metadata indexer cleanup failed", extra={"error": str(e)})
+
+    async def _call(self, tool_name: str, args: Dict[str, Any]) -> str:
+        service = await self._ensure_connected()
+        result = await service.call_tool(tool_name, args)
+        text = extract_result_text(result.content if hasattr(result, "content") else result)
+        if getattr(result, "isError", False):
+            raise RuntimeError(f"{tool_name} failed: {text[:200]}")
+        return text
+
+    async def refresh(self) -> Dict[str, int]:
+        """データソース一覧を取得し、新規・更新されたもののみメタデータを再取得する"""
+        start_time = time.time()
+        config = self.settings.metadata_index
+        listed = parse_datasource_list(await self._call(LIST_DATASOURCES_TOOL, {}))[:config.max_datasources]
+        listed_ids = {datasource.luid for datasource in listed}
+
+        stale = []
+        for datasource in listed:
+            current = self.index.get(datasource.luid)
+            if current is None:
+                stale.append(datasource)
+            elif datasource.updated_at is not None:
+                if datasource.updated_at != current.updated_at:
+                    stale.append(datasource)
+            elif time.time() - current.indexed_at >= config.full_refresh_seconds:
+                stale.append(datasource)
+
+        removed = [datasource.luid for datasource in self.index.datasources() if datasource.luid not in listed_ids]
+        for luid in removed:
+            self.index.remove(luid)
+
+        semaphore = asyncio.Semaphore(max(1, config.concurrency))
+
+        async def fetch(datasource: DatasourceInfo) -> bool:
+            async with semaphore:
+                try:
+                    text = await self._call(DATASOURCE_METADATA_TOOL, {"datasourceLuid": datasource.luid})
+                except Exception as e:
+                    self.logger.warning(
+                        "Failed to fetch datasource metadata",
+                        extra={"datasource": datasource.luid, "error": str(e)}
+                    )
+                    return False
+            datasource.fields = parse_datasource_metadata(text)
+            datasource.indexed_at = time.time()
+            self.index.upsert(datasource)
+            return True
+
+        results = await asyncio.gather(*(fetch(datasource) for datasource in stale))
+        stats = {
+            "datasources": len(self.index),
+            "updated": sum(results),
+            "failed": len(results) - sum(results),
+            "removed": len(removed),
+        }
+
+        metrics = get_metrics()
+        metrics.increment("metadata_index.refreshes")
+        metrics.increment("metadata_index.datasources_fetched", stats["updated"])
+        metrics.set_gauge("metadata_index.datasources", stats["datasources"])
+        metrics.set_gauge("metadata_index.fields", self.index.field_count)
+        metrics.observe("metadata_index.refresh_seconds", time.time() - start_time)
+        self.logger.info("Metadata index refreshed", extra={**stats, "duration": time.time() - start_time})
+        return stats
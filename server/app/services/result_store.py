@@ -0,0 +1,381 @@
+"""会話ごとのクエリ結果を列指向で保持するインメモリストアとローカル集計"""
+import operator
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..core.logging import get_logger
+from ..core.metrics import get_metrics
+from ..core.result_encoding import encode_rows
+
+AGGREGATE_FUNCTIONS = ("sum", "avg", "min", "max", "count", "count_distinct")
+FILTER_OPERATORS = ("=", "!=", ">", ">=", "<", "<=", "in", "contains")
+
+_MAX_HANDLES = 10000
+
+_COMPARATORS = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+
+class LocalQueryError(ValueError):
+    """ローカル集計クエリの指定が不正"""
+
+
+@dataclass
+class StoredResult:
+    result_id: str
+    tool_name: str
+    tool_args: Dict[str, Any]
+    columns: Dict[str, np.ndarray]
+    row_count: int
+    nbytes: int
+    created_at: float = field(default_factory=time.time)
+
+    def to_rows(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """列指向データを行リストに戻す"""
+        count = self.row_count if limit is None else min(limit, self.row_count)
+        return [
+            {name: _to_python(values[i]) for name, values in self.columns.items()}
+            for i in range(count)
+        ]
+
+    def describe(self) -> str:
+        """プロンプト埋め込み用の1行説明"""
+        column_desc = ", ".join(
+            f"{name}:{'number' if values.dtype.kind == 'f' else 'text'}"
+            for name, values in self.columns.items()
+        )
+        return f"{self.result_id} ({self.tool_name}, {self.row_count} rows) columns: {column_desc}"
+
+
+def _to_column(values: List[Any]) -> np.ndarray:
+    """値リストを列配列に変換（数値のみなら float64、それ以外は object）"""
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return np.array(["" if v is None else v for v in values], dtype=object)
+
+
+def _column_nbytes(values: np.ndarray) -> int:
+    if values.dtype == object:
+        return values.nbytes + sum(len(str(v)) + 49 for v in values)
+    return values.nbytes
+
+
+class ResultStore:
+    """会話単位のクエリ結果キャッシュ（総メモリ上限付きLRU）"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_results_per_conversation: int = 20):
+        self.max_bytes = max_bytes
+        self.max_results_per_conversation = max_results_per_conversation
+        self._entries: "OrderedDict[Tuple[str, str], StoredResult]" = OrderedDict()
+        # 結果IDはストア全体で単調増加させ、退避後も再利用しない（古いハンドルや会話履歴中の
+        # resultId 参照が別の結果を指さないようにするため）
+        self._sequence = 0
+        # データハンドル -> (conversation_id, result_ids)
+        self._handles: "OrderedDict[str, Tuple[str, List[str]]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.logger = get_logger("result_store")
+
+    def put(
+        self,
+        conversation_id: str,
+        tool_name: str,
+        tool_args: Dict[str, Any],
+        rows: List[Dict[str, Any]]
+    ) -> Optional[StoredResult]:
+        """行リストを列指向に変換して保存（上限を超える単体結果は保存しない）"""
+        column_names: List[str] = []
+        seen = set()
+        for row in rows:
+            for key in row:
+                if key not in seen:
+                    seen.add(key)
+                    column_names.append(key)
+
+        columns = {name: _to_column([row.get(name) for row in rows]) for name in column_names}
+        nbytes = sum(_column_nbytes(values) for values in columns.values())
+        if nbytes > self.max_bytes:
+            self.logger.info("Result too large to store", extra={"nbytes": nbytes, "max_bytes": self.max_bytes})
+            return None
+
+        return self._insert(conversation_id, lambda result_id: StoredResult(
+            result_id=result_id,
+            tool_name=tool_name,
+            tool_args=tool_args,
+            columns=columns,
+            row_count=len(rows),
+            nbytes=nbytes
+        ))
+
+    def restore(self, conversation_id: str, stored: StoredResult) -> Optional[StoredResult]:
+        """他の会話で保存された結果を、列データを共有したままこの会話の結果として登録"""
+        if stored.nbytes > self.max_bytes:
+            return None
+        return self._insert(conversation_id, lambda result_id: replace(stored, result_id=result_id, created_at=time.time()))
+
+    def _insert(self, conversation_id: str, build: Callable[[str], StoredResult]) -> StoredResult:
+        with self._lock:
+            self._sequence += 1
+            stored = build(f"r{self._sequence}")
+            self._entries[(conversation_id, stored.result_id)] = stored
+            self._total_bytes += stored.nbytes
+
+            conversation_keys = [key for key in self._entries if key[0] == conversation_id]
+            for key in conversation_keys[:-self.max_results_per_conversation]:
+                self._evict(key)
+            while self._total_bytes > self.max_bytes and self._entries:
+                self._evict(next(iter(self._entries)))
+
+            get_metrics().set_gauge("result_store.bytes", self._total_bytes)
+            get_metrics().set_gauge("result_store.entries", len(self._entries))
+
+        return stored
+
+    def get(self, conversation_id: str, result_id: str) -> Optional[StoredResult]:
+        key = (conversation_id, result_id)
+        with self._lock:
+            stored = self._entries.get(key)
+            if stored is not None:
+                self._entries.move_to_end(key)
+            return stored
+
+    def list(self, conversation_id: str) -> List[StoredResult]:
+        with self._lock:
+            return [stored for key, stored in self._entries.items() if key[0] == conversation_id]
+
+    def create_handle(self, conversation_id: str, result_ids: List[str]) -> str:
+        """チャット応答に紐づく結果群へのハンドルを発行"""
+        handle = uuid.uuid4().hex
+        with self._lock:
+            self._handles[handle] = (conversation_id, list(result_ids))
+            while len(self._handles) > _MAX_HANDLES:
+                self._handles.popitem(last=False)
+        return handle
+
+    def resolve_handle(self, handle: str) -> List[StoredResult]:
+        """ハンドルから保存済み結果を取得（退避済みの結果は含まない）"""
+        with self._lock:
+            entry = self._handles.get(handle)
+        if entry is None:
+            return []
+        conversation_id, result_ids = entry
+        results = [self.get(conversation_id, result_id) for result_id in result_ids]
+        return [stored for stored in results if stored is not None]
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def _evict(self, key: Tuple[str, str]) -> None:
+        stored = self._entries.pop(key)
+        self._total_bytes -= stored.nbytes
+        get_metrics().increment("result_store.evictions")
+
+
+def _filter_mask(stored: StoredResult, filters: List[Dict[str, Any]]) -> np.ndarray:
+    mask = np.ones(stored.row_count, dtype=bool)
+    for condition in filters:
+        column = condition.get("column")
+        op = condition.get("op")
+        value = condition.get("value")
+        if column not in stored.columns:
+            raise LocalQueryError(f"Unknown column: {column}")
+        if op not in FILTER_OPERATORS:
+            raise LocalQueryError(f"Unsupported operator: {op}")
+
+        values = stored.columns[column]
+        if op == "in":
+            mask &= np.isin(values, value if isinstance(value, list) else [value])
+        elif op == "contains":
+            needle = str(value).lower()
+            mask &= np.fromiter((needle in str(v).lower() for v in values), dtype=bool, count=values.size)
+        else:
+            if values.dtype.kind == "f":
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    raise LocalQueryError(f"Column {column} is numeric; value must be a number")
+            try:
+                mask &= np.asarray(_COMPARATORS[op](values, value), dtype=bool)
+            except TypeError:
+                raise LocalQueryError(f"Operator {op} is not supported for column {column}")
+    return mask
+
+
+def _group_codes(columns: List[np.ndarray]) -> Tuple[np.ndarray, List[List[Any]]]:
+    """グループ化列の組み合わせごとにコードを振る
+
+    Returns:
+        (codes, group_keys) のタプル。group_keys[i] はグループiの各列の値。
+    """
+    key_codes = []
+    key_labels = []
+    for values in columns:
+        labels, inverse = np.unique(values.astype(str), return_inverse=True)
+        key_labels.append(labels)
+        key_codes.append(inverse)
+
+    shape = [labels.size for labels in key_labels]
+    combined = np.ravel_multi_index(key_codes, shape)
+    unique_combined, codes = np.unique(combined, return_inverse=True)
+    label_indices = np.unravel_index(unique_combined, shape)
+
+    group_keys = [
+        [key_labels[position][label_indices[position][group]] for position in range(len(columns))]
+        for group in range(unique_combined.size)
+    ]
+    return codes, group_keys
+
+
+def _aggregate(values: np.ndarray, codes: np.ndarray, group_count: int, function: str) -> np.ndarray:
+    if function == "count":
+        if values.dtype.kind == "f":
+            return np.bincount(codes, weights=~np.isnan(values), minlength=group_count)
+        return np.bincount(codes, minlength=group_count).astype(float)
+
+    if function == "count_distinct":
+        distinct: List[set] = [set() for _ in range(group_count)]
+        for code, value in zip(codes, values):
+            distinct[code].add(value)
+        return np.array([len(items) for items in distinct], dtype=float)
+
+    if values.dtype.kind != "f":
+        raise LocalQueryError(f"{function} requires a numeric column")
+
+    valid = ~np.isnan(values)
+    sums = np.bincount(codes[valid], weights=values[valid], minlength=group_count)
+    if function == "sum":
+        return sums
+    if function == "avg":
+        counts = np.bincount(codes[valid], minlength=group_count)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return sums / counts
+
+    result = np.full(group_count, np.inf if function == "min" else -np.inf)
+    ufunc = np.minimum if function == "min" else np.maximum
+    ufunc.at(result, codes[valid], values[valid])
+    result[np.isinf(result)] = np.nan
+    return result
+
+
+def _to_python(value: Any) -> Any:
+    if isinstance(value, np.floating):
+        value = float(value)
+    if isinstance(value, float):
+        if np.isnan(value):
+            return None
+        if value.is_integer():
+            return int(value)
+    return value
+
+
+def run_local_query(
+    stored: StoredResult,
+    filters: Optional[List[Dict[str, Any]]] = None,
+    group_by: Optional[List[str]] = None,
+    aggregations: Optional[List[Dict[str, Any]]] = None,
+    sort_by: Optional[List[Dict[str, Any]]] = None,
+    limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """保存済み結果に対してフィルタ・グループ化・集計・並べ替えを実行する"""
+    mask = _filter_mask(stored, filters or [])
+    group_by = group_by or []
+    aggregations = aggregations or []
+
+    for column in group_by:
+        if column not in stored.columns:
+            raise LocalQueryError(f"Unknown column: {column}")
+    for aggregation in aggregations:
+        if aggregation.get("column") not in stored.columns:
+            raise LocalQueryError(f"Unknown column: {aggregation.get('column')}")
+        if aggregation.get("function") not in AGGREGATE_FUNCTIONS:
+            raise LocalQueryError(f"Unsupported function: {aggregation.get('function')}")
+
+    filtered = {name: values[mask] for name, values in stored.columns.items()}
+    filtered_count = int(mask.sum())
+
+    if not group_by and not aggregations:
+        rows = [
+            {name: _to_python(values[i]) for name, values in filtered.items()}
+            for i in range(filtered_count)
+        ]
+    else:
+        if group_by and filtered_count:
+            codes, group_keys = _group_codes([filtered[column] for column in group_by])
+        elif group_by:
+            codes, group_keys = np.array([], dtype=int), []
+        else:
+            codes, group_keys = np.zeros(filtered_count, dtype=int), [[]]
+
+        aggregated = {}
+        for aggregation in aggregations:
+            alias = aggregation.get("alias") or f"{aggregation['function']}({aggregation['column']})"
+            aggregated[alias] = _aggregate(
+                filtered[aggregation["column"]], codes, len(group_keys), aggregation["function"]
+            )
+
+        rows = []
+        for group_index, key in enumerate(group_keys):
+            row: Dict[str, Any] = {}
+            for column, label in zip(group_by, key):
+                # 元の列が数値の場合は数値に戻す
+                row[column] = _to_python(float(label)) if filtered[column].dtype.kind == "f" else label
+            for alias, values in aggregated.items():
+                row[alias] = _to_python(values[group_index])
+            rows.append(row)
+
+    for sort in reversed(sort_by or []):
+        column = sort.get("column")
+        if rows and column not in rows[0]:
+            raise LocalQueryError(f"Unknown sort column: {column}")
+        descending = str(sort.get("direction", "asc")).lower() == "desc"
+        rows.sort(
+            key=lambda row: (row[column] is None, row[column] if row[column] is not None else 0),
+            reverse=descending
+        )
+
+    if limit is not None:
+        rows = rows[:max(0, int(limit))]
+    return rows
+
+
+def format_results_for_prompt(stored_results: List[StoredResult], max_rows: int, max_bytes: int) -> str:
+    """保存済み結果をプロンプト用のコンパクトな表に整形（全体でmax_bytes以内）"""
+    sections = []
+    remaining = max_bytes
+    for stored in stored_results:
+        if remaining <= 0:
+            break
+        table, _ = encode_rows(stored.to_rows(), max_rows, remaining)
+        section = f"[resultId: {stored.result_id} source: {stored.tool_name}]\n{table}"
+        sections.append(section)
+        remaining -= len(section.encode("utf-8"))
+    return "\n\n".join(sections)
+
+
+def resolve_handle_for_prompt(
+    result_store: Optional[ResultStore],
+    data_handle: Optional[str],
+    max_rows: int,
+    max_bytes: int
+) -> Optional[str]:
+    """data_handleの結果群をプロンプト用に整形（ハンドルが無効・期限切れの場合はNone）"""
+    if not (result_store and data_handle):
+        return None
+    stored_results = result_store.resolve_handle(data_handle)
+    if not stored_results:
+        return None
+    return format_results_for_prompt(stored_results, max_rows=max_rows, max_bytes=max_bytes)
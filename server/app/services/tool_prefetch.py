@@ -0,0 +1,132 @@
+"""最初のモデル呼び出しと並行して、最初に要求されそうなツールを先行実行する
+
+データに関する質問では、最初のモデル応答はほぼ必ずデータソース一覧やメタデータを要求する。
+会話の開始時に、設定したツールと過去の会話で最初に呼ばれることが多かったツールを
+Bedrockの呼び出し中に実行しておき、モデルが同じ引数で要求した場合はその結果を返す。
+"""
+import asyncio
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from ..core.logging import get_mcp_logger
+from ..core.metrics import get_metrics
+from ..core.tool_loop import canonicalize_tool_args
+
+ToolCall = Tuple[str, Dict[str, Any]]
+
+
+class FirstToolStats:
+    """直近の会話で最初のモデル応答が要求したツール呼び出しの集計（プロセス共有）"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[List[Tuple[str, str]]] = deque(maxlen=window)
+        self._args: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._issued = 0
+        self._hits = 0
+        self._lock = threading.Lock()
+
+    def record(self, calls: List[ToolCall]) -> None:
+        """最初の応答のツール呼び出しを記録（ツールを呼ばなかった応答も空の標本として記録）"""
+        keys = []
+        with self._lock:
+            for name, args in calls:
+                key = (name, canonicalize_tool_args(args))
+                if key not in keys:
+                    keys.append(key)
+                    self._args[key] = dict(args or {})
+            self._samples.append(keys)
+
+    def predict(self, min_share: float, min_samples: int, limit: int) -> List[ToolCall]:
+        """標本のうちmin_share以上で最初に呼ばれたツール呼び出し（多い順）"""
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return []
+            counts = Counter(key for keys in self._samples for key in keys)
+            total = len(self._samples)
+            return [
+                (key[0], dict(self._args[key]))
+                for key, count in counts.most_common(limit)
+                if count / total >= min_share
+            ]
+
+    def record_outcome(self, issued: int, hits: int) -> None:
+        with self._lock:
+            self._issued += issued
+            self._hits += hits
+            hit_rate = self._hits / self._issued if self._issued else 0.0
+        get_metrics().set_gauge("mcp.prefetch.hit_rate", round(hit_rate, 3))
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        with self._lock:
+            return self._hits / self._issued if self._issued else None
+
+
+class _Prefetched:
+    def __init__(self, tool_name: str, task: asyncio.Task, started_at: float):
+        self.tool_name = tool_name
+        self.task = task
+        self.started_at = started_at
+        # claimed: 呼び出しに割り当て済み、used: 結果を返した（失敗した先行実行はヒットに数えない）
+        self.claimed = False
+        self.used = False
+
+
+class ToolPrefetcher:
+    """1回のクエリ処理内で先行実行したツール呼び出しのバッファ"""
+
+    def __init__(
+        self,
+        call: Callable[[str, Dict[str, Any]], Awaitable[Any]],
+        ttl_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self._call = call
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: Dict[Tuple[str, str], _Prefetched] = {}
+        self.logger = get_mcp_logger()
+
+    def start(self, calls: List[ToolCall]) -> None:
+        for name, args in calls:
+            key = (name, canonicalize_tool_args(args))
+            if key in self._entries:
+                continue
+            self._entries[key] = _Prefetched(name, asyncio.create_task(self._call(name, args)), self._clock())
+            get_metrics().increment("mcp.prefetch.calls", tool=name)
+        if self._entries:
+            self.logger.debug("Prefetching tools", extra={"tools": [entry.tool_name for entry in self._entries.values()]})
+
+    async def take(self, tool_name: str, tool_args: Dict[str, Any]) -> Optional[Any]:
+        """同じ引数で先行実行した結果（なし・期限切れ・失敗の場合はNone）"""
+        entry = self._entries.get((tool_name, canonicalize_tool_args(tool_args)))
+        if entry is None or entry.claimed or self._clock() - entry.started_at > self.ttl_seconds:
+            return None
+        entry.claimed = True
+        try:
+            result = await entry.task
+        except Exception as e:
+            self.logger.info(f"Prefetched tool call failed: {tool_name}", extra={"tool": tool_name, "error": str(e)})
+            return None
+        entry.used = True
+        get_metrics().increment("mcp.prefetch.hits", tool=tool_name)
+        return result
+
+    def finish(self) -> Tuple[int, int]:
+        """未使用の先行実行を取り消し、（実行数, ヒット数）を返す"""
+        hits = 0
+        for entry in self._entries.values():
+            if entry.used:
+                hits += 1
+                continue
+            get_metrics().increment("mcp.prefetch.wasted", tool=entry.tool_name)
+            if not entry.task.done():
+                entry.task.cancel()
+            elif not entry.task.cancelled():
+                # 失敗した先行実行の例外を回収する（未回収の警告を避ける）
+                entry.task.exception()
+        issued = len(self._entries)
+        self._entries = {}
+        return issued, hits
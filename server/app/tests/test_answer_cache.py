@@ -0,0 +1,138 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.dependencies import get_answer_cache, get_metadata_index, get_result_store
+from app.routers import chat
+from app.services.answer_cache import AnswerCache, normalize_question
+from app.services.bedrock_service import remember_verified_credentials
+from app.services.metadata_index import DatasourceInfo, MetadataIndex
+from app.services.result_store import ResultStore
+
+_QUESTION = "今四半期の地域別の売上を教えてください。"
+
+
+def test_normalization_ignores_width_case_and_punctuation():
+    assert normalize_question("ＳＡＬＥＳ by  Region？") == normalize_question("sales by region")
+
+
+def test_near_duplicate_hits_and_different_content_misses():
+    cache = AnswerCache()
+    cache.put(_QUESTION, "East: 100", {"ds-1": "v1"})
+
+    hit = cache.lookup("今四半期の地域別売上を教えてください", {"ds-1": "v1"})
+    assert hit.result == "hit"
+    assert hit.entry.answer == "East: 100"
+    assert hit.similarity >= 0.8
+
+    assert cache.lookup("今四半期の製品別の利益を教えてください", {"ds-1": "v1"}).result == "miss"
+    assert cache.lookup("sales by region this quarter").result == "miss"
+
+    cache.put("今四半期の東地域の売上を教えてください", "East", {"ds-1": "v1"})
+    assert cache.lookup("今四半期の西地域の売上を教えてください", {"ds-1": "v1"}).result == "miss"
+
+    cache.put("2023年の地域別の売上を教えてください", "2023", {"ds-1": "v1"})
+    assert cache.lookup("2024年の地域別の売上を教えてください", {"ds-1": "v1"}).result == "miss"
+
+
+def test_datasource_update_and_ttl_make_entries_stale():
+    cache = AnswerCache(ttl_seconds=3600, unversioned_ttl_seconds=0)
+    cache.put(_QUESTION, "answer", {"ds-1": "v1"})
+    assert cache.lookup(_QUESTION, {"ds-1": "v2"}).result == "stale"
+    assert len(cache) == 0
+
+    # バージョン不明の回答は短いTTLで失効する
+    cache.put(_QUESTION, "answer", {"ds-1": None})
+    assert cache.lookup(_QUESTION).result == "stale"
+
+
+def test_invalidate_by_datasource():
+    cache = AnswerCache()
+    cache.put(_QUESTION, "a", {"ds-1": "v1"})
+    cache.put("従業員数の推移", "b", {"ds-2": "v1"})
+    assert cache.invalidate("ds-1") == 1
+    assert [entry.answer for entry in cache.entries()] == ["b"]
+    assert cache.invalidate() == 1
+
+
+def _client(cache: AnswerCache, index: MetadataIndex, store: ResultStore = None) -> TestClient:
+    app = FastAPI()
+    app.include_router(chat.router)
+    app.dependency_overrides[get_answer_cache] = lambda: cache
+    app.dependency_overrides[get_metadata_index] = lambda: index
+    app.dependency_overrides[get_result_store] = lambda: store or ResultStore()
+    return TestClient(app)
+
+
+def _request(**overrides) -> dict:
+    return {
+        "messages": [{"role": "user", "content": _QUESTION}],
+        "timestamp": "2024-01-01T00:00:00Z",
+        "aws_region": "us-east-1",
+        "aws_bearer_token": "token",
+        "bedrock_model_id": "model",
+        "max_tokens": 1024,
+        **overrides,
+    }
+
+
+def test_chat_serves_cached_answer_and_invalidation_endpoint():
+    index = MetadataIndex()
+    index.upsert(DatasourceInfo(luid="ds-1", name="Superstore", updated_at="v1"))
+    source = ResultStore()
+    rows = [{"Region": "East", "Sales": 100}]
+    cache = AnswerCache()
+    cache.put(_QUESTION, "East: 100", {"ds-1": "v1"}, results=[source.put("original", "query-datasource", {}, rows)])
+    store = ResultStore()
+    client = _client(cache, index, store)
+    remember_verified_credentials("us-east-1", "token", "model")
+
+    response = client.post("/api/chat", json=_request())
+    body = response.json()
+    assert body["success"] is True
+    assert body["cached"] is True
+    assert body["message"] == "East: 100"
+    # 根拠データはこの会話の結果として復元され、レポート生成用のハンドルが返る
+    assert [stored.to_rows() for stored in store.resolve_handle(body["data_handle"])] == [rows]
+    # 会話IDはメッセージ内容から導出せず、リクエストごとに発行する
+    assert body["conversation_id"]
+    second = client.post("/api/chat", json=_request())
+    assert second.json()["conversation_id"] != body["conversation_id"]
+
+    assert client.delete("/api/answer_cache", params={"datasource_luid": "ds-1"}).json() == {
+        "removed": 1,
+        "success": True,
+    }
+
+
+class _FailingMCPService:
+    turn_datasource_luids = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def set_bedrock_service(self, bedrock_service):
+        pass
+
+    def start_connect(self):
+        pass
+
+    async def process_chat_with_history(self, messages, conversation_id=None):
+        raise RuntimeError("invalid bearer token")
+
+    async def cleanup(self):
+        pass
+
+
+def test_cached_answer_is_not_served_to_unverified_credentials(monkeypatch):
+    checked = []
+    monkeypatch.setattr(chat, "verify_bedrock_credentials", lambda *args: checked.append(args) or False)
+    monkeypatch.setattr(chat, "BedrockService", lambda **kwargs: None)
+    monkeypatch.setattr(chat, "MCPService", _FailingMCPService)
+    cache = AnswerCache()
+    cache.put(_QUESTION, "East: 100", {})
+
+    body = _client(cache, MetadataIndex()).post("/api/chat", json=_request(aws_bearer_token="bogus")).json()
+    assert checked == [("us-east-1", "bogus", "model")]
+    assert body["success"] is False
+    assert body["cached"] is False
+    assert cache.stats()["hits"] == 0
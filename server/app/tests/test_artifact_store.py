@@ -0,0 +1,110 @@
+import zlib
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.dashboard_renderer import render_dashboard
+from app.core.dashboard_spec import DashboardSpec
+from app.core.exceptions import CustomException, custom_exception_handler
+from app.dependencies import get_artifact_store
+from app.routers import artifacts
+from app.services.artifact_store import ArtifactStore, content_hash
+
+
+def _dashboard(index: int) -> str:
+    return render_dashboard(DashboardSpec.model_validate({
+        "title": f"売上ダッシュボード {index}",
+        "kpis": [{"label": "売上", "value": f"{index * 1000:,}円"}],
+        "charts": [{
+            "title": "地域別",
+            "type": "bar",
+            "labels": ["East", "West", "Central"],
+            "datasets": [{"label": "売上", "data": [index, index * 2, index * 3]}]
+        }]
+    }))
+
+
+def test_content_addressed_and_deduplicated():
+    store = ArtifactStore()
+    html = _dashboard(1)
+    first = store.put(html, kind="dashboard")
+    second = store.put(html, kind="dashboard")
+    assert first.artifact_id == second.artifact_id == content_hash(html)
+    assert len(store) == 1
+    assert store.get(first.artifact_id).html == html
+
+
+def test_template_dictionary_improves_compression():
+    store = ArtifactStore()
+    html = _dashboard(2)
+    store.put(html, kind="dashboard")
+    plain = len(zlib.compress(html.encode("utf-8"), 6))
+    stats = store.stats()
+    assert stats["compressed_bytes"] < plain
+    assert stats["compression_ratio"] > len(html.encode("utf-8")) / plain
+
+
+def test_memory_limit_spills_to_disk_and_reloads(tmp_path):
+    store = ArtifactStore(max_memory_bytes=1, disk_dir=str(tmp_path))
+    ids = [store.put(_dashboard(i), kind="dashboard", parent_id="p").artifact_id for i in range(3)]
+    stats = store.stats()
+    assert stats["memory_entries"] == 1
+    assert stats["disk_entries"] == 2
+
+    restored = store.get(ids[0])
+    assert restored.html == _dashboard(0)
+    assert restored.parent_id == "p"
+
+    # 再起動後もディスクから読める
+    reopened = ArtifactStore(disk_dir=str(tmp_path))
+    assert reopened.get(ids[1]).html == _dashboard(1)
+
+
+def test_disk_limit_evicts_oldest(tmp_path):
+    store = ArtifactStore(max_memory_bytes=1, disk_dir=str(tmp_path), max_disk_bytes=600)
+    ids = [store.put(_dashboard(i), kind="dashboard").artifact_id for i in range(6)]
+    assert store.stats()["disk_bytes"] <= 600
+    assert store.get(ids[0]) is None
+    assert store.get(ids[-1]) is not None
+
+
+def test_without_disk_evicted_entries_are_dropped():
+    store = ArtifactStore(max_memory_bytes=1)
+    first = store.put(_dashboard(1), kind="chart").artifact_id
+    store.put(_dashboard(2), kind="chart")
+    assert store.get(first) is None
+
+
+def _client(store: ArtifactStore) -> TestClient:
+    app = FastAPI()
+    app.add_exception_handler(CustomException, custom_exception_handler)
+    app.include_router(artifacts.router)
+    app.dependency_overrides[get_artifact_store] = lambda: store
+    return TestClient(app)
+
+
+def test_get_artifact_etag_and_cache_headers():
+    store = ArtifactStore()
+    artifact = store.put(_dashboard(3), kind="dashboard")
+    client = _client(store)
+
+    response = client.get(f"/api/artifacts/{artifact.artifact_id}")
+    assert response.status_code == 200
+    assert response.text == artifact.html
+    assert response.headers["etag"] == f'"{artifact.artifact_id}"'
+    assert response.headers["cache-control"].startswith("private,")
+    assert "immutable" in response.headers["cache-control"]
+    assert response.headers["content-security-policy"] == "sandbox allow-scripts"
+
+    cached = client.get(
+        f"/api/artifacts/{artifact.artifact_id}",
+        headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    assert client.get("/api/artifacts/unknown").status_code == 404
+    # 存在しないアーティファクトやワイルドカードには304を返さない
+    assert client.get("/api/artifacts/unknown", headers={"If-None-Match": '"unknown"'}).status_code == 404
+    wildcard = client.get(f"/api/artifacts/{artifact.artifact_id}", headers={"If-None-Match": "*"})
+    assert wildcard.status_code == 200
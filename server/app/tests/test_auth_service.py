@@ -0,0 +1,83 @@
+import jwt
+import pytest
+from pydantic import ValidationError
+
+from app.config.settings import JWTSettings, Settings
+from app.services import auth_service as auth_module
+from app.services.auth_service import AuthService, DEFAULT_SCOPES
+
+
+@pytest.fixture
+def service():
+    settings = Settings()
+    settings.tableau.connected_app_client_id = "client-id"
+    settings.tableau.connected_app_client_secret = "secret-id"
+    settings.tableau.connected_app_secret_value = "secret-value"
+    settings.jwt.token_expiry_minutes = 5
+    settings.jwt.refresh_margin_seconds = 60
+    return AuthService(settings)
+
+
+class _FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+def test_cached_token_is_reused(service):
+    token1, exp1 = service.get_jwt_token("alice")
+    token2, exp2 = service.get_jwt_token("alice")
+    assert token1 == token2
+    assert exp1 == exp2
+
+
+def test_tokens_are_cached_per_username_and_scopes(service):
+    token_alice, _ = service.get_jwt_token("alice")
+    token_bob, _ = service.get_jwt_token("bob")
+    token_scoped, _ = service.get_jwt_token("alice", scopes=["tableau:views:embed"])
+    assert len({token_alice, token_bob, token_scoped}) == 3
+
+
+def test_cache_never_serves_token_past_exp_minus_margin(service, monkeypatch):
+    clock = _FakeClock(1_700_000_000)
+    monkeypatch.setattr(auth_module, "time", clock)
+    margin = service.settings.jwt.refresh_margin_seconds
+
+    token, exp = service.get_jwt_token("alice")
+    # 5分間を10秒刻みで進め、返却されるトークンが常に安全マージン内であることを確認
+    for _ in range(60):
+        served, served_exp = service.get_jwt_token("alice")
+        assert clock.now < served_exp - margin
+        claims = jwt.decode(served, options={"verify_signature": False})
+        assert claims["exp"] == served_exp
+        clock.now += 10
+
+    refreshed, refreshed_exp = service.get_jwt_token("alice")
+    assert refreshed != token
+    assert refreshed_exp > exp
+
+
+def test_unsupported_scope_is_rejected(service):
+    with pytest.raises(ValueError):
+        service.get_jwt_token("alice", scopes=["tableau:content:read"])
+
+
+def test_default_scopes_in_payload(service):
+    token = service.generate_jwt_token("alice", token_expiry_minutes=5)
+    claims = jwt.decode(token, options={"verify_signature": False})
+    assert claims["scp"] == sorted(DEFAULT_SCOPES)
+    assert claims["sub"] == "alice"
+
+
+def test_explicit_default_scopes_share_cached_token(service):
+    token, _ = service.get_jwt_token("alice")
+    explicit, _ = service.get_jwt_token("alice", scopes=reversed(DEFAULT_SCOPES))
+    assert explicit == token
+
+
+def test_refresh_margin_not_shorter_than_lifetime_is_rejected():
+    with pytest.raises(ValidationError):
+        JWTSettings(token_expiry_minutes=1, refresh_margin_seconds=60)
+    assert JWTSettings(token_expiry_minutes=1, refresh_margin_seconds=59).refresh_margin_seconds == 59
@@ -0,0 +1,152 @@
+import asyncio
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.config.settings import Settings
+from app.core.exceptions import CustomException, custom_exception_handler
+from app.dependencies import get_batch_store
+from app.routers import batch
+from app.services.answer_cache import AnswerCache
+from app.services.artifact_store import ArtifactStore
+from app.services.batch_service import BatchItem, BatchRunner, BatchStore
+
+
+class _FakeMCP:
+    """処理中の同時実行数を記録するMCPServiceの代替"""
+    active = 0
+    peak = 0
+    sessions = 0
+
+    def __init__(self):
+        self.turn_datasource_luids = []
+        _FakeMCP.sessions += 1
+
+    def set_bedrock_service(self, bedrock_service):
+        pass
+
+    async def connect(self):
+        return True
+
+    async def cleanup(self):
+        pass
+
+    async def process_chat_with_history(self, messages, conversation_id=None):
+        question = messages[0]["content"]
+        if question == "fail":
+            raise RuntimeError("boom")
+        _FakeMCP.active += 1
+        _FakeMCP.peak = max(_FakeMCP.peak, _FakeMCP.active)
+        await asyncio.sleep(0.01)
+        _FakeMCP.active -= 1
+        self.turn_datasource_luids = ["ds-1"]
+        return f"| 地域 | 売上 |\n|---|---|\n| East | 100 |\n| West | 200 |\n\n{question}"
+
+    def create_data_handle(self):
+        return None
+
+
+def _runner(answer_cache=None):
+    _FakeMCP.active = _FakeMCP.peak = _FakeMCP.sessions = 0
+    bedrock = SimpleNamespace(
+        create_message=lambda **kwargs: SimpleNamespace(
+            content=[SimpleNamespace(type="text", text="<!DOCTYPE html><html><body>report</body></html>")],
+            usage=SimpleNamespace(output_tokens=10)
+        )
+    )
+    return BatchRunner(
+        Settings(), bedrock, result_store=None, artifact_store=ArtifactStore(),
+        answer_cache=answer_cache, mcp_factory=_FakeMCP
+    )
+
+
+def test_worker_pool_bounds_concurrency_and_reuses_sessions():
+    store = BatchStore()
+    job = store.create([BatchItem(str(i), "answer", f"質問{i}") for i in range(8)], concurrency=3)
+    asyncio.run(_runner().run(job))
+
+    assert job.status == "completed"
+    assert job.count("succeeded") == 8
+    assert _FakeMCP.peak == 3
+    assert _FakeMCP.sessions == 3
+    assert job.items_per_minute > 0
+
+
+def test_per_item_failures_and_artifacts():
+    store = BatchStore()
+    job = store.create([
+        BatchItem("a", "report", "地域別の売上"),
+        BatchItem("b", "chart", "地域別の売上チャート"),
+        BatchItem("c", "answer", "fail"),
+    ], concurrency=2)
+    runner = _runner()
+    asyncio.run(runner.run(job))
+
+    report, chart, failed = job.items
+    assert report.status == "succeeded" and "report" in runner.artifact_store.get(report.artifact_id).html
+    # 表を含む回答のチャートはローカル描画される
+    assert chart.status == "succeeded" and "new Chart" in runner.artifact_store.get(chart.artifact_id).html
+    assert failed.status == "failed" and failed.error == "boom"
+
+
+def test_answer_cache_is_shared_across_items():
+    cache = AnswerCache()
+    cache.put("地域別の売上", "cached answer", {"ds-1": "v1"})
+    job = BatchStore().create([BatchItem("a", "answer", "地域別の売上"), BatchItem("b", "answer", "新しい質問")], 1)
+    asyncio.run(_runner(cache).run(job))
+
+    assert job.items[0].cached is True
+    assert job.items[0].message == "cached answer"
+    assert job.items[1].cached is False
+    assert cache.peek("新しい質問") is not None
+
+
+def test_cache_hit_only_batch_does_not_open_sessions():
+    cache = AnswerCache()
+    cache.put("地域別の売上", "cached answer", {"ds-1": "v1"})
+    job = BatchStore().create([BatchItem(str(i), "answer", "地域別の売上") for i in range(4)], concurrency=2)
+    asyncio.run(_runner(cache).run(job))
+
+    assert job.count("succeeded") == 4
+    assert _FakeMCP.sessions == 0
+
+
+def test_batch_status_endpoint():
+    store = BatchStore()
+    job = store.create([BatchItem("a", "answer", "地域別の売上")], concurrency=1)
+    asyncio.run(_runner().run(job))
+
+    app = FastAPI()
+    app.add_exception_handler(CustomException, custom_exception_handler)
+    app.include_router(batch.router)
+    app.dependency_overrides[get_batch_store] = lambda: store
+    client = TestClient(app)
+
+    body = client.get(f"/api/batch/{job.batch_id}").json()
+    assert body["status"] == "completed"
+    assert body["succeeded"] == 1
+    assert body["items"][0]["id"] == "a"
+    assert client.get("/api/batch/unknown").status_code == 404
+
+
+def test_batch_with_rejected_credentials_is_not_scheduled(monkeypatch):
+    monkeypatch.setattr(batch, "verify_bedrock_credentials", lambda region, token, model: False)
+    store = BatchStore()
+    app = FastAPI()
+    app.add_exception_handler(CustomException, custom_exception_handler)
+    app.include_router(batch.router)
+    app.dependency_overrides[get_batch_store] = lambda: store
+    client = TestClient(app)
+
+    response = client.post("/api/batch", json={
+        "items": [{"kind": "answer", "question": "地域別の売上"}],
+        "timestamp": "2024-01-01T00:00:00Z",
+        "aws_region": "us-east-1",
+        "aws_bearer_token": "invalid",
+        "bedrock_model_id": "model",
+        "max_tokens": 1000,
+    })
+    assert response.status_code == 401
+    assert response.json()["success"] is False
+    assert not store._jobs
@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from app.services.bedrock_hedging import HedgePolicy, hedged_call
+
+
+def _slow(value, delay):
+    def call():
+        time.sleep(delay)
+        return value
+    return call
+
+
+def _warmed_policy(**options):
+    policy = HedgePolicy(min_samples=1, min_delay=0.01, max_delay=0.05, **options)
+    policy.record_latency(0.01)
+    return policy
+
+
+def test_fast_primary_is_returned_without_hedging():
+    policy = _warmed_policy(max_ratio=1.0, burst=1.0)
+    assert hedged_call(_slow("primary", 0), _slow("fallback", 0), policy) == "primary"
+    # 予算は消費されていない
+    assert policy.try_acquire_hedge()
+
+
+def test_slow_primary_is_beaten_by_fallback():
+    policy = _warmed_policy(max_ratio=1.0, burst=1.0)
+    assert hedged_call(_slow("primary", 0.5), _slow("fallback", 0), policy) == "fallback"
+
+
+def test_budget_limits_hedge_ratio():
+    policy = _warmed_policy(max_ratio=0.5, burst=1.0)
+    results = [hedged_call(_slow("primary", 0.1), _slow("fallback", 0), policy) for _ in range(4)]
+    # 4リクエストで予算は 0.5 * 4 = 2 件分
+    assert results.count("fallback") == 2
+
+
+def test_fallback_error_falls_back_to_primary_result():
+    policy = _warmed_policy(max_ratio=1.0, burst=1.0)
+
+    def failing():
+        raise RuntimeError("region down")
+
+    assert hedged_call(_slow("primary", 0.1), failing, policy) == "primary"
+
+
+def test_both_failures_raise():
+    policy = _warmed_policy(max_ratio=1.0, burst=1.0)
+
+    def slow_failure():
+        time.sleep(0.1)
+        raise RuntimeError("primary down")
+
+    def failing():
+        raise RuntimeError("fallback down")
+
+    with pytest.raises(RuntimeError):
+        hedged_call(slow_failure, failing, policy)
+
+
+def test_hedge_delay_uses_max_delay_until_warmed_up():
+    policy = HedgePolicy(min_samples=5, min_delay=0.1, max_delay=10.0)
+    assert policy.hedge_delay() == 10.0
+    for latency in (0.2, 0.3, 0.4, 0.5, 2.0):
+        policy.record_latency(latency)
+    assert policy.hedge_delay() == 2.0
@@ -0,0 +1,28 @@
+import os
+import threading
+import time
+
+from app.services import bedrock_service
+from app.services.bedrock_service import BedrockService
+
+
+def test_concurrent_clients_are_created_with_their_own_token(monkeypatch):
+    def fake_client(service_name, region_name):
+        # 環境変数の設定とクライアント生成の間に他スレッドが割り込める状況を作る
+        time.sleep(0.05)
+        return os.environ["AWS_BEARER_TOKEN_BEDROCK"]
+
+    monkeypatch.setattr(bedrock_service.boto3, "client", fake_client)
+    monkeypatch.setenv("AWS_BEARER_TOKEN_BEDROCK", "")
+    clients = {}
+
+    def create(token):
+        clients[token] = BedrockService("us-east-1", token, "model", max_tokens=1).client
+
+    threads = [threading.Thread(target=create, args=(f"token-{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert clients == {token: token for token in clients} and len(clients) == 4
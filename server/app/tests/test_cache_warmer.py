@@ -0,0 +1,99 @@
+import asyncio
+import time
+from datetime import datetime
+
+from app.config.settings import Settings
+from app.services.answer_cache import AnswerCache
+from app.services.cache_warmer import CacheWarmer, LiveTraffic, QuestionLog, in_time_windows
+from app.services.metadata_index import DatasourceInfo, MetadataIndex
+
+_NOON = datetime(2024, 1, 1, 12, 0)
+_NIGHT = datetime(2024, 1, 1, 3, 0)
+
+
+def test_time_windows_support_wrapping_past_midnight():
+    assert in_time_windows(datetime(2024, 1, 1, 23, 30), ["22:00-02:00"])
+    assert in_time_windows(datetime(2024, 1, 1, 1, 0), ["22:00-02:00"])
+    assert not in_time_windows(_NOON, ["22:00-02:00", "03:00-05:00"])
+
+
+def test_question_log_orders_by_frequency():
+    log = QuestionLog()
+    for question in ["地域別の売上", "製品別の利益", "地域別の売上？", "従業員数"]:
+        log.record(question)
+    assert log.top(2, window_seconds=60) == ["地域別の売上", "従業員数"]
+
+
+class _Indexer:
+    def __init__(self):
+        self.requests = 0
+
+    def request_refresh(self):
+        self.requests += 1
+
+
+def _warmer(clock, questions, live=None):
+    settings = Settings()
+    settings.cache_warmer.min_interval_seconds = 0
+    log = QuestionLog()
+    for question in questions:
+        log.record(question)
+    index = MetadataIndex()
+    index.upsert(DatasourceInfo(luid="ds-1", name="Superstore", updated_at="v1"))
+    answered = []
+
+    async def answer(question):
+        answered.append(question)
+        return f"answer: {question}", ["ds-1"], []
+
+    warmer = CacheWarmer(
+        settings, AnswerCache(), log, index, live or LiveTraffic(), answer, indexer=_Indexer(), clock=clock
+    )
+    return warmer, answered
+
+
+def test_warms_uncached_popular_questions_only_off_peak():
+    warmer, answered = _warmer(lambda: _NOON, ["地域別の売上", "製品別の利益"])
+    assert asyncio.run(warmer.tick()) is None
+    assert answered == []
+
+    warmer.clock = lambda: _NIGHT
+    result = asyncio.run(warmer.tick())
+    assert result["warmed"] == 2
+    assert warmer.coverage() == 1.0
+    assert warmer.indexer.requests == 1
+    assert warmer.answer_cache.stats()["hits"] == 0
+
+    # キャッシュ済みの質問は再実行しない
+    assert asyncio.run(warmer.tick())["warmed"] == 0
+    assert len(answered) == 2
+
+
+def test_datasource_refresh_triggers_rewarming():
+    warmer, answered = _warmer(lambda: _NOON, ["地域別の売上"])
+    asyncio.run(warmer.tick())
+    warmer.answer_cache.put("地域別の売上", "old", {"ds-1": "v1"})
+
+    warmer.metadata_index.upsert(DatasourceInfo(luid="ds-1", name="Superstore", updated_at="v2"))
+    warmer._attempted.clear()
+    result = asyncio.run(warmer.tick())
+    assert result["trigger"] == "datasource_refresh"
+    assert answered == ["地域別の売上"]
+    assert warmer.answer_cache.peek("地域別の売上", warmer.metadata_index.versions()).answer == "answer: 地域別の売上"
+
+
+def test_defers_to_live_traffic():
+    live = LiveTraffic()
+    warmer, answered = _warmer(lambda: _NIGHT, ["地域別の売上"], live=live)
+    with live.track():
+        result = asyncio.run(warmer.tick())
+    assert result["deferred"] is True
+    assert answered == []
+
+
+def test_expired_attempts_are_pruned():
+    warmer, _ = _warmer(lambda: _NIGHT, [])
+    retry = warmer.settings.cache_warmer.retry_interval_seconds
+    warmer._attempted = {"old": time.time() - retry - 1, "recent": time.time()}
+    asyncio.run(warmer.warm(trigger="offpeak"))
+    assert list(warmer._attempted) == ["recent"]
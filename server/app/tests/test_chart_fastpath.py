@@ -0,0 +1,107 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.config.settings import Settings
+from app.core.chart_fastpath import (
+    detect_chart,
+    parse_label_value_pairs,
+    parse_markdown_tables,
+    parse_number,
+    render_chart_template,
+)
+from app.services.dashboard_service import DashboardService
+
+_REGION_TABLE = """## 地域別売上
+
+| 地域 | 売上 | 利益 | 前年比 |
+|------|-----:|-----:|--------|
+| **East** | 678,781 | 91,523 | +12.4% |
+| West | ¥725,458 | 108,418 | +8.1% |
+| Central | 501,240 | ▲39,706 | -2.3% |
+| 合計 | 1,905,479 | 160,235 | +6.0% |
+"""
+
+
+class _UnusedBedrock:
+    def create_message(self, *args, **kwargs):
+        raise AssertionError("fast path should not call the model")
+
+
+def test_parse_number_formats():
+    assert parse_number("1,234,567") == (1234567.0, None)
+    assert parse_number("¥725,458") == (725458.0, None)
+    assert parse_number("▲39,706") == (-39706.0, None)
+    assert parse_number("12.5％") == (12.5, "%")
+    assert parse_number("3億円") == (3.0, "億円")
+    assert parse_number("East") is None
+    assert parse_number("2024-01-01") is None
+
+
+def test_parse_markdown_table_with_title():
+    tables = parse_markdown_tables("前置き\n\n" + _REGION_TABLE)
+    assert len(tables) == 1
+    assert tables[0].title == "地域別売上"
+    assert tables[0].headers == ["地域", "売上", "利益", "前年比"]
+    assert tables[0].rows[0][0] == "East"
+
+
+def test_table_becomes_grouped_bar_without_total_and_percent_columns():
+    chart = detect_chart(_REGION_TABLE)
+    assert chart.type == "bar"
+    assert chart.labels == ["East", "West", "Central"]
+    assert [d.label for d in chart.datasets] == ["売上", "利益"]
+    assert chart.datasets[1].data == [91523.0, 108418.0, -39706.0]
+
+
+def test_time_labels_become_line_chart():
+    chart = detect_chart("### 月別売上（千円）\n1月: 94, 2月: 59, 3月: 205\n4月: 137\n\n以上です。")
+    assert chart.type == "line"
+    assert chart.title == "月別売上（千円）"
+    assert chart.labels == ["1月", "2月", "3月", "4月"]
+
+
+def test_share_column_becomes_doughnut():
+    chart = detect_chart("| カテゴリ | 構成比 |\n|---|---|\n| A | 50% |\n| B | 30% |\n| C | 20% |")
+    assert chart.type == "doughnut"
+
+
+def test_pairs_with_mixed_units_are_rejected():
+    assert parse_label_value_pairs("売上: 1,234円\n件数: 5件\n利益: 300円") is not None
+    assert detect_chart("売上: 1,234円\n件数: 5件\n利益: 300円") is None
+
+
+def test_prose_is_not_detected():
+    assert detect_chart("データソースは3つあります。Superstoreが最も大きいです。") is None
+    assert detect_chart("注意: 10件\n\n以上") is None
+
+
+def test_render_into_chart_template():
+    html = render_chart_template(detect_chart(_REGION_TABLE))
+    assert html.startswith("<!DOCTYPE html>")
+    assert "<title>地域別売上</title>" in html
+    assert 'width="560" height="320"' in html
+    assert "new Chart(document.getElementById('chart')" in html
+
+
+def test_service_uses_fast_path_without_model_call():
+    service = DashboardService(_UnusedBedrock(), Settings())
+    html = asyncio.run(service.generate_chart_code(_REGION_TABLE))
+    assert "getElementById('chart')" in html
+
+
+def test_service_draws_structured_data_with_the_model():
+    calls = []
+
+    def create_message(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text="<!DOCTYPE html><html><body>chart</body></html>")],
+            usage=SimpleNamespace(output_tokens=10)
+        )
+
+    service = DashboardService(SimpleNamespace(create_message=create_message), Settings())
+    data = "[resultId: r1 source: query-datasource]\n地域\t売上\nEast\t678781.25\nWest\t725458.5"
+    html = asyncio.run(service.generate_chart_code(_REGION_TABLE, data=data, render_mode="html"))
+    # 回答文の表ではなく結果行から描画させるため、高速パスを使わずモデルに渡す
+    assert len(calls) == 1 and "678781.25" in str(calls[0]["messages"])
+    assert "chart" in html
@@ -0,0 +1,77 @@
+from app.core.circuit_breaker import CircuitBreaker, CircuitState
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _breaker(clock):
+    return CircuitBreaker("test", failure_threshold=2, base_backoff=10, max_backoff=40, clock=clock)
+
+
+def test_opens_after_consecutive_failures():
+    breaker = _breaker(_FakeClock())
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.allow_request()
+
+
+def test_success_resets_failure_count():
+    breaker = _breaker(_FakeClock())
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_half_open_allows_single_probe():
+    clock = _FakeClock()
+    breaker = _breaker(clock)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    clock.now = 10
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.allow_request()
+
+
+def test_failed_probe_doubles_backoff_up_to_max():
+    clock = _FakeClock()
+    breaker = _breaker(clock)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    expected_backoffs = [20, 40, 40]
+    for backoff in expected_backoffs:
+        clock.now += 1000
+        assert breaker.allow_request()
+        breaker.record_failure()
+        opened_at = clock.now
+        clock.now = opened_at + backoff - 1
+        assert breaker.state == CircuitState.OPEN
+        clock.now = opened_at + backoff
+        assert breaker.state == CircuitState.HALF_OPEN
+
+
+def test_stalled_probe_is_replaced_after_probe_timeout():
+    clock = _FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=1, base_backoff=10, probe_timeout=30, clock=clock)
+    breaker.record_failure()
+
+    clock.now = 10
+    assert breaker.allow_request()
+    clock.now = 39
+    assert not breaker.allow_request()
+    clock.now = 40
+    assert breaker.allow_request()
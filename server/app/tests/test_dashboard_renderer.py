@@ -0,0 +1,171 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.config.settings import Settings
+from app.core.dashboard_renderer import build_chart_config, render_chart_page, render_dashboard
+from app.core.dashboard_spec import ChartSpec, DashboardSpec, parse_dashboard_spec
+from app.services.dashboard_service import DashboardService
+
+_SPEC = {
+    "title": "売上ダッシュボード",
+    "subtitle": "2024年度",
+    "kpis": [{"label": "売上", "value": "1.2億円", "delta": "+12%", "trend": "up"}],
+    "charts": [{
+        "title": "地域別売上",
+        "type": "bar",
+        "labels": ["East", "West"],
+        "datasets": [{"label": "Sales", "data": [120, 80]}],
+        "y_axis_label": "円"
+    }],
+    "sections": [{"heading": "洞察", "paragraphs": ["Eastが好調"], "bullets": ["West改善余地"]}]
+}
+
+
+class _FakeBedrock:
+    def __init__(self, *texts):
+        self.texts = list(texts)
+        self.calls = []
+
+    def create_message(self, messages, tools=None, system=None, model_id=None, max_tokens=None, tier="default"):
+        self.calls.append({"system": system, "max_tokens": max_tokens})
+        text = self.texts.pop(0)
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text=text)],
+            usage=SimpleNamespace(input_tokens=10, output_tokens=len(text) // 4)
+        )
+
+
+def test_parse_spec_strips_code_fence_and_preamble():
+    text = "はい、以下です。\n```json\n" + json.dumps(_SPEC, ensure_ascii=False) + "\n```"
+    spec = parse_dashboard_spec(text)
+    assert spec.title == "売上ダッシュボード"
+    assert spec.charts[0].type == "bar"
+
+
+def test_parse_spec_rejects_invalid_chart_type():
+    bad = dict(_SPEC, charts=[dict(_SPEC["charts"][0], type="scatter3d")])
+    with pytest.raises(ValueError):
+        parse_dashboard_spec(json.dumps(bad))
+
+
+def test_render_dashboard_escapes_text_and_embeds_config():
+    spec = DashboardSpec.model_validate(dict(_SPEC, title="<script>alert(1)</script>"))
+    html = render_dashboard(spec)
+    assert html.startswith("<!DOCTYPE html>")
+    assert "<script>alert(1)</script>" not in html
+    assert "&lt;script&gt;" in html
+    assert 'data-section-id="kpi-0"' in html
+    assert "getElementById('chart-0')" in html
+    assert "West改善余地" in html
+
+
+def test_chart_config_escapes_closing_script_tags():
+    chart = ChartSpec.model_validate(dict(_SPEC["charts"][0], title="x", labels=["</script>", "b"]))
+    page = render_chart_page(chart)
+    assert "</script>\"" not in page
+    assert "<\\/script>" in page
+
+
+def test_chart_config_options():
+    chart = ChartSpec.model_validate(dict(_SPEC["charts"][0], horizontal=True, stacked=True))
+    config = build_chart_config(chart)
+    assert config["options"]["responsive"] is False
+    assert config["options"]["indexAxis"] == "y"
+    assert config["options"]["scales"]["y"]["title"]["text"] == "円"
+
+    pie = build_chart_config(ChartSpec.model_validate(dict(_SPEC["charts"][0], type="pie")))
+    assert "scales" not in pie["options"]
+    assert len(pie["data"]["datasets"][0]["backgroundColor"]) == 2
+
+
+def test_service_spec_mode_renders_template():
+    bedrock = _FakeBedrock(json.dumps(_SPEC, ensure_ascii=False))
+    service = DashboardService(bedrock, Settings())
+    html = asyncio.run(service.generate_dashboard_code("分析", render_mode="spec"))
+    assert "地域別売上" in html
+    assert len(bedrock.calls) == 1
+    assert bedrock.calls[0]["max_tokens"] == Settings().dashboard.spec_max_tokens
+
+
+def test_service_spec_mode_falls_back_to_html():
+    bedrock = _FakeBedrock("not json", "<!DOCTYPE html><html><body>fallback</body></html>")
+    service = DashboardService(bedrock, Settings())
+    html = asyncio.run(service.generate_chart_code("分析", render_mode="spec"))
+    assert "fallback" in html
+    assert len(bedrock.calls) == 2
+
+
+class _SectionBedrock:
+    """計画呼び出しにはplanを、セクション呼び出しには見出しを含む断片を返す（呼び出しごとにdelay秒待機）"""
+
+    def __init__(self, plan, delay=0.0, fail_titles=()):
+        self.plan = plan
+        self.delay = delay
+        self.fail_titles = set(fail_titles)
+        self.tiers = []
+
+    def create_message(self, messages, tools=None, system=None, model_id=None, max_tokens=None, tier="default"):
+        self.tiers.append(tier)
+        time.sleep(self.delay)
+        if tier == "planning":
+            text = self.plan
+        elif tier == "section":
+            title = messages[0]["content"].split("見出し: ")[1].split("\n")[0]
+            if title in self.fail_titles:
+                raise RuntimeError("throttled")
+            text = f"```html\n<h2>{title}</h2>\n```"
+        else:
+            text = "<!DOCTYPE html><html><body>single</body></html>"
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text=text)],
+            usage=SimpleNamespace(input_tokens=10, output_tokens=5)
+        )
+
+
+_PLAN = json.dumps({
+    "title": "売上",
+    "sections": [
+        {"type": "kpi", "title": "KPI", "brief": "売上合計"},
+        {"type": "chart", "title": "地域別", "brief": "棒グラフ"},
+        {"type": "chart", "title": "月別", "brief": "折れ線"},
+        {"type": "insight", "title": "洞察", "brief": "要点"},
+    ]
+}, ensure_ascii=False)
+
+
+def test_sections_are_generated_in_parallel_and_assembled_in_order():
+    bedrock = _SectionBedrock(_PLAN, delay=0.2)
+    settings = Settings()
+    settings.dashboard.section_concurrency = 4
+    service = DashboardService(bedrock, settings)
+
+    start = time.perf_counter()
+    html = asyncio.run(service.generate_dashboard_code("分析", render_mode="sections"))
+    elapsed = time.perf_counter() - start
+
+    # 計画1回＋セクション4並列 ≒ 2回分の待ち時間
+    assert elapsed < 0.2 * 4
+    assert bedrock.tiers.count("section") == 4
+    assert html.startswith("<!DOCTYPE html>")
+    assert "```" not in html
+    positions = [html.index(f'data-section-id="s{i}"') for i in range(1, 5)]
+    assert positions == sorted(positions)
+    assert html.index("<h2>KPI</h2>") < html.index("<h2>洞察</h2>")
+
+
+def test_failed_section_is_skipped():
+    bedrock = _SectionBedrock(_PLAN, fail_titles={"月別"})
+    html = asyncio.run(DashboardService(bedrock, Settings()).generate_dashboard_code("分析", render_mode="sections"))
+    assert "<h2>地域別</h2>" in html
+    assert 'data-section-id="s3"' not in html
+
+
+def test_invalid_plan_falls_back_to_single_generation():
+    bedrock = _SectionBedrock("plan unavailable")
+    html = asyncio.run(DashboardService(bedrock, Settings()).generate_dashboard_code("分析", render_mode="sections"))
+    assert "single" in html
+    assert bedrock.tiers == ["planning", "default"]
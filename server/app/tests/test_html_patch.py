@@ -0,0 +1,97 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.config.settings import Settings
+from app.core.dashboard_renderer import assemble_sections
+from app.core.html_patch import PatchSet, apply_patches, parse_patch_set, section_ids, split_sections
+from app.services.dashboard_service import DashboardService
+
+_DOC = assemble_sections("売上", [
+    ("s1", '<div class="kpi"><div>売上</div><div>1.2億円</div></div>'),
+    ("s2", "<canvas id=\"s2-chart\" width=\"560\" height=\"320\"></canvas>\n"
+           "<script>(function(){ new Chart(document.getElementById('s2-chart'), "
+           "{type:'bar', data:{datasets:[{backgroundColor:'#4e79a7'}]}}); })();</script>"),
+    ("s3", "<p>Westが好調</p>"),
+])
+
+
+def _patches(*patches):
+    return PatchSet.model_validate({"patches": list(patches)})
+
+
+class _FakeBedrock:
+    def __init__(self, *texts):
+        self.texts = list(texts)
+        self.systems = []
+
+    def create_message(self, messages, tools=None, system=None, model_id=None, max_tokens=None, tier="default"):
+        self.systems.append(system)
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text=self.texts.pop(0))],
+            usage=SimpleNamespace(input_tokens=1000, output_tokens=40)
+        )
+
+
+def test_split_sections_round_trips_and_ignores_nested_divs():
+    segments = split_sections(_DOC)
+    assert "".join(segment.render() for segment in segments) == _DOC
+    assert section_ids(_DOC) == ["s1", "s2", "s3"]
+    kpi = next(segment for segment in segments if segment.section_id == "s1")
+    assert kpi.text.strip().endswith("</div></div>")
+
+
+def test_replace_only_touches_one_fragment():
+    result = apply_patches(_DOC, _patches({"op": "replace", "find": "'#4e79a7'", "replace": "'#e15759'"}))
+    assert result.applied == 1
+    assert result.changed_sections == ["s2"]
+    assert "'#e15759'" in result.html
+    assert result.html.replace("'#e15759'", "'#4e79a7'") == _DOC
+
+
+def test_replace_must_be_unique():
+    result = apply_patches(_DOC, _patches({"op": "replace", "find": "div", "replace": "span"}))
+    assert result.applied == 0
+    assert result.html == _DOC
+    assert "exactly once" in result.failed[0]
+
+
+def test_section_ops_and_resanitize_changed_fragment():
+    result = apply_patches(_DOC, _patches(
+        {"op": "replace_section", "section_id": "s3", "html": '<canvas id="s3-c" width="5000" height="9000"></canvas>'},
+        {"op": "insert_section", "after": "s1", "section_id": "s1b", "html": "<div>利益 3,000万円</div>"},
+        {"op": "remove_section", "section_id": "s2"},
+        {"op": "remove_section", "section_id": "missing"},
+    ))
+    assert result.applied == 3
+    assert len(result.failed) == 1
+    assert section_ids(result.html) == ["s1", "s1b", "s3"]
+    assert 'width="600" height="400"' in result.html
+    assert result.removed_sections == ["s2"]
+    assert sorted(result.changed_sections) == ["s1b", "s3"]
+
+
+def test_parse_patch_set_from_fenced_output():
+    text = "```json\n" + json.dumps({"patches": [{"op": "remove_section", "section_id": "s1"}]}) + "\n```"
+    assert parse_patch_set(text).patches[0].section_id == "s1"
+
+
+def test_service_edit_applies_patches():
+    bedrock = _FakeBedrock(json.dumps({"patches": [{"op": "replace", "find": "Westが好調", "replace": "Eastが好調"}]}))
+    result = asyncio.run(DashboardService(bedrock, Settings()).edit_code(_DOC, "WestをEastに"))
+    assert result.mode == "patch"
+    assert result.changed_sections == ["s3"]
+    assert "Eastが好調" in result.html
+    assert len(bedrock.systems) == 1
+
+
+def test_service_edit_falls_back_to_full_regeneration():
+    bedrock = _FakeBedrock(
+        json.dumps({"patches": [{"op": "replace", "find": "存在しない", "replace": "x"}]}),
+        "<!DOCTYPE html><html><body>rewritten</body></html>"
+    )
+    result = asyncio.run(DashboardService(bedrock, Settings()).edit_code(_DOC, "全面的に作り直す"))
+    assert result.mode == "full"
+    assert "rewritten" in result.html
+    assert len(result.failed_patches) == 1
+
@@ -0,0 +1,90 @@
+import asyncio
+
+from app.config.settings import Settings
+from app.core.html_stream import HTMLStreamFragmenter
+from app.services.dashboard_service import DashboardService
+
+_DOC = (
+    "<!DOCTYPE html>\n<html lang=\"ja\">\n<head>\n<title>売上</title>\n"
+    "<style>body { margin: 0; }\n.card > h2 { color: red; }</style>\n</head>\n<body>\n"
+    "<div class=\"card\"><h2>地域別</h2><canvas id=\"c\" width=\"560\" height=\"320\"></canvas></div>\n"
+    "<script>\nif (1 > 0) { new Chart(document.getElementById('c'), {type: 'bar'}); }\n</script>\n"
+    "</body>\n</html>"
+)
+
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _stream(fragmenter, text, size):
+    fragments = []
+    for chunk in _chunks(text, size):
+        fragments.extend(fragmenter.feed(chunk))
+    fragments.extend(fragmenter.flush())
+    return fragments
+
+
+def test_fragments_end_at_tag_boundaries_and_reassemble():
+    fragments = _stream(HTMLStreamFragmenter(min_chars=1), _DOC, 7)
+    assert len(fragments) > 5
+    assert "".join(fragments) == _DOC
+    for fragment in fragments[:-1]:
+        assert fragment.rstrip().endswith(">")
+
+
+def test_script_and_style_are_emitted_whole():
+    fragments = _stream(HTMLStreamFragmenter(min_chars=1), _DOC, 5)
+    script = [f for f in fragments if "<script>" in f]
+    style = [f for f in fragments if "<style>" in f]
+    assert len(script) == 1 and "</script>" in script[0]
+    assert len(style) == 1 and "</style>" in style[0]
+
+
+def test_code_fences_are_stripped():
+    fragments = _stream(HTMLStreamFragmenter(min_chars=1), "```html\n" + _DOC + "\n```", 4)
+    assert "".join(fragments) == _DOC
+
+
+def test_min_chars_batches_small_fragments():
+    assert len(_stream(HTMLStreamFragmenter(min_chars=200), _DOC, 3)) <= 3
+
+
+def test_fragments_are_sanitized():
+    fragments = _stream(HTMLStreamFragmenter(min_chars=1), '<div><canvas width="9000" height="20000"></canvas></div>', 6)
+    assert 'width="600" height="400"' in "".join(fragments)
+
+
+class _StreamingBedrock:
+    def __init__(self, text):
+        self.text = text
+
+    def stream_message(self, messages, system=None, model_id=None, max_tokens=None, tier="default"):
+        for chunk in _chunks(self.text, 16):
+            yield {"type": "text", "text": chunk}
+        yield {"type": "usage", "input_tokens": 100, "output_tokens": 80, "stop_reason": "end_turn"}
+
+
+async def _collect(service, kind, content):
+    return [event async for event in service.stream_code(kind, content)]
+
+
+def test_service_streams_fragments_then_complete_document():
+    settings = Settings()
+    settings.dashboard.chart_fastpath_enabled = False
+    service = DashboardService(_StreamingBedrock(_DOC), settings)
+    events = asyncio.run(_collect(service, "dashboard", "分析"))
+
+    assert events[-1]["event"] == "complete"
+    assert events[-1]["code"] == _DOC
+    assert events[-1]["usage"]["output_tokens"] == 80
+    fragments = [event["html"] for event in events[:-1]]
+    assert all(event["event"] == "fragment" for event in events[:-1])
+    assert "".join(fragments) == _DOC
+
+
+def test_chart_stream_uses_fast_path_for_tables():
+    service = DashboardService(_StreamingBedrock(""), Settings())
+    events = asyncio.run(_collect(service, "chart", "| 地域 | 売上 |\n|---|---|\n| East | 10 |\n| West | 20 |"))
+    assert [event["event"] for event in events] == ["complete"]
+    assert "new Chart" in events[0]["code"]
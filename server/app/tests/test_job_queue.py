@@ -0,0 +1,126 @@
+import asyncio
+
+from cryptography.fernet import Fernet
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.exceptions import CustomException, custom_exception_handler
+from app.dependencies import get_job_queue
+from app.routers import jobs
+from app.services.artifact_store import ArtifactStore
+from app.services.job_queue import JobQueue, JobWorkerPool
+
+_PAYLOAD = {
+    "content": "地域別の売上",
+    "data": None,
+    "timestamp": "2024-01-01T00:00:00",
+    "aws_region": "us-east-1",
+    "aws_bearer_token": "secret",
+    "bedrock_model_id": "model",
+    "max_tokens": 1000
+}
+
+
+def test_interrupted_jobs_are_requeued_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path, max_attempts=2)
+    first = queue.enqueue("dashboard", dict(_PAYLOAD))
+    second = queue.enqueue("chart", dict(_PAYLOAD))
+    assert queue.claim().job_id == first.job_id
+    queue.close()
+
+    # 実行中だったジョブは待機中に戻り、待機中のジョブはそのまま残る
+    queue = JobQueue(path, max_attempts=2)
+    assert queue.recover() == [first.job_id]
+    assert queue.counts() == {"queued": 2}
+    assert queue.get(first.job_id).payload["aws_bearer_token"] == "secret"
+
+    # 試行回数の上限に達したジョブは失敗にして認証情報を破棄
+    queue.claim()
+    queue.claim()
+    queue.recover()
+    failed = queue.get(first.job_id)
+    assert failed.status == "failed"
+    assert failed.payload["aws_bearer_token"] is None
+    assert queue.get(second.job_id).status == "queued"
+
+
+def test_credentials_are_encrypted_at_rest(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job = queue.enqueue("dashboard", dict(_PAYLOAD))
+    queue.close()
+
+    assert not any(b"secret" in file.read_bytes() for file in tmp_path.iterdir())
+    assert (tmp_path / "jobs.key").stat().st_mode & 0o077 == 0
+    assert JobQueue(str(tmp_path / "jobs.sqlite3")).get(job.job_id).payload["aws_bearer_token"] == "secret"
+
+
+def test_jobs_fail_when_credentials_cannot_be_decrypted(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path, secret_key=Fernet.generate_key().decode())
+    queued = queue.enqueue("dashboard", dict(_PAYLOAD))
+    running = queue.enqueue("chart", dict(_PAYLOAD))
+    queue.claim()
+    queue.close()
+
+    # 別の鍵で起動した場合は認証情報を復号できないため、再投入せずに失敗にする
+    reopened = JobQueue(path, secret_key=Fernet.generate_key().decode())
+    assert reopened.recover() == []
+    for job_id in (queued.job_id, running.job_id):
+        job = reopened.get(job_id)
+        assert job.status == "failed" and job.error == "credentials expired"
+        assert job.payload["content"] == "地域別の売上"
+
+
+def test_worker_pool_runs_jobs_and_scrubs_credentials(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    artifact_store = ArtifactStore()
+    seen = []
+
+    async def executor(job):
+        seen.append(job.payload["aws_bearer_token"])
+        if job.payload["content"] == "fail":
+            raise RuntimeError("boom")
+        return f"<html>{job.payload['content']}</html>"
+
+    async def scenario():
+        pool = JobWorkerPool(queue, executor, artifact_store=artifact_store, concurrency=2, poll_interval_seconds=5)
+        pool.start()
+        ok = queue.enqueue("dashboard", dict(_PAYLOAD))
+        failed = queue.enqueue("chart", dict(_PAYLOAD, content="fail"))
+        # 投入通知でワーカーが起床するため、ポーリング間隔を待たずに完了する
+        for _ in range(100):
+            if queue.get(ok.job_id).finished and queue.get(failed.job_id).finished:
+                break
+            await asyncio.sleep(0.01)
+        await pool.stop()
+        return queue.get(ok.job_id), queue.get(failed.job_id)
+
+    ok, failed = asyncio.run(scenario())
+    assert seen == ["secret", "secret"]
+    assert ok.status == "succeeded" and ok.code == "<html>地域別の売上</html>"
+    assert artifact_store.get(ok.artifact_id).html == ok.code
+    assert failed.status == "failed" and failed.error == "boom"
+    assert ok.payload["aws_bearer_token"] is None
+    assert failed.payload["aws_bearer_token"] is None
+
+
+def test_job_endpoints(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    app = FastAPI()
+    app.add_exception_handler(CustomException, custom_exception_handler)
+    app.include_router(jobs.router)
+    app.dependency_overrides[get_job_queue] = lambda: queue
+    client = TestClient(app)
+
+    job = queue.enqueue("dashboard", dict(_PAYLOAD))
+    assert client.get(f"/api/jobs/{job.job_id}").json()["status"] == "queued"
+    assert client.get(f"/api/jobs/{job.job_id}/result").status_code == 409
+    assert client.get("/api/jobs/unknown").status_code == 404
+
+    queue.complete(queue.claim(), "<html></html>", "artifact-1")
+    body = client.get(f"/api/jobs/{job.job_id}/result").json()
+    assert body["success"] is True
+    assert body["code"] == "<html></html>"
+    assert body["artifact_id"] == "artifact-1"
+    assert body["timestamp"] == _PAYLOAD["timestamp"]
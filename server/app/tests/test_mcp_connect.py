@@ -0,0 +1,134 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.config.prompts import FORCE_FINAL_ANSWER_MESSAGE
+from app.config.settings import Settings
+from app.core.metrics import get_metrics
+from app.services.mcp_service import MCPService, get_known_tool_catalog, get_mcp_circuit_breaker
+
+_TOOLS = [{"name": "list-datasources", "description": "list", "input_schema": {"type": "object", "properties": {}}}]
+
+
+class _FakeSession:
+    def __init__(self):
+        self.calls = []
+
+    async def list_tools(self):
+        return SimpleNamespace(tools=[
+            SimpleNamespace(name=tool["name"], description=tool["description"], inputSchema=tool["input_schema"])
+            for tool in _TOOLS
+        ])
+
+    async def call_tool(self, name, args):
+        self.calls.append(name)
+        return SimpleNamespace(content=[SimpleNamespace(text="ds-1")])
+
+
+class _FakeBedrock:
+    bedrock_model_id = "model"
+
+    def __init__(self, service, responses):
+        self.service = service
+        self.responses = list(responses)
+        self.connected_at_call = []
+        self.requests = []
+
+    def create_message(self, messages, tools=None, system=None, model_id=None, max_tokens=None, tier="default"):
+        self.connected_at_call.append(self.service.session is not None)
+        self.requests.append(list(messages))
+        return SimpleNamespace(content=self.responses.pop(0))
+
+
+def _service(responses, connect):
+    get_known_tool_catalog().update(_TOOLS)
+    settings = Settings()
+    settings.bedrock.fast_model_id = None
+    settings.mcp.prefetch_enabled = False
+    service = MCPService(settings)
+    service._connect_to_server = lambda: connect(service)
+    bedrock = _FakeBedrock(service, responses)
+    service.set_bedrock_service(bedrock)
+    return service, bedrock
+
+
+async def _chat(service):
+    service.start_connect()
+    try:
+        return await service.process_chat_with_history([{"role": "user", "content": "データソースの一覧"}])
+    finally:
+        await service.cleanup()
+
+
+def test_question_without_tools_does_not_wait_for_mcp():
+    never = asyncio.Event()
+
+    async def connect(service):
+        await never.wait()
+
+    abandoned = get_metrics().get_counter("mcp.connect.abandoned")
+    service, bedrock = _service([[SimpleNamespace(type="text", text="こんにちは")]], connect)
+
+    async def scenario():
+        answer = await asyncio.wait_for(_chat(service), timeout=2)
+        await asyncio.sleep(0)
+        return answer
+
+    assert asyncio.run(scenario()) == "こんにちは"
+    # 既知のツール定義で接続完了前にモデルを呼び出し、接続は破棄される
+    assert bedrock.connected_at_call == [False]
+    assert get_metrics().get_counter("mcp.connect.abandoned") == abandoned + 1
+    assert get_mcp_circuit_breaker().allow_request() is True
+
+
+def test_tool_call_waits_for_background_connection():
+    session = _FakeSession()
+
+    async def connect(service):
+        await asyncio.sleep(0.05)
+        service.session = session
+
+    tool_use = SimpleNamespace(type="tool_use", id="t1", name="list-datasources", input={})
+    service, bedrock = _service([[tool_use], [SimpleNamespace(type="text", text="ds-1 があります")]], connect)
+
+    assert asyncio.run(_chat(service)) == "ds-1 があります"
+    assert bedrock.connected_at_call == [False, True]
+    assert session.calls == ["list-datasources"]
+
+
+def test_failed_connection_after_tool_request_forces_final_answer():
+    async def connect(service):
+        raise RuntimeError("spawn failed")
+
+    tool_use = SimpleNamespace(type="tool_use", id="t1", name="list-datasources", input={})
+    service, bedrock = _service([[tool_use], [SimpleNamespace(type="text", text="接続できませんでした")]], connect)
+
+    assert asyncio.run(_chat(service)) == "接続できませんでした"
+    final_request = bedrock.requests[-1][-1]["content"]
+    assert "MCPサーバーに接続できません" in final_request[0]["content"]
+    assert final_request[-1]["text"] == FORCE_FINAL_ANSWER_MESSAGE
+    get_mcp_circuit_breaker().record_success()
+
+
+def test_cancelled_connect_releases_half_open_probe():
+    started = asyncio.Event()
+
+    async def connect(service):
+        started.set()
+        await asyncio.Event().wait()
+
+    breaker = get_mcp_circuit_breaker()
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    breaker._open_until = 0.0
+    service, _ = _service([], connect)
+
+    async def scenario():
+        task = asyncio.create_task(service.connect())
+        await started.wait()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    # 中断されたプローブの枠が解放され、次の接続試行が許可される
+    assert breaker.allow_request() is True
+    breaker.record_success()
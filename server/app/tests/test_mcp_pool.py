@@ -0,0 +1,145 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.config.settings import Settings
+from app.core.exceptions import MCPConnectionError
+from app.services.mcp_pool import MCPServerPool
+from app.services.mcp_service import MCPService
+
+
+class _FakeSession:
+    """呼び出しごとに解放されるまで待機できるMCPセッションの代替"""
+
+    def __init__(self):
+        self.alive = True
+        self.calls = []
+        self.release = asyncio.Event()
+        self.release.set()
+        self.closed = False
+
+    async def list_tools(self):
+        return SimpleNamespace(tools=[])
+
+    async def call_tool(self, name, arguments=None):
+        if not self.alive:
+            raise RuntimeError("connection closed")
+        self.calls.append(name)
+        await self.release.wait()
+        return SimpleNamespace(content=[SimpleNamespace(text=name)])
+
+    async def send_ping(self):
+        if not self.alive:
+            raise RuntimeError("connection closed")
+
+
+async def _factory(stack):
+    session = _FakeSession()
+    stack.callback(lambda: setattr(session, "closed", True))
+    return session
+
+
+def _pool(size=2, **kwargs):
+    return MCPServerPool(size, _factory, health_check_interval_seconds=60, acquire_timeout_seconds=0.5, **kwargs)
+
+
+def test_calls_go_to_replica_with_fewest_outstanding_calls():
+    async def scenario():
+        pool = _pool()
+        await pool.start_replicas()
+        first, second = (replica.session for replica in pool.replicas)
+        first.release.clear()
+
+        blocked = asyncio.create_task(pool.call_tool("slow"))
+        await asyncio.sleep(0.01)
+        assert [r["outstanding"] for r in pool.stats()["replicas"]] == [1, 0]
+
+        await pool.call_tool("fast")
+        assert second.calls == ["fast"]
+
+        first.release.set()
+        await blocked
+        assert [r["outstanding"] for r in pool.stats()["replicas"]] == [0, 0]
+        await pool.stop()
+        return first.closed and second.closed
+
+    assert asyncio.run(scenario()) is True
+
+
+def test_dead_replica_is_restarted_and_call_retried_elsewhere():
+    async def scenario():
+        pool = _pool()
+        await pool.start_replicas()
+        dead = pool.replicas[0].session
+        dead.alive = False
+
+        # 失敗した呼び出しは別のレプリカで再試行される
+        result = await pool.call_tool("query")
+        assert result.content[0].text == "query"
+        assert pool.replicas[1].session.calls == ["query"]
+
+        await asyncio.sleep(0.05)
+        await pool.check_health()
+        replica = pool.replicas[0]
+        assert replica.session is not dead and replica.session.alive
+        assert replica.restarts == 1
+        assert dead.closed
+        await pool.stop()
+
+    asyncio.run(scenario())
+
+
+def test_ping_failure_triggers_restart():
+    async def scenario():
+        pool = _pool(size=1)
+        await pool.start_replicas()
+        pool.replicas[0].session.alive = False
+        await pool.check_health()
+        assert pool.replicas[0].restarts == 1
+        assert pool.available
+        await pool.stop()
+
+    asyncio.run(scenario())
+
+
+def test_replica_is_recycled_after_max_calls():
+    async def scenario():
+        pool = _pool(size=2, max_calls_per_replica=2)
+        await pool.start_replicas()
+        original = pool.replicas[0].session
+        await pool.call_tool("a")
+        await pool.call_tool("b")
+        await pool.call_tool("c")
+        await asyncio.sleep(0.05)
+        await pool.stop()
+        return original, pool.replicas[0]
+
+    original, replica = asyncio.run(scenario())
+    assert original.closed
+    assert replica.restarts == 1
+
+
+def test_no_available_replica_raises():
+    async def scenario():
+        pool = _pool(size=1)
+        with pytest.raises(MCPConnectionError):
+            await pool.call_tool("query")
+
+    asyncio.run(scenario())
+
+
+def test_mcp_service_uses_pool_without_spawning():
+    async def scenario():
+        pool = _pool(size=1)
+        await pool.start_replicas()
+        service = MCPService(Settings(), mcp_pool=pool)
+        service.start_connect()
+        assert service.session is pool and not service.connection_pending
+        result = await service.call_tool("list-datasources", {})
+        await service.cleanup()
+        assert pool.available and not pool.replicas[0].session.closed
+        await pool.stop()
+        return result
+
+    assert asyncio.run(scenario()).content[0].text == "list-datasources"
@@ -0,0 +1,63 @@
+import pytest
+
+from app.config.settings import Settings
+from app.core.exceptions import MCPConnectionError
+from app.services import mcp_service
+from app.services.mcp_pool import MCPServerPool
+from app.services.mcp_service import mcp_server_configured, open_transport
+
+
+def _settings(transport, **mcp):
+    settings = Settings()
+    settings.mcp.transport = transport
+    for key, value in mcp.items():
+        setattr(settings.mcp, key, value)
+    return settings
+
+
+def test_server_is_configured_by_script_for_stdio_and_url_for_network():
+    assert mcp_server_configured(_settings("stdio", server_script_path="index.js"))
+    assert not mcp_server_configured(_settings("stdio", server_url="http://mcp:3927/tableau-mcp"))
+    assert mcp_server_configured(_settings("streamable-http", server_url="http://mcp:3927/tableau-mcp"))
+    assert not mcp_server_configured(_settings("sse", server_script_path="index.js"))
+
+
+@pytest.mark.parametrize("transport, client_name", [("streamable-http", "streamablehttp_client"), ("sse", "sse_client")])
+def test_network_transport_connects_to_shared_server_url(monkeypatch, transport, client_name):
+    calls = []
+    monkeypatch.setattr(mcp_service, client_name, lambda url, **kwargs: calls.append((url, kwargs)) or "client")
+    settings = _settings(
+        transport,
+        server_url="http://mcp:3927/tableau-mcp",
+        server_auth_token="secret",
+        http_timeout_seconds=12.0
+    )
+
+    assert open_transport(settings) == "client"
+    url, kwargs = calls[0]
+    assert url == "http://mcp:3927/tableau-mcp"
+    assert kwargs["headers"] == {"Authorization": "Bearer secret"}
+    assert kwargs["timeout"] == 12.0
+
+
+@pytest.mark.parametrize("settings", [
+    _settings("streamable-http"),
+    _settings("websocket", server_url="ws://mcp:3927"),
+    _settings("stdio"),
+])
+def test_misconfigured_transport_raises_connection_error(settings):
+    with pytest.raises(MCPConnectionError):
+        open_transport(settings)
+
+
+def test_pool_over_network_transport_does_not_track_processes():
+    network_settings = _settings("streamable-http", server_url="http://mcp:3927/tableau-mcp")
+    stdio_settings = _settings("stdio", server_script_path="index.js")
+    for settings in (network_settings, stdio_settings):
+        settings.mcp_pool.size = 2
+    network = MCPServerPool.from_settings(network_settings)
+    stdio = MCPServerPool.from_settings(stdio_settings)
+    assert len(network.replicas) == len(stdio.replicas) == 2
+
+    assert not any(replica.track_process for replica in network.replicas)
+    assert all(replica.track_process for replica in stdio.replicas)
@@ -0,0 +1,130 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.config.settings import Settings
+from app.services.local_tools import SearchDatasourceMetadataTool
+from app.services.mcp_service import MCPService
+from app.services.metadata_index import (
+    DatasourceInfo,
+    FieldInfo,
+    MetadataIndex,
+    MetadataIndexer,
+    parse_datasource_list,
+    parse_datasource_metadata,
+)
+
+
+def _superstore(updated_at="2024-01-01T00:00:00Z", fields=None):
+    return DatasourceInfo(
+        luid="ds-1",
+        name="Superstore Sales",
+        project="Samples",
+        updated_at=updated_at,
+        fields=fields or [
+            FieldInfo("Sales", caption="売上", data_type="REAL"),
+            FieldInfo("Region", caption="地域", data_type="STRING"),
+            FieldInfo("Order Date", caption="注文日", data_type="DATE"),
+        ]
+    )
+
+
+def _index():
+    index = MetadataIndex()
+    index.upsert(_superstore())
+    index.upsert(DatasourceInfo(
+        luid="ds-2",
+        name="HR Headcount",
+        fields=[FieldInfo("Employee Count", caption="従業員数", data_type="INTEGER"), FieldInfo("Region")]
+    ))
+    return index
+
+
+def test_parse_tool_outputs():
+    datasources = parse_datasource_list(json.dumps([
+        {"id": "ds-1", "name": "Superstore", "project": {"name": "Samples"}, "updatedAt": "2024-01-01"},
+        {"name": "no id"},
+    ]))
+    assert [(d.luid, d.project, d.updated_at) for d in datasources] == [("ds-1", "Samples", "2024-01-01")]
+
+    fields = parse_datasource_metadata(json.dumps({"data": [
+        {"fieldName": "Sales", "fieldCaption": "売上", "dataType": "REAL"},
+    ]}))
+    assert fields[0].describe() == "Sales [売上] (REAL)"
+    assert parse_datasource_metadata("not json") == []
+
+
+def test_search_matches_captions_and_datasource_names():
+    index = _index()
+    matches = index.search("地域別の売上を教えて", limit=2)
+    assert {match.field_info.name for match in matches} == {"Sales", "Region"}
+    assert matches[0].datasource.luid == "ds-1"
+
+    hr = index.search("HR headcount")
+    assert {match.datasource.luid for match in hr} == {"ds-2"}
+
+
+def test_upsert_replaces_old_postings():
+    index = _index()
+    index.upsert(_superstore("2024-02-01T00:00:00Z", [FieldInfo("Profit", caption="利益", data_type="REAL")]))
+    assert index.search("売上") == []
+    assert index.search("利益")[0].field_info.name == "Profit"
+    assert index.versions()["ds-1"] == "2024-02-01T00:00:00Z"
+
+    index.remove("ds-1")
+    assert index.search("利益") == []
+    assert len(index) == 1
+
+
+class _FakeService:
+    def __init__(self, listing):
+        self.listing = listing
+        self.calls = []
+
+    async def connect(self):
+        return True
+
+    async def cleanup(self):
+        pass
+
+    async def call_tool(self, name, args):
+        self.calls.append(name)
+        if name == "list-datasources":
+            payload = self.listing
+        else:
+            payload = {"fields": [{"name": "Sales", "dataType": "REAL"}]}
+        return SimpleNamespace(content=[SimpleNamespace(text=json.dumps(payload))], isError=False)
+
+
+def test_indexer_refreshes_incrementally():
+    index = MetadataIndex()
+    listing = [
+        {"id": "ds-1", "name": "Superstore", "updatedAt": "1"},
+        {"id": "ds-2", "name": "HR", "updatedAt": "1"},
+    ]
+    service = _FakeService(listing)
+    indexer = MetadataIndexer(Settings(), index, lambda: service)
+
+    stats = asyncio.run(indexer.refresh())
+    assert stats == {"datasources": 2, "updated": 2, "failed": 0, "removed": 0}
+
+    # 変更なしのデータソースはメタデータを再取得しない
+    service.calls.clear()
+    service.listing = [{"id": "ds-1", "name": "Superstore", "updatedAt": "2"}]
+    stats = asyncio.run(indexer.refresh())
+    assert stats == {"datasources": 1, "updated": 1, "failed": 0, "removed": 1}
+    assert service.calls == ["list-datasources", "get-datasource-metadata"]
+
+
+def test_local_tool_and_prompt_context():
+    index = _index()
+    result = asyncio.run(SearchDatasourceMetadataTool(index, default_limit=5).run({"query": "従業員数"}))
+    assert "HR Headcount (datasourceLuid: ds-2)" in result
+    assert "Employee Count [従業員数] (INTEGER)" in result
+
+    service = MCPService(Settings(), metadata_index=index)
+    service._set_conversation("conv")
+    assert "search-datasource-metadata" in service.local_tools
+    context = service._build_metadata_context([{"role": "user", "content": "注文日ごとの売上"}])
+    assert "Superstore Sales (datasourceLuid: ds-1, project: Samples)" in context
+    assert "Order Date [注文日]" in context
@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+from app.config.settings import Settings
+from app.services.mcp_service import MCPService
+
+
+class _FakeBedrock:
+    bedrock_model_id = "strong-model"
+    max_tokens = 8000
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def create_message(self, messages, tools=None, system=None, model_id=None, max_tokens=None, tier="default"):
+        self.calls.append({"model_id": model_id, "max_tokens": max_tokens, "tier": tier})
+        return self.responses.pop(0)
+
+
+def _response(stop_reason, *blocks):
+    return SimpleNamespace(stop_reason=stop_reason, content=list(blocks))
+
+
+_TOOL_USE = SimpleNamespace(type="tool_use", id="t1", name="list-datasources", input={})
+_TEXT = SimpleNamespace(type="text", text="answer")
+_TOOLS = [{"name": "list-datasources", "description": "", "input_schema": {}}]
+
+
+def _service(fast_model_id, responses):
+    settings = Settings()
+    settings.bedrock.fast_model_id = fast_model_id
+    settings.bedrock.fast_max_tokens = 512
+    service = MCPService(settings)
+    service.set_bedrock_service(_FakeBedrock(responses))
+    return service
+
+
+def test_tool_planning_goes_to_fast_tier():
+    service = _service("fast-model", [_response("tool_use", _TOOL_USE)])
+    response = service._create_routed_message([], _TOOLS, "system")
+    assert response.content == [_TOOL_USE]
+    assert service.bedrock_service.calls == [
+        {"model_id": "fast-model", "max_tokens": 512, "tier": "planning"}
+    ]
+
+
+def test_answer_without_tools_is_kept_from_fast_tier():
+    service = _service("fast-model", [_response("end_turn", _TEXT)])
+    response = service._create_routed_message([], _TOOLS, "system")
+    assert response.content == [_TEXT]
+    assert [call["tier"] for call in service.bedrock_service.calls] == ["planning"]
+
+
+def test_truncated_fast_answer_escalates_to_selected_model():
+    service = _service("fast-model", [_response("max_tokens", _TEXT), _response("end_turn", _TEXT)])
+    service._create_routed_message([], _TOOLS, "system")
+    assert [call["tier"] for call in service.bedrock_service.calls] == ["planning", "final"]
+    assert service.bedrock_service.calls[1]["model_id"] is None
+
+
+def test_turn_after_tool_results_goes_straight_to_selected_model():
+    messages = [
+        {"role": "user", "content": "データソースの一覧"},
+        {"role": "assistant", "content": [_TOOL_USE]},
+        {"role": "user", "content": [{"type": "tool_result", "tool_use_id": "t1", "content": "ds-1"}]},
+    ]
+    service = _service("fast-model", [_response("end_turn", _TEXT)])
+    service._create_routed_message(messages, _TOOLS, "system")
+    assert service.bedrock_service.calls == [{"model_id": None, "max_tokens": None, "tier": "final"}]
+
+
+def test_routing_disabled_without_fast_model():
+    service = _service(None, [_response("tool_use", _TOOL_USE)])
+    service._create_routed_message([], _TOOLS, "system")
+    assert [call["tier"] for call in service.bedrock_service.calls] == ["final"]
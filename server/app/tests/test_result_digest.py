@@ -0,0 +1,72 @@
+import json
+
+from app.core.result_digest import build_digest, sample_rows
+from app.core.result_encoding import encode_tool_result
+
+
+def _rows():
+    rows = []
+    for day in range(1, 11):
+        for region in ("East", "West"):
+            rows.append({
+                "Order Date": f"2024-01-{day:02d}",
+                "Region": region,
+                "Sales": float(day * 10),
+                "Discount": None if day == 1 else 0.1,
+            })
+    return rows
+
+
+def _line(digest, column):
+    return next(line for line in digest.splitlines() if line.startswith(f"{column}\t"))
+
+
+def test_numeric_column_summary():
+    line = _line(build_digest(_rows()), "Sales")
+    assert "number" in line
+    assert "count=20" in line
+    assert "min=10" in line
+    assert "max=100" in line
+    assert "sum=1100" in line
+
+
+def test_null_rate_is_reported():
+    assert "null_rate=0.100" in _line(build_digest(_rows()), "Discount")
+
+
+def test_category_top_k():
+    line = _line(build_digest(_rows()), "Region")
+    assert "distinct=2" in line
+    assert "East:10" in line and "West:10" in line
+
+
+def test_date_range_and_trend_slope():
+    digest = build_digest(_rows())
+    assert "min=2024-01-01" in _line(digest, "Order Date")
+    # 日次合計は 20, 40, ..., 200 なので傾きは 20/day
+    assert "trend Sales by Order Date: slope=20/day" in digest
+
+
+def test_numeric_string_column_is_not_treated_as_date():
+    rows = [{"Zip": str(10000 + i * 10), "Sales": float(i)} for i in range(20)]
+    digest = build_digest(rows)
+    assert "category" in _line(digest, "Zip")
+    assert "trend" not in digest
+
+
+def test_sample_rows_are_evenly_spaced():
+    rows = [{"i": i} for i in range(100)]
+    sample = sample_rows(rows, 5)
+    assert [row["i"] for row in sample] == [0, 24, 49, 74, 99]
+
+
+def test_large_results_are_digested():
+    encoded = encode_tool_result(json.dumps({"data": _rows()}), digest_min_rows=10, digest_sample_rows=3)
+    assert encoded.digested
+    assert encoded.text.startswith("[digest rows=20 columns=4]")
+    assert "[sample]\n[table rows=3 columns=4 format=tsv]" in encoded.text
+
+
+def test_small_results_are_not_digested():
+    encoded = encode_tool_result(json.dumps({"data": _rows()}), digest_min_rows=100)
+    assert not encoded.digested
@@ -0,0 +1,67 @@
+import json
+from types import SimpleNamespace
+
+from app.core.result_encoding import encode_tool_result, extract_result_text
+
+
+def _rows(count):
+    return [{"Region": f"R{i}", "Sales": i * 10.5, "Orders": i} for i in range(count)]
+
+
+def test_row_oriented_json_becomes_table():
+    text = json.dumps({"data": _rows(3)})
+    encoded = encode_tool_result(text)
+    lines = encoded.text.splitlines()
+    assert lines[0] == "[table rows=3 columns=3 format=tsv]"
+    assert lines[1] == "Region\tSales\tOrders"
+    assert lines[2] == "R0\t0.0\t0"
+    assert encoded.row_count == 3
+    assert not encoded.truncated
+    assert encoded.tokens_saved > 0
+
+
+def test_row_budget_adds_truncation_note():
+    encoded = encode_tool_result(json.dumps(_rows(50)), max_rows=10)
+    assert encoded.truncated
+    assert encoded.text.endswith("[truncated: showing 10 of 50 rows]")
+
+
+def test_byte_budget_adds_truncation_note():
+    encoded = encode_tool_result(json.dumps(_rows(1000)), max_rows=1000, max_bytes=500)
+    assert encoded.truncated
+    assert len(encoded.text.encode("utf-8")) < 600
+    assert "[truncated: showing" in encoded.text
+
+
+def test_large_meta_counts_against_byte_budget():
+    payload = {"data": _rows(20), "meta": {"note": "x" * 5000}}
+    encoded = encode_tool_result(json.dumps(payload), max_rows=1000, max_bytes=500)
+    lines = encoded.text.splitlines()
+    assert lines[1].startswith("meta: ") and lines[1].endswith("[truncated]")
+    assert len("\n".join(lines[:-1]).encode("utf-8")) <= 500
+    assert encoded.tokens_saved >= 0
+
+
+def test_tokens_saved_is_never_negative():
+    encoded = encode_tool_result("[]", max_bytes=1)
+    assert encoded.tokens_saved == 0
+
+
+def test_cells_with_tabs_and_newlines_are_escaped():
+    encoded = encode_tool_result(json.dumps([{"name": "a\tb\nc", "value": None}]))
+    assert encoded.text.splitlines()[2] == "a\\tb\\nc\t"
+
+
+def test_non_tabular_json_is_compacted():
+    encoded = encode_tool_result(json.dumps({"name": "Superstore", "fields": []}, indent=2))
+    assert encoded.text == '{"name":"Superstore","fields":[]}'
+
+
+def test_plain_text_is_passed_through():
+    encoded = encode_tool_result("Error: datasource not found")
+    assert encoded.text == "Error: datasource not found"
+
+
+def test_text_content_items_are_joined():
+    content = [SimpleNamespace(type="text", text="first"), {"type": "text", "text": "second"}]
+    assert extract_result_text(content) == "first\nsecond"
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from app.services.local_tools import AggregateCachedResultTool
+from app.services.result_store import LocalQueryError, ResultStore, format_results_for_prompt, run_local_query
+
+_ROWS = [
+    {"Region": "East", "Category": "Tech", "Sales": 100.0, "Units": 1},
+    {"Region": "East", "Category": "Office", "Sales": 50.0, "Units": 2},
+    {"Region": "West", "Category": "Tech", "Sales": 300.0, "Units": 3},
+    {"Region": "West", "Category": "Tech", "Sales": None, "Units": 4},
+    {"Region": "South", "Category": "Office", "Sales": 20.0, "Units": 5},
+]
+
+
+@pytest.fixture
+def stored():
+    store = ResultStore()
+    return store.put("conv", "query-datasource", {}, _ROWS)
+
+
+def test_group_by_and_aggregate(stored):
+    rows = run_local_query(
+        stored,
+        group_by=["Region"],
+        aggregations=[
+            {"column": "Sales", "function": "sum", "alias": "total"},
+            {"column": "Sales", "function": "count"},
+        ],
+        sort_by=[{"column": "total", "direction": "desc"}],
+    )
+    assert rows == [
+        {"Region": "West", "total": 300, "count(Sales)": 1},
+        {"Region": "East", "total": 150, "count(Sales)": 2},
+        {"Region": "South", "total": 20, "count(Sales)": 1},
+    ]
+
+
+def test_multi_column_group_by_with_filter(stored):
+    rows = run_local_query(
+        stored,
+        filters=[{"column": "Units", "op": ">=", "value": 2}],
+        group_by=["Region", "Category"],
+        aggregations=[{"column": "Units", "function": "max"}],
+    )
+    assert {(row["Region"], row["Category"]): row["max(Units)"] for row in rows} == {
+        ("East", "Office"): 2,
+        ("West", "Tech"): 4,
+        ("South", "Office"): 5,
+    }
+
+
+def test_filter_and_limit_without_aggregation(stored):
+    rows = run_local_query(
+        stored,
+        filters=[{"column": "Category", "op": "in", "value": ["Tech"]}],
+        sort_by=[{"column": "Units", "direction": "desc"}],
+        limit=2,
+    )
+    assert [row["Units"] for row in rows] == [4, 3]
+    assert rows[0]["Sales"] is None
+
+
+def test_unknown_column_is_rejected(stored):
+    with pytest.raises(LocalQueryError):
+        run_local_query(stored, group_by=["Country"])
+
+
+def test_lru_eviction_respects_memory_cap():
+    store = ResultStore(max_bytes=9_000)
+    first = store.put("a", "query-datasource", {}, _ROWS)
+    second = store.put("b", "query-datasource", {}, _ROWS)
+    big_rows = [{"Name": "x" * 100, "Value": i} for i in range(50)]
+    store.put("c", "query-datasource", {}, big_rows)
+
+    assert store.total_bytes <= 9_000
+    assert store.get("a", first.result_id) is None
+    assert store.get("b", second.result_id) is not None
+
+
+def test_per_conversation_limit():
+    store = ResultStore(max_results_per_conversation=2)
+    for _ in range(3):
+        store.put("conv", "query-datasource", {}, _ROWS)
+    assert [stored.result_id for stored in store.list("conv")] == ["r2", "r3"]
+
+
+def test_result_ids_are_not_reused_after_eviction():
+    store = ResultStore(max_bytes=9_000)
+    first = store.put("a", "query-datasource", {}, _ROWS)
+    handle = store.create_handle("a", [first.result_id])
+    big_rows = [{"Name": "x" * 100, "Value": i} for i in range(50)]
+    store.put("c", "query-datasource", {}, big_rows)
+    store.put("d", "query-datasource", {}, big_rows)
+    assert store.list("a") == []
+
+    again = store.put("a", "query-datasource", {}, [{"Other": 1}])
+    assert again.result_id != first.result_id
+    # 退避済みの結果を指すハンドルは無関係な新しい結果に解決されない
+    assert store.resolve_handle(handle) == []
+
+
+def test_local_tool_returns_table(stored):
+    store = ResultStore()
+    store.put("conv", "query-datasource", {}, _ROWS)
+    tool = AggregateCachedResultTool(store, "conv", max_rows=100, max_bytes=10_000)
+    text = asyncio.run(tool.run({
+        "resultId": "r1",
+        "groupBy": ["Category"],
+        "aggregations": [{"column": "Units", "function": "sum"}],
+        "sortBy": [{"column": "Category"}],
+    }))
+    lines = text.splitlines()
+    assert lines[0] == "[resultId: r2]"
+    assert lines[2:] == ["Category\tsum(Units)", "Office\t7", "Tech\t8"]
+    # 集計結果も再利用できるよう保存される
+    assert store.get("conv", "r2").row_count == 2
+
+
+def test_local_tool_reports_missing_result():
+    tool = AggregateCachedResultTool(ResultStore(), "conv", max_rows=100, max_bytes=10_000)
+    assert "r9" in asyncio.run(tool.run({"resultId": "r9"}))
+
+
+def test_data_handle_resolves_results_and_formats_prompt():
+    store = ResultStore()
+    first = store.put("conv", "query-datasource", {}, _ROWS)
+    handle = store.create_handle("conv", [first.result_id, "r99"])
+
+    resolved = store.resolve_handle(handle)
+    assert [stored.result_id for stored in resolved] == ["r1"]
+    assert store.resolve_handle("unknown") == []
+
+    text = format_results_for_prompt(resolved, max_rows=2, max_bytes=10_000)
+    assert text.startswith("[resultId: r1 source: query-datasource]")
+    assert "[truncated: showing 2 of 5 rows]" in text
@@ -0,0 +1,111 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.config.prompts import FORCE_FINAL_ANSWER_MESSAGE, REPEATED_TOOL_CALL_NOTE
+from app.config.settings import Settings
+from app.core.metrics import get_metrics
+from app.core.tool_loop import ToolCallLedger, canonicalize_tool_args
+from app.services.mcp_service import MCPService
+
+
+def test_canonical_args_ignore_key_order_whitespace_and_none():
+    assert canonicalize_tool_args({"b": [1.0, " x "], "a": {"d": None, "c": 2}}) == \
+        canonicalize_tool_args({"a": {"c": 2.0}, "b": [1, "x"]})
+    assert canonicalize_tool_args({"a": 1}) != canonicalize_tool_args({"a": 2})
+    assert canonicalize_tool_args(None) == canonicalize_tool_args({})
+
+
+def test_ledger_detects_iterations_without_new_calls():
+    ledger = ToolCallLedger(max_unproductive_iterations=2)
+    assert ledger.lookup("query", {"q": 1}) is None
+    ledger.record("query", {"q": 1}, "rows")
+    assert ledger.end_iteration() is False
+
+    assert ledger.lookup("query", {"q": 1}) == "rows"
+    assert ledger.end_iteration() is False
+    assert ledger.lookup("query", {"q": 1}) == "rows"
+    assert ledger.end_iteration() is True
+    assert (ledger.calls, ledger.repeats) == (3, 2)
+
+
+class _FakeSession:
+    def __init__(self):
+        self.calls = []
+
+    async def list_tools(self):
+        return SimpleNamespace(tools=[
+            SimpleNamespace(name=name, description=name, inputSchema={"type": "object", "properties": {}})
+            for name in ("list-datasources", "query-datasource")
+        ])
+
+    async def call_tool(self, name, args):
+        self.calls.append(name)
+        return SimpleNamespace(content=[SimpleNamespace(text=f"{name} result")])
+
+
+class _FakeBedrock:
+    bedrock_model_id = "model"
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def create_message(self, messages, tools=None, system=None, model_id=None, max_tokens=None, tier="default"):
+        self.requests.append([dict(message) for message in messages])
+        return SimpleNamespace(content=self.responses.pop(0))
+
+
+def _tool_use(name, args, block_id="t"):
+    return SimpleNamespace(type="tool_use", id=block_id, name=name, input=args)
+
+
+def _text(text):
+    return SimpleNamespace(type="text", text=text)
+
+
+def _process(responses, max_iterations=20):
+    settings = Settings()
+    settings.bedrock.fast_model_id = None
+    settings.mcp.max_iterations = max_iterations
+    settings.mcp.prefetch_enabled = False
+    service = MCPService(settings)
+    service.session = _FakeSession()
+    bedrock = _FakeBedrock(responses)
+    service.set_bedrock_service(bedrock)
+    answer = asyncio.run(service._process_query_with_tools([{"role": "user", "content": "売上"}]))
+    return answer, service.session.calls, bedrock.requests
+
+
+def test_repeated_call_reuses_result_and_cycle_forces_final_answer():
+    histogram = get_metrics().get_histogram("mcp.agent_loop.iterations", outcome="forced_cycle")
+    before = histogram.count if histogram else 0
+
+    # 2つのツールを同じ引数で交互に呼び続ける
+    answer, calls, requests = _process([
+        [_tool_use("list-datasources", {})],
+        [_tool_use("query-datasource", {"q": 1, "x": None})],
+        [_tool_use("list-datasources", {})],
+        [_tool_use("query-datasource", {"q": 1.0})],
+        [_text("最終回答")],
+    ])
+
+    assert answer == "最終回答"
+    assert calls == ["list-datasources", "query-datasource"]
+    # 5回目（最終回答の指示）で終了し、上限まで反復しない
+    assert len(requests) == 5
+    repeated_result = requests[3][-1]["content"][0]["content"]
+    assert repeated_result.startswith(REPEATED_TOOL_CALL_NOTE)
+    assert requests[4][-1]["content"][-1] == {"type": "text", "text": FORCE_FINAL_ANSWER_MESSAGE}
+    assert get_metrics().get_histogram("mcp.agent_loop.iterations", outcome="forced_cycle").count == before + 1
+
+
+def test_iteration_limit_forces_final_answer_instead_of_failing():
+    answer, calls, requests = _process([
+        [_tool_use("query-datasource", {"q": 1})],
+        [_tool_use("query-datasource", {"q": 2})],
+        [_text("上限での回答")],
+    ], max_iterations=2)
+
+    assert answer == "上限での回答"
+    assert calls == ["query-datasource", "query-datasource"]
+    assert requests[-1][-1]["content"][-1]["text"] == FORCE_FINAL_ANSWER_MESSAGE
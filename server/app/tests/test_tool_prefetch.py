@@ -0,0 +1,109 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from app.config.settings import Settings
+from app.core.metrics import get_metrics
+from app.services.mcp_service import MCPService, get_first_tool_stats
+from app.services.tool_prefetch import FirstToolStats, ToolPrefetcher
+
+
+def test_stats_predict_tools_called_first_in_most_chats():
+    stats = FirstToolStats()
+    for _ in range(4):
+        stats.record([("list-datasources", {}), ("get-datasource-metadata", {"datasourceLuid": "ds-1"})])
+    assert stats.predict(min_share=0.6, min_samples=5, limit=2) == []
+
+    stats.record([("list-datasources", {})])
+    assert stats.predict(min_share=0.6, min_samples=5, limit=2) == [
+        ("list-datasources", {}),
+        ("get-datasource-metadata", {"datasourceLuid": "ds-1"}),
+    ]
+    assert stats.predict(min_share=0.9, min_samples=5, limit=2) == [("list-datasources", {})]
+
+
+class _FakeSession:
+    def __init__(self):
+        self.calls = []
+        self.called = threading.Event()
+
+    async def list_tools(self):
+        return SimpleNamespace(tools=[
+            SimpleNamespace(name=name, description=name, inputSchema={"type": "object", "properties": {}})
+            for name in ("list-datasources", "query-datasource")
+        ])
+
+    async def call_tool(self, name, args):
+        self.calls.append(name)
+        self.called.set()
+        return SimpleNamespace(content=[SimpleNamespace(text=f"{name} result")])
+
+
+class _FakeBedrock:
+    bedrock_model_id = "model"
+
+    def __init__(self, session, responses):
+        self.session = session
+        self.responses = list(responses)
+        self.overlapped = None
+
+    def create_message(self, messages, tools=None, system=None, model_id=None, max_tokens=None, tier="default"):
+        if self.overlapped is None:
+            # 最初のモデル呼び出しの処理中に先行実行が始まっている
+            self.overlapped = self.session.called.wait(timeout=2)
+        return SimpleNamespace(content=self.responses.pop(0))
+
+
+def _process(responses):
+    get_first_tool_stats.cache_clear()
+    settings = Settings()
+    settings.bedrock.fast_model_id = None
+    settings.mcp.prefetch_tools = ["list-datasources"]
+    service = MCPService(settings)
+    service.session = _FakeSession()
+    bedrock = _FakeBedrock(service.session, responses)
+    service.set_bedrock_service(bedrock)
+    answer = asyncio.run(service._process_query_with_tools([{"role": "user", "content": "データソースの一覧"}]))
+    return answer, service.session.calls, bedrock
+
+
+def _counter(name):
+    return get_metrics().get_counter(name, tool="list-datasources")
+
+
+def test_prefetched_result_is_served_to_the_first_tool_call():
+    hits = _counter("mcp.prefetch.hits")
+    tool_use = SimpleNamespace(type="tool_use", id="t1", name="list-datasources", input={})
+    answer, calls, bedrock = _process([[tool_use], [SimpleNamespace(type="text", text="一覧です")]])
+
+    assert answer == "一覧です"
+    assert bedrock.overlapped is True
+    assert calls == ["list-datasources"]
+    assert _counter("mcp.prefetch.hits") == hits + 1
+    assert get_first_tool_stats().hit_rate == 1.0
+
+
+def test_unused_prefetch_is_counted_as_wasted():
+    wasted = _counter("mcp.prefetch.wasted")
+    answer, calls, _ = _process([[SimpleNamespace(type="text", text="こんにちは")]])
+
+    assert answer == "こんにちは"
+    assert _counter("mcp.prefetch.wasted") == wasted + 1
+    assert get_first_tool_stats().hit_rate == 0.0
+
+
+def test_failed_prefetch_is_counted_as_wasted():
+    wasted = _counter("mcp.prefetch.wasted")
+
+    async def call(name, args):
+        raise RuntimeError("boom")
+
+    async def scenario():
+        prefetcher = ToolPrefetcher(call)
+        prefetcher.start([("list-datasources", {})])
+        # 失敗した先行実行は結果を返さず、呼び出し側はライブ呼び出しにフォールバックする
+        assert await prefetcher.take("list-datasources", {}) is None
+        return prefetcher.finish()
+
+    assert asyncio.run(scenario()) == (1, 0)
+    assert _counter("mcp.prefetch.wasted") == wasted + 1
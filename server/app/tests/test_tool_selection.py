@@ -0,0 +1,118 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.config.settings import Settings
+from app.core.tool_index import ToolIndex, ToolSelection
+from app.services.mcp_service import MCPService
+
+
+def _tool(name, description, *properties):
+    return {
+        "name": name,
+        "description": description,
+        "input_schema": {"type": "object", "properties": {prop: {"type": "string"} for prop in properties}},
+    }
+
+
+_CATALOG = [
+    _tool("list-datasources", "Retrieves a list of published data sources.", "filter"),
+    _tool("get-datasource-metadata", "Fetches field names, types and descriptions for a data source.", "datasourceLuid"),
+    _tool("query-datasource", "Runs a VizQL query against a published data source.", "datasourceLuid", "query"),
+    _tool("list-workbooks", "Retrieves a list of workbooks on the site.", "filter"),
+    _tool("get-workbook", "Retrieves information about a workbook including its views.", "workbookId"),
+    _tool("get-view-data", "Retrieves data in CSV format for the specified view.", "viewId"),
+    _tool("get-view-image", "Retrieves a PNG image of the specified view.", "viewId", "width", "height"),
+    _tool("list-all-pulse-metric-definitions", "Lists all Pulse metric definitions.", "view"),
+    _tool("search-content", "Searches content across the site.", "terms"),
+]
+_PINNED = ["list-datasources", "get-datasource-metadata", "query-datasource"]
+
+
+def test_bm25_ranks_japanese_queries_against_english_descriptions():
+    index = ToolIndex(_CATALOG)
+    assert index.top("このビューの画像を見せて", 1) == ["get-view-image"]
+    assert index.top("Pulseの指標一覧", 1) == ["list-all-pulse-metric-definitions"]
+    assert index.top("ワークブックを探して", 2, exclude=["search-content"])[0] in ("list-workbooks", "get-workbook")
+
+
+def test_selection_keeps_pinned_tools_and_reports_savings():
+    selection = ToolSelection(_CATALOG, "ビューの画像", pinned=_PINNED, top_n=1)
+    assert selection.names == [*_PINNED, "get-view-image"]
+    assert "search-content" in selection.omitted_names
+    assert 0 < selection.tokens_saved < selection.full_tokens
+
+    disabled = ToolSelection(_CATALOG, "ビューの画像", pinned=_PINNED, top_n=1, enabled=False)
+    assert len(disabled.tools) == len(_CATALOG)
+    assert disabled.tokens_saved == 0
+
+
+def test_selection_grows_but_never_shrinks():
+    selection = ToolSelection(_CATALOG, "", pinned=_PINNED, top_n=2)
+    assert selection.names == _PINNED
+    assert selection.mentioned_missing("search-content を使う必要があります") == ["search-content"]
+    assert selection.add(["search-content", "query-datasource", "unknown-tool"]) == ["search-content"]
+    assert "search-content" in selection
+
+
+class _FakeSession:
+    async def list_tools(self):
+        return SimpleNamespace(tools=[
+            SimpleNamespace(name=tool["name"], description=tool["description"], inputSchema=tool["input_schema"])
+            for tool in _CATALOG
+        ])
+
+    async def call_tool(self, name, args):
+        return SimpleNamespace(content=[SimpleNamespace(text="ok")])
+
+
+class _FakeBedrock:
+    bedrock_model_id = "model"
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent_tools = []
+
+    def create_message(self, messages, tools=None, system=None, model_id=None, max_tokens=None, tier="default"):
+        self.sent_tools.append([tool["name"] for tool in tools or []])
+        return self.responses.pop(0)
+
+
+def _text(text):
+    return SimpleNamespace(type="text", text=text)
+
+
+def _process(responses, question):
+    settings = Settings()
+    settings.bedrock.fast_model_id = None
+    settings.mcp.tool_selection_top_n = 1
+    service = MCPService(settings)
+    service.session = _FakeSession()
+    bedrock = _FakeBedrock([SimpleNamespace(content=blocks) for blocks in responses])
+    service.set_bedrock_service(bedrock)
+    answer = asyncio.run(service._process_query_with_tools([{"role": "user", "content": question}]))
+    return answer, bedrock.sent_tools
+
+
+def test_omitted_tool_mentioned_alongside_a_tool_call_is_sent_next():
+    tool_use = SimpleNamespace(type="tool_use", id="t1", name="list-datasources", input={})
+    answer, sent_tools = _process(
+        [[_text("search-content も必要です"), tool_use], [_text("検索結果です")]],
+        "売上の推移を教えて"
+    )
+    assert answer == "検索結果です"
+    assert "search-content" not in sent_tools[0]
+    assert "search-content" in sent_tools[1]
+
+
+def test_final_answer_mentioning_omitted_tool_is_kept():
+    answer, sent_tools = _process([[_text("search-content でも検索できます")]], "売上の推移を教えて")
+    assert answer == "search-content でも検索できます"
+    assert len(sent_tools) == 1
+
+
+def test_call_to_unsent_tool_is_executed_and_added():
+    tool_use = SimpleNamespace(type="tool_use", id="t1", name="list-workbooks", input={})
+    answer, sent_tools = _process([[tool_use], [_text("完了")]], "ビューの画像")
+    assert answer == "完了"
+    assert "list-workbooks" not in sent_tools[0]
+    assert "list-workbooks" in sent_tools[1]
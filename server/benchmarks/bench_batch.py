@@ -0,0 +1,80 @@
+"""バッチAPIのスループット（items/分）を逐次実行と比較する
+
+同じ質問セットを同時実行数1（従来のスクリプトによる逐次呼び出し相当）と指定の同時実行数で
+実行し、items/分と速度向上率を表示する。回答キャッシュの効果を除くためキャッシュは無効にする。
+実際のMCPサーバー・Bedrock呼び出しを行うため、SERVER_SCRIPT_PATH（または MCP_SERVER_URL）と以下の環境変数が必要:
+    BENCH_AWS_REGION, BENCH_AWS_BEARER_TOKEN, BENCH_BEDROCK_MODEL_ID
+
+実行方法（server/ ディレクトリで）:
+    python -m benchmarks.bench_batch [同時実行数] [質問ファイル（1行1問、省略時は既定の質問）]
+"""
+import asyncio
+import os
+import sys
+
+from app.config.settings import get_settings
+from app.services.artifact_store import ArtifactStore
+from app.services.batch_service import BatchItem, BatchRunner, BatchStore
+from app.services.bedrock_service import BedrockService
+from app.services.mcp_service import mcp_server_configured
+from app.services.result_store import ResultStore
+
+_QUESTIONS = [
+    ("answer", "データソースの一覧を教えてください"),
+    ("answer", "Superstoreの地域別の売上を教えてください"),
+    ("report", "Superstoreのカテゴリ別の売上と利益をまとめてください"),
+    ("chart", "Superstoreの月別の売上推移を教えてください"),
+    ("answer", "Superstoreで利益率が最も低いサブカテゴリは？"),
+    ("report", "Superstoreのセグメント別の売上構成を分析してください"),
+]
+
+
+def _load_questions(path: str = None):
+    if not path:
+        return _QUESTIONS
+    with open(path, encoding="utf-8") as f:
+        return [("answer", line.strip()) for line in f if line.strip()]
+
+
+def _runner() -> BatchRunner:
+    try:
+        bedrock = BedrockService(
+            aws_region=os.environ["BENCH_AWS_REGION"],
+            aws_bearer_token=os.environ["BENCH_AWS_BEARER_TOKEN"],
+            bedrock_model_id=os.environ["BENCH_BEDROCK_MODEL_ID"],
+            max_tokens=int(os.getenv("BENCH_MAX_TOKENS", "8000"))
+        )
+    except KeyError as e:
+        sys.exit(f"missing environment variable: {e.args[0]}")
+    settings = get_settings()
+    if not mcp_server_configured(settings):
+        sys.exit("missing environment variable: SERVER_SCRIPT_PATH (or MCP_SERVER_URL)")
+    return BatchRunner(settings, bedrock, result_store=ResultStore(), artifact_store=ArtifactStore())
+
+
+async def _run(runner: BatchRunner, questions, concurrency: int):
+    items = [BatchItem(str(i), kind, question) for i, (kind, question) in enumerate(questions)]
+    job = BatchStore().create(items, concurrency=concurrency)
+    return await runner.run(job)
+
+
+def main(concurrency: int = 4, path: str = None) -> None:
+    runner = _runner()
+    questions = _load_questions(path)
+    results = {}
+    for workers in (1, concurrency):
+        job = asyncio.run(_run(runner, questions, workers))
+        results[workers] = job.items_per_minute or 0.0
+        print(
+            f"concurrency={workers:<3} items={len(job.items):<3} failed={job.count('failed'):<3} "
+            f"duration={job.finished_at - job.started_at:>7.1f}s  items/min={results[workers]:>6.2f}"
+        )
+    if results[1]:
+        print(f"speedup: {results[concurrency] / results[1]:.2f}x")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 4,
+        sys.argv[2] if len(sys.argv) > 2 else None
+    )
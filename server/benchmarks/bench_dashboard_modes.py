@@ -0,0 +1,93 @@
+"""ダッシュボード/チャート生成の各モード（html / spec / sections）の出力トークン数・レイテンシ比較
+
+同じ入力に対して各モードを交互に実行し、出力トークン数とレイテンシの中央値を表示する。
+実際のBedrock呼び出しを行うため、以下の環境変数が必要:
+    BENCH_AWS_REGION, BENCH_AWS_BEARER_TOKEN, BENCH_BEDROCK_MODEL_ID
+
+実行方法（server/ ディレクトリで）:
+    python -m benchmarks.bench_dashboard_modes [繰り返し回数]
+"""
+import asyncio
+import os
+import sys
+
+from app.config.settings import get_settings
+from app.core.metrics import get_metrics
+from app.services.bedrock_service import BedrockService
+from app.services.dashboard_service import DashboardService
+
+_ANALYSIS = """## 2024年度 地域別売上分析
+
+| 地域 | 売上 | 利益 | 前年比 |
+|------|------|------|--------|
+| East | 678,781 | 91,523 | +12.4% |
+| West | 725,458 | 108,418 | +8.1% |
+| Central | 501,240 | 39,706 | -2.3% |
+| South | 391,722 | 46,749 | +4.7% |
+
+### 月別売上推移（千円）
+1月: 94, 2月: 59, 3月: 205, 4月: 137, 5月: 155, 6月: 152,
+7月: 147, 8月: 159, 9月: 307, 10月: 200, 11月: 352, 12月: 322
+
+### 洞察
+- Westが売上・利益ともに最大
+- Centralは唯一前年割れで、値引き率の高さが利益を圧迫
+- 9月・11月・12月に売上が集中する季節性がある
+"""
+
+_MODES = {"dashboard": ("html", "spec", "sections"), "chart": ("html", "spec")}
+
+
+def _service() -> DashboardService:
+    try:
+        bedrock = BedrockService(
+            aws_region=os.environ["BENCH_AWS_REGION"],
+            aws_bearer_token=os.environ["BENCH_AWS_BEARER_TOKEN"],
+            bedrock_model_id=os.environ["BENCH_BEDROCK_MODEL_ID"],
+            max_tokens=int(os.getenv("BENCH_MAX_TOKENS", "8000"))
+        )
+    except KeyError as e:
+        sys.exit(f"missing environment variable: {e.args[0]}")
+    settings = get_settings()
+    # 表を含む入力はチャート高速パスで処理されるため、LLM生成同士を比較するよう無効化
+    settings.dashboard.chart_fastpath_enabled = False
+    return DashboardService(bedrock, settings)
+
+
+async def _run(service: DashboardService, kind: str, iterations: int) -> None:
+    generate = service.generate_chart_code if kind == "chart" else service.generate_dashboard_code
+    for _ in range(iterations):
+        for mode in _MODES[kind]:
+            await generate(_ANALYSIS, render_mode=mode)
+
+
+def _report(kind: str) -> None:
+    metrics = get_metrics()
+    for mode in _MODES[kind]:
+        tokens = metrics.get_histogram("dashboard.output_tokens", kind=kind, mode=mode)
+        latency = metrics.get_histogram("dashboard.latency_seconds", kind=kind, mode=mode)
+        if tokens is None or latency is None:
+            continue
+        fallbacks = 0
+        if mode == "spec":
+            fallbacks = metrics.get_counter("dashboard.spec_fallbacks", kind=kind)
+        elif mode == "sections":
+            fallbacks = sum(
+                metrics.get_counter("dashboard.section_fallbacks", reason=reason) for reason in ("plan", "sections")
+            )
+        print(
+            f"{kind:<10} {mode:<5} n={tokens.count:<3} "
+            f"output_tokens p50={tokens.percentile(50):>7.0f} mean={tokens.summary()['mean']:>7.0f}  "
+            f"latency p50={latency.percentile(50):>6.2f}s  fallbacks={fallbacks:.0f}"
+        )
+
+
+def main(iterations: int = 3) -> None:
+    service = _service()
+    for kind in ("dashboard", "chart"):
+        asyncio.run(_run(service, kind, iterations))
+        _report(kind)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
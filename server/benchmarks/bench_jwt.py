@@ -0,0 +1,36 @@
+"""JWT署名スループットのマイクロベンチマーク
+
+実行方法（server/ ディレクトリで）:
+    python -m benchmarks.bench_jwt
+"""
+import time
+
+from app.config.settings import Settings
+from app.services.auth_service import AuthService
+
+
+def _build_service() -> AuthService:
+    settings = Settings()
+    settings.tableau.connected_app_client_id = settings.tableau.connected_app_client_id or "bench-client"
+    settings.tableau.connected_app_client_secret = settings.tableau.connected_app_client_secret or "bench-secret-id"
+    settings.tableau.connected_app_secret_value = settings.tableau.connected_app_secret_value or "bench-secret-value"
+    return AuthService(settings)
+
+
+def _measure(label: str, func, iterations: int) -> None:
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {iterations / elapsed:>12,.0f} tokens/s  ({elapsed * 1e6 / iterations:.1f} us/token)")
+
+
+def main(iterations: int = 20000, users: int = 50) -> None:
+    service = _build_service()
+
+    _measure("sign (uncached)", lambda i: service.generate_jwt_token(f"user{i % users}", 5), iterations)
+    _measure("get_jwt_token (cached)", lambda i: service.get_jwt_token(f"user{i % users}"), iterations)
+
+
+if __name__ == "__main__":
+    main()
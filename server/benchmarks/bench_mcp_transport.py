@@ -0,0 +1,100 @@
+"""MCPツール呼び出しのレイテンシをトランスポート（stdio / streamable-http / sse）ごとに比較する
+
+各トランスポートで以下を計測する:
+    connect+call  接続・初期化から1回の呼び出し、切断まで（プールを使わないリクエスト相当）
+    reused        開いたままの1つのセッションでの逐次呼び出し（プール・共有サーバー相当）
+    concurrent    同じセッションで同時に呼び出した場合のスループット
+
+stdioは SERVER_SCRIPT_PATH、ネットワーク接続は MCP_SERVER_URL（MCP_TRANSPORT が stdio の場合は
+streamable-http として接続）が設定されている場合に計測する。
+
+実行方法（server/ ディレクトリで）:
+    python -m benchmarks.bench_mcp_transport [呼び出し回数] [ツール名] [引数（JSON）]
+"""
+import asyncio
+import json
+import statistics
+import sys
+import time
+from contextlib import AsyncExitStack
+
+from app.config.settings import get_settings
+from app.services.mcp_service import open_session
+
+
+def _transport_settings():
+    settings = get_settings()
+    targets = []
+    if settings.mcp.server_script_path:
+        stdio = settings.model_copy(deep=True)
+        stdio.mcp.transport = "stdio"
+        targets.append(stdio)
+    if settings.mcp.server_url:
+        network = settings.model_copy(deep=True)
+        if network.mcp.transport == "stdio":
+            network.mcp.transport = "streamable-http"
+        targets.append(network)
+    return targets
+
+
+def _percentile(samples, percentile: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+def _report(label: str, samples) -> None:
+    ms = [sample * 1000 for sample in samples]
+    print(
+        f"  {label:<14} n={len(ms):<4} mean={statistics.mean(ms):>8.1f}ms  "
+        f"p50={_percentile(ms, 50):>8.1f}ms  p95={_percentile(ms, 95):>8.1f}ms"
+    )
+
+
+async def _connect_and_call(settings, tool: str, args: dict) -> float:
+    start = time.perf_counter()
+    async with AsyncExitStack() as stack:
+        session = await open_session(stack, settings)
+        await session.call_tool(tool, args)
+    return time.perf_counter() - start
+
+
+async def _reused(settings, tool: str, args: dict, iterations: int, concurrency: int):
+    async with AsyncExitStack() as stack:
+        session = await open_session(stack, settings)
+        # 初回呼び出し（サーバー側の認証・キャッシュの準備）は計測から除く
+        await session.call_tool(tool, args)
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            await session.call_tool(tool, args)
+            samples.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(session.call_tool(tool, args) for _ in range(concurrency)))
+        throughput = concurrency / (time.perf_counter() - start)
+    return samples, throughput
+
+
+async def _bench(settings, tool: str, args: dict, iterations: int, concurrency: int) -> None:
+    print(f"transport={settings.mcp.transport}")
+    cold = [await _connect_and_call(settings, tool, args) for _ in range(max(1, iterations // 5))]
+    _report("connect+call", cold)
+    samples, throughput = await _reused(settings, tool, args, iterations, concurrency)
+    _report("reused", samples)
+    print(f"  {'concurrent':<14} n={concurrency:<4} {throughput:>8.1f} calls/s")
+
+
+def main(iterations: int = 20, tool: str = "list-datasources", args: dict = None, concurrency: int = 8) -> None:
+    targets = _transport_settings()
+    if not targets:
+        sys.exit("missing environment variable: SERVER_SCRIPT_PATH and/or MCP_SERVER_URL")
+    for settings in targets:
+        asyncio.run(_bench(settings, tool, args or {}, iterations, concurrency))
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        sys.argv[2] if len(sys.argv) > 2 else "list-datasources",
+        json.loads(sys.argv[3]) if len(sys.argv) > 3 else None
+    )
@@ -0,0 +1,55 @@
+"""大規模クエリ結果に対するダイジェスト生成時間とプロンプトサイズのベンチマーク
+
+実行方法（server/ ディレクトリで）:
+    python -m benchmarks.bench_result_digest
+"""
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from app.core.result_encoding import encode_tool_result, estimate_tokens_from_chars
+
+_REGIONS = ["East", "West", "Central", "South"]
+_CATEGORIES = ["Furniture", "Office Supplies", "Technology"]
+
+
+def _synthetic_result(row_count: int) -> str:
+    rng = random.Random(42)
+    start = date(2023, 1, 1)
+    rows = []
+    for i in range(row_count):
+        rows.append({
+            "Order Date": (start + timedelta(days=i % 730)).isoformat(),
+            "Region": rng.choice(_REGIONS),
+            "Category": rng.choice(_CATEGORIES),
+            "Sales": round(rng.uniform(10, 5000), 2),
+            "Profit": round(rng.uniform(-500, 1500), 2) if rng.random() > 0.02 else None,
+            "Quantity": rng.randint(1, 14),
+        })
+    return json.dumps({"data": rows})
+
+
+def _report(label: str, raw_chars: int, func) -> None:
+    start = time.perf_counter()
+    encoded = func()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<22} {elapsed * 1000:>9.1f} ms  {encoded.encoded_chars:>11,} chars  "
+        f"~{encoded.encoded_tokens:>9,} tokens  ({encoded.encoded_chars / raw_chars:.2%} of raw)"
+    )
+
+
+def main(row_count: int = 100_000) -> None:
+    raw = _synthetic_result(row_count)
+    raw_chars = len(raw)
+    print(f"raw JSON               {'':>12}  {raw_chars:>11,} chars  ~{estimate_tokens_from_chars(raw_chars):>9,} tokens")
+
+    unbounded = 10 ** 12
+    _report("table (uncapped)", raw_chars, lambda: encode_tool_result(raw, max_rows=unbounded, max_bytes=unbounded))
+    _report("table (default caps)", raw_chars, lambda: encode_tool_result(raw))
+    _report("digest + 20 samples", raw_chars, lambda: encode_tool_result(raw, digest_min_rows=1000))
+
+
+if __name__ == "__main__":
+    main()